@@ -2,17 +2,52 @@ from __future__ import annotations
 
 from pathlib import Path
 import datetime
-from typing import Optional
+import os
+from typing import Iterator, Optional, Tuple
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
 
-from app.robots.vsb import VsbRobotError, run_vsb_robot
-from app.parsers.nfe import parse_nfe_directory
-from app.validators.avd import AVDValidationError, conciliar_notas_com_avd
-from app.services.database import db_session
+from app.services.admissao import Limiter, Saturado, downloads
+from app.services.coalescencia import ResultCache
+
+# Robôs (requests), parsers, validadores e SQLAlchemy são importados dentro dos
+# endpoints: o boot do app e dos workers não paga por módulos que a rota não usa.
+# scripts/check_importtime.py falha se algum deles voltar ao import de app.main.
 
 app = FastAPI(title="TUST Robots API")
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+# /robots/vsb: pedidos simultâneos para a mesma transmissora, competência e
+# destino compartilham o download e a extração (`Robot.executar`, o mesmo
+# single-flight do /robots/executar e do agendador); com Idempotency-Key,
+# repetições dentro do prazo devolvem a resposta guardada sem executar de novo.
+VSB_IDEMPOTENCY_TTL = float(os.environ.get("VSB_IDEMPOTENCY_TTL", 600))
+_vsb_respostas = ResultCache(ttl=VSB_IDEMPOTENCY_TTL)
+
+# Admissão por etapa: downloads do portal e escritas no banco têm limites e filas
+# próprios; saturado, o pedido volta com 429/503 e Retry-After em vez de empilhar.
+# O limite de downloads é o do processo (`admissao.downloads`), compartilhado
+# com o RobotScheduler.
+vsb_downloads = downloads
+db_escritas = Limiter(
+    "escrita",
+    limite=int(os.environ.get("DB_MAX_ESCRITAS", 1)),
+    fila=int(os.environ.get("DB_FILA_ESCRITAS", 16)),
+    espera_max=float(os.environ.get("DB_ESPERA_MAX", 60)),
+)
+
+
+@app.exception_handler(Saturado)
+async def _saturado(request, exc: Saturado) -> JSONResponse:
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": str(exc), "etapa": exc.etapa},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
 
 
 class VsbRequest(BaseModel):
@@ -40,42 +75,304 @@ class VsbResponse(BaseModel):
     processamento: Optional[dict] = None
 
 
-@app.post("/robots/vsb", response_model=VsbResponse, summary="Executa o robô da VSB.")
-async def trigger_vsb_robot(payload: VsbRequest) -> VsbResponse:
+def _executar_vsb(payload: VsbRequest) -> Tuple[VsbResponse, bool]:
+    from app.robots.vsb import VsbRobotError, executar_vsb_robot
+
+    # A escrita é admitida antes do download: com a fila do banco cheia o
+    # pedido é recusado sem baixar nada.
+    if payload.processar:
+        db_escritas.verificar()
     try:
-        result = run_vsb_robot(
+        result, compartilhada = executar_vsb_robot(
             codigo_ons=payload.codigo_ons,
             competencia=payload.competencia,
             download_dir=payload.download_dir,
+            esperar=False,
         )
     except VsbRobotError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
 
     processamento = None
     if payload.processar:
+        from app.parsers.pacote import parse_pacote
+        from app.services.database import db_session
+        from app.services.documentos import registrar_documentos
+        from app.validators.avd import AVDValidationError, conciliar_notas_com_avd
+
         competencia_str = result["competencia"]
         destino_path = Path(result["destino"])
         ano, mes = competencia_str.split(".")
         competencia_date = datetime.date(int(ano), int(mes), 1)
-        invoices = parse_nfe_directory(destino_path, payload.codigo_ons, competencia_date)
+        pacote = parse_pacote(destino_path, payload.codigo_ons, competencia_date)
         try:
-            with db_session(payload.db_url) as session:
+            # O download já foi feito: espera a vaga em vez de descartá-lo.
+            with db_escritas.slot(esperar=True), db_session(payload.db_url) as session:
+                documentos = registrar_documentos(
+                    session,
+                    result["arquivos"],
+                    payload.codigo_ons,
+                    assinaturas=result.get("assinaturas"),
+                )
                 processamento = conciliar_notas_com_avd(
                     session,
                     payload.codigo_ons,
                     competencia_date,
-                    invoices,
+                    pacote.notas,
+                    pacote.boletos,
                 )
+                processamento["documentos"] = {
+                    chave: documentos[chave] for chave in ("total", "novos", "ignorados")
+                }
         except AVDValidationError as exc:
             raise HTTPException(status_code=400, detail=str(exc)) from exc
+        except Saturado:
+            raise
         except Exception as exc:
             raise HTTPException(status_code=500, detail=str(exc)) from exc
 
-    return VsbResponse(
+    resposta = VsbResponse(
         codigo_ons=result["codigo_ons"],
         competencia=result["competencia"],
         arquivos=[str(path) for path in result["arquivos"]],
         destino=str(result["destino"]),
         processamento=processamento,
     )
+    return resposta, compartilhada
+
+
+@app.post("/robots/vsb", response_model=VsbResponse, summary="Executa o robô da VSB.")
+async def trigger_vsb_robot(
+    payload: VsbRequest,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+) -> VsbResponse:
+    from app.robots.base import default_competencia
+
+    # Corpo com a competência resolvida: omitir a padrão ou informá-la é o mesmo pedido.
+    chave = payload.model_copy(
+        update={"competencia": payload.competencia or default_competencia()}
+    ).model_dump_json()
+    if idempotency_key:
+        anterior = _vsb_respostas.get(idempotency_key)
+        if anterior is not None:
+            corpo, resposta = anterior
+            if corpo != chave:
+                raise HTTPException(
+                    status_code=422,
+                    detail="Idempotency-Key já utilizada com outro corpo de requisição.",
+                )
+            response.headers["Idempotent-Replayed"] = "true"
+            return resposta
+
+    resposta, compartilhada = await run_in_threadpool(_executar_vsb, payload)
+    if compartilhada:
+        response.headers["X-Coalesced"] = "true"
+    if idempotency_key:
+        _vsb_respostas.set(idempotency_key, (chave, resposta))
+    return resposta
+
+
+@app.get("/metrics/admissao", summary="Ocupação, fila e recusas dos limites de admissão.")
+def metricas_admissao() -> dict:
+    from app.robots.base import execucoes as robot_execucoes
+
+    return {
+        "download": vsb_downloads.stats(),
+        "escrita": db_escritas.stats(),
+        "robos_em_andamento": robot_execucoes.em_andamento(),
+        "vsb_idempotencia": _vsb_respostas.stats(),
+    }
+
+
+class RobotsRequest(BaseModel):
+    competencia: Optional[str] = Field(
+        None, pattern=r"^\d{4}\.\d{2}$", description="Competência no formato YYYY.MM."
+    )
+    codigos_ons: Optional[list[str]] = Field(
+        None, description="Transmissoras a processar (padrão: todas com robô disponível)."
+    )
+    download_dir: Optional[Path] = Field(
+        None, description="Diretório base para salvar os arquivos baixados."
+    )
+    max_portais: int = Field(4, ge=1, le=16, description="Portais executados em paralelo.")
 
+
+@app.post("/robots/executar", summary="Executa os robôs de cada transmissora pelo seu portal.")
+def executar_robots(payload: RobotsRequest) -> dict:
+    from app.robots.scheduler import RobotScheduler
+    from app.services.database import db_session
+    from app.services.documentos import registrar_resultados
+    from app.services.transmissoras import transmissora_cache
+
+    with db_session() as session:
+        if payload.codigos_ons:
+            transmissoras = [
+                transmissora_cache.get_por_codigo(session, codigo)
+                for codigo in payload.codigos_ons
+            ]
+            desconhecidos = [
+                codigo for codigo, t in zip(payload.codigos_ons, transmissoras) if t is None
+            ]
+            if desconhecidos:
+                raise HTTPException(
+                    status_code=404,
+                    detail=f"Transmissoras não cadastradas: {', '.join(desconhecidos)}.",
+                )
+        else:
+            transmissoras = [
+                t
+                for t in transmissora_cache.all(session)
+                if (t.formaencaminhamentofaturas or "").lower() == "download"
+            ]
+
+    scheduler = RobotScheduler(max_portals=payload.max_portais, download_dir=payload.download_dir)
+    resultados = scheduler.run(transmissoras, payload.competencia)
+    # Os downloads já foram feitos: a escrita espera a vaga em vez de descartá-los.
+    with db_escritas.slot(esperar=True), db_session() as session:
+        documentos = registrar_resultados(session, resultados)
+    status: dict = {}
+    for resultado in resultados:
+        status[resultado["status"]] = status.get(resultado["status"], 0) + 1
+    return {"status": status, "documentos": documentos, "resultados": resultados}
+
+
+@app.get("/avds", summary="Lista AVDs por empresa/competência (paginação por id).")
+def listar_avds(
+    response: Response,
+    codigo_empresa: Optional[str] = Query(None, description="Código da empresa (CODIGOEMPRESA)."),
+    competencia: Optional[str] = Query(
+        None, pattern=r"^\d{4}\.\d{2}$", description="Competência no formato YYYY.MM."
+    ),
+    after: Optional[int] = Query(None, description="Último ID_AVISODEBITO da página anterior."),
+    limit: int = Query(100, ge=1, le=1000),
+    fields: Optional[str] = Query(None, description="Colunas separadas por vírgula."),
+    if_none_match: Optional[str] = Header(None),
+):
+    from app.services import consultas
+    from app.services.database import db_session
+
+    try:
+        with db_session() as session:
+            page = consultas.listar_avds(
+                session,
+                codigo_empresa=codigo_empresa,
+                competencia=competencia,
+                after=after,
+                limit=limit,
+                fields=fields,
+            )
+    except consultas.ConsultaError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    etag = consultas.make_etag(page)
+    if consultas.etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return page
+
+
+@app.get("/avds/resumo", summary="Totais por empresa/competência/transmissora.")
+def resumo_avds(
+    codigo_empresa: Optional[str] = Query(None, description="Código da empresa (CODIGOEMPRESA)."),
+    competencia: Optional[str] = Query(
+        None, pattern=r"^\d{4}\.\d{2}$", description="Competência no formato YYYY.MM."
+    ),
+    codigo_ons: Optional[str] = Query(None, description="Código ONS da transmissora."),
+):
+    from app.services import consultas
+    from app.services.database import db_session
+    from app.services.resumo import listar_resumo
+
+    try:
+        competencia_dt = consultas.parse_competencia(competencia) if competencia else None
+    except consultas.ConsultaError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+    with db_session() as session:
+        return [
+            {
+                "codigo_empresa": row.codigoempresa,
+                "competencia": row.datacompetencia.date().isoformat(),
+                "codigo_ons": row.codigoons,
+                "qtd_itens": row.qtditens,
+                "valor_parcela1": str(row.valorparcela1),
+                "valor_parcela2": str(row.valorparcela2),
+                "valor_parcela3": str(row.valorparcela3),
+                "valor_total": str(row.valortotal),
+            }
+            for row in listar_resumo(session, codigo_empresa, competencia_dt, codigo_ons)
+        ]
+
+
+@app.get("/avds/{avd_id}/itens", summary="Itens de uma AVD em JSON transmitido por partes.")
+def listar_itens_avd(
+    avd_id: int,
+    after: Optional[int] = Query(None, description="Último ID_AVISODEBITOITEM da página anterior."),
+    limit: Optional[int] = Query(None, ge=1, description="Sem limite, transmite todos os itens."),
+    fields: Optional[str] = Query(None, description="Colunas separadas por vírgula."),
+    if_none_match: Optional[str] = Header(None),
+):
+    from app.services import consultas
+    from app.services.database import db_session
+
+    try:
+        consultas.resolve_fields(consultas.AVD_ITEM_FIELDS, "id_avisodebitoitem", fields)
+        # Corpo e ETag saem da mesma leitura, na mesma sessão.
+        with db_session() as session:
+            if not consultas.avd_existe(session, avd_id):
+                raise HTTPException(status_code=404, detail=f"AVD {avd_id} não encontrada.")
+            etag, partes = consultas.pagina_itens_json(session, avd_id, after, limit, fields)
+    except consultas.ConsultaError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    if consultas.etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return StreamingResponse(iter(partes), media_type="application/json", headers={"ETag": etag})
+
+
+def _stream_conciliacao(
+    formato: str,
+    codigo_empresa: Optional[str],
+    de: Optional[datetime.date],
+    ate: Optional[datetime.date],
+) -> Iterator[str]:
+    from app.services.database import db_session
+    from app.services.exportacao import iter_export
+    from app.validators.avd import CONCILIACAO_EXPORT_FIELDS, iter_conciliacao_persistida
+
+    with db_session() as session:
+        rows = iter_conciliacao_persistida(
+            session,
+            codigo_empresa=codigo_empresa,
+            competencia_inicio=de,
+            competencia_fim=ate,
+        )
+        yield from iter_export(rows, formato, CONCILIACAO_EXPORT_FIELDS)
+
+
+@app.get("/conciliacao/export", summary="Exporta a conciliação NF x AVD em NDJSON ou CSV.")
+def exportar_conciliacao(
+    codigo_empresa: Optional[str] = Query(None, description="Código da empresa (CODIGOEMPRESA)."),
+    de: Optional[str] = Query(
+        None, pattern=r"^\d{4}\.\d{2}$", description="Competência inicial YYYY.MM."
+    ),
+    ate: Optional[str] = Query(
+        None, pattern=r"^\d{4}\.\d{2}$", description="Competência final YYYY.MM."
+    ),
+    formato: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+):
+    from app.services import consultas
+    from app.services.exportacao import FORMATOS
+
+    try:
+        inicio = consultas.parse_competencia(de).date() if de else None
+        fim = consultas.parse_competencia(ate).date() if ate else None
+    except consultas.ConsultaError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+    headers = {}
+    if formato == "csv":
+        headers["Content-Disposition"] = 'attachment; filename="conciliacao.csv"'
+    return StreamingResponse(
+        _stream_conciliacao(formato, codigo_empresa, inicio, fim),
+        media_type=FORMATOS[formato],
+        headers=headers,
+    )
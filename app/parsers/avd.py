@@ -0,0 +1,589 @@
+"""Planilha AVD (.xlsx) do ONS: detecção do layout, cabeçalho e itens por transmissora."""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import os
+import posixpath
+import re
+import threading
+import unicodedata
+import zipfile
+from array import array
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+from itertools import chain, islice
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from xml.etree import ElementTree as ET
+
+XL_NS = {"main": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+REL_NS = {"rel": "http://schemas.openxmlformats.org/package/2006/relationships"}
+R_ID = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id"
+EXCEL_EPOCH = datetime(1899, 12, 30)
+PT_BR_MONTHS = {
+    "janeiro": 1,
+    "fevereiro": 2,
+    "marco": 3,
+    "abril": 4,
+    "maio": 5,
+    "junho": 6,
+    "julho": 7,
+    "agosto": 8,
+    "setembro": 9,
+    "outubro": 10,
+    "novembro": 11,
+    "dezembro": 12,
+}
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+# Ancorado na raiz do projeto: a API e os scripts usam o mesmo arquivo,
+# qualquer que seja o diretório de onde foram iniciados.
+AVD_LAYOUT_CACHE = Path(
+    os.environ.get("AVD_LAYOUT_CACHE", ROOT_DIR / "data" / "avd" / "layouts.json")
+)
+
+# Rótulos do cabeçalho (normalizados) → campo; o valor fica na próxima célula à direita.
+HEADER_LABELS = {
+    "numero avd": "numero_avd",
+    "encargo mensal": "encargo_mensal",
+    "periodo apuracao": "periodo_apuracao",
+    "periodo de apuracao": "periodo_apuracao",
+    "pv/spb": "pv_spb",
+    "data de disponibilizacao": "data_disponibilizacao",
+    "total s/ pis/pasep e cofins": "total_sem_pis_cofins",
+}
+REQUIRED_HEADER = ("numero_avd", "periodo_apuracao")
+MAX_HEADER_ROWS = 30
+
+_PARCELA_RE = re.compile(r"^(\d)\s*a?\.?\s*parcela")
+_DATE_RE = re.compile(r"(\d{2}/\d{2}/\d{4})")
+
+Cell = Tuple[int, str]
+Rows = List[Tuple[int, Dict[str, str]]]
+
+
+class AvdLayoutError(ValueError):
+    """Planilha AVD sem layout reconhecível."""
+
+
+def _normalize_label(text: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", text.strip().lower())
+    cleaned = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return " ".join(cleaned.rstrip(":").split())
+
+
+def _col_index(col: str) -> int:
+    index = 0
+    for ch in col:
+        index = index * 26 + ord(ch) - 64
+    return index
+
+
+def _col_letter(index: int) -> str:
+    letters = ""
+    while index:
+        index, rest = divmod(index - 1, 26)
+        letters = chr(65 + rest) + letters
+    return letters
+
+
+def _parse_shared_strings(data: bytes) -> List[str]:
+    root = ET.fromstring(data)
+    values: List[str] = []
+    for si in root.findall("main:si", XL_NS):
+        pieces = []
+        for node in si.iterfind(".//main:t", XL_NS):
+            pieces.append(node.text or "")
+        values.append("".join(pieces))
+    return values
+
+
+def _iter_sheet(data: bytes, shared_strings: List[str]) -> Iterator[Tuple[int, Dict[str, str]]]:
+    """Linhas (número, {coluna: valor}) em streaming; cada <row> é descartado depois de lido."""
+    row_tag = f"{{{XL_NS['main']}}}row"
+    for _, row in ET.iterparse(io.BytesIO(data)):
+        if row.tag != row_tag:
+            continue
+        row_map: Dict[str, str] = {}
+        for cell in row.findall("main:c", XL_NS):
+            ref = cell.attrib["r"]
+            col = "".join(filter(str.isalpha, ref))
+            value = None
+            v = cell.find("main:v", XL_NS)
+            if cell.attrib.get("t") == "s":
+                if v is not None:
+                    value = shared_strings[int(v.text)]
+            elif cell.attrib.get("t") == "inlineStr":
+                value = "".join(node.text or "" for node in cell.iterfind(".//main:t", XL_NS))
+            elif v is not None:
+                value = v.text
+            if value is not None:
+                row_map[col] = value
+        if row_map:
+            yield int(row.attrib["r"]), row_map
+        row.clear()
+
+
+def _excel_serial_to_datetime(serial: str) -> datetime:
+    """Convert Excel serial value to datetime (supports fractional time)."""
+    value = float(serial)
+    days = int(value)
+    remainder = value - days
+    return EXCEL_EPOCH + timedelta(days=days, seconds=remainder * 86400)
+
+
+def _parse_period(text: str) -> datetime:
+    """Parse strings como 'Outubro/2025' to the first day of that month."""
+    month_str, year_str = text.split("/")
+    month = PT_BR_MONTHS[_normalize_label(month_str)]
+    return datetime(int(year_str), month, 1)
+
+
+def _parse_due(text: str) -> datetime:
+    """Data dd/mm/aaaa contida no texto, p.ex. '1a. Parcela dia 15/11/2025'."""
+    match = _DATE_RE.search(text or "")
+    if not match:
+        raise ValueError(f"Could not parse due date text: {text}")
+    return datetime.strptime(match.group(1), "%d/%m/%Y")
+
+
+def _decimal_or_none(value: Optional[str]) -> Optional[Decimal]:
+    if value is None or value == "":
+        return None
+    return Decimal(value)
+
+
+@dataclass(frozen=True)
+class AvdLayout:
+    """Posições detectadas numa planilha AVD (células como (linha, coluna))."""
+
+    sheet: str
+    shared_strings: Optional[str]
+    campos: Dict[str, Cell]
+    vencimentos: Dict[int, Cell]
+    header_row: int
+    colunas: Dict[str, str]
+    rotulos: List[Tuple[int, str, str]]
+
+    def confere(self, rows: Rows) -> bool:
+        """Os rótulos continuam nas mesmas células? (validação do caminho rápido)."""
+        por_linha = {idx: data for idx, data in rows if idx <= self.header_row}
+        return all(
+            _normalize_label(por_linha.get(row, {}).get(col, "")) == rotulo
+            for row, col, rotulo in self.rotulos
+        )
+
+    def to_json(self) -> dict:
+        data = asdict(self)
+        data["campos"] = {campo: list(cell) for campo, cell in self.campos.items()}
+        data["vencimentos"] = {str(n): list(cell) for n, cell in self.vencimentos.items()}
+        data["rotulos"] = [list(rotulo) for rotulo in self.rotulos]
+        return data
+
+    @classmethod
+    def from_json(cls, data: dict) -> "AvdLayout":
+        return cls(
+            sheet=data["sheet"],
+            shared_strings=data.get("shared_strings"),
+            campos={campo: (cell[0], cell[1]) for campo, cell in data["campos"].items()},
+            vencimentos={int(n): (cell[0], cell[1]) for n, cell in data["vencimentos"].items()},
+            header_row=data["header_row"],
+            colunas=dict(data["colunas"]),
+            rotulos=[(r[0], r[1], r[2]) for r in data["rotulos"]],
+        )
+
+
+class LayoutCache:
+    """Layouts por impressão digital, em memória e (opcionalmente) num JSON em disco."""
+
+    def __init__(self, path: Optional[Path] = None) -> None:
+        self.path = path
+        self._layouts: Optional[Dict[str, AvdLayout]] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self) -> Dict[str, AvdLayout]:
+        if self._layouts is None:
+            self._layouts = {}
+            if self.path and self.path.exists():
+                try:
+                    raw = json.loads(self.path.read_text(encoding="utf-8"))
+                    self._layouts = {k: AvdLayout.from_json(v) for k, v in raw.items()}
+                except (ValueError, KeyError, TypeError):
+                    self._layouts = {}
+        return self._layouts
+
+    def get(self, fingerprint: str) -> Optional[AvdLayout]:
+        with self._lock:
+            layout = self._load().get(fingerprint)
+            if layout is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return layout
+
+    def put(self, fingerprint: str, layout: AvdLayout) -> None:
+        with self._lock:
+            layouts = self._load()
+            layouts[fingerprint] = layout
+            if not self.path:
+                return
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = self.path.with_suffix(f".tmp{os.getpid()}")
+                tmp.write_text(
+                    json.dumps({k: v.to_json() for k, v in layouts.items()}), encoding="utf-8"
+                )
+                os.replace(tmp, self.path)
+            except OSError:
+                pass
+
+    def clear(self) -> None:
+        with self._lock:
+            self._layouts = {}
+
+
+layout_cache = LayoutCache(AVD_LAYOUT_CACHE)
+
+
+def _resolve_target(target: str) -> str:
+    if target.startswith("/"):
+        return target.lstrip("/")
+    return posixpath.normpath(posixpath.join("xl", target))
+
+
+def workbook_parts(zf: zipfile.ZipFile) -> Tuple[List[Tuple[str, str]], Optional[str]]:
+    """Planilhas (nome, caminho no zip) na ordem do workbook e o caminho das shared strings."""
+    rels = ET.fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+    targets: Dict[str, str] = {}
+    shared_strings = None
+    for rel in rels.findall("rel:Relationship", REL_NS):
+        target = _resolve_target(rel.attrib["Target"])
+        targets[rel.attrib["Id"]] = target
+        if rel.attrib.get("Type", "").endswith("/sharedStrings"):
+            shared_strings = target
+
+    workbook = ET.fromstring(zf.read("xl/workbook.xml"))
+    sheets = [
+        (sheet.attrib.get("name", ""), targets[sheet.attrib[R_ID]])
+        for sheet in workbook.findall("main:sheets/main:sheet", XL_NS)
+        if sheet.attrib.get(R_ID) in targets
+    ]
+    return sheets, shared_strings
+
+
+def layout_fingerprint(zf: zipfile.ZipFile, sheets: List[Tuple[str, str]]) -> str:
+    """
+    Identifica o "modelo" da planilha sem ler as células.
+
+    Usa os estilos e a estrutura de planilhas (não os nomes, que trazem o
+    código da empresa): arquivos gerados pelo mesmo modelo têm a mesma impressão.
+    """
+    digest = hashlib.sha1()
+    try:
+        digest.update(zf.read("xl/styles.xml"))
+    except KeyError:
+        pass
+    for _, target in sheets:
+        digest.update(target.encode())
+    return digest.hexdigest()
+
+
+def _next_value(data: Dict[str, str], col: str) -> Optional[str]:
+    """Coluna da próxima célula preenchida à direita de `col`."""
+    inicio = _col_index(col)
+    candidatas = sorted((_col_index(c), c) for c in data if _col_index(c) > inicio)
+    return candidatas[0][1] if candidatas else None
+
+
+def _detect_in_sheet(rows: Rows, sheet: str, shared_strings: Optional[str]) -> Optional[AvdLayout]:
+    campos: Dict[str, Cell] = {}
+    rotulos: List[Tuple[int, str, str]] = []
+    vencimentos: Dict[int, Cell] = {}
+    colunas: Dict[str, str] = {}
+    header_row = None
+
+    for row_idx, data in rows[:MAX_HEADER_ROWS]:
+        normalized = {col: _normalize_label(value) for col, value in data.items()}
+        for col, label in normalized.items():
+            campo = HEADER_LABELS.get(label)
+            if campo and campo not in campos:
+                value_col = _next_value(data, col)
+                if value_col:
+                    campos[campo] = (row_idx, value_col)
+                    rotulos.append((row_idx, col, label))
+                    if campo == "periodo_apuracao":
+                        # Código e nome da empresa ficam à esquerda do rótulo do período.
+                        esquerda = sorted(
+                            (c for c in data if _col_index(c) < _col_index(col)), key=_col_index
+                        )
+                        if len(esquerda) >= 2:
+                            campos["codigo_empresa"] = (row_idx, esquerda[0])
+                            campos["nome_empresa"] = (row_idx, esquerda[1])
+
+        cnpj_col = next((c for c, label in normalized.items() if label == "cnpj"), None)
+        parcelas = {
+            int(match.group(1)): col
+            for col, label in normalized.items()
+            for match in [_PARCELA_RE.match(label)]
+            if match
+        }
+        if cnpj_col and parcelas:
+            header_row = row_idx
+            nome_col = next(
+                (c for c, label in normalized.items() if label.startswith("transmissora")),
+                _col_letter(_col_index(cnpj_col) - 1),
+            )
+            colunas = {
+                "codigo_ons": _col_letter(_col_index(nome_col) - 1),
+                "nome_transmissora": nome_col,
+                "cnpj": cnpj_col,
+            }
+            for numero, col in parcelas.items():
+                colunas[f"valor_parcela{numero}"] = col
+                vencimentos[numero] = (row_idx, col)
+            for col, label in normalized.items():
+                if label.startswith("total c/"):
+                    colunas["valor_total"] = col
+                elif label.startswith("pis/pasep e cofins"):
+                    colunas["valor_pis_cofins"] = col
+            rotulos.append((row_idx, cnpj_col, "cnpj"))
+            break
+
+    if header_row is None or any(campo not in campos for campo in REQUIRED_HEADER):
+        return None
+    return AvdLayout(
+        sheet=sheet,
+        shared_strings=shared_strings,
+        campos=campos,
+        vencimentos=vencimentos,
+        header_row=header_row,
+        colunas=colunas,
+        rotulos=rotulos,
+    )
+
+
+def detect_layout(
+    zf: zipfile.ZipFile,
+    sheets: List[Tuple[str, str]],
+    shared_strings_path: Optional[str],
+    shared_strings: List[str],
+) -> Tuple[AvdLayout, Rows, Iterator[Tuple[int, Dict[str, str]]]]:
+    """Procura, planilha a planilha, os rótulos do cabeçalho e da tabela de transmissoras."""
+    for _, sheet in sheets:
+        rows = _iter_sheet(zf.read(sheet), shared_strings)
+        head = list(islice(rows, MAX_HEADER_ROWS))
+        layout = _detect_in_sheet(head, sheet, shared_strings_path)
+        if layout is not None:
+            return layout, head, rows
+    raise AvdLayoutError("Nenhuma planilha com cabeçalho de AVD reconhecível.")
+
+
+def load_avd_rows(
+    path: Path, cache: LayoutCache = layout_cache
+) -> Tuple[AvdLayout, Rows, Iterator[Tuple[int, Dict[str, str]]]]:
+    """
+    Layout (do cache quando possível), primeiras linhas e o restante da planilha.
+
+    Só o cabeçalho é materializado; as linhas de itens são lidas sob demanda.
+    """
+    with zipfile.ZipFile(path) as zf:
+        sheets, shared_path = workbook_parts(zf)
+        shared = _parse_shared_strings(zf.read(shared_path)) if shared_path else []
+        fingerprint = layout_fingerprint(zf, sheets)
+
+        layout = cache.get(fingerprint)
+        if layout is not None and layout.sheet in {target for _, target in sheets}:
+            rows = _iter_sheet(zf.read(layout.sheet), shared)
+            head = list(islice(rows, MAX_HEADER_ROWS))
+            if layout.confere(head):
+                return layout, head, rows
+
+        layout, head, rows = detect_layout(zf, sheets, shared_path, shared)
+        cache.put(fingerprint, layout)
+        return layout, head, rows
+
+
+def _header(layout: AvdLayout, rows: Rows) -> Dict[str, object]:
+    por_linha = {idx: data for idx, data in rows if idx <= layout.header_row}
+
+    def valor(campo: str) -> Optional[str]:
+        cell = layout.campos.get(campo)
+        return por_linha.get(cell[0], {}).get(cell[1]) if cell else None
+
+    def vencimento(numero: int) -> Optional[datetime]:
+        cell = layout.vencimentos.get(numero)
+        texto = por_linha.get(cell[0], {}).get(cell[1]) if cell else None
+        return _parse_due(texto) if texto else None
+
+    disponibilizacao = valor("data_disponibilizacao")
+    return {
+        "numero_avd": valor("numero_avd"),
+        "encargo_mensal": _decimal_or_none(valor("encargo_mensal")),
+        "codigo_empresa": valor("codigo_empresa"),
+        "nome_empresa": valor("nome_empresa"),
+        "periodo_apuracao": _parse_period(valor("periodo_apuracao")),
+        "pv_spb": _decimal_or_none(valor("pv_spb")),
+        "data_disponibilizacao": (
+            _excel_serial_to_datetime(disponibilizacao) if disponibilizacao else None
+        ),
+        "total_sem_pis_cofins": _decimal_or_none(valor("total_sem_pis_cofins")),
+        "vencimento_parcela1": vencimento(1),
+        "vencimento_parcela2": vencimento(2),
+        "vencimento_parcela3": vencimento(3),
+    }
+
+
+TEXTO_CAMPOS = ("codigo_ons", "nome_transmissora", "cnpj")
+VALOR_CAMPOS = (
+    "valor_parcela1",
+    "valor_parcela2",
+    "valor_parcela3",
+    "valor_total",
+    "valor_pis_cofins",
+)
+CENTAVO = Decimal("0.01")
+_NULO = -(2**63)  # valor ausente nas colunas int64
+
+
+def _centavos(value: Optional[str]) -> int:
+    if value is None or value == "":
+        return _NULO
+    return int(Decimal(value).quantize(CENTAVO, rounding=ROUND_HALF_UP).scaleb(2))
+
+
+def _decimal_de_centavos(centavos: int) -> Optional[Decimal]:
+    return None if centavos == _NULO else Decimal(centavos).scaleb(-2)
+
+
+class AvdItemView:
+    """Uma linha de `AvdItems`, acessível como o dict de antes (`item["valor_total"]`)."""
+
+    __slots__ = ("_items", "_index")
+
+    def __init__(self, items: "AvdItems", index: int) -> None:
+        self._items = items
+        self._index = index
+
+    def __getitem__(self, campo: str):
+        return self._items.valor(campo, self._index)
+
+    def get(self, campo: str, default=None):
+        try:
+            return self[campo]
+        except KeyError:
+            return default
+
+    def to_dict(self) -> Dict[str, object]:
+        return {campo: self[campo] for campo in TEXTO_CAMPOS + VALOR_CAMPOS}
+
+    def __repr__(self) -> str:
+        return f"AvdItemView({self.to_dict()!r})"
+
+
+class AvdItems:
+    """
+    Itens da AVD em colunas: textos em listas e valores em centavos num `array('q')`.
+
+    Cada linha ocupa 5 inteiros de 8 bytes em vez de um dict com 8 chaves e
+    objetos `Decimal`; o `Decimal` só é criado quando o valor é lido.
+    """
+
+    __slots__ = ("codigo_ons", "nome_transmissora", "cnpj", "_valores")
+
+    def __init__(self) -> None:
+        self.codigo_ons: List[str] = []
+        self.nome_transmissora: List[Optional[str]] = []
+        self.cnpj: List[Optional[str]] = []
+        self._valores: Dict[str, array] = {campo: array("q") for campo in VALOR_CAMPOS}
+
+    def append(
+        self,
+        codigo_ons: str,
+        nome_transmissora: Optional[str],
+        cnpj: Optional[str],
+        valores: Iterable[Optional[str]],
+    ) -> None:
+        """Acrescenta uma linha; `valores` segue a ordem de `VALOR_CAMPOS`."""
+        self.codigo_ons.append(codigo_ons)
+        self.nome_transmissora.append(nome_transmissora)
+        self.cnpj.append(cnpj)
+        for campo, value in zip(VALOR_CAMPOS, valores):
+            self._valores[campo].append(_centavos(value))
+
+    def __len__(self) -> int:
+        return len(self.codigo_ons)
+
+    def __getitem__(self, index: int) -> AvdItemView:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return AvdItemView(self, index)
+
+    def __iter__(self) -> Iterator[AvdItemView]:
+        return (AvdItemView(self, index) for index in range(len(self)))
+
+    def valor(self, campo: str, index: int):
+        if campo in self._valores:
+            return _decimal_de_centavos(self._valores[campo][index])
+        if campo in TEXTO_CAMPOS:
+            return getattr(self, campo)[index]
+        raise KeyError(campo)
+
+    def centavos(self, campo: str) -> array:
+        """Coluna crua em centavos (`_NULO` onde a célula estava vazia)."""
+        return self._valores[campo]
+
+    def total(self, campo: str) -> Decimal:
+        return Decimal(sum(c for c in self._valores[campo] if c != _NULO)).scaleb(-2)
+
+    def to_dicts(self) -> List[Dict[str, object]]:
+        return [item.to_dict() for item in self]
+
+    def insert_rows(self, id_avisodebito: int) -> Iterator[Dict[str, object]]:
+        """Dicts de `RsmTustAvisoDebitoItem` para `bulk_insert`, gerados um a um."""
+        zero = Decimal("0.00")
+        p1, p2, p3, total = (self._valores[campo] for campo in VALOR_CAMPOS[:4])
+        for idx in range(len(self)):
+            yield {
+                "identificador": idx + 1,
+                "identificadoravisodebitotransmissao": id_avisodebito,
+                "codigoons": self.codigo_ons[idx],
+                "nometransmissora": self.nome_transmissora[idx],
+                "cnpjtransmissora": self.cnpj[idx],
+                "valorparcela1": _decimal_de_centavos(p1[idx]) or zero,
+                "valorparcela2": _decimal_de_centavos(p2[idx]) or zero,
+                "valorparcela3": _decimal_de_centavos(p3[idx]) or zero,
+                "valortotal": _decimal_de_centavos(total[idx]) or zero,
+            }
+
+
+def _items(layout: AvdLayout, rows: Iterable[Tuple[int, Dict[str, str]]]) -> AvdItems:
+    col = layout.colunas
+    valor_cols = [col.get(campo, "") for campo in VALOR_CAMPOS]
+    items = AvdItems()
+    for row_idx, data in rows:
+        if row_idx <= layout.header_row:
+            continue
+        codigo_ons = data.get(col["codigo_ons"])
+        if not codigo_ons:
+            continue
+        items.append(
+            codigo_ons,
+            data.get(col["nome_transmissora"]),
+            data.get(col["cnpj"]),
+            [data.get(c) for c in valor_cols],
+        )
+    return items
+
+
+def parse_avd(path: Path) -> Tuple[Dict[str, object], AvdItems]:
+    """Extract header info and item rows from the spreadsheet."""
+    layout, head, rows = load_avd_rows(path)
+    return _header(layout, head), _items(layout, chain(head, rows))
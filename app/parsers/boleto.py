@@ -0,0 +1,140 @@
+"""Linha digitável de boletos bancários (FEBRABAN): dígitos verificadores, valor e vencimento."""
+
+from __future__ import annotations
+
+import datetime as dt
+import re
+import zlib
+from dataclasses import dataclass
+from decimal import Decimal
+from pathlib import Path
+from typing import List, Optional
+
+# Fator de vencimento: dias desde 07/10/1997; ao chegar a 9999 (21/02/2025) o
+# fator recomeça em 1000 a partir de 22/02/2025.
+_BASE_FATOR = dt.date(1997, 10, 7)
+_BASE_FATOR_2025 = dt.date(2025, 2, 22)
+
+LINHA_RE = re.compile(
+    r"(\d{5})\.?(\d{5})\s*(\d{5})\.?(\d{6})\s*(\d{5})\.?(\d{6})\s*(\d)\s*(\d{14})"
+)
+_STREAM_RE = re.compile(rb"stream\r?\n(.*?)\r?\nendstream", re.S)
+_PDF_STRING_RE = re.compile(rb"\(((?:\\.|[^\\)])*)\)")
+
+
+class BoletoError(ValueError):
+    """Linha digitável inválida."""
+
+
+@dataclass
+class BoletoInfo:
+    linha_digitavel: str
+    codigo_barras: str
+    banco: str
+    valor: Decimal
+    data_vencimento: Optional[dt.date]
+    arquivo: Optional[Path] = None
+
+
+def _dv_modulo10(numero: str) -> int:
+    total = 0
+    for posicao, digito in enumerate(reversed(numero)):
+        produto = int(digito) * (2 if posicao % 2 == 0 else 1)
+        total += produto // 10 + produto % 10
+    return (10 - total % 10) % 10
+
+
+def _dv_modulo11(numero: str) -> int:
+    total = sum(int(d) * (2 + i % 8) for i, d in enumerate(reversed(numero)))
+    resto = 11 - total % 11
+    return 1 if resto in (0, 10, 11) else resto
+
+
+def data_por_fator(fator: int, referencia: Optional[dt.date] = None) -> Optional[dt.date]:
+    """
+    Converte o fator de vencimento em data.
+
+    Como o fator é cíclico, escolhe entre a base de 1997 e a de 2025 a data mais
+    próxima de `referencia` (default: hoje). Fator zero significa sem vencimento.
+    """
+    if fator == 0:
+        return None
+    referencia = referencia or dt.date.today()
+    candidatas = [_BASE_FATOR + dt.timedelta(days=fator)]
+    if fator >= 1000:
+        candidatas.append(_BASE_FATOR_2025 + dt.timedelta(days=fator - 1000))
+    return min(candidatas, key=lambda data: abs((data - referencia).days))
+
+
+def decode_linha_digitavel(
+    linha: str, referencia: Optional[dt.date] = None
+) -> BoletoInfo:
+    """Valida os dígitos verificadores e extrai banco, valor e vencimento."""
+    digitos = re.sub(r"\D", "", linha)
+    if len(digitos) != 47:
+        raise BoletoError(f"Linha digitável deve ter 47 dígitos: {linha!r}.")
+
+    campos = (digitos[0:10], digitos[10:21], digitos[21:32])
+    for numero, campo in enumerate(campos, start=1):
+        if _dv_modulo10(campo[:-1]) != int(campo[-1]):
+            raise BoletoError(f"Dígito verificador do campo {numero} inválido: {linha!r}.")
+
+    codigo_barras = (
+        digitos[0:4] + digitos[32] + digitos[33:47] + digitos[4:9] + digitos[10:20] + digitos[21:31]
+    )
+    if _dv_modulo11(codigo_barras[:4] + codigo_barras[5:]) != int(codigo_barras[4]):
+        raise BoletoError(f"Dígito verificador geral inválido: {linha!r}.")
+
+    return BoletoInfo(
+        linha_digitavel=digitos,
+        codigo_barras=codigo_barras,
+        banco=digitos[0:3],
+        valor=Decimal(int(digitos[37:47])) / 100,
+        data_vencimento=data_por_fator(int(digitos[33:37]), referencia),
+    )
+
+
+def _texto_pdf(conteudo: bytes) -> str:
+    """Texto literal dos content streams (comprimidos ou não) de um PDF."""
+    partes: List[bytes] = []
+    for match in _STREAM_RE.finditer(conteudo):
+        stream = match.group(1)
+        try:
+            stream = zlib.decompress(stream)
+        except zlib.error:
+            pass
+        partes.append(b" ".join(_PDF_STRING_RE.findall(stream)))
+    return b" ".join(partes).decode("latin-1")
+
+
+def find_linhas_digitaveis(texto: str) -> List[str]:
+    vistos: List[str] = []
+    for match in LINHA_RE.finditer(texto):
+        linha = "".join(match.groups())
+        if linha not in vistos:
+            vistos.append(linha)
+    return vistos
+
+
+def parse_boleto_file(path: Path, competencia: Optional[dt.date] = None) -> List[BoletoInfo]:
+    """
+    Boletos encontrados num PDF ou texto; linhas com dígito inválido são ignoradas.
+
+    PDFs são lidos sem dependências: só textos literais dos content streams
+    (fontes com codificação própria não são decodificadas).
+    """
+    conteudo = path.read_bytes()
+    if path.suffix.lower() == ".pdf":
+        texto = _texto_pdf(conteudo)
+    else:
+        texto = conteudo.decode("latin-1")
+
+    boletos: List[BoletoInfo] = []
+    for linha in find_linhas_digitaveis(texto):
+        try:
+            boleto = decode_linha_digitavel(linha, competencia)
+        except BoletoError:
+            continue
+        boleto.arquivo = path
+        boletos.append(boleto)
+    return boletos
@@ -1,16 +1,31 @@
+"""NF-e (nfeProc) e eventos de cancelamento (procEventoNFe) das transmissoras."""
+
 from __future__ import annotations
 
 import datetime as dt
+import logging
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
 from decimal import Decimal
+from itertools import islice, repeat
 from pathlib import Path
-from typing import List, Optional
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Union
 from xml.etree import ElementTree as ET
 
 NFE_NS = {"nfe": "http://www.portalfiscal.inf.br/nfe"}
+EVENTO_TAGS = ("procEventoNFe", "evento")
+# Cancelamento e cancelamento por substituição.
+TIPOS_CANCELAMENTO = ("110111", "110112")
+# cStat do retorno para evento registrado e vinculado à NF-e (135) ou
+# registrado fora do prazo, com a NF-e já cancelada (155).
+EVENTO_REGISTRADO = ("135", "155")
+
+DEFAULT_CHUNK_SIZE = 500
+
+logger = logging.getLogger(__name__)
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class NFeInvoice:
     codigo_ons: str
     competencia: dt.date
@@ -23,11 +38,19 @@ class NFeInvoice:
     chave_nfe: str
     numero_fatura: Optional[str]
     valor_total: Decimal
-    data_emissao: dt.datetime
+    data_emissao: Optional[dt.datetime]
     data_vencimento: Optional[dt.date]
     duplicata_numero: Optional[str]
     duplicata_valor: Optional[Decimal]
-    arquivo: Path
+    arquivo: str
+
+
+@dataclass(frozen=True, slots=True)
+class NFeCancelamento:
+    chave_nfe: str
+    data_cancelamento: dt.datetime
+    protocolo: Optional[str]
+    arquivo: str
 
 
 def _get_text(parent: Optional[ET.Element], path: str) -> Optional[str]:
@@ -46,10 +69,70 @@ def _parse_decimal(value: Optional[str]) -> Optional[Decimal]:
     return Decimal(normalized)
 
 
+def _parse_datetime(value: Optional[str]) -> Optional[dt.datetime]:
+    return dt.datetime.fromisoformat(value.replace("Z", "+00:00")) if value else None
+
+
+def _parse_evento(root: ET.Element, xml_path: Path) -> Optional[NFeCancelamento]:
+    """
+    Cancelamento registrado pela SEFAZ; outros eventos (CC-e, manifestação) dão None.
+
+    Só vale o procEventoNFe com retEvento de cStat 135 ou 155. O evento sem
+    retorno (só o pedido, raiz <evento>) ou recusado é ignorado e registrado no log.
+    """
+    evento = root if root.tag.endswith("}evento") else root.find("nfe:evento", NFE_NS)
+    inf_evento = evento.find("nfe:infEvento", NFE_NS) if evento is not None else None
+    if inf_evento is None or _get_text(inf_evento, "nfe:tpEvento") not in TIPOS_CANCELAMENTO:
+        return None
+
+    retorno = root.find("nfe:retEvento/nfe:infEvento", NFE_NS)
+    status = _get_text(retorno, "nfe:cStat")
+    if retorno is None or status not in EVENTO_REGISTRADO:
+        logger.warning(
+            "Cancelamento sem registro da SEFAZ ignorado em %s (cStat %s).", xml_path, status
+        )
+        return None
+
+    chave = _get_text(inf_evento, "nfe:chNFe")
+    data = _parse_datetime(_get_text(retorno, "nfe:dhRegEvento")) or _parse_datetime(
+        _get_text(inf_evento, "nfe:dhEvento")
+    )
+    if not chave or data is None:
+        raise ValueError(f"Evento de cancelamento incompleto em {xml_path}.")
+    return NFeCancelamento(
+        # Mesmo formato de NFeInvoice.chave_nfe (Id do infNFe), como é gravado em CHAVENFE.
+        chave_nfe=f"NFe{chave}",
+        data_cancelamento=data,
+        protocolo=_get_text(retorno, "nfe:nProt")
+        or _get_text(inf_evento, "nfe:detEvento/nfe:nProt"),
+        arquivo=str(xml_path),
+    )
+
+
+def parse_nfe_xml(
+    xml_path: Path,
+    codigo_ons: str,
+    competencia: dt.date,
+    conteudo: Optional[bytes] = None,
+) -> Union[NFeInvoice, NFeCancelamento, None]:
+    """
+    NF-e (nfeProc) ou evento (procEventoNFe) com um único parse do arquivo.
+
+    Com `conteudo` (p.ex. lido do acervo), o XML vem dele e `xml_path` só identifica a nota.
+    """
+    root = ET.fromstring(conteudo) if conteudo is not None else ET.parse(xml_path).getroot()
+    if root.tag.rpartition("}")[2] in EVENTO_TAGS:
+        return _parse_evento(root, xml_path)
+    return _parse_invoice(root, xml_path, codigo_ons, competencia)
+
+
 def parse_nfe_file(xml_path: Path, codigo_ons: str, competencia: dt.date) -> NFeInvoice:
-    tree = ET.parse(xml_path)
-    root = tree.getroot()
+    return _parse_invoice(ET.parse(xml_path).getroot(), xml_path, codigo_ons, competencia)
+
 
+def _parse_invoice(
+    root: ET.Element, xml_path: Path, codigo_ons: str, competencia: dt.date
+) -> NFeInvoice:
     inf_nfe = root.find("nfe:NFe/nfe:infNFe", NFE_NS)
     if inf_nfe is None:
         raise ValueError(f"Arquivo {xml_path} não contém elemento infNFe.")
@@ -64,10 +147,8 @@ def parse_nfe_file(xml_path: Path, codigo_ons: str, competencia: dt.date) -> NFe
     serie = _get_text(ide, "nfe:serie") or ""
     chave = inf_nfe.attrib.get("Id", "")
 
-    dh_emi = _get_text(ide, "nfe:dhEmi")
-    data_emissao = (
-        dt.datetime.fromisoformat(dh_emi.replace("Z", "+00:00")) if dh_emi else dt.datetime.utcnow()
-    )
+    # Sem dhEmi a emissão fica em aberto (a validação aponta "dhEmi ausente").
+    data_emissao = _parse_datetime(_get_text(ide, "nfe:dhEmi"))
 
     numero_fatura = _get_text(cobr, "nfe:fat/nfe:nFat")
     duplicata_numero = _get_text(cobr, "nfe:dup/nfe:nDup")
@@ -93,12 +174,106 @@ def parse_nfe_file(xml_path: Path, codigo_ons: str, competencia: dt.date) -> NFe
         data_vencimento=data_vencimento,
         duplicata_numero=duplicata_numero,
         duplicata_valor=duplicata_valor,
-        arquivo=xml_path,
+        arquivo=str(xml_path),
     )
 
 
-def parse_nfe_directory(destino: Path, codigo_ons: str, competencia: dt.date) -> List[NFeInvoice]:
-    notas: List[NFeInvoice] = []
-    for xml_path in destino.rglob("*.xml"):
-        notas.append(parse_nfe_file(xml_path, codigo_ons, competencia))
-    return notas
+def chunked(invoices: Iterable[NFeInvoice], size: int) -> Iterator[List[NFeInvoice]]:
+    iterator = iter(invoices)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class InvoiceBatch:
+    """
+    NF-es de uma lista de arquivos, lidas sob demanda em blocos de `chunk_size`.
+
+    Guarda só os caminhos; cada iteração de `chunks()` lê um bloco e o entrega
+    para a gravação e a conciliação antes de ler o próximo, então no máximo um
+    bloco de notas fica em memória. Com `max_workers` > 1 o bloco é lido num
+    pool de processos: o parse do ElementTree segura o GIL e não rende em threads.
+    Eventos de cancelamento encontrados no caminho não entram nos blocos: ficam
+    em `cancelamentos`, por chave, completos ao fim da iteração. Com `leitor`,
+    o conteúdo de cada caminho vem dele em vez do disco (acervo compactado).
+    """
+
+    def __init__(
+        self,
+        paths: Sequence[Path],
+        codigo_ons: str,
+        competencia: dt.date,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        max_workers: int = 1,
+        leitor: Optional[Callable[[Path], bytes]] = None,
+    ) -> None:
+        self.paths = paths
+        self.codigo_ons = codigo_ons
+        self.competencia = competencia
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self.leitor = leitor
+        self.cancelamentos: Dict[str, NFeCancelamento] = {}
+
+    @classmethod
+    def from_directory(
+        cls, destino: Path, codigo_ons: str, competencia: dt.date, **kwargs
+    ) -> "InvoiceBatch":
+        return cls(sorted(destino.rglob("*.xml")), codigo_ons, competencia, **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def _separar(
+        self, lidos: Iterable[Union[NFeInvoice, NFeCancelamento, None]]
+    ) -> List[NFeInvoice]:
+        notas: List[NFeInvoice] = []
+        for lido in lidos:
+            if isinstance(lido, NFeInvoice):
+                notas.append(lido)
+            elif lido is not None:
+                self.cancelamentos[lido.chave_nfe] = lido
+        return notas
+
+    def chunks(self) -> Iterator[List[NFeInvoice]]:
+        pool = ProcessPoolExecutor(self.max_workers) if self.max_workers > 1 else None
+        try:
+            for start in range(0, len(self.paths), self.chunk_size):
+                paths = self.paths[start : start + self.chunk_size]
+                # O leitor (acervo) fica neste processo; os workers recebem os bytes.
+                conteudos = (
+                    [self.leitor(path) for path in paths]
+                    if self.leitor is not None
+                    else repeat(None)
+                )
+                args = (paths, repeat(self.codigo_ons), repeat(self.competencia), conteudos)
+                if pool:
+                    lote = max(1, len(paths) // (self.max_workers * 4))
+                    lidos = pool.map(parse_nfe_xml, *args, chunksize=lote)
+                else:
+                    lidos = map(parse_nfe_xml, *args)
+                notas = self._separar(lidos)
+                if notas:
+                    yield notas
+        finally:
+            if pool:
+                pool.shutdown()
+
+    def __iter__(self) -> Iterator[NFeInvoice]:
+        for chunk in self.chunks():
+            yield from chunk
+
+
+def parse_nfe_directory(
+    destino: Path,
+    codigo_ons: str,
+    competencia: dt.date,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    max_workers: int = 1,
+) -> Iterator[List[NFeInvoice]]:
+    """NF-es do diretório em blocos de `chunk_size`, lidos à medida que são consumidos."""
+    return InvoiceBatch.from_directory(
+        destino, codigo_ons, competencia, chunk_size=chunk_size, max_workers=max_workers
+    ).chunks()
@@ -0,0 +1,54 @@
+"""Leitura do pacote baixado de uma transmissora: NF-es (XML) e boletos (PDF/texto)."""
+
+from __future__ import annotations
+
+import datetime as dt
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List
+
+from app.parsers.boleto import BoletoInfo, parse_boleto_file
+from app.parsers.nfe import DEFAULT_CHUNK_SIZE, InvoiceBatch
+
+BOLETO_SUFFIXES = (".pdf", ".txt")
+
+
+@dataclass
+class PacoteParseado:
+    notas: InvoiceBatch
+    boletos: List[BoletoInfo] = field(default_factory=list)
+
+
+def parse_pacote(
+    destino: Path,
+    codigo_ons: str,
+    competencia: dt.date,
+    max_workers: int = 4,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> PacoteParseado:
+    """
+    Lê os boletos (PDF/texto) de um diretório e prepara a leitura das NF-es (XML).
+
+    Os boletos são poucos e lidos já, em sequência (regex e zlib seguram o GIL;
+    um pool não compensa); as notas ficam num `InvoiceBatch`, lidas em blocos
+    por `max_workers` processos à medida que a conciliação as consome.
+    """
+    xmls = sorted(destino.rglob("*.xml"))
+    boletos_paths = sorted(
+        path
+        for path in destino.rglob("*")
+        if path.is_file() and path.suffix.lower() in BOLETO_SUFFIXES
+    )
+
+    pacote = PacoteParseado(
+        InvoiceBatch(
+            xmls, codigo_ons, competencia, chunk_size=chunk_size, max_workers=max_workers
+        )
+    )
+    vistos = set()
+    for path in boletos_paths:
+        for boleto in parse_boleto_file(path, competencia):
+            if boleto.linha_digitavel not in vistos:
+                vistos.add(boleto.linha_digitavel)
+                pacote.boletos.append(boleto)
+    return pacote
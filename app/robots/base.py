@@ -0,0 +1,145 @@
+"""Interface comum dos robôs de portais de transmissoras."""
+
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from app.services import admissao
+from app.services.admissao import Limiter
+from app.services.coalescencia import SingleFlight
+
+
+class RobotError(Exception):
+    """Erro de execução de um robô de portal."""
+
+
+def default_competencia() -> str:
+    """Retorna o mês anterior no formato YYYY.MM."""
+    hoje = datetime.utcnow()
+    mes_anterior = (hoje.replace(day=1) - timedelta(days=1)).replace(day=1)
+    return mes_anterior.strftime("%Y.%m")
+
+
+# Execuções em andamento no processo, por (robô, transmissora, competência,
+# destino): /robots/vsb, /robots/executar e o agendador compartilham a mesma
+# execução em vez de baixar e extrair ao mesmo tempo no mesmo diretório.
+execucoes = SingleFlight()
+
+
+class Robot(ABC):
+    """
+    Robô de um portal: busca metadados → baixa o pacote → extrai os arquivos.
+
+    Subclasses definem `name` (também o subdiretório padrão em `data/`), os
+    `hosts` atendidos (comparados com `URLSITE` da transmissora) e as três etapas.
+    """
+
+    name: str = ""
+    hosts: Tuple[str, ...] = ()
+    max_concurrency: int = 2
+
+    @abstractmethod
+    def fetch_metadata(self, codigo_ons: str, competencia: str) -> Dict[str, object]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def download(
+        self, codigo_ons: str, competencia: str, metadata: Dict[str, object], destino: Path
+    ) -> Path:
+        raise NotImplementedError
+
+    @abstractmethod
+    def extract(self, archive: Path, destino: Path) -> List[Path]:
+        raise NotImplementedError
+
+    def extraidos(
+        self, archive: Path, destino: Path
+    ) -> Optional[Dict[str, Optional[Tuple[int, int]]]]:
+        """
+        Arquivos (com as assinaturas) já extraídos deste mesmo pacote em `destino`.
+
+        None (o padrão) faz a extração; robôs com cache HTTP devolvem os
+        arquivos de uma extração anterior quando o portal responde 304.
+        """
+        return None
+
+    def registrar_extracao(
+        self, archive: Path, destino: Path, arquivos: Dict[str, Optional[Tuple[int, int]]]
+    ) -> None:
+        """Chamado após a extração, para `extraidos` reaproveitá-la depois."""
+
+    def destino(
+        self, codigo_ons: str, competencia: str, download_dir: Optional[Path] = None
+    ) -> Path:
+        """Diretório da transmissora na competência (`<download_dir>/<YYYY.MM>/<codigo_ons>`)."""
+        base_dir = Path(download_dir or Path("data") / self.name)
+        return base_dir / competencia / codigo_ons
+
+    def executar(
+        self,
+        codigo_ons: str,
+        competencia: Optional[str] = None,
+        download_dir: Optional[Path] = None,
+        downloads: Optional[Limiter] = None,
+        esperar: bool = True,
+    ) -> Tuple[Dict[str, object], bool]:
+        """
+        Como `run`, mas devolve também se a execução foi compartilhada.
+
+        A chave usa a competência e o destino já resolvidos: omitir a
+        competência ou informar a padrão dá na mesma execução. Só quem executa
+        ocupa uma vaga de `downloads` (padrão: o limite do processo); com
+        `esperar` falso, a fila cheia vira `Saturado` para todos os que aguardam.
+        """
+        competencia_final = competencia or default_competencia()
+        destino = self.destino(codigo_ons, competencia_final, download_dir)
+        chave = (self.name, codigo_ons, competencia_final, str(destino.resolve()))
+        limite = downloads or admissao.downloads
+
+        def executar_com_vaga() -> Dict[str, object]:
+            with limite.slot(esperar=esperar):
+                return self._run(codigo_ons, competencia_final, destino)
+
+        return execucoes.do(chave, executar_com_vaga)
+
+    def run(
+        self,
+        codigo_ons: str,
+        competencia: Optional[str] = None,
+        download_dir: Optional[Path] = None,
+    ) -> Dict[str, object]:
+        return self.executar(codigo_ons, competencia, download_dir)[0]
+
+    def _run(self, codigo_ons: str, competencia_final: str, destino: Path) -> Dict[str, object]:
+        from app.robots.extracao import assinaturas_zip
+
+        destino.mkdir(parents=True, exist_ok=True)
+
+        metadata = self.fetch_metadata(codigo_ons, competencia_final)
+        archive = self.download(codigo_ons, competencia_final, metadata, destino)
+        extraidos = self.extraidos(archive, destino)
+        if extraidos is None:
+            # Lidas antes da extração, que pode apagar o pacote.
+            assinaturas = assinaturas_zip(archive, destino)
+            arquivos = self.extract(archive, destino)
+            extraidos = {str(path): assinaturas.get(str(path)) for path in arquivos}
+            self.registrar_extracao(archive, destino, extraidos)
+        else:
+            arquivos = [Path(path) for path in extraidos]
+
+        return {
+            "codigo_ons": codigo_ons,
+            "competencia": competencia_final,
+            "destino": destino,
+            "arquivos": arquivos,
+            "assinaturas": {
+                path: assinatura for path, assinatura in extraidos.items() if assinatura
+            },
+            "metadata": metadata,
+        }
+
+
+__all__ = ["Robot", "RobotError", "default_competencia", "execucoes"]
@@ -0,0 +1,186 @@
+"""Extração seletiva e paralela dos pacotes ZIP baixados pelos robôs."""
+
+from __future__ import annotations
+
+import logging
+import os
+import shutil
+import sys
+import uuid
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path, PurePosixPath
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.robots.base import RobotError
+
+logger = logging.getLogger(__name__)
+
+COPY_CHUNK = 1 << 20
+
+
+class ExtracaoError(RobotError):
+    """Pacote recusado na extração (caminho fora do destino, acima dos limites ou corrompido)."""
+
+
+def destino_seguro(extract_dir: Path, nome: str) -> Path:
+    """
+    Caminho final de um membro dentro de `extract_dir` (proteção contra zip-slip).
+
+    Recusa nomes absolutos, com unidade (C:) ou que escapem do diretório com "..".
+    """
+    partes = PurePosixPath(nome.replace("\\", "/")).parts
+    if not partes or partes[0] == "/" or ".." in partes or ":" in partes[0]:
+        raise ExtracaoError(f"Caminho inválido no pacote: {nome!r}")
+    return extract_dir.joinpath(*partes)
+
+
+def _preparar_diretorios(extract_dir: Path, destinos: Iterable[Path]) -> None:
+    """
+    Cria cada diretório de destino uma vez e confere que, resolvidos os links
+    simbólicos já existentes, ele continua dentro de `extract_dir`.
+    """
+    raiz = extract_dir.resolve()
+    for diretorio in {destino.parent for destino in destinos}:
+        resolvido = diretorio.resolve()
+        if resolvido != raiz and raiz not in resolvido.parents:
+            raise ExtracaoError(f"Diretório fora do destino no pacote: {diretorio}")
+        diretorio.mkdir(parents=True, exist_ok=True)
+
+
+def selecionar_membros(
+    infos: Iterable[zipfile.ZipInfo],
+    suffixes: Optional[Tuple[str, ...]],
+    max_member_bytes: int,
+) -> List[zipfile.ZipInfo]:
+    """Arquivos com extensão aceita e tamanho declarado dentro do limite (sem diretórios)."""
+    return [
+        info
+        for info in infos
+        if not info.is_dir()
+        and (suffixes is None or info.filename.lower().endswith(suffixes))
+        and info.file_size <= max_member_bytes
+    ]
+
+
+def assinaturas_zip(zip_path: Path, extract_dir: Path) -> Dict[str, Tuple[int, int]]:
+    """
+    (tamanho, CRC-32) declarados de cada membro, pelo caminho em que ele é extraído.
+
+    Lê só o diretório central. Como a extração confere o CRC, o par identifica o
+    conteúdo do arquivo extraído mesmo que a extração seguinte mude o seu mtime.
+    Pacote ilegível dá {} (o erro fica para a extração).
+    """
+    try:
+        with zipfile.ZipFile(zip_path, "r") as zf:
+            infos = zf.infolist()
+    except (OSError, zipfile.BadZipFile):
+        return {}
+    assinaturas: Dict[str, Tuple[int, int]] = {}
+    for info in infos:
+        if info.is_dir():
+            continue
+        try:
+            destino = destino_seguro(extract_dir, info.filename)
+        except ExtracaoError:
+            continue
+        assinaturas[str(destino)] = (info.file_size, info.CRC)
+    return assinaturas
+
+
+def _gravar_membro(zf: zipfile.ZipFile, info: zipfile.ZipInfo, destino: Path) -> None:
+    """Descompacta num temporário ao lado do destino e renomeia: nunca fica arquivo pela metade."""
+    tmp = destino.with_name(f".{destino.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        # ZipExtFile lê no máximo o tamanho declarado e confere o CRC no fim:
+        # um membro que mente o tamanho falha aqui, sem passar do limite.
+        with zf.open(info) as origem, tmp.open("wb") as saida:
+            shutil.copyfileobj(origem, saida, COPY_CHUNK)
+        os.replace(tmp, destino)
+    except (zlib.error, EOFError, zipfile.BadZipFile) as exc:
+        # Deflate inválido, membro truncado ou CRC divergente.
+        raise ExtracaoError(f"Membro corrompido no pacote: {info.filename!r} ({exc})") from exc
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+def _distribuir(
+    membros: List[Tuple[zipfile.ZipInfo, Path]], partes: int
+) -> List[List[Tuple[zipfile.ZipInfo, Path]]]:
+    """Divide os membros em grupos de volume parecido (maiores primeiro, no grupo mais leve)."""
+    grupos: List[List[Tuple[zipfile.ZipInfo, Path]]] = [[] for _ in range(partes)]
+    cargas = [0] * partes
+    for membro in sorted(membros, key=lambda item: item[0].compress_size, reverse=True):
+        indice = cargas.index(min(cargas))
+        grupos[indice].append(membro)
+        cargas[indice] += membro[0].compress_size
+    return [grupo for grupo in grupos if grupo]
+
+
+def extrair_zip(
+    zip_path: Path,
+    extract_dir: Path,
+    suffixes: Optional[Tuple[str, ...]] = None,
+    max_member_bytes: int = 1 << 30,
+    max_total_bytes: int = 1 << 32,
+    max_workers: int = 4,
+) -> List[Path]:
+    """
+    Extrai de `zip_path` só os membros com extensão em `suffixes` (None = todos).
+
+    Membros acima de `max_member_bytes` são ignorados (com um aviso no log); se
+    o total selecionado passar de `max_total_bytes`, o pacote é recusado; um
+    membro corrompido vira `ExtracaoError`. A descompressão roda em
+    `max_workers` threads, cada uma com o próprio handle do ZIP (o zlib libera
+    o GIL). Devolve os caminhos extraídos na ordem do pacote.
+    """
+    suffixes = tuple(s.lower() for s in suffixes) if suffixes is not None else None
+    with zipfile.ZipFile(zip_path, "r") as zf:
+        infos = zf.infolist()
+    selecionados = selecionar_membros(infos, suffixes, max_member_bytes)
+    grandes = [
+        info.filename
+        for info in selecionar_membros(infos, suffixes, sys.maxsize)
+        if info.file_size > max_member_bytes
+    ]
+    if grandes:
+        logger.warning(
+            "Pacote %s: %d membro(s) acima de %d bytes ignorado(s): %s",
+            zip_path.name,
+            len(grandes),
+            max_member_bytes,
+            ", ".join(grandes),
+        )
+    total = sum(info.file_size for info in selecionados)
+    if total > max_total_bytes:
+        raise ExtracaoError(
+            f"Pacote {zip_path.name} descompactaria {total} bytes (limite {max_total_bytes})."
+        )
+
+    membros = [(info, destino_seguro(extract_dir, info.filename)) for info in selecionados]
+    _preparar_diretorios(extract_dir, (destino for _, destino in membros))
+    grupos = _distribuir(membros, max(1, max_workers))
+
+    def extrair_grupo(grupo: List[Tuple[zipfile.ZipInfo, Path]]) -> None:
+        with zipfile.ZipFile(zip_path, "r") as zf:
+            for info, destino in grupo:
+                _gravar_membro(zf, info, destino)
+
+    if len(grupos) > 1:
+        with ThreadPoolExecutor(max_workers=len(grupos)) as pool:
+            list(pool.map(extrair_grupo, grupos))
+    else:
+        for grupo in grupos:
+            extrair_grupo(grupo)
+    return [destino for _, destino in membros]
+
+
+__all__ = [
+    "ExtracaoError",
+    "assinaturas_zip",
+    "destino_seguro",
+    "extrair_zip",
+    "selecionar_membros",
+]
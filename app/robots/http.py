@@ -0,0 +1,342 @@
+"""Camada de download dos robôs: retry com backoff, limite por host e cache condicional."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Mapping, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class FetchError(Exception):
+    """Falha definitiva ao buscar uma URL (após esgotar as tentativas)."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+
+
+@dataclass
+class FetchResult:
+    status_code: int
+    headers: Mapping[str, str]
+    content: bytes
+    from_cache: bool = False
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class RetryBudget:
+    """
+    Limita retentativas a uma fração das requisições feitas no processo.
+
+    Evita que uma indisponibilidade do portal multiplique a carga: cada
+    requisição deposita `ratio` fichas e cada retentativa consome uma.
+    """
+
+    def __init__(
+        self, ratio: float = 0.2, min_tokens: float = 10.0, max_tokens: float = 100.0
+    ) -> None:
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = min_tokens
+        self._lock = threading.Lock()
+
+    def deposit(self) -> None:
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+
+# Assinatura (tamanho, CRC-32) de um arquivo extraído; None se desconhecida.
+Assinatura = Optional[Tuple[int, int]]
+
+
+class HttpCache:
+    """
+    Cache em disco por URL com os validadores ETag/Last-Modified da resposta.
+
+    O total dos corpos fica limitado a `max_bytes`: ao gravar, os menos usados
+    recentemente (pelo mtime, renovado a cada leitura) são removidos. Quem
+    extrai um corpo registra os arquivos gerados (`registrar_extracao`); numa
+    revalidação com 304 eles são reaproveitados (`extracao`) em vez de o
+    pacote ser gravado e extraído de novo. Um corpo novo descarta os registros.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int = 1 << 30) -> None:
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _paths(self, url: str):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return self.directory / f"{key}.json", self.directory / f"{key}.body"
+
+    @staticmethod
+    def _usar(path: Path) -> None:
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def corpo(self, url: str) -> Optional[Path]:
+        """Arquivo com o corpo em cache da URL (marcado como usado agora), se houver."""
+        meta_path, body_path = self._paths(url)
+        if not meta_path.exists() or not body_path.exists():
+            return None
+        self._usar(body_path)
+        return body_path
+
+    def validators(self, url: str) -> Dict[str, str]:
+        meta_path, body_path = self._paths(url)
+        if not meta_path.exists() or not body_path.exists():
+            return {}
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+        return headers
+
+    def load(self, url: str) -> Optional[FetchResult]:
+        meta_path, body_path = self._paths(url)
+        if not meta_path.exists() or not body_path.exists():
+            return None
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        self._usar(body_path)
+        return FetchResult(
+            200,
+            CaseInsensitiveDict(meta.get("headers", {})),
+            body_path.read_bytes(),
+            from_cache=True,
+        )
+
+    def _gravar_meta(self, meta_path: Path, meta: dict) -> None:
+        tmp_meta = meta_path.with_suffix(".json.tmp")
+        tmp_meta.write_text(json.dumps(meta), encoding="utf-8")
+        os.replace(tmp_meta, meta_path)
+
+    def _remover(self, meta_path: Path, body_path: Path) -> None:
+        for path in (meta_path, body_path):
+            try:
+                path.unlink()
+            except OSError:
+                # Já removido, ou aberto por outra thread (Windows): fica para a próxima.
+                pass
+
+    def store(self, url: str, result: FetchResult) -> None:
+        etag = result.headers.get("ETag")
+        last_modified = result.headers.get("Last-Modified")
+        meta_path, body_path = self._paths(url)
+        with self._lock:
+            if not etag and not last_modified:
+                # Sem validadores a versão anterior não serve mais para revalidar.
+                self._remover(meta_path, body_path)
+                return
+            self.directory.mkdir(parents=True, exist_ok=True)
+            tmp_body = body_path.with_suffix(".body.tmp")
+            tmp_body.write_bytes(result.content)
+            os.replace(tmp_body, body_path)
+            meta = {
+                "url": url,
+                "etag": etag,
+                "last_modified": last_modified,
+                "headers": {
+                    k: v for k, v in result.headers.items() if k.lower() == "content-type"
+                },
+                "extracoes": {},
+            }
+            self._gravar_meta(meta_path, meta)
+            self._evict(manter=body_path)
+
+    def _evict(self, manter: Path) -> None:
+        """Remove os corpos menos usados até o total caber em `max_bytes`."""
+        corpos: List[Tuple[float, int, Path]] = []
+        total = 0
+        for body_path in self.directory.glob("*.body"):
+            try:
+                stat = body_path.stat()
+            except FileNotFoundError:
+                continue
+            total += stat.st_size
+            if body_path != manter:
+                corpos.append((stat.st_mtime, stat.st_size, body_path))
+        for _, tamanho, body_path in sorted(corpos):
+            if total <= self.max_bytes:
+                break
+            self._remover(body_path.with_suffix(".json"), body_path)
+            total -= tamanho
+
+    def registrar_extracao(
+        self, corpo: Path, destino: Path, arquivos: Dict[str, Assinatura]
+    ) -> None:
+        """Guarda os arquivos extraídos do corpo `corpo` em `destino`."""
+        meta_path = corpo.with_suffix(".json")
+        with self._lock:
+            try:
+                meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            except FileNotFoundError:
+                return
+            meta.setdefault("extracoes", {})[str(destino)] = arquivos
+            self._gravar_meta(meta_path, meta)
+
+    def extracao(self, corpo: Path, destino: Path) -> Optional[Dict[str, Assinatura]]:
+        """
+        Arquivos já extraídos do corpo em `destino`, se todos seguem no disco
+        com o tamanho registrado; None quando é preciso extrair de novo.
+        """
+        try:
+            meta = json.loads(corpo.with_suffix(".json").read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None
+        arquivos = meta.get("extracoes", {}).get(str(destino))
+        if not arquivos:
+            return None
+        for path, assinatura in arquivos.items():
+            try:
+                tamanho = os.stat(path).st_size
+            except OSError:
+                return None
+            if assinatura is not None and tamanho != assinatura[0]:
+                return None
+        return {
+            path: tuple(assinatura) if assinatura is not None else None
+            for path, assinatura in arquivos.items()
+        }
+
+
+class Fetcher:
+    """GET com backoff exponencial + jitter, orçamento de retentativas e limite por host."""
+
+    def __init__(
+        self,
+        max_attempts: int = 4,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        per_host_limit: int = 4,
+        budget: Optional[RetryBudget] = None,
+        cache: Optional[HttpCache] = None,
+    ) -> None:
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.per_host_limit = per_host_limit
+        self.budget = budget or RetryBudget()
+        self.cache = cache
+        self._hosts: Dict[str, Tuple[threading.BoundedSemaphore, requests.Session]] = {}
+        self._hosts_lock = threading.Lock()
+
+    def _new_session(self) -> requests.Session:
+        # Um pool de conexões do tamanho do limite por host: as tentativas e as
+        # chamadas seguintes reaproveitam as conexões (keep-alive) em vez de
+        # abrir uma nova a cada GET.
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.per_host_limit)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    @contextmanager
+    def _host_slot(self, url: str) -> Iterator[requests.Session]:
+        host = urlsplit(url).netloc
+        with self._hosts_lock:
+            slot = self._hosts.get(host)
+            if slot is None:
+                slot = self._hosts[host] = (
+                    threading.BoundedSemaphore(self.per_host_limit),
+                    self._new_session(),
+                )
+        semaphore, session = slot
+        with semaphore:
+            yield session
+
+    def close(self) -> None:
+        with self._hosts_lock:
+            for _, session in self._hosts.values():
+                session.close()
+            self._hosts.clear()
+
+    def _delay(self, attempt: int, retry_after: Optional[str]) -> float:
+        if retry_after and retry_after.isdigit():
+            return min(self.max_delay, float(retry_after))
+        # "Full jitter": espalha as retentativas de vários clientes no tempo.
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def get(
+        self,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: float = 30,
+        use_cache: bool = False,
+    ) -> FetchResult:
+        request_headers = dict(headers or {})
+        cache = self.cache if use_cache else None
+        if cache is not None:
+            request_headers.update(cache.validators(url))
+
+        self.budget.deposit()
+        attempt = 0
+        while True:
+            retry_after = None
+            try:
+                with self._host_slot(url) as session:
+                    response = session.get(url, headers=request_headers, timeout=timeout)
+            except (requests.ConnectionError, requests.Timeout) as exc:
+                error: Exception = exc
+                status = None
+            else:
+                status = response.status_code
+                if status == 304 and cache is not None:
+                    cached = cache.load(url)
+                    if cached is not None:
+                        return cached
+                    # Corpo removido do cache depois de enviados os validadores:
+                    # busca de novo, sem eles.
+                    validadores = [
+                        request_headers.pop(nome, None)
+                        for nome in ("If-None-Match", "If-Modified-Since")
+                    ]
+                    if any(validadores):
+                        continue
+                if status not in RETRY_STATUS:
+                    result = FetchResult(status, response.headers, response.content)
+                    if cache is not None and status == 200:
+                        cache.store(url, result)
+                    return result
+                retry_after = response.headers.get("Retry-After")
+                error = FetchError(f"Status {status} em {url}", status)
+
+            attempt += 1
+            if attempt >= self.max_attempts or not self.budget.withdraw():
+                raise FetchError(
+                    f"Falha ao buscar {url} após {attempt} tentativa(s): {error}", status
+                ) from error
+            time.sleep(self._delay(attempt, retry_after))
+
+
+__all__ = ["FetchError", "FetchResult", "Fetcher", "HttpCache", "RetryBudget"]
@@ -0,0 +1,68 @@
+"""Registro dos robôs por portal e roteamento das transmissoras."""
+
+from __future__ import annotations
+
+import importlib
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+from app.robots.base import Robot
+
+# Módulos com robôs embutidos; cada um se registra ao ser importado.
+BUILTIN_ROBOTS = ("app.robots.vsb",)
+
+_robots: Dict[str, Robot] = {}
+_hosts: Dict[str, str] = {}
+_loaded = False
+
+
+def portal_host(url: Optional[str]) -> str:
+    """Host normalizado de `URLSITE` (sem esquema, porta e prefixo www.)."""
+    if not url:
+        return ""
+    text = url.strip()
+    if "//" not in text:
+        text = f"//{text}"
+    host = (urlsplit(text).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def register_robot(robot: Robot) -> Robot:
+    _robots[robot.name] = robot
+    for host in robot.hosts:
+        _hosts[portal_host(host)] = robot.name
+    return robot
+
+
+def _ensure_loaded() -> None:
+    global _loaded
+    if not _loaded:
+        for module in BUILTIN_ROBOTS:
+            importlib.import_module(module)
+        _loaded = True
+
+
+def get_robot(name: str) -> Optional[Robot]:
+    _ensure_loaded()
+    return _robots.get(name)
+
+
+def robot_for_url(url: Optional[str]) -> Optional[Robot]:
+    _ensure_loaded()
+    name = _hosts.get(portal_host(url))
+    return _robots.get(name) if name else None
+
+
+def available_robots() -> List[str]:
+    _ensure_loaded()
+    return sorted(_robots)
+
+
+__all__ = [
+    "BUILTIN_ROBOTS",
+    "available_robots",
+    "get_robot",
+    "portal_host",
+    "register_robot",
+    "robot_for_url",
+]
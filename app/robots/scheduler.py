@@ -0,0 +1,101 @@
+"""Agendador compartilhado: roteia transmissoras para robôs e executa portais em paralelo."""
+
+from __future__ import annotations
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from app.robots.base import RobotError
+from app.robots.registry import robot_for_url
+from app.services import admissao
+from app.services.admissao import Limiter
+from app.services.transmissoras import TransmissoraRecord
+
+logger = logging.getLogger(__name__)
+
+
+class RobotScheduler:
+    """
+    Executa os robôs de várias transmissoras numa competência.
+
+    Cada portal tem seu próprio pool limitado a `Robot.max_concurrency`
+    (não sobrecarrega um mesmo site) e até `max_portals` portais rodam ao mesmo tempo.
+    Cada download ocupa uma vaga de `downloads` (por padrão o limite do processo,
+    o mesmo do /robots/vsb), esperando por ela em vez de ser recusado, e uma
+    transmissora/competência já em execução no processo é compartilhada
+    (`Robot.executar`).
+    """
+
+    def __init__(
+        self,
+        max_portals: int = 4,
+        download_dir: Optional[Path] = None,
+        downloads: Optional[Limiter] = None,
+    ) -> None:
+        self.max_portals = max_portals
+        self.download_dir = download_dir
+        self.downloads = downloads or admissao.downloads
+
+    def _run_one(self, robot, codigo_ons: str, competencia: Optional[str]) -> Dict[str, object]:
+        try:
+            resultado, _ = robot.executar(
+                codigo_ons, competencia, self.download_dir, downloads=self.downloads
+            )
+        except Exception as exc:
+            # Uma falha inesperada (OSError, bug de parsing...) fica restrita à
+            # transmissora: as demais do portal e dos outros portais seguem.
+            if isinstance(exc, RobotError):
+                logger.warning("Robô %s falhou para %s: %s", robot.name, codigo_ons, exc)
+            else:
+                logger.exception("Falha inesperada no robô %s para %s", robot.name, codigo_ons)
+            return {
+                "codigo_ons": codigo_ons,
+                "portal": robot.name,
+                "status": "erro",
+                "erro": str(exc),
+            }
+        return {
+            "codigo_ons": codigo_ons,
+            "portal": robot.name,
+            "status": "ok",
+            "competencia": resultado["competencia"],
+            "destino": str(resultado["destino"]),
+            "arquivos": [str(path) for path in resultado["arquivos"]],
+            "assinaturas": resultado.get("assinaturas", {}),
+        }
+
+    def _run_portal(
+        self, robot, codigos: List[str], competencia: Optional[str]
+    ) -> List[Dict[str, object]]:
+        with ThreadPoolExecutor(max_workers=robot.max_concurrency) as pool:
+            return list(pool.map(lambda codigo: self._run_one(robot, codigo, competencia), codigos))
+
+    def run(
+        self, transmissoras: Iterable[TransmissoraRecord], competencia: Optional[str] = None
+    ) -> List[Dict[str, object]]:
+        por_portal: Dict[str, tuple] = {}
+        resultados: List[Dict[str, object]] = []
+        for transmissora in transmissoras:
+            robot = robot_for_url(transmissora.urlsite)
+            if robot is None:
+                resultados.append(
+                    {"codigo_ons": transmissora.codigoons, "portal": None, "status": "sem_robo"}
+                )
+                continue
+            por_portal.setdefault(robot.name, (robot, []))[1].append(transmissora.codigoons)
+
+        if not por_portal:
+            return resultados
+        with ThreadPoolExecutor(max_workers=min(self.max_portals, len(por_portal))) as pool:
+            futures = [
+                pool.submit(self._run_portal, robot, codigos, competencia)
+                for robot, codigos in por_portal.values()
+            ]
+            for future in futures:
+                resultados.extend(future.result())
+        return resultados
+
+
+__all__ = ["RobotScheduler"]
@@ -1,31 +1,44 @@
 from __future__ import annotations
 
+import os
 import zipfile
-from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Dict, List, Optional
-
-import requests
-
-
-class VsbRobotError(Exception):
+from typing import Dict, List, Optional, Tuple
+
+from app.robots.base import Robot, RobotError
+from app.robots.extracao import ExtracaoError, extrair_zip
+from app.robots.http import Fetcher, FetchError, HttpCache
+from app.robots.registry import register_robot
+
+VSB_BASE_URL = os.environ.get("VSB_BASE_URL", "https://www.vsbtrans.com.br")
+VSB_CACHE_DIR = Path(os.environ.get("VSB_CACHE_DIR", Path("data") / "vsb" / ".http_cache"))
+VSB_CACHE_MAX_MB = int(os.environ.get("VSB_CACHE_MAX_MB", 1024))
+# Só o que o pacote usa: NF-es e eventos (XML), DANFEs/boletos (PDF) e boletos em texto.
+VSB_EXTRACT_SUFFIXES = tuple(
+    os.environ.get("VSB_EXTRACT_SUFFIXES", ".xml,.pdf,.txt").lower().split(",")
+)
+VSB_EXTRACT_MAX_MEMBER_MB = int(os.environ.get("VSB_EXTRACT_MAX_MEMBER_MB", 64))
+VSB_EXTRACT_MAX_TOTAL_MB = int(os.environ.get("VSB_EXTRACT_MAX_TOTAL_MB", 2048))
+VSB_EXTRACT_WORKERS = int(os.environ.get("VSB_EXTRACT_WORKERS", 4))
+
+# Compartilhado pelas execuções do processo: o limite por host e o orçamento
+# de retentativas valem para todas as chamadas simultâneas ao portal.
+fetcher = Fetcher(
+    per_host_limit=4, cache=HttpCache(VSB_CACHE_DIR, max_bytes=VSB_CACHE_MAX_MB << 20)
+)
+
+
+class VsbRobotError(RobotError):
     """Erros de execução do robô VSB."""
 
 
-def _default_competencia() -> str:
-    """Retorna o mês anterior no formato YYYY.MM."""
-    hoje = datetime.utcnow()
-    mes_anterior = (hoje.replace(day=1) - timedelta(days=1)).replace(day=1)
-    return mes_anterior.strftime("%Y.%m")
-
-
 def _request_zip_metadata(codigo_ons: str, competencia: str) -> Dict[str, str]:
-    url = f"https://www.vsbtrans.com.br/getFiles.php?codigo={codigo_ons}&data={competencia}"
+    url = f"{VSB_BASE_URL}/getFiles.php?codigo={codigo_ons}&data={competencia}"
     headers = {
         "accept": "*/*",
         "accept-language": "pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7",
         "priority": "u=1, i",
-        "referer": "https://www.vsbtrans.com.br/",
+        "referer": f"{VSB_BASE_URL}/",
         "sec-ch-ua": '"Chromium";v="128", "Not;A=Brand";v="24", "Google Chrome";v="128"',
         "sec-ch-ua-mobile": "?0",
         "sec-ch-ua-platform": '"Windows"',
@@ -38,7 +51,12 @@ def _request_zip_metadata(codigo_ons: str, competencia: str) -> Dict[str, str]:
         ),
     }
 
-    response = requests.get(url, headers=headers, timeout=30)
+    try:
+        response = fetcher.get(url, headers=headers, timeout=30)
+    except FetchError as exc:
+        raise VsbRobotError(
+            f"Falha ao consultar metadados para {codigo_ons} ({competencia}). {exc}"
+        ) from exc
     if response.status_code != 200:
         raise VsbRobotError(
             f"Falha ao consultar metadados para {codigo_ons} ({competencia}). "
@@ -53,8 +71,17 @@ def _request_zip_metadata(codigo_ons: str, competencia: str) -> Dict[str, str]:
         ) from exc
 
 
-def _download_zip(download_url: str, destino_zip: Path) -> None:
-    response = requests.get(download_url, timeout=60)
+def _download_zip(download_url: str, destino_zip: Path) -> Path:
+    """
+    Baixa o ZIP; se o arquivo não mudou desde o último download, o servidor responde 304.
+
+    Quando a resposta fica no cache HTTP, o pacote é o próprio corpo em cache
+    (sem outra cópia em `destino_zip`); senão, é gravado em `destino_zip`.
+    """
+    try:
+        response = fetcher.get(download_url, timeout=60, use_cache=True)
+    except FetchError as exc:
+        raise VsbRobotError(f"Falha ao baixar ZIP ({download_url}). {exc}") from exc
     if response.status_code != 200:
         raise VsbRobotError(
             f"Falha ao baixar ZIP ({download_url}). Status {response.status_code}"
@@ -66,59 +93,99 @@ def _download_zip(download_url: str, destino_zip: Path) -> None:
             f"Conteúdo inesperado ao baixar ZIP ({download_url}): {content_type}"
         )
 
+    corpo = fetcher.cache.corpo(download_url) if fetcher.cache is not None else None
+    if corpo is not None:
+        return corpo
     destino_zip.parent.mkdir(parents=True, exist_ok=True)
     destino_zip.write_bytes(response.content)
+    return destino_zip
+
+
+def _em_cache(archive: Path) -> bool:
+    return fetcher.cache is not None and archive.parent == fetcher.cache.directory
 
 
 def _extract_zip(zip_path: Path, extract_dir: Path) -> List[Path]:
-    arquivos: List[Path] = []
     try:
-        with zipfile.ZipFile(zip_path, "r") as zip_ref:
-            zip_ref.extractall(extract_dir)
-            arquivos = [extract_dir / name for name in zip_ref.namelist()]
+        arquivos = extrair_zip(
+            zip_path,
+            extract_dir,
+            suffixes=VSB_EXTRACT_SUFFIXES,
+            max_member_bytes=VSB_EXTRACT_MAX_MEMBER_MB << 20,
+            max_total_bytes=VSB_EXTRACT_MAX_TOTAL_MB << 20,
+            max_workers=VSB_EXTRACT_WORKERS,
+        )
     except zipfile.BadZipFile as exc:
         raise VsbRobotError(f"Arquivo ZIP corrompido: {zip_path}") from exc
+    except ExtracaoError as exc:
+        raise VsbRobotError(f"Pacote recusado ({zip_path.name}): {exc}") from exc
     finally:
-        if zip_path.exists():
+        # O corpo do cache HTTP fica para a próxima revalidação.
+        if zip_path.exists() and not _em_cache(zip_path):
             zip_path.unlink()
     return arquivos
 
 
+class VsbRobot(Robot):
+    name = "vsb"
+    hosts = ("vsbtrans.com.br",)
+    max_concurrency = 4
+
+    def fetch_metadata(self, codigo_ons: str, competencia: str) -> Dict[str, object]:
+        metadata = _request_zip_metadata(codigo_ons, competencia)
+        if not metadata.get("zipUrl"):
+            raise VsbRobotError(
+                f"'zipUrl' não encontrado para {codigo_ons} na competência {competencia}."
+            )
+        return metadata
+
+    def download(
+        self, codigo_ons: str, competencia: str, metadata: Dict[str, object], destino: Path
+    ) -> Path:
+        zip_url = str(metadata["zipUrl"])
+        if zip_url.startswith("http"):
+            download_url = zip_url
+        else:
+            download_url = f"{VSB_BASE_URL}{zip_url}"
+
+        zip_path = destino / f"{competencia}_{codigo_ons}_faturas.zip"
+        return _download_zip(download_url, zip_path)
+
+    def extract(self, archive: Path, destino: Path) -> List[Path]:
+        return _extract_zip(archive, destino)
+
+    def extraidos(
+        self, archive: Path, destino: Path
+    ) -> Optional[Dict[str, Optional[Tuple[int, int]]]]:
+        return fetcher.cache.extracao(archive, destino) if _em_cache(archive) else None
+
+    def registrar_extracao(
+        self, archive: Path, destino: Path, arquivos: Dict[str, Optional[Tuple[int, int]]]
+    ) -> None:
+        if _em_cache(archive):
+            fetcher.cache.registrar_extracao(archive, destino, arquivos)
+
+
+vsb_robot = register_robot(VsbRobot())
+
+
 def run_vsb_robot(
     codigo_ons: str,
     competencia: Optional[str] = None,
     download_dir: Optional[Path] = None,
 ) -> Dict[str, object]:
     """Executa o robô VSB para o código informado."""
-    competencia_final = competencia or _default_competencia()
+    return vsb_robot.run(codigo_ons, competencia, download_dir)
 
-    base_dir = Path(download_dir or Path("data") / "vsb")
-    destino = base_dir / competencia_final / codigo_ons
-    destino.mkdir(parents=True, exist_ok=True)
 
-    metadata = _request_zip_metadata(codigo_ons, competencia_final)
-    zip_url = metadata.get("zipUrl")
-    if not zip_url:
-        raise VsbRobotError(
-            f"'zipUrl' não encontrado para {codigo_ons} na competência {competencia_final}."
-        )
-
-    if zip_url.startswith("http"):
-        download_url = zip_url
-    else:
-        download_url = f"https://www.vsbtrans.com.br{zip_url}"
-
-    zip_path = destino / f"{competencia_final}_{codigo_ons}_faturas.zip"
-    _download_zip(download_url, zip_path)
-    arquivos = _extract_zip(zip_path, destino)
-
-    return {
-        "codigo_ons": codigo_ons,
-        "competencia": competencia_final,
-        "destino": destino,
-        "arquivos": arquivos,
-        "metadata": metadata,
-    }
+def executar_vsb_robot(
+    codigo_ons: str,
+    competencia: Optional[str] = None,
+    download_dir: Optional[Path] = None,
+    esperar: bool = True,
+) -> Tuple[Dict[str, object], bool]:
+    """Como `run_vsb_robot`; o segundo valor indica que a execução foi compartilhada."""
+    return vsb_robot.executar(codigo_ons, competencia, download_dir, esperar=esperar)
 
 
-__all__ = ["run_vsb_robot", "VsbRobotError"]
+__all__ = ["VsbRobot", "executar_vsb_robot", "run_vsb_robot", "VsbRobotError", "vsb_robot"]
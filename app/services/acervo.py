@@ -0,0 +1,401 @@
+"""
+Acervo dos documentos baixados: um pacote compactado por competência, endereçado por conteúdo.
+
+Cada competência vira dois arquivos em `ACERVO_DIR`:
+- `<competencia>.pack`: objetos concatenados, cada um com um cabeçalho
+  (hash, compressão, tamanhos) seguido do conteúdo compactado com zlib;
+- `<competencia>.idx.json`: hash → (offset, tamanho gravado, tamanho, compressão)
+  e, por transmissora, nome do arquivo → hash.
+
+O hash é o mesmo BLAKE2b-160 de `documentos.file_digest` (IDENTIFICADORARQUIVO
+em RSM_TUSTANEXO), então o banco aponta direto para o conteúdo; arquivos iguais
+são guardados uma vez só. O pacote só cresce por append e o índice é regravado
+por inteiro (temporário + rename) a cada lote, depois do fsync do pacote; um
+`<competencia>.lock` serializa as gravações entre processos.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import hashlib
+import json
+import os
+import shutil
+import struct
+import threading
+import zlib
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path, PurePosixPath
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import sessionmaker
+
+from models.tust_models import RsmTustAnexo
+
+from app.parsers.nfe import DEFAULT_CHUNK_SIZE, InvoiceBatch
+from app.services.database import session_scope
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+ACERVO_DIR = Path(os.environ.get("ACERVO_DIR", Path("data") / "acervo"))
+
+# Cabeçalho de cada objeto no pacote: marca, hash (20 bytes), compressão,
+# tamanho gravado e tamanho original.
+_CABECALHO = struct.Struct("<4s20sBII")
+_MARCA = b"PVA1"
+SEM_COMPRESSAO = 0
+ZLIB = 1
+ZLIB_LEVEL = 6
+_IN_CHUNK = 500
+
+# FILENAME de RSM_TUSTANEXO de um arquivo que só existe no acervo:
+# "acervo:<competencia>/<codigo_ons>/<nome>".
+PREFIXO_REFERENCIA = "acervo:"
+
+
+class AcervoError(Exception):
+    """Objeto ausente ou corrompido no acervo."""
+
+
+@dataclass(frozen=True, slots=True)
+class EntradaAcervo:
+    codigo_ons: str
+    nome: str
+    digest: str
+    tamanho: int
+
+    @property
+    def caminho(self) -> PurePosixPath:
+        """Caminho relativo no pacote (`<codigo_ons>/<nome>`), como no diretório do robô."""
+        return PurePosixPath(self.codigo_ons, self.nome)
+
+
+def digest_bytes(conteudo: bytes) -> str:
+    """BLAKE2b de 160 bits em hex, igual a `documentos.file_digest` do arquivo."""
+    return hashlib.blake2b(conteudo, digest_size=20).hexdigest()
+
+
+def referencia_acervo(competencia: str, caminho: PurePosixPath) -> str:
+    """Valor de FILENAME que aponta para `<codigo_ons>/<nome>` no pacote da competência."""
+    return f"{PREFIXO_REFERENCIA}{competencia}/{caminho}"
+
+
+@contextmanager
+def _trava_exclusiva(path: Path) -> Iterator[None]:
+    """Trava exclusiva entre processos no arquivo `path` (criado se preciso)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("a+b") as handle:
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        else:
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+            else:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class PacoteCompetencia:
+    """
+    Pacote e índice de uma competência.
+
+    Leituras e gravações são seguras entre threads; entre processos, `guardar`
+    roda sob a trava `<competencia>.lock` e relê o índice antes de acrescentar,
+    então gravações concorrentes (p.ex. migrar_acervo e um robô) não se perdem.
+    """
+
+    def __init__(self, base_dir: Path, competencia: str) -> None:
+        self.competencia = competencia
+        self.pack_path = base_dir / f"{competencia}.pack"
+        self.idx_path = base_dir / f"{competencia}.idx.json"
+        self.lock_path = base_dir / f"{competencia}.lock"
+        self._lock = threading.Lock()
+        self._handle = None
+        self.objetos: Dict[str, Tuple[int, int, int, int]] = {}
+        self.entradas: Dict[str, Dict[str, str]] = {}
+        self._carregar_indice()
+
+    def _carregar_indice(self) -> None:
+        if self.idx_path.exists():
+            dados = json.loads(self.idx_path.read_text(encoding="utf-8"))
+            self.objetos = {k: tuple(v) for k, v in dados.get("objetos", {}).items()}
+            self.entradas = dados.get("entradas", {})
+
+    def __contains__(self, digest: str) -> bool:
+        return digest in self.objetos
+
+    def listar(
+        self, codigo_ons: Optional[str] = None, suffix: Optional[str] = None
+    ) -> List[EntradaAcervo]:
+        """Entradas em ordem de transmissora e nome, opcionalmente filtradas."""
+        codigos = [codigo_ons] if codigo_ons is not None else sorted(self.entradas)
+        sufixo = suffix.lower() if suffix else None
+        return [
+            EntradaAcervo(codigo, nome, digest, self.objetos[digest][2])
+            for codigo in codigos
+            for nome, digest in sorted(self.entradas.get(codigo, {}).items())
+            if sufixo is None or nome.lower().endswith(sufixo)
+        ]
+
+    def guardar(self, codigo_ons: str, arquivos: Iterable[Tuple[str, bytes]]) -> List[str]:
+        """Acrescenta (nome, conteúdo) da transmissora; conteúdo já guardado só ganha o nome."""
+        digests: List[str] = []
+        with self._lock, _trava_exclusiva(self.lock_path):
+            # Outro processo pode ter acrescentado objetos desde a última leitura.
+            self._carregar_indice()
+            nomes = self.entradas.setdefault(codigo_ons, {})
+            with self.pack_path.open("ab") as pack:
+                offset = pack.seek(0, os.SEEK_END)
+                for nome, conteudo in arquivos:
+                    digest = digest_bytes(conteudo)
+                    if digest not in self.objetos:
+                        compactado = zlib.compress(conteudo, ZLIB_LEVEL)
+                        compressao = ZLIB
+                        if len(compactado) >= len(conteudo):
+                            compactado, compressao = conteudo, SEM_COMPRESSAO
+                        pack.write(
+                            _CABECALHO.pack(
+                                _MARCA,
+                                bytes.fromhex(digest),
+                                compressao,
+                                len(compactado),
+                                len(conteudo),
+                            )
+                        )
+                        pack.write(compactado)
+                        self.objetos[digest] = (
+                            offset + _CABECALHO.size,
+                            len(compactado),
+                            len(conteudo),
+                            compressao,
+                        )
+                        offset += _CABECALHO.size + len(compactado)
+                    nomes[nome] = digest
+                    digests.append(digest)
+                pack.flush()
+                os.fsync(pack.fileno())
+            # O pacote é aberto para leitura depois de crescer.
+            self._fechar_leitura()
+            self._gravar_indice()
+        return digests
+
+    def _gravar_indice(self) -> None:
+        tmp = self.idx_path.with_suffix(".json.tmp")
+        tmp.write_text(
+            json.dumps({"versao": 1, "objetos": self.objetos, "entradas": self.entradas}),
+            encoding="utf-8",
+        )
+        os.replace(tmp, self.idx_path)
+
+    def _fechar_leitura(self) -> None:
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+    def ler(self, digest: str) -> bytes:
+        """Conteúdo original do objeto, com uma leitura posicionada no pacote."""
+        if digest not in self.objetos:
+            # Pode ter sido guardado por outro processo depois que o índice foi lido.
+            with self._lock:
+                self._carregar_indice()
+        try:
+            offset, gravado, tamanho, compressao = self.objetos[digest]
+        except KeyError:
+            raise AcervoError(f"Objeto {digest} não está no acervo {self.competencia}.") from None
+        with self._lock:
+            if self._handle is None:
+                self._handle = self.pack_path.open("rb")
+            self._handle.seek(offset)
+            dados = self._handle.read(gravado)
+        conteudo = zlib.decompress(dados) if compressao == ZLIB else dados
+        if len(conteudo) != tamanho or digest_bytes(conteudo) != digest:
+            raise AcervoError(f"Objeto {digest} corrompido no acervo {self.competencia}.")
+        return conteudo
+
+    def ler_entrada(self, caminho: PurePosixPath) -> bytes:
+        """Conteúdo pelo caminho `<codigo_ons>/<nome>` de `EntradaAcervo.caminho`."""
+        codigo_ons, _, nome = str(PurePosixPath(caminho)).partition("/")
+        try:
+            digest = self.entradas[codigo_ons][nome]
+        except KeyError:
+            raise AcervoError(f"{caminho} não está no acervo {self.competencia}.") from None
+        return self.ler(digest)
+
+    def restaurar(self, codigo_ons: str, destino: Path) -> List[Path]:
+        """Regrava os arquivos da transmissora em `destino` (para leitores que exigem caminho)."""
+        arquivos: List[Path] = []
+        for entrada in self.listar(codigo_ons):
+            path = destino / entrada.nome
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f".{path.name}.tmp")
+            tmp.write_bytes(self.ler(entrada.digest))
+            os.replace(tmp, path)
+            arquivos.append(path)
+        return arquivos
+
+    def close(self) -> None:
+        with self._lock:
+            self._fechar_leitura()
+
+
+class Acervo:
+    """Pacotes por competência sob `base_dir`, abertos sob demanda e mantidos em cache."""
+
+    def __init__(self, base_dir: Path = ACERVO_DIR) -> None:
+        self.base_dir = Path(base_dir)
+        self._pacotes: Dict[str, PacoteCompetencia] = {}
+        self._lock = threading.Lock()
+
+    def pacote(self, competencia: str) -> PacoteCompetencia:
+        with self._lock:
+            pacote = self._pacotes.get(competencia)
+            if pacote is None:
+                pacote = self._pacotes[competencia] = PacoteCompetencia(self.base_dir, competencia)
+            return pacote
+
+    def ler_referencia(self, referencia: str) -> bytes:
+        """Conteúdo de um FILENAME gravado por `referencia_acervo`."""
+        if not referencia.startswith(PREFIXO_REFERENCIA):
+            raise AcervoError(f"{referencia!r} não é uma referência ao acervo.")
+        competencia, _, caminho = referencia[len(PREFIXO_REFERENCIA) :].partition("/")
+        return self.pacote(competencia).ler_entrada(PurePosixPath(caminho))
+
+    def competencias(self) -> List[str]:
+        return sorted(path.name[: -len(".idx.json")] for path in self.base_dir.glob("*.idx.json"))
+
+    def guardar_arquivos(
+        self, competencia: str, codigo_ons: str, arquivos: Iterable[Path], raiz: Path
+    ) -> List[str]:
+        """Guarda arquivos do disco com o nome relativo a `raiz` (o diretório da transmissora)."""
+        return self.pacote(competencia).guardar(
+            codigo_ons,
+            ((path.relative_to(raiz).as_posix(), path.read_bytes()) for path in arquivos),
+        )
+
+    def invoice_batch(
+        self,
+        competencia: str,
+        codigo_ons: str,
+        competencia_date: dt.date,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        max_workers: int = 1,
+    ) -> InvoiceBatch:
+        """NF-es da transmissora lidas direto do pacote, sem extrair para o disco."""
+        pacote = self.pacote(competencia)
+        return InvoiceBatch(
+            [entrada.caminho for entrada in pacote.listar(codigo_ons, ".xml")],
+            codigo_ons,
+            competencia_date,
+            chunk_size=chunk_size,
+            max_workers=max_workers,
+            leitor=pacote.ler_entrada,
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            for pacote in self._pacotes.values():
+                pacote.close()
+            self._pacotes.clear()
+
+
+def _apontar_anexos(
+    session_factory: sessionmaker, competencia: str, entradas: Dict[str, PurePosixPath]
+) -> Tuple[int, Set[str]]:
+    """
+    Regrava FILENAME dos anexos (RSM_TUSTANEXO) com hash em `entradas` para a
+    referência no acervo e confirma a transação. Devolve quantos anexos foram
+    apontados e os hashes cuja referência não cabe na coluna (não apontados).
+    """
+    tamanho_max = RsmTustAnexo.__table__.c.FILENAME.type.length
+    apontados = 0
+    sem_referencia: Set[str] = set()
+    digests = list(entradas)
+    with session_scope(session_factory) as session:
+        for start in range(0, len(digests), _IN_CHUNK):
+            chunk = digests[start : start + _IN_CHUNK]
+            atualizacoes = []
+            for id_anexo, digest in session.query(
+                RsmTustAnexo.id_anexo, RsmTustAnexo.identificadorarquivo
+            ).filter(RsmTustAnexo.identificadorarquivo.in_(chunk)):
+                referencia = referencia_acervo(competencia, entradas[digest])
+                if len(referencia) > tamanho_max:
+                    sem_referencia.add(digest)
+                else:
+                    atualizacoes.append({"id_anexo": id_anexo, "filename": referencia})
+            if atualizacoes:
+                session.bulk_update_mappings(RsmTustAnexo, atualizacoes)
+                apontados += len(atualizacoes)
+    return apontados, sem_referencia
+
+
+def mover_para_acervo(
+    acervo: Acervo,
+    competencia: str,
+    codigo_ons: str,
+    diretorio: Path,
+    remover: bool = False,
+    session_factory: Optional[sessionmaker] = None,
+) -> Dict[str, int]:
+    """
+    Guarda os arquivos de `diretorio` no pacote da competência.
+
+    Com `remover` (exige `session_factory`), cada arquivo só é apagado depois
+    de relido do pacote e conferido pelo hash, e depois que os anexos de
+    RSM_TUSTANEXO com o mesmo hash passam a apontar para o acervo
+    (`referencia_acervo`, já confirmado no banco). Um arquivo cuja referência
+    não cabe em FILENAME fica no disco. O diretório vazio também sai.
+    """
+    if remover and session_factory is None:
+        raise ValueError("remover exige session_factory para apontar os anexos ao acervo.")
+    arquivos = sorted(path for path in diretorio.rglob("*") if path.is_file())
+    pacote = acervo.pacote(competencia)
+    objetos_antes = len(pacote.objetos)
+    digests = acervo.guardar_arquivos(competencia, codigo_ons, arquivos, diretorio)
+    resumo = {
+        "arquivos": len(arquivos),
+        "objetos_novos": len(pacote.objetos) - objetos_antes,
+        "bytes": sum(pacote.objetos[digest][2] for digest in digests),
+        "removidos": 0,
+        "anexos_apontados": 0,
+        "mantidos": 0,
+    }
+    if remover:
+        entradas: Dict[str, PurePosixPath] = {}
+        for path, digest in zip(arquivos, digests):
+            pacote.ler(digest)
+            entradas[digest] = PurePosixPath(codigo_ons, path.relative_to(diretorio).as_posix())
+        resumo["anexos_apontados"], sem_referencia = _apontar_anexos(
+            session_factory, competencia, entradas
+        )
+        for path, digest in zip(arquivos, digests):
+            if digest in sem_referencia:
+                resumo["mantidos"] += 1
+                continue
+            path.unlink()
+            resumo["removidos"] += 1
+        if not any(path.is_file() for path in diretorio.rglob("*")):
+            shutil.rmtree(diretorio)
+    return resumo
+
+
+__all__ = [
+    "ACERVO_DIR",
+    "Acervo",
+    "AcervoError",
+    "EntradaAcervo",
+    "PREFIXO_REFERENCIA",
+    "PacoteCompetencia",
+    "digest_bytes",
+    "mover_para_acervo",
+    "referencia_acervo",
+]
@@ -0,0 +1,123 @@
+"""Controle de admissão: limite de execuções simultâneas por etapa com fila limitada."""
+
+from __future__ import annotations
+
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+
+class Saturado(Exception):
+    """Etapa sem capacidade: fila cheia (429) ou espera esgotada (503)."""
+
+    def __init__(self, etapa: str, status_code: int, retry_after: int) -> None:
+        motivo = "fila cheia" if status_code == 429 else "tempo de espera esgotado"
+        super().__init__(f"Etapa '{etapa}' saturada ({motivo}); tente em {retry_after}s.")
+        self.etapa = etapa
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class Limiter:
+    """
+    No máximo `limite` execuções simultâneas e `fila` esperando por uma vaga.
+
+    Quem chega com a fila cheia é recusado na hora (429); quem espera mais de
+    `espera_max` segundos desiste (503). O Retry-After sugerido vem da duração
+    média recente das execuções e do tamanho da fila.
+    """
+
+    def __init__(self, nome: str, limite: int, fila: int, espera_max: float = 30.0) -> None:
+        if limite < 1:
+            raise ValueError("limite deve ser >= 1.")
+        self.nome = nome
+        self.limite = limite
+        self.fila = fila
+        self.espera_max = espera_max
+        self._cond = threading.Condition()
+        self.ativos = 0
+        self.esperando = 0
+        self.admitidos = 0
+        self.recusados = 0
+        self.expirados = 0
+        self._duracao: Optional[float] = None
+
+    def _retry_after(self) -> int:
+        duracao = self._duracao if self._duracao is not None else 1.0
+        return max(1, math.ceil(duracao * (self.esperando + 1) / self.limite))
+
+    def verificar(self) -> None:
+        """Recusa já (429) se um pedido agora encontraria a fila cheia; não reserva vaga."""
+        with self._cond:
+            if self.ativos >= self.limite and self.esperando >= self.fila:
+                self.recusados += 1
+                raise Saturado(self.nome, 429, self._retry_after())
+
+    @contextmanager
+    def slot(self, esperar: bool = False) -> Iterator[None]:
+        """
+        Ocupa uma vaga durante o bloco.
+
+        Com `esperar`, aguarda a vaga sem limite de fila nem de tempo: para
+        trabalho que já foi pago (gravar um download concluído) ou lotes que
+        não têm a quem devolver um 429. Quem espera assim conta na fila.
+        """
+        with self._cond:
+            if self.ativos >= self.limite:
+                if not esperar and self.esperando >= self.fila:
+                    self.recusados += 1
+                    raise Saturado(self.nome, 429, self._retry_after())
+                self.esperando += 1
+                try:
+                    livre = self._cond.wait_for(
+                        lambda: self.ativos < self.limite,
+                        timeout=None if esperar else self.espera_max,
+                    )
+                finally:
+                    self.esperando -= 1
+                if not livre:
+                    self.expirados += 1
+                    raise Saturado(self.nome, 503, self._retry_after())
+            self.ativos += 1
+            self.admitidos += 1
+
+        inicio = time.monotonic()
+        try:
+            yield
+        finally:
+            duracao = time.monotonic() - inicio
+            with self._cond:
+                self.ativos -= 1
+                self._duracao = (
+                    duracao if self._duracao is None else 0.8 * self._duracao + 0.2 * duracao
+                )
+                self._cond.notify()
+
+    def stats(self) -> Dict[str, object]:
+        with self._cond:
+            return {
+                "limite": self.limite,
+                "fila_max": self.fila,
+                "ativos": self.ativos,
+                "em_fila": self.esperando,
+                "admitidos": self.admitidos,
+                "recusados_fila_cheia": self.recusados,
+                "recusados_espera": self.expirados,
+                "duracao_media_s": round(self._duracao, 3) if self._duracao is not None else None,
+            }
+
+
+# Downloads dos portais no processo: a API (/robots/vsb, /robots/executar) e o
+# job do agendador passam todos por este limite.
+downloads = Limiter(
+    "download",
+    limite=int(os.environ.get("VSB_MAX_DOWNLOADS", 4)),
+    fila=int(os.environ.get("VSB_FILA_DOWNLOADS", 8)),
+    espera_max=float(os.environ.get("VSB_ESPERA_MAX", 30)),
+)
+
+
+__all__ = ["Limiter", "Saturado", "downloads"]
@@ -0,0 +1,357 @@
+"""Execução agendada das importações automáticas (RSM_TUSTIMPAUTOMATICA)."""
+
+from __future__ import annotations
+
+import calendar
+import datetime as dt
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import func, or_, update
+from sqlalchemy.orm import Session, sessionmaker
+
+from models.tust_models import RsmTustImpAutExecucao, RsmTustImpAutomatica
+
+STATUS_EXECUTANDO = "EXECUTANDO"
+STATUS_OCIOSO = "OCIOSO"
+STATUS_SUCESSO = "SUCESSO"
+STATUS_ERRO = "ERRO"
+MENSAGEM_MAX = 4000
+# HORAEXECUCAO é cadastrada no horário local dos operadores, não em UTC.
+AGENDADOR_TZ = ZoneInfo(os.environ.get("AGENDADOR_TZ", "America/Sao_Paulo"))
+
+logger = logging.getLogger(__name__)
+
+# Job recebe a competência (YYYY.MM) e o id da execução; devolve a quantidade de erros.
+Job = Callable[[str, Optional[int]], int]
+
+
+def agora_local() -> dt.datetime:
+    """Hora corrente no fuso do agendador, sem tzinfo (como as colunas DATE)."""
+    return dt.datetime.now(AGENDADOR_TZ).replace(tzinfo=None)
+
+
+def executar_importacao(
+    competencia: str,
+    execucao_id: Optional[int] = None,
+    session_factory: Optional[sessionmaker] = None,
+    codigo_empresa: Optional[str] = None,
+) -> int:
+    """
+    Job padrão: roda os robôs das transmissoras com envio por download, registra
+    os arquivos e importa/concilia as NF-es baixadas com a AVD (`Ingestor`).
+
+    Usa o banco de `session_factory` (o do Agendador); sem ele, o banco padrão.
+    Conta como erro cada robô que falhou e cada arquivo que não pôde ser importado.
+    """
+    from app.robots.scheduler import RobotScheduler
+    from app.services.consultas import parse_competencia
+    from app.services.database import get_session_factory, session_scope
+    from app.services.documentos import registrar_resultados
+    from app.services.ingestao import Ingestor
+    from app.services.transmissoras import transmissora_cache
+
+    fabrica = session_factory or get_session_factory()
+    with session_scope(fabrica) as session:
+        transmissoras = [
+            t
+            for t in transmissora_cache.all(session)
+            if (t.formaencaminhamentofaturas or "").lower() == "download"
+        ]
+    resultados = RobotScheduler().run(transmissoras, competencia)
+    with session_scope(fabrica) as session:
+        registrar_resultados(session, resultados, execucao_id)
+    erros = sum(1 for resultado in resultados if resultado["status"] == "erro")
+
+    arquivos = [
+        Path(arquivo)
+        for resultado in resultados
+        if resultado["status"] == "ok"
+        for arquivo in resultado["arquivos"]
+    ]
+    if not arquivos:
+        return erros
+    ingestor = Ingestor(
+        fabrica,
+        codigo_empresa=codigo_empresa,
+        competencia=parse_competencia(competencia).date(),
+    )
+    try:
+        importados = ingestor(arquivos)
+    finally:
+        ingestor.close()
+    for importado in importados:
+        if importado["status"] == "erro":
+            logger.warning("Falha ao importar %s: %s", importado["arquivo"], importado["detalhe"])
+            erros += 1
+    return erros
+
+
+def _slot(ano: int, mes: int, hora: dt.datetime) -> dt.datetime:
+    """Horário de execução no mês: dia e hora de HORAEXECUCAO (dia limitado ao fim do mês)."""
+    dia = min(hora.day, calendar.monthrange(ano, mes)[1])
+    return dt.datetime(ano, mes, dia, hora.hour, hora.minute)
+
+
+def _competencia_do_slot(slot: dt.datetime) -> str:
+    anterior = slot.replace(day=1) - dt.timedelta(days=1)
+    return anterior.strftime("%Y.%m")
+
+
+def slots_pendentes(
+    config: RsmTustImpAutomatica, agora: dt.datetime, max_catchup: int = 12
+) -> List[dt.datetime]:
+    """
+    Horários mensais vencidos desde a última execução, do mais antigo ao mais recente.
+
+    Sem execução anterior, só o horário do mês corrente conta (não há histórico
+    a recuperar). O atraso é limitado a `max_catchup` meses. `agora` é a hora
+    local (`agora_local`), no mesmo fuso de HORAEXECUCAO.
+    """
+    if config.horaexecucao is None:
+        return []
+    atual = _slot(agora.year, agora.month, config.horaexecucao)
+    if config.dataultimaexecucao is None:
+        return [atual] if atual <= agora else []
+
+    ultima = config.dataultimaexecucao
+    ano, mes = ultima.year, ultima.month
+    slots: List[dt.datetime] = []
+    while (ano, mes) <= (agora.year, agora.month):
+        slot = _slot(ano, mes, config.horaexecucao)
+        if ultima < slot <= agora:
+            slots.append(slot)
+        ano, mes = (ano + 1, 1) if mes == 12 else (ano, mes + 1)
+    return slots[-max_catchup:]
+
+
+def _format_duracao(inicio: dt.datetime, fim: dt.datetime) -> str:
+    segundos = int((fim - inicio).total_seconds())
+    return f"{segundos // 3600:02d}:{segundos % 3600 // 60:02d}:{segundos % 60:02d}"
+
+
+class Agendador:
+    """
+    Dispara as importações configuradas em RSM_TUSTIMPAUTOMATICA num pool limitado.
+
+    Uma configuração só é executada se for "reivindicada" com um UPDATE
+    condicional do STATUS para EXECUTANDO, o que impede execuções sobrepostas
+    entre threads e entre processos. Horários perdidos (p.ex. após um restart)
+    são reunidos numa única execução por configuração.
+
+    Enquanto uma configuração executa, o agendador renova a reivindicação a
+    cada `heartbeat_interval` segundos (DATAALTERACAO); `recuperar_travadas`
+    só libera as que ficaram `stale_after` sem renovação, ou seja, as de um
+    processo que caiu, por mais longa que seja a execução.
+
+    Todas as datas seguem o relógio local (`AGENDADOR_TZ`), o mesmo de HORAEXECUCAO.
+    """
+
+    def __init__(
+        self,
+        session_factory: sessionmaker,
+        job: Optional[Job] = None,
+        max_workers: int = 2,
+        stale_after: dt.timedelta = dt.timedelta(minutes=10),
+        heartbeat_interval: float = 60.0,
+        codigo_empresa: Optional[str] = None,
+    ) -> None:
+        self.session_factory = session_factory
+        # Sem job explícito, robôs e importação rodam contra o mesmo banco do agendador.
+        self.job = job or partial(
+            executar_importacao, session_factory=session_factory, codigo_empresa=codigo_empresa
+        )
+        self.stale_after = stale_after
+        self.heartbeat_interval = heartbeat_interval
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+        self._running: Dict[int, Future] = {}
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._batimento: Optional[threading.Thread] = None
+
+    def _ativas(self, session: Session) -> List[RsmTustImpAutomatica]:
+        return (
+            session.query(RsmTustImpAutomatica)
+            .filter(
+                or_(RsmTustImpAutomatica.inativo.is_(None), RsmTustImpAutomatica.inativo != "S"),
+                or_(RsmTustImpAutomatica.excluido.is_(None), RsmTustImpAutomatica.excluido != "S"),
+            )
+            .all()
+        )
+
+    def recuperar_travadas(self, agora: Optional[dt.datetime] = None) -> int:
+        """Libera configurações presas em EXECUTANDO por um processo que caiu."""
+        agora = agora or agora_local()
+        renovada = func.coalesce(
+            RsmTustImpAutomatica.dataalteracao, RsmTustImpAutomatica.dataultimaexecucao
+        )
+        with self.session_factory() as session:
+            result = session.execute(
+                update(RsmTustImpAutomatica)
+                .where(
+                    RsmTustImpAutomatica.status == STATUS_EXECUTANDO,
+                    renovada < agora - self.stale_after,
+                )
+                .values(status=STATUS_OCIOSO, statusimportacao=STATUS_ERRO)
+            )
+            session.commit()
+            return result.rowcount
+
+    def _reivindicar(self, session: Session, config_id: int, agora: dt.datetime) -> bool:
+        result = session.execute(
+            update(RsmTustImpAutomatica)
+            .where(
+                RsmTustImpAutomatica.id_impautomatica == config_id,
+                or_(
+                    RsmTustImpAutomatica.status.is_(None),
+                    RsmTustImpAutomatica.status != STATUS_EXECUTANDO,
+                ),
+            )
+            .values(status=STATUS_EXECUTANDO, dataultimaexecucao=agora, dataalteracao=agora)
+        )
+        return result.rowcount == 1
+
+    def _bater(self, agora: Optional[dt.datetime] = None) -> int:
+        """Renova a reivindicação das configurações em execução neste processo."""
+        with self._lock:
+            ids = list(self._running)
+        if not ids:
+            return 0
+        with self.session_factory() as session:
+            result = session.execute(
+                update(RsmTustImpAutomatica)
+                .where(
+                    RsmTustImpAutomatica.id_impautomatica.in_(ids),
+                    RsmTustImpAutomatica.status == STATUS_EXECUTANDO,
+                )
+                .values(dataalteracao=agora or agora_local())
+            )
+            session.commit()
+            return result.rowcount
+
+    def _manter_batimento(self) -> None:
+        while not self._parar.wait(self.heartbeat_interval):
+            try:
+                self._bater()
+            except Exception:
+                logger.exception("Falha ao renovar as importações automáticas em execução")
+
+    def _iniciar_batimento(self) -> None:
+        if self._batimento is None:
+            self._batimento = threading.Thread(
+                target=self._manter_batimento, name="agendador-batimento", daemon=True
+            )
+            self._batimento.start()
+
+    def tick(self, agora: Optional[dt.datetime] = None) -> List[int]:
+        """Agenda as configurações vencidas; retorna os ids submetidos ao pool."""
+        agora = agora or agora_local()
+        submetidas: List[int] = []
+        with self.session_factory() as session:
+            pendentes = []
+            for config in self._ativas(session):
+                with self._lock:
+                    if config.id_impautomatica in self._running:
+                        continue
+                slots = slots_pendentes(config, agora)
+                if slots:
+                    pendentes.append((config.id_impautomatica, slots))
+
+            for config_id, slots in pendentes:
+                if not self._reivindicar(session, config_id, agora):
+                    continue
+                session.commit()
+                competencias = sorted({_competencia_do_slot(slot) for slot in slots})
+                future = self._pool.submit(self._executar, config_id, competencias)
+                with self._lock:
+                    self._running[config_id] = future
+                future.add_done_callback(lambda _f, cid=config_id: self._finalizar(cid))
+                submetidas.append(config_id)
+        if submetidas:
+            self._iniciar_batimento()
+        return submetidas
+
+    def _finalizar(self, config_id: int) -> None:
+        with self._lock:
+            self._running.pop(config_id, None)
+
+    def _executar_competencia(self, session: Session, config_id: int, competencia: str) -> int:
+        execucao = RsmTustImpAutExecucao(
+            datainclusao=agora_local(),
+            identificadorimportacaoautomatica=config_id,
+            dataexecucao=agora_local(),
+            status=STATUS_EXECUTANDO,
+            qtderros=0,
+        )
+        session.add(execucao)
+        session.commit()
+        try:
+            erros = self.job(competencia, execucao.id_impautexecucao)
+        except Exception as exc:
+            logger.exception(
+                "Falha na importação automática %s (competência %s)", config_id, competencia
+            )
+            erros = 1
+            execucao.status = STATUS_ERRO
+            execucao.mensagemerro = f"{type(exc).__name__}: {exc}"[:MENSAGEM_MAX]
+        else:
+            execucao.status = STATUS_ERRO if erros else STATUS_SUCESSO
+        execucao.qtderros = erros
+        execucao.dataalteracao = agora_local()
+        session.commit()
+        return erros
+
+    def _liberar(self, config_id: int, inicio: dt.datetime, erros: int) -> None:
+        """Devolve a configuração para OCIOSO com o resultado da execução."""
+        fim = agora_local()
+        with self.session_factory() as session:
+            session.execute(
+                update(RsmTustImpAutomatica)
+                .where(RsmTustImpAutomatica.id_impautomatica == config_id)
+                .values(
+                    status=STATUS_OCIOSO,
+                    statusimportacao=STATUS_ERRO if erros else STATUS_SUCESSO,
+                    datafimultimaexecucao=fim,
+                    duracaoultimaexecucao=_format_duracao(inicio, fim),
+                )
+            )
+            session.commit()
+
+    def _executar(self, config_id: int, competencias: List[str]) -> int:
+        inicio = agora_local()
+        erros_total = 0
+        try:
+            with self.session_factory() as session:
+                for competencia in competencias:
+                    erros_total += self._executar_competencia(session, config_id, competencia)
+        except Exception:
+            # Falha fora do job (p.ex. o banco ao gravar a execução).
+            logger.exception("Falha ao executar a importação automática %s", config_id)
+            erros_total += 1
+        finally:
+            # A configuração nunca fica presa em EXECUTANDO até `recuperar_travadas`.
+            try:
+                self._liberar(config_id, inicio, erros_total)
+            except Exception:
+                logger.exception("Falha ao liberar a importação automática %s", config_id)
+        return erros_total
+
+    def run_forever(self, poll_interval: float = 60.0) -> None:
+        self.recuperar_travadas()
+        while True:
+            self.tick()
+            time.sleep(poll_interval)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait)
+        self._parar.set()
+
+
+__all__ = ["AGENDADOR_TZ", "Agendador", "agora_local", "executar_importacao", "slots_pendentes"]
@@ -0,0 +1,77 @@
+"""Importação de planilhas AVD (RSM_TUSTAVISODEBITO, itens e resumo da competência)."""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from models.tust_models import RsmTustAvisoDebito, RsmTustAvisoDebitoItem
+
+from app.parsers.avd import AvdItems, parse_avd
+from app.services.bulk import bulk_insert
+from app.services.resumo import atualizar_resumo
+
+
+def import_single_avd(
+    session: Session,
+    path: Path,
+    overwrite: bool = False,
+    parsed: Optional[Tuple[Dict[str, object], AvdItems]] = None,
+) -> Tuple[int, bool]:
+    """
+    Importa um único arquivo AVD.
+
+    `parsed` aceita o resultado de `parse_avd` já calculado (p.ex. num worker).
+    Retorna (id, created) onde created indica se houve inserção nova.
+    """
+    header, items = parsed if parsed is not None else parse_avd(path)
+    numero_avd = str(header["numero_avd"])
+
+    existing = (
+        session.query(RsmTustAvisoDebito)
+        .filter_by(numeroavd=numero_avd)
+        .one_or_none()
+    )
+
+    if existing and not overwrite:
+        return existing.id_avisodebito, False
+
+    if existing and overwrite:
+        anterior = (existing.codigoempresa, existing.datacompetencia)
+        session.query(RsmTustAvisoDebitoItem).filter_by(
+            identificadoravisodebitotransmissao=existing.id_avisodebito
+        ).delete()
+        session.delete(existing)
+        session.flush()
+        if anterior != (header["codigo_empresa"], header["periodo_apuracao"]):
+            atualizar_resumo(session, *anterior)
+
+    avd = RsmTustAvisoDebito(
+        identificador=int(header["numero_avd"]),
+        codigoempresa=header["codigo_empresa"],
+        codigofilial=header["nome_empresa"],
+        codigoons=items[0]["codigo_ons"] if items else None,
+        nomeempresa=header["nome_empresa"],
+        numeroavd=numero_avd,
+        datacompetencia=header["periodo_apuracao"],
+        datavencimentoparcela1=header["vencimento_parcela1"],
+        datavencimentoparcela2=header["vencimento_parcela2"],
+        datavencimentoparcela3=header["vencimento_parcela3"],
+    )
+    session.add(avd)
+    session.flush()
+
+    bulk_insert(
+        session,
+        RsmTustAvisoDebitoItem,
+        items.insert_rows(avd.id_avisodebito),
+    )
+
+    atualizar_resumo(session, header["codigo_empresa"], header["periodo_apuracao"])
+    session.commit()
+    return avd.id_avisodebito, True
+
+
+__all__ = ["import_single_avd"]
@@ -0,0 +1,115 @@
+"""Escrita em lote independente de dialeto (executemany / array DML no Oracle)."""
+
+from __future__ import annotations
+
+from itertools import islice
+from typing import Dict, Iterable, List, Sequence
+
+from sqlalchemy import inspect, insert, text, update
+from sqlalchemy.orm import Session
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def dialect_name(session: Session) -> str:
+    return session.get_bind().dialect.name
+
+
+def _primary_key(model) -> tuple:
+    mapper = inspect(model)
+    column = mapper.primary_key[0]
+    attr = mapper.get_property_by_column(column).key
+    return attr, column
+
+
+def next_ids(session: Session, model, count: int) -> List[int]:
+    """
+    Reserva `count` valores da sequence da chave primária numa única ida ao banco.
+
+    Só faz sentido no Oracle; nos demais dialetos a chave é gerada no INSERT.
+    """
+    if count <= 0:
+        return []
+    _, column = _primary_key(model)
+    sequence = column.default
+    if sequence is None or not getattr(sequence, "is_sequence", False):
+        raise ValueError(f"{model.__name__} não possui sequence na chave primária.")
+    rows = session.execute(
+        text(f"SELECT {sequence.name}.NEXTVAL FROM DUAL CONNECT BY LEVEL <= :n"),
+        {"n": count},
+    )
+    return [int(value) for (value,) in rows]
+
+
+def _batches(rows: Iterable[Dict[str, object]], batch_size: int):
+    iterator = iter(rows)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def bulk_insert(
+    session: Session,
+    model,
+    rows: Iterable[Dict[str, object]],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    return_ids: bool = False,
+) -> List[int]:
+    """
+    Insere `rows` (dicts com nomes de atributo do modelo) em lotes de `batch_size`.
+
+    `rows` pode ser um gerador: só um lote de dicts existe em memória por vez.
+
+    Cada lote vira um único executemany. No Oracle as chaves são pré-alocadas da
+    sequence (uma consulta por lote) e enviadas junto com os dados, então os ids
+    são sempre conhecidos; nos demais dialetos eles só são buscados (RETURNING)
+    quando `return_ids` é verdadeiro.
+    """
+    if not rows:
+        return []
+    session.flush()
+    pk_attr, pk_column = _primary_key(model)
+    oracle = dialect_name(session) == "oracle"
+
+    ids: List[int] = []
+    for batch in _batches(rows, batch_size):
+        if oracle:
+            pending = [row for row in batch if row.get(pk_attr) is None]
+            for row, new_id in zip(pending, next_ids(session, model, len(pending))):
+                row[pk_attr] = new_id
+            session.execute(insert(model), batch)
+            ids.extend(int(row[pk_attr]) for row in batch)
+        elif return_ids:
+            result = session.execute(
+                insert(model).returning(pk_column, sort_by_parameter_order=True), batch
+            )
+            ids.extend(result.scalars())
+        else:
+            session.execute(insert(model), batch)
+    return ids
+
+
+def bulk_update(
+    session: Session,
+    model,
+    rows: Sequence[Dict[str, object]],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> int:
+    """UPDATE por chave primária em executemany; cada dict deve conter a chave."""
+    if not rows:
+        return 0
+    session.flush()
+    for batch in _batches(rows, batch_size):
+        session.execute(update(model), batch)
+    return len(rows)
+
+
+__all__ = [
+    "DEFAULT_BATCH_SIZE",
+    "bulk_insert",
+    "bulk_update",
+    "dialect_name",
+    "next_ids",
+]
@@ -0,0 +1,66 @@
+"""Aplicação dos eventos de cancelamento de NF-e às notas já gravadas."""
+
+from __future__ import annotations
+
+import datetime as dt
+from typing import Dict, Iterable, Set
+
+from sqlalchemy import bindparam, update
+from sqlalchemy.orm import Session
+
+from models.tust_models import RsmTustFatTransmissaoNf
+
+from app.parsers.nfe import NFeCancelamento
+from app.services.faturas import recalcular_faturas
+
+_IN_CHUNK = 500
+
+
+def _faturas_das_chaves(session: Session, chaves: list) -> Set[int]:
+    nf = RsmTustFatTransmissaoNf
+    faturas: Set[int] = set()
+    for start in range(0, len(chaves), _IN_CHUNK):
+        query = session.query(nf.identificadorfaturatransmissao).filter(
+            nf.chavenfe.in_(chaves[start : start + _IN_CHUNK]),
+            nf.identificadorfaturatransmissao.isnot(None),
+        )
+        faturas.update(fatura_id for (fatura_id,) in query.distinct())
+    return faturas
+
+
+def aplicar_cancelamentos(
+    session: Session, cancelamentos: Iterable[NFeCancelamento]
+) -> Dict[str, int]:
+    """
+    Marca como canceladas as NFs das chaves informadas e recalcula suas faturas.
+
+    É um único UPDATE (executemany) por CHAVENFE, que é indexada; as notas não
+    são relidas. Eventos de notas ainda não gravadas não têm efeito. O commit
+    fica com o chamador.
+    """
+    por_chave = {cancelamento.chave_nfe: cancelamento for cancelamento in cancelamentos}
+    if not por_chave:
+        return {"eventos": 0, "notas": 0, "faturas": 0}
+
+    session.flush()
+    tabela = RsmTustFatTransmissaoNf.__table__
+    agora = dt.datetime.utcnow()
+    result = session.execute(
+        update(tabela)
+        .where(tabela.c.CHAVENFE == bindparam("b_chave"))
+        .values(
+            ISCANCELADO="S",
+            DATACANCELAMENTO=bindparam("b_data"),
+            DATAALTERACAO=agora,
+        ),
+        [
+            {"b_chave": chave, "b_data": cancelamento.data_cancelamento}
+            for chave, cancelamento in por_chave.items()
+        ],
+    )
+    faturas = _faturas_das_chaves(session, list(por_chave))
+    recalcular_faturas(session, faturas)
+    return {"eventos": len(por_chave), "notas": result.rowcount, "faturas": len(faturas)}
+
+
+__all__ = ["aplicar_cancelamentos"]
@@ -0,0 +1,90 @@
+"""Coalescência de execuções concorrentes (single-flight) e cache de resultados com validade."""
+
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class SingleFlight:
+    """
+    Chamadas concorrentes com a mesma chave compartilham uma única execução.
+
+    A primeira chamada executa `fn`; as que chegam enquanto ela roda esperam e
+    recebem o mesmo resultado (ou a mesma exceção). Terminada a execução, a
+    chave é liberada: a próxima chamada executa de novo. Vale por processo.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, Future] = {}
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Tuple[Any, bool]:
+        """Retorna (resultado, compartilhado); compartilhado indica que outra chamada executou."""
+        with self._lock:
+            future = self._inflight.get(key)
+            lider = future is None
+            if lider:
+                future = self._inflight[key] = Future()
+        if not lider:
+            return future.result(), True
+
+        try:
+            resultado = fn(*args, **kwargs)
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(resultado)
+            return resultado, False
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    def em_andamento(self) -> int:
+        with self._lock:
+            return len(self._inflight)
+
+
+class ResultCache:
+    """Resultados por chave por `ttl` segundos, com no máximo `max_entries` (sai o mais antigo)."""
+
+    def __init__(self, ttl: float = 600.0, max_entries: int = 1024) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _purge(self, agora: float) -> None:
+        for key in [key for key, (expira, _) in self._entries.items() if expira <= agora]:
+            del self._entries[key]
+        while len(self._entries) > self.max_entries:
+            del self._entries[next(iter(self._entries))]
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            self._purge(time.monotonic())
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            agora = time.monotonic()
+            self._entries.pop(key, None)
+            self._entries[key] = (agora + self.ttl, value)
+            self._purge(agora)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+__all__ = ["ResultCache", "SingleFlight"]
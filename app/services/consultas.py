@@ -0,0 +1,196 @@
+"""Consultas de leitura sobre AVDs e itens (paginação por chave e projeção de colunas)."""
+
+from __future__ import annotations
+
+import datetime as dt
+import hashlib
+import json
+from decimal import Decimal
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models.tust_models import RsmTustAvisoDebito, RsmTustAvisoDebitoItem
+
+
+class ConsultaError(Exception):
+    """Parâmetros de consulta inválidos."""
+
+
+AVD_FIELDS = (
+    "id_avisodebito",
+    "identificador",
+    "codigoempresa",
+    "codigofilial",
+    "codigoons",
+    "nomeempresa",
+    "numeroavd",
+    "datacompetencia",
+    "datavencimentoparcela1",
+    "datavencimentoparcela2",
+    "datavencimentoparcela3",
+)
+
+AVD_ITEM_FIELDS = (
+    "id_avisodebitoitem",
+    "identificador",
+    "identificadoravisodebitotransmissao",
+    "codigoons",
+    "nometransmissora",
+    "cnpjtransmissora",
+    "percentual_rede_basica",
+    "valor_rede_basica",
+    "valorparcela1",
+    "valorparcela2",
+    "valorparcela3",
+    "valortotal",
+)
+
+
+def parse_competencia(competencia: str) -> dt.datetime:
+    """Converte 'YYYY.MM' no primeiro dia do mês."""
+    try:
+        ano, mes = competencia.split(".")
+        return dt.datetime(int(ano), int(mes), 1)
+    except ValueError as exc:
+        raise ConsultaError(f"Competência inválida: {competencia}. Use YYYY.MM.") from exc
+
+
+def resolve_fields(allowed: Sequence[str], pk: str, fields: Optional[str]) -> List[str]:
+    """Valida o parâmetro `fields=` (nomes separados por vírgula) e devolve as colunas."""
+    if fields:
+        requested = [name.strip() for name in fields.split(",") if name.strip()]
+        unknown = [name for name in requested if name not in allowed]
+        if unknown:
+            raise ConsultaError(f"Campos desconhecidos: {', '.join(unknown)}.")
+    else:
+        requested = list(allowed)
+    # A chave primária sempre acompanha a projeção: é o cursor da paginação.
+    return [pk] + [name for name in requested if name != pk]
+
+
+def _json_value(value: object) -> object:
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (dt.date, dt.datetime)):
+        return value.isoformat()
+    return value
+
+
+def _row_to_dict(names: Sequence[str], row: Sequence[object]) -> Dict[str, object]:
+    return {name: _json_value(value) for name, value in zip(names, row)}
+
+
+def listar_avds(
+    session: Session,
+    codigo_empresa: Optional[str] = None,
+    competencia: Optional[str] = None,
+    after: Optional[int] = None,
+    limit: int = 100,
+    fields: Optional[str] = None,
+) -> Dict[str, object]:
+    """Lista AVDs em ordem de id, a partir do cursor `after`."""
+    pk = RsmTustAvisoDebito.id_avisodebito
+    names = resolve_fields(AVD_FIELDS, "id_avisodebito", fields)
+    stmt = (
+        select(*(getattr(RsmTustAvisoDebito, name) for name in names))
+        .order_by(pk)
+        .limit(limit)
+    )
+    if codigo_empresa:
+        stmt = stmt.where(RsmTustAvisoDebito.codigoempresa == codigo_empresa)
+    if competencia:
+        stmt = stmt.where(RsmTustAvisoDebito.datacompetencia == parse_competencia(competencia))
+    if after is not None:
+        stmt = stmt.where(pk > after)
+
+    items = [_row_to_dict(names, row) for row in session.execute(stmt)]
+    next_after = items[-1]["id_avisodebito"] if len(items) == limit else None
+    return {"items": items, "next_after": next_after}
+
+
+def avd_existe(session: Session, avd_id: int) -> bool:
+    return session.get(RsmTustAvisoDebito, avd_id) is not None
+
+
+def iter_itens_json(
+    session: Session,
+    avd_id: int,
+    after: Optional[int] = None,
+    limit: Optional[int] = None,
+    fields: Optional[str] = None,
+    chunk_size: int = 500,
+) -> Iterator[str]:
+    """Gera o corpo JSON dos itens em pedaços, sem montar a lista completa."""
+    pk = RsmTustAvisoDebitoItem.id_avisodebitoitem
+    names = resolve_fields(AVD_ITEM_FIELDS, "id_avisodebitoitem", fields)
+    stmt = (
+        select(*(getattr(RsmTustAvisoDebitoItem, name) for name in names))
+        .where(RsmTustAvisoDebitoItem.identificadoravisodebitotransmissao == avd_id)
+        .order_by(pk)
+    )
+    if after is not None:
+        stmt = stmt.where(pk > after)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+
+    yield '{"items":['
+    count = 0
+    last_id = None
+    for row in session.execute(stmt.execution_options(yield_per=chunk_size)):
+        yield ("," if count else "") + json.dumps(_row_to_dict(names, row), ensure_ascii=False)
+        count += 1
+        last_id = row[0]
+    next_after = last_id if limit is not None and count == limit else None
+    yield f'],"next_after":{json.dumps(next_after)}}}'
+
+
+def pagina_itens_json(
+    session: Session,
+    avd_id: int,
+    after: Optional[int] = None,
+    limit: Optional[int] = None,
+    fields: Optional[str] = None,
+) -> Tuple[str, List[str]]:
+    """
+    Corpo JSON de uma página de itens e o ETag dele, numa só leitura.
+
+    O ETag é o hash do próprio corpo: descreve exatamente o que é enviado e
+    custa só a faixa `after`/`limit` pedida, não a AVD inteira. A página fica
+    em memória (no máximo `limit` itens; sem `limit`, os itens da AVD).
+    """
+    partes = list(iter_itens_json(session, avd_id, after=after, limit=limit, fields=fields))
+    digest = hashlib.sha1()
+    for parte in partes:
+        digest.update(parte.encode("utf-8"))
+    return f'W/"{digest.hexdigest()}"', partes
+
+
+def make_etag(payload: object) -> str:
+    digest = hashlib.sha1(
+        json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+__all__ = [
+    "AVD_FIELDS",
+    "AVD_ITEM_FIELDS",
+    "ConsultaError",
+    "avd_existe",
+    "etag_matches",
+    "iter_itens_json",
+    "listar_avds",
+    "make_etag",
+    "pagina_itens_json",
+    "parse_competencia",
+    "resolve_fields",
+]
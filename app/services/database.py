@@ -1,27 +1,30 @@
 from __future__ import annotations
 
 from contextlib import contextmanager
+from functools import lru_cache
 from typing import Iterator
 
 from sqlalchemy.orm import Session, sessionmaker
 
-from models.tust_models import Base, create_sqlite_engine
+from models.tust_models import create_db_engine, ensure_schema
 
 
+@lru_cache(maxsize=None)
 def get_engine(db_url: str | None = None, echo: bool = False):
-    url = db_url or "sqlite:///tust.db"
-    return create_sqlite_engine(url, echo=echo)
+    """Um engine (e pool de conexões) por URL no processo."""
+    return create_db_engine(db_url, echo=echo)
 
 
+@lru_cache(maxsize=None)
 def get_session_factory(db_url: str | None = None, echo: bool = False):
     engine = get_engine(db_url, echo=echo)
-    Base.metadata.create_all(engine)
+    ensure_schema(engine)
     return sessionmaker(bind=engine)
 
 
 @contextmanager
-def db_session(db_url: str | None = None, echo: bool = False) -> Iterator[Session]:
-    factory = get_session_factory(db_url, echo=echo)
+def session_scope(factory: sessionmaker) -> Iterator[Session]:
+    """Sessão de `factory` com commit ao final e rollback em caso de erro."""
     session = factory()
     try:
         yield session
@@ -31,3 +34,9 @@ def db_session(db_url: str | None = None, echo: bool = False) -> Iterator[Sessio
         raise
     finally:
         session.close()
+
+
+@contextmanager
+def db_session(db_url: str | None = None, echo: bool = False) -> Iterator[Session]:
+    with session_scope(get_session_factory(db_url, echo=echo)) as session:
+        yield session
@@ -0,0 +1,330 @@
+"""Registro dos documentos baixados pelos robôs (classificação, hash e deduplicação)."""
+
+from __future__ import annotations
+
+import datetime as dt
+import hashlib
+import json
+import os
+import stat
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Set
+
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+
+from models.tust_models import (
+    RsmTustAnexo,
+    RsmTustFatTransmissaoArquivo,
+    RsmTustImpAutExecucao,
+)
+
+from app.services.bulk import bulk_insert
+
+TIPO_NFE_XML = "NFE_XML"
+TIPO_EVENTO_XML = "EVENTO_XML"
+TIPO_DANFE = "DANFE"
+TIPO_BOLETO = "BOLETO"
+TIPO_FATURA = "FATURA"
+TIPO_OUTRO = "OUTRO"
+
+# Coluna de contagem em RSM_TUSTIMPAUTEXECUCAO para cada tipo.
+CONTADORES = {
+    TIPO_NFE_XML: "qtdarquivosxml",
+    TIPO_EVENTO_XML: "qtdarquivosxml",
+    TIPO_DANFE: "qtdarquivosdanfe",
+    TIPO_BOLETO: "qtdarquivosboleto",
+    TIPO_FATURA: "qtdarquivosfatura",
+}
+
+_IN_CHUNK = 500
+
+DOCUMENTOS_CACHE_DIR = Path(
+    os.environ.get("DOCUMENTOS_CACHE_DIR", Path("data") / "documentos" / "inspecao")
+)
+
+
+@dataclass
+class Documento:
+    path: Path
+    tipo: str
+    digest: str
+    size: int
+
+
+def file_digest(path: Path, chunk_size: int = 1 << 20) -> str:
+    """BLAKE2b de 160 bits em hex (40 caracteres, cabe em IDENTIFICADORARQUIVO)."""
+    digest = hashlib.blake2b(digest_size=20)
+    with path.open("rb") as handle:
+        for chunk in iter(lambda: handle.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def classificar(path: Path) -> str:
+    """Classifica pelo nome/extensão; XMLs pelo elemento raiz (lendo só o início)."""
+    nome = path.name.lower()
+    sufixo = path.suffix.lower()
+    if sufixo == ".xml":
+        with path.open("rb") as handle:
+            inicio = handle.read(2048)
+        if b"procEventoNFe" in inicio or b"<evento" in inicio:
+            return TIPO_EVENTO_XML
+        if b"nfeProc" in inicio or b"<NFe" in inicio:
+            return TIPO_NFE_XML
+        return TIPO_OUTRO
+    if "boleto" in nome or sufixo == ".txt":
+        return TIPO_BOLETO
+    if "fatura" in nome:
+        return TIPO_FATURA
+    if sufixo == ".pdf":
+        return TIPO_DANFE
+    return TIPO_OUTRO
+
+
+class CacheInspecao:
+    """
+    Hash e tipo já calculados de cada arquivo, válidos enquanto a assinatura
+    dele não mudar: (tamanho, CRC-32) do membro do ZIP de onde foi extraído ou,
+    sem ela, (tamanho, mtime), o mesmo critério do índice do git.
+
+    Um JSON por diretório de origem em `directory`, gravado por temporário +
+    rename; evita reler e re-hashear os pacotes já registrados a cada execução,
+    inclusive quando o robô extrai de novo o mesmo pacote (mtime novo, mesmo CRC).
+    """
+
+    def __init__(self, directory: Path = DOCUMENTOS_CACHE_DIR) -> None:
+        self.directory = Path(directory)
+
+    def _path(self, diretorio: Path) -> Path:
+        key = hashlib.sha256(str(diretorio.resolve()).encode("utf-8")).hexdigest()
+        return self.directory / f"{key}.json"
+
+    def carregar(self, diretorio: Path) -> Dict[str, list]:
+        path = self._path(diretorio)
+        if not path.exists():
+            return {}
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except ValueError:
+            return {}
+
+    def gravar(self, diretorio: Path, entradas: Dict[str, list]) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(diretorio)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(entradas), encoding="utf-8")
+        os.replace(tmp, path)
+
+
+cache_inspecao = CacheInspecao()
+
+
+def inspecionar(
+    arquivos: Iterable[Path],
+    cache: Optional[CacheInspecao] = None,
+    assinaturas: Optional[Mapping[str, Sequence[int]]] = None,
+) -> List[Documento]:
+    """
+    Classifica e calcula o hash dos arquivos.
+
+    Com `cache`, arquivos com o mesmo caminho e assinatura da última inspeção
+    reaproveitam hash e tipo sem serem lidos. `assinaturas` traz o (tamanho,
+    CRC-32) do membro do ZIP de cada caminho extraído (`assinaturas_zip`).
+    """
+    assinaturas = assinaturas or {}
+    documentos = []
+    por_diretorio: Dict[Path, Dict[str, list]] = {}
+    alterados: Set[Path] = set()
+    for path in arquivos:
+        path = Path(path)
+        try:
+            info = path.stat()
+        except FileNotFoundError:
+            continue
+        if not stat.S_ISREG(info.st_mode):
+            continue
+        membro = assinaturas.get(str(path))
+        if membro is not None and membro[0] == info.st_size:
+            entrada: list = [info.st_size, f"crc32:{membro[1]:08x}"]
+        else:
+            entrada = [info.st_size, info.st_mtime_ns]
+        entradas = None
+        if cache is not None:
+            if path.parent not in por_diretorio:
+                por_diretorio[path.parent] = cache.carregar(path.parent)
+            entradas = por_diretorio[path.parent]
+            conhecido = entradas.get(path.name)
+            if conhecido is not None and conhecido[:2] == entrada:
+                documentos.append(Documento(path, conhecido[3], conhecido[2], info.st_size))
+                continue
+        documento = Documento(path, classificar(path), file_digest(path), info.st_size)
+        documentos.append(documento)
+        if entradas is not None:
+            entradas[path.name] = entrada + [documento.digest, documento.tipo]
+            alterados.add(path.parent)
+    for diretorio in alterados:
+        cache.gravar(diretorio, por_diretorio[diretorio])
+    return documentos
+
+
+def hashes_conhecidos(session: Session, digests: Iterable[str]) -> Set[str]:
+    valores = list(digests)
+    conhecidos: Set[str] = set()
+    for start in range(0, len(valores), _IN_CHUNK):
+        chunk = valores[start : start + _IN_CHUNK]
+        conhecidos.update(
+            value
+            for (value,) in session.query(RsmTustAnexo.identificadorarquivo).filter(
+                RsmTustAnexo.identificadorarquivo.in_(chunk)
+            )
+        )
+    return conhecidos
+
+
+def arquivos_vinculados(session: Session, codigo_ons: str, digests: Iterable[str]) -> Set[str]:
+    """Hashes já registrados em RSM_TUSTFATTRANSMISSAOARQUIVO para a transmissora."""
+    arquivo = RsmTustFatTransmissaoArquivo
+    valores = list(digests)
+    vinculados: Set[str] = set()
+    for start in range(0, len(valores), _IN_CHUNK):
+        chunk = valores[start : start + _IN_CHUNK]
+        vinculados.update(
+            value
+            for (value,) in session.query(arquivo.id_arquivo).filter(
+                arquivo.id_arquivo.in_(chunk), arquivo.codigotransmissoraons == codigo_ons
+            )
+        )
+    return vinculados
+
+
+def _somar_contagens(session: Session, execucao_id: int, contagens: Dict[str, int]) -> None:
+    execucao = RsmTustImpAutExecucao
+    session.execute(
+        update(execucao)
+        .where(execucao.id_impautexecucao == execucao_id)
+        .values(
+            {
+                getattr(execucao, coluna): func.coalesce(getattr(execucao, coluna), 0) + quantidade
+                for coluna, quantidade in contagens.items()
+            }
+        )
+    )
+
+
+def registrar_documentos(
+    session: Session,
+    arquivos: Iterable[Path],
+    codigo_ons: str,
+    execucao_id: Optional[int] = None,
+    id_faturatransmissao: Optional[int] = None,
+    cache: Optional[CacheInspecao] = cache_inspecao,
+    assinaturas: Optional[Mapping[str, Sequence[int]]] = None,
+) -> Dict[str, object]:
+    """
+    Registra os arquivos extraídos que a transmissora ainda não tem no banco.
+
+    O conteúdo (RSM_TUSTANEXO) é gravado uma vez por hash; o vínculo
+    (RSM_TUSTFATTRANSMISSAOARQUIVO) é por transmissora, então o mesmo arquivo
+    enviado por outra transmissora também é registrado. As contagens por tipo
+    dos novos são somadas às da execução `execucao_id` (RSM_TUSTIMPAUTEXECUCAO).
+    Arquivos inalterados desde a última inspeção não são relidos (`cache`).
+    """
+    documentos = inspecionar(arquivos, cache, assinaturas)
+    por_hash: Dict[str, Documento] = {}
+    for doc in documentos:
+        por_hash.setdefault(doc.digest, doc)
+    vinculados = arquivos_vinculados(session, codigo_ons, por_hash)
+    novos = {digest: doc for digest, doc in por_hash.items() if digest not in vinculados}
+
+    resumo: Dict[str, object] = {
+        "total": len(documentos),
+        "novos": len(novos),
+        "ignorados": len(documentos) - len(novos),
+        "novos_arquivos": [str(doc.path) for doc in novos.values()],
+    }
+    if not novos:
+        return resumo
+
+    agora = dt.datetime.utcnow()
+    conhecidos = hashes_conhecidos(session, novos)
+    bulk_insert(
+        session,
+        RsmTustAnexo,
+        [
+            {
+                "identificadorarquivo": doc.digest,
+                "model": RsmTustFatTransmissaoArquivo.__tablename__,
+                "filename": doc.path.name[:200],
+                "size": doc.size,
+            }
+            for doc in novos.values()
+            if doc.digest not in conhecidos
+        ],
+    )
+    bulk_insert(
+        session,
+        RsmTustFatTransmissaoArquivo,
+        [
+            {
+                "datainclusao": agora,
+                "id_faturatransmissao": id_faturatransmissao,
+                "id_arquivo": doc.digest,
+                "tp_arquivo": doc.tipo,
+                "nomearquivo": doc.path.name[:100],
+                "codigotransmissoraons": codigo_ons,
+            }
+            for doc in novos.values()
+        ],
+    )
+
+    contagens = {coluna: 0 for coluna in set(CONTADORES.values())}
+    for doc in novos.values():
+        coluna = CONTADORES.get(doc.tipo)
+        if coluna:
+            contagens[coluna] += 1
+    if execucao_id is not None:
+        _somar_contagens(session, execucao_id, contagens)
+    session.flush()
+    resumo["contagens"] = contagens
+    return resumo
+
+
+def registrar_resultados(
+    session: Session,
+    resultados: Iterable[Dict[str, object]],
+    execucao_id: Optional[int] = None,
+) -> Dict[str, int]:
+    """Registra os arquivos de cada resultado "ok" do RobotScheduler."""
+    totais = {"total": 0, "novos": 0, "ignorados": 0}
+    for resultado in resultados:
+        if resultado.get("status") != "ok":
+            continue
+        resumo = registrar_documentos(
+            session,
+            (Path(path) for path in resultado["arquivos"]),
+            str(resultado["codigo_ons"]),
+            execucao_id=execucao_id,
+            assinaturas=resultado.get("assinaturas"),
+        )
+        resultado["documentos_novos"] = resumo["novos"]
+        for chave in totais:
+            totais[chave] += int(resumo[chave])
+    return totais
+
+
+__all__ = [
+    "CONTADORES",
+    "CacheInspecao",
+    "DOCUMENTOS_CACHE_DIR",
+    "Documento",
+    "arquivos_vinculados",
+    "cache_inspecao",
+    "classificar",
+    "file_digest",
+    "hashes_conhecidos",
+    "inspecionar",
+    "registrar_documentos",
+    "registrar_resultados",
+]
@@ -0,0 +1,48 @@
+"""Serialização incremental (NDJSON/CSV) de linhas de exportação."""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+from typing import Dict, Iterable, Iterator, Optional, Sequence
+
+FORMATOS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def iter_ndjson(rows: Iterable[Dict[str, Optional[str]]]) -> Iterator[str]:
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + "\n"
+
+
+def iter_csv(rows: Iterable[Dict[str, Optional[str]]], fieldnames: Sequence[str]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames, delimiter=";", lineterminator="\n")
+
+    def _drain() -> str:
+        value = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return value
+
+    writer.writeheader()
+    yield _drain()
+    for row in rows:
+        writer.writerow(row)
+        yield _drain()
+
+
+def iter_export(
+    rows: Iterable[Dict[str, Optional[str]]], formato: str, fieldnames: Sequence[str]
+) -> Iterator[str]:
+    if formato == "ndjson":
+        return iter_ndjson(rows)
+    if formato == "csv":
+        return iter_csv(rows, fieldnames)
+    raise ValueError(f"Formato de exportação não suportado: {formato}")
+
+
+__all__ = ["FORMATOS", "iter_csv", "iter_export", "iter_ndjson"]
@@ -0,0 +1,353 @@
+"""Montagem das faturas de transmissão (RSM_TUSTFATURATRANSMISSAO) a partir das notas lidas."""
+
+from __future__ import annotations
+
+import datetime as dt
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+
+from models.tust_models import (
+    RsmTustAvisoDebito,
+    RsmTustFatTransmissaoBoleto,
+    RsmTustFatTransmissaoNf,
+    RsmTustFaturaTransmissao,
+)
+
+from app.parsers.boleto import BoletoInfo
+from app.parsers.nfe import NFeInvoice
+from app.services.bulk import bulk_insert, bulk_update
+from app.services.resumo import parcelas_por_transmissora
+from app.services.transmissoras import TransmissoraRecord, transmissora_cache
+
+# Chave natural da fatura dentro de uma AVD: (código ONS da transmissora, competência).
+FaturaKey = Tuple[str, dt.datetime]
+
+_IN_CHUNK = 500
+
+# Situação da fatura (TIPOSITUACAOFATURATRANSMISSAO) gravada por `atualizar_agregados`.
+SITUACAO_CONCILIADA = "CONCILIADA"
+SITUACAO_DIVERGENTE = "DIVERGENTE"
+SITUACAO_PENDENTE = "PENDENTE"
+
+
+@dataclass
+class GrupoFatura:
+    transmissora: TransmissoraRecord
+    competencia: dt.datetime
+    notas: List[NFeInvoice] = field(default_factory=list)
+    boletos: List[BoletoInfo] = field(default_factory=list)
+
+
+def agrupar_notas(
+    session: Session,
+    invoices: Iterable[NFeInvoice],
+    boletos: Sequence[BoletoInfo] = (),
+    sobras_no_unico: bool = True,
+) -> Dict[FaturaKey, GrupoFatura]:
+    """
+    Agrupa as notas por transmissora (CNPJ do emitente) e competência numa só passada.
+
+    Cada boleto vai para o grupo que tem uma duplicata de mesmo valor; havendo
+    um único grupo (e `sobras_no_unico`), os boletos sem par ficam nele. Notas de
+    CNPJ não cadastrado ficam de fora.
+    """
+    grupos: Dict[FaturaKey, GrupoFatura] = {}
+    por_valor: Dict[Decimal, FaturaKey] = {}
+    for invoice in invoices:
+        transmissora = transmissora_cache.get_por_cnpj(session, invoice.cnpj_emitente)
+        if transmissora is None:
+            continue
+        competencia = dt.datetime.combine(invoice.competencia, dt.time())
+        key = (transmissora.codigoons, competencia)
+        grupo = grupos.get(key)
+        if grupo is None:
+            grupo = grupos[key] = GrupoFatura(transmissora, competencia)
+        grupo.notas.append(invoice)
+        valor = invoice.duplicata_valor if invoice.duplicata_valor is not None else invoice.valor_total
+        por_valor.setdefault(valor, key)
+
+    unico = next(iter(grupos)) if len(grupos) == 1 and sobras_no_unico else None
+    for boleto in boletos:
+        key = por_valor.get(boleto.valor, unico)
+        if key is not None:
+            grupos[key].boletos.append(boleto)
+    return grupos
+
+
+def _valores_ons(
+    session: Session, avd: RsmTustAvisoDebito, codigos: Iterable[str]
+) -> Dict[str, Decimal]:
+    """Valor da AVD por transmissora (soma das parcelas), do resumo ou, na falta, dos itens."""
+    linhas = parcelas_por_transmissora(
+        session,
+        avd.datacompetencia,
+        avd.codigoempresa,
+        {(avd.codigoempresa, codigo) for codigo in codigos},
+    )
+    return {
+        codigo: (linha.valorparcela1 or Decimal("0"))
+        + (linha.valorparcela2 or Decimal("0"))
+        + (linha.valorparcela3 or Decimal("0"))
+        for (_, codigo), linha in linhas.items()
+    }
+
+
+def _faturas_existentes(
+    session: Session, avd: RsmTustAvisoDebito, keys: Iterable[FaturaKey]
+) -> Dict[FaturaKey, int]:
+    codigos = sorted({codigo for codigo, _ in keys})
+    existentes: Dict[FaturaKey, int] = {}
+    for start in range(0, len(codigos), _IN_CHUNK):
+        query = session.query(
+            RsmTustFaturaTransmissao.codigotransmissoraons,
+            RsmTustFaturaTransmissao.datacompetencia,
+            RsmTustFaturaTransmissao.id_faturatransmissao,
+        ).filter(
+            RsmTustFaturaTransmissao.identificadoravisodebitotransmissao == avd.id_avisodebito,
+            RsmTustFaturaTransmissao.codigotransmissoraons.in_(codigos[start : start + _IN_CHUNK]),
+        )
+        for codigo, competencia, fatura_id in query:
+            existentes[(codigo, competencia)] = fatura_id
+    return existentes
+
+
+def garantir_faturas(
+    session: Session, avd: RsmTustAvisoDebito, grupos: Dict[FaturaKey, GrupoFatura]
+) -> Dict[FaturaKey, int]:
+    """Retorna o id da fatura de cada grupo, criando em lote as que ainda não existem."""
+    ids = _faturas_existentes(session, avd, grupos)
+    novos = [key for key in grupos if key not in ids]
+    if novos:
+        agora = dt.datetime.utcnow()
+        novos_ids = bulk_insert(
+            session,
+            RsmTustFaturaTransmissao,
+            [
+                {
+                    "datainclusao": agora,
+                    "identificador": avd.identificador,
+                    "identificadoravisodebitotransmissao": avd.id_avisodebito,
+                    "identificadortransmissora": grupos[key].transmissora.id_transmissora,
+                    "formapagamento": grupos[key].transmissora.formapagamento,
+                    "codigotransmissoraons": key[0],
+                    "codigoempresa": avd.codigoempresa,
+                    "datacompetencia": key[1],
+                }
+                for key in novos
+            ],
+            return_ids=True,
+        )
+        ids.update(zip(novos, novos_ids))
+    return ids
+
+
+def situacao_fatura(
+    qtd_nf: int,
+    total_nf: Optional[Decimal],
+    qtd_blt: int,
+    total_blt: Optional[Decimal],
+    valor_ons: Optional[Decimal],
+) -> str:
+    """
+    CONCILIADA quando as NFs somam o valor da AVD e os boletos (se houver)
+    somam o mesmo que as NFs; sem NF válida, PENDENTE; senão DIVERGENTE.
+    """
+    if not qtd_nf:
+        return SITUACAO_PENDENTE
+    if valor_ons is None or total_nf != valor_ons:
+        return SITUACAO_DIVERGENTE
+    if qtd_blt and total_blt != total_nf:
+        return SITUACAO_DIVERGENTE
+    return SITUACAO_CONCILIADA
+
+
+def atualizar_agregados(
+    session: Session, avd: RsmTustAvisoDebito, ids: Dict[FaturaKey, int]
+) -> None:
+    """
+    Recalcula os totais e a situação das faturas a partir das NFs (não
+    canceladas) e boletos já vinculados.
+
+    São duas agregações (NF e boleto) e um UPDATE em lote, independentemente do
+    número de faturas. Como cada CHAVENFE é gravada uma vez só
+    (`_persist_notas_fiscais`), rodar de novo não duplica os valores.
+    """
+    fatura_ids = list(ids.values())
+    notas: Dict[int, tuple] = {}
+    boletos: Dict[int, tuple] = {}
+    for start in range(0, len(fatura_ids), _IN_CHUNK):
+        chunk = fatura_ids[start : start + _IN_CHUNK]
+        nf = RsmTustFatTransmissaoNf
+        for fatura_id, qtd, total, emissao, vencimento, numero in session.query(
+            nf.identificadorfaturatransmissao,
+            func.count(nf.id_faturatransmissaonf),
+            func.sum(nf.valortotal),
+            func.min(nf.dataemissao),
+            func.min(nf.datavencimento),
+            func.min(nf.numeronotafiscal),
+        ).filter(
+            nf.identificadorfaturatransmissao.in_(chunk),
+            or_(nf.iscancelado.is_(None), nf.iscancelado != "S"),
+        ).group_by(nf.identificadorfaturatransmissao):
+            notas[fatura_id] = (qtd, total, emissao, vencimento, numero)
+
+        blt = RsmTustFatTransmissaoBoleto
+        for fatura_id, qtd, total in session.query(
+            blt.identificadorfaturatransmissao,
+            func.count(blt.id_faturatransmissaoboleto),
+            func.sum(blt.valortotal),
+        ).filter(blt.identificadorfaturatransmissao.in_(chunk)).group_by(
+            blt.identificadorfaturatransmissao
+        ):
+            boletos[fatura_id] = (qtd, total)
+
+    valores_ons = _valores_ons(session, avd, {codigo for codigo, _ in ids})
+    agora = dt.datetime.utcnow()
+    linhas = []
+    for key, fatura_id in ids.items():
+        qtd_nf, total_nf, emissao, vencimento, numero = notas.get(
+            fatura_id, (0, None, None, None, None)
+        )
+        qtd_blt, total_blt = boletos.get(fatura_id, (0, None))
+        linhas.append(
+            {
+                "id_faturatransmissao": fatura_id,
+                "dataalteracao": agora,
+                "datafatura": emissao,
+                "datavencimento": vencimento,
+                "numeronotafiscal": numero,
+                "isfaturaagrupada": "S" if qtd_nf > 1 else "N",
+                "qtdnotasfiscais": qtd_nf,
+                "valortotalnotasfiscais": total_nf or Decimal("0"),
+                "valorfatura": total_nf or Decimal("0"),
+                "qtdboletos": qtd_blt,
+                "valortotalboletos": total_blt or Decimal("0"),
+                "valorons": valores_ons.get(key[0]),
+                "tiposituacaofaturatransmissao": situacao_fatura(
+                    qtd_nf, total_nf, qtd_blt, total_blt, valores_ons.get(key[0])
+                ),
+            }
+        )
+    bulk_update(session, RsmTustFaturaTransmissao, linhas)
+
+
+def recalcular_faturas(session: Session, fatura_ids: Iterable[int]) -> int:
+    """`atualizar_agregados` para faturas conhecidas só pelo id (agrupadas por AVD)."""
+    fatura_ids = sorted(set(fatura_ids))
+    por_avd: Dict[int, Dict[FaturaKey, int]] = {}
+    for start in range(0, len(fatura_ids), _IN_CHUNK):
+        query = session.query(
+            RsmTustFaturaTransmissao.identificadoravisodebitotransmissao,
+            RsmTustFaturaTransmissao.codigotransmissoraons,
+            RsmTustFaturaTransmissao.datacompetencia,
+            RsmTustFaturaTransmissao.id_faturatransmissao,
+        ).filter(
+            RsmTustFaturaTransmissao.id_faturatransmissao.in_(fatura_ids[start : start + _IN_CHUNK])
+        )
+        for avd_id, codigo, competencia, fatura_id in query:
+            por_avd.setdefault(avd_id, {})[(codigo, competencia)] = fatura_id
+
+    for avd_id, ids in por_avd.items():
+        avd = session.get(RsmTustAvisoDebito, avd_id)
+        if avd is not None:
+            atualizar_agregados(session, avd, ids)
+    return sum(len(ids) for ids in por_avd.values())
+
+
+def fatura_por_chave(
+    grupos: Dict[FaturaKey, GrupoFatura], ids: Dict[FaturaKey, int]
+) -> Tuple[Dict[str, int], Dict[str, int]]:
+    """Mapas chave NF-e → id da fatura e linha digitável → id da fatura."""
+    notas: Dict[str, int] = {}
+    boletos: Dict[str, int] = {}
+    for key, grupo in grupos.items():
+        for invoice in grupo.notas:
+            notas[invoice.chave_nfe] = ids[key]
+        for boleto in grupo.boletos:
+            boletos[boleto.linha_digitavel] = ids[key]
+    return notas, boletos
+
+
+def montar_faturas(
+    session: Session,
+    avd: RsmTustAvisoDebito,
+    invoices: Iterable[NFeInvoice],
+    boletos: Sequence[BoletoInfo] = (),
+    sobras_no_unico: bool = True,
+) -> Tuple[Dict[FaturaKey, GrupoFatura], Dict[FaturaKey, int]]:
+    """Agrupa as notas e garante as faturas; os totais vêm de `atualizar_agregados`."""
+    grupos = agrupar_notas(session, invoices, boletos, sobras_no_unico)
+    if not grupos:
+        return grupos, {}
+    return grupos, garantir_faturas(session, avd, grupos)
+
+
+def revincular_notas(session: Session, chunk_size: int = 1000) -> int:
+    """
+    Monta as faturas das NFs já gravadas e aponta cada NF para a sua fatura.
+
+    Corrige as linhas antigas, em que IDENTIFICADORFATURATRANSMISSAO guardava o
+    id da AVD. As NFs são lidas uma vez (em ordem de AVD) e cada AVD custa um
+    número fixo de consultas. Retorna a quantidade de NFs vinculadas.
+    """
+    query = (
+        session.query(
+            RsmTustFatTransmissaoNf.id_faturatransmissaonf,
+            RsmTustFatTransmissaoNf.cnpj_emissor,
+            RsmTustAvisoDebito,
+        )
+        .join(
+            RsmTustAvisoDebito,
+            RsmTustAvisoDebito.identificador == RsmTustFatTransmissaoNf.identificador,
+        )
+        .order_by(RsmTustAvisoDebito.id_avisodebito)
+    )
+
+    # Por AVD: (avd, grupos, ids das NFs de cada grupo).
+    lotes: List[tuple] = []
+    for nf_id, cnpj, avd in query.yield_per(chunk_size):
+        if not lotes or lotes[-1][0].id_avisodebito != avd.id_avisodebito:
+            lotes.append((avd, {}, {}))
+        transmissora = transmissora_cache.get_por_cnpj(session, cnpj or "")
+        if transmissora is None:
+            continue
+        _, grupos, notas = lotes[-1]
+        key = (transmissora.codigoons, avd.datacompetencia)
+        grupos.setdefault(key, GrupoFatura(transmissora, avd.datacompetencia))
+        notas.setdefault(key, []).append(nf_id)
+
+    total = 0
+    for avd, grupos, notas in lotes:
+        if not grupos:
+            continue
+        ids = garantir_faturas(session, avd, grupos)
+        linhas = [
+            {"id_faturatransmissaonf": nf_id, "identificadorfaturatransmissao": ids[key]}
+            for key, nf_ids in notas.items()
+            for nf_id in nf_ids
+        ]
+        bulk_update(session, RsmTustFatTransmissaoNf, linhas)
+        atualizar_agregados(session, avd, ids)
+        total += len(linhas)
+    return total
+
+
+__all__ = [
+    "FaturaKey",
+    "GrupoFatura",
+    "SITUACAO_CONCILIADA",
+    "SITUACAO_DIVERGENTE",
+    "SITUACAO_PENDENTE",
+    "agrupar_notas",
+    "atualizar_agregados",
+    "fatura_por_chave",
+    "garantir_faturas",
+    "montar_faturas",
+    "recalcular_faturas",
+    "revincular_notas",
+    "situacao_fatura",
+]
@@ -0,0 +1,236 @@
+"""Ingestão incremental de AVDs (.xlsx) e NF-es (.xml) entregues pelo monitoramento de diretórios."""
+
+from __future__ import annotations
+
+import datetime as dt
+import re
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session, sessionmaker
+
+from models.tust_models import RsmTustAvisoDebito
+
+_COMPETENCIA_DIR = re.compile(r"^(\d{4})\.(\d{2})$")
+
+
+def competencia_do_caminho(path: Path) -> Tuple[Optional[dt.date], Optional[str]]:
+    """
+    Competência e código ONS pelo layout dos robôs (`<base>/<YYYY.MM>/<codigo_ons>/...`).
+
+    Retorna (None, None) quando nenhum diretório do caminho é uma competência.
+    """
+    partes = path.parent.parts
+    for posicao in range(len(partes) - 1, -1, -1):
+        match = _COMPETENCIA_DIR.match(partes[posicao])
+        if match:
+            competencia = dt.date(int(match.group(1)), int(match.group(2)), 1)
+            codigo_ons = partes[posicao + 1] if posicao + 1 < len(partes) else None
+            return competencia, codigo_ons
+    return None, None
+
+
+# Notas de um emitente numa competência, por arquivo.
+GrupoNotas = Dict[str, object]
+
+
+class Ingestor:
+    """
+    Lê os arquivos num pool de workers e grava cada um na sua própria transação.
+
+    A leitura (planilha, XML) roda em paralelo; a escrita é sequencial, então o
+    banco vê um escritor por vez e um arquivo com erro não desfaz os demais.
+    NF-es precisam do código da empresa (da AVD) e da competência, que vem do
+    caminho do arquivo quando não é informada; eventos de cancelamento
+    (procEventoNFe) marcam as notas já gravadas.
+
+    NF-es que chegam antes da AVD da sua competência ficam "aguardando_avd"
+    numa fila em memória e são conciliadas de novo a cada lote, até a AVD
+    ser importada (pelo monitoramento ou por fora).
+    """
+
+    def __init__(
+        self,
+        session_factory: sessionmaker,
+        max_workers: int = 4,
+        codigo_empresa: Optional[str] = None,
+        competencia: Optional[dt.date] = None,
+        overwrite: bool = False,
+    ) -> None:
+        self.session_factory = session_factory
+        self.codigo_empresa = codigo_empresa
+        self.competencia = competencia
+        self.overwrite = overwrite
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+        self._aguardando_avd: Dict[Tuple[dt.date, str], GrupoNotas] = {}
+
+    def _parse_nfe(self, path: Path):
+        from app.parsers.nfe import parse_nfe_xml
+
+        competencia, codigo_ons = competencia_do_caminho(path)
+        competencia = self.competencia or competencia
+        if competencia is None:
+            raise ValueError("competência não identificada (use --competencia).")
+        return parse_nfe_xml(path, codigo_ons or "", competencia)
+
+    def _ingerir_cancelamentos(self, eventos: list) -> List[Dict[str, object]]:
+        from app.services.cancelamentos import aplicar_cancelamentos
+
+        with self.session_factory() as session:
+            try:
+                aplicados = aplicar_cancelamentos(session, eventos)
+                session.commit()
+            except Exception as exc:
+                session.rollback()
+                status, detalhe = "erro", str(exc)
+            else:
+                status = "importado"
+                detalhe = f"{aplicados['notas']} nota(s) cancelada(s) no lote."
+        return [
+            {
+                "arquivo": evento.arquivo,
+                "tipo": "cancelamento",
+                "status": status,
+                "detalhe": detalhe,
+            }
+            for evento in eventos
+        ]
+
+    def _ingerir_avd(self, path: Path, future: Future) -> Dict[str, object]:
+        from app.services.avds import import_single_avd
+
+        with self.session_factory() as session:
+            avd_id, criada = import_single_avd(
+                session, path, overwrite=self.overwrite, parsed=future.result()
+            )
+        return {
+            "arquivo": str(path),
+            "tipo": "avd",
+            "status": "importado" if criada else "existente",
+            "detalhe": avd_id,
+        }
+
+    def _avd_importada(self, session: Session, competencia: dt.date) -> bool:
+        return (
+            session.query(RsmTustAvisoDebito.id_avisodebito)
+            .filter(
+                RsmTustAvisoDebito.codigoempresa == self.codigo_empresa,
+                RsmTustAvisoDebito.datacompetencia == dt.datetime.combine(competencia, dt.time()),
+            )
+            .first()
+            is not None
+        )
+
+    def _conciliar(self, competencia: dt.date, invoices: list) -> Tuple[str, str]:
+        from app.validators.avd import conciliar_notas_com_avd
+
+        divergentes: Set[str] = set()
+
+        def anotar(validacao: dict) -> None:
+            if validacao["divergencia"]:
+                divergentes.add(validacao["chave_nfe"])
+
+        # Qualquer falha (erro de banco, transmissora não cadastrada...) desfaz
+        # só o grupo e vira "erro" nos seus arquivos, como na AVD.
+        with self.session_factory() as session:
+            try:
+                if not self._avd_importada(session, competencia):
+                    return "aguardando_avd", f"AVD de {competencia:%Y.%m} ainda não importada."
+                # Só o resumo interessa: as validações não ficam em memória.
+                processamento = conciliar_notas_com_avd(
+                    session, self.codigo_empresa, competencia, invoices, ao_validar=anotar
+                )
+                session.commit()
+            except Exception as exc:
+                session.rollback()
+                return "erro", str(exc)
+        divergentes.difference_update(processamento.get("chaves_canceladas", ()))
+        avd = processamento.get("avd")
+        return "importado", f"AVD {avd}, {len(divergentes)} divergente(s) da AVD"
+
+    def _ingerir_notas(self, notas: List[Tuple[Path, Future]]) -> List[Dict[str, object]]:
+        from app.parsers.nfe import NFeCancelamento
+
+        resultados: List[Dict[str, object]] = []
+        eventos: list = []
+        # As notas que aguardam a AVD entram de novo; a versão nova de um
+        # arquivo substitui a que estava na fila.
+        grupos, self._aguardando_avd = self._aguardando_avd, {}
+        novos: Set[str] = set()
+        for path, future in notas:
+            try:
+                invoice = future.result()
+            except Exception as exc:
+                resultados.append(
+                    {"arquivo": str(path), "tipo": "nfe", "status": "erro", "detalhe": str(exc)}
+                )
+                continue
+            if invoice is None:
+                resultados.append(
+                    {"arquivo": str(path), "tipo": "evento", "status": "ignorado", "detalhe": None}
+                )
+            elif isinstance(invoice, NFeCancelamento):
+                eventos.append(invoice)
+            else:
+                chave = (invoice.competencia, invoice.cnpj_emitente)
+                grupos.setdefault(chave, {})[str(invoice.arquivo)] = invoice
+                novos.add(str(invoice.arquivo))
+
+        for (competencia, cnpj), grupo in grupos.items():
+            if not self.codigo_empresa:
+                status, detalhe = "ignorado", "código da empresa não informado."
+            else:
+                status, detalhe = self._conciliar(competencia, list(grupo.values()))
+            if status == "aguardando_avd":
+                self._aguardando_avd[(competencia, cnpj)] = grupo
+                # Na fila, a nota só é reportada quando chega, não a cada lote.
+                arquivos = [arquivo for arquivo in grupo if arquivo in novos]
+            else:
+                arquivos = list(grupo)
+            resultados.extend(
+                {"arquivo": arquivo, "tipo": "nfe", "status": status, "detalhe": detalhe}
+                for arquivo in arquivos
+            )
+        # Depois das notas: um cancelamento pode chegar no mesmo lote da nota.
+        if eventos:
+            resultados.extend(self._ingerir_cancelamentos(eventos))
+        return resultados
+
+    def __call__(self, paths: List[Path]) -> List[Dict[str, object]]:
+        from app.parsers.avd import parse_avd
+
+        avds = [
+            (path, self._pool.submit(parse_avd, path))
+            for path in paths
+            if path.suffix.lower() == ".xlsx"
+        ]
+        notas = [
+            (path, self._pool.submit(self._parse_nfe, path))
+            for path in paths
+            if path.suffix.lower() == ".xml"
+        ]
+
+        # AVDs antes das notas: a conciliação de um mesmo lote depende delas.
+        resultados: List[Dict[str, object]] = []
+        for path, future in avds:
+            try:
+                resultados.append(self._ingerir_avd(path, future))
+            except Exception as exc:
+                resultados.append(
+                    {"arquivo": str(path), "tipo": "avd", "status": "erro", "detalhe": str(exc)}
+                )
+        if notas or self._aguardando_avd:
+            resultados.extend(self._ingerir_notas(notas))
+        return resultados
+
+    @property
+    def aguardando_avd(self) -> int:
+        """Quantidade de NF-es na fila à espera da AVD."""
+        return sum(len(grupo) for grupo in self._aguardando_avd.values())
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=True)
+
+
+__all__ = ["Ingestor", "competencia_do_caminho"]
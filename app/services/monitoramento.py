@@ -0,0 +1,262 @@
+"""Monitoramento de diretórios: detecta arquivos novos e só os entrega depois de estáveis."""
+
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+# Arquivos temporários de navegador/Excel que nunca devem ser ingeridos.
+IGNORED_SUFFIXES = (".crdownload", ".part", ".partial", ".tmp", ".download")
+IGNORED_PREFIXES = ("~$", ".~")
+
+Signature = Tuple[int, int]
+
+
+def _signature(path: Path) -> Optional[Signature]:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+class PollingBackend:
+    """Varre os diretórios a cada chamada; funciona em qualquer sistema e em shares de rede."""
+
+    name = "polling"
+
+    def __init__(self, roots: List[Path], recursive: bool = True) -> None:
+        self.roots = roots
+        self.recursive = recursive
+        self._known: Dict[Path, Signature] = {}
+
+    def _scan(self) -> Dict[Path, Signature]:
+        atual: Dict[Path, Signature] = {}
+        for root in self.roots:
+            files = root.rglob("*") if self.recursive else root.glob("*")
+            for path in files:
+                signature = _signature(path)
+                if signature is not None and path.is_file():
+                    atual[path] = signature
+        return atual
+
+    def prime(self) -> List[Path]:
+        self._known = self._scan()
+        return list(self._known)
+
+    def poll(self, timeout: float) -> Set[Path]:
+        time.sleep(timeout)
+        atual = self._scan()
+        alterados = {path for path, sig in atual.items() if self._known.get(path) != sig}
+        self._known = atual
+        return alterados
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyBackend:
+    """inotify via ctypes (Linux): acorda só quando algo muda, sem varrer os diretórios."""
+
+    name = "inotify"
+
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_Q_OVERFLOW = 0x00004000
+    IN_ISDIR = 0x40000000
+    IN_NONBLOCK = 0o4000
+    _MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+    _EVENT = struct.Struct("iIII")
+
+    def __init__(self, roots: List[Path], recursive: bool = True) -> None:
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify disponível apenas no Linux.")
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(self.IN_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 falhou.")
+        self.recursive = recursive
+        self.roots = roots
+        self._dirs: Dict[int, Path] = {}
+
+    def _watch(self, directory: Path) -> None:
+        wd = self._add_watch(self.fd, os.fsencode(directory), self._MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch falhou em {directory}.")
+        self._dirs[wd] = directory
+
+    def _varrer(self) -> List[Path]:
+        """Observa os diretórios (de novo, sem efeito nos já observados) e lista os arquivos."""
+        existentes: List[Path] = []
+        for root in self.roots:
+            self._watch(root)
+            for path in root.rglob("*") if self.recursive else root.glob("*"):
+                if path.is_dir() and self.recursive:
+                    self._watch(path)
+                elif path.is_file():
+                    existentes.append(path)
+        return existentes
+
+    def prime(self) -> List[Path]:
+        return self._varrer()
+
+    def poll(self, timeout: float) -> Set[Path]:
+        alterados: Set[Path] = set()
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return alterados
+        transbordou = False
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = self._EVENT.unpack_from(data, offset)
+                offset += self._EVENT.size
+                name = data[offset : offset + length].rstrip(b"\0")
+                offset += length
+                if mask & self.IN_Q_OVERFLOW:
+                    transbordou = True
+                    continue
+                directory = self._dirs.get(wd)
+                if directory is None or not name:
+                    continue
+                path = directory / os.fsdecode(name)
+                if mask & self.IN_ISDIR:
+                    if self.recursive and mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                        self._watch(path)
+                        alterados.update(p for p in path.rglob("*") if p.is_file())
+                else:
+                    alterados.add(path)
+        if transbordou:
+            # A fila do kernel encheu e eventos se perderam: varre tudo; o
+            # DirectoryWatcher só entrega o que mudou desde a última entrega.
+            alterados.update(self._varrer())
+        return alterados
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+def create_backend(roots: List[Path], recursive: bool = True, force_polling: bool = False):
+    """inotify quando disponível; senão (ou se `force_polling`), varredura periódica."""
+    if not force_polling:
+        try:
+            return InotifyBackend(roots, recursive)
+        except (OSError, AttributeError):
+            pass
+    return PollingBackend(roots, recursive)
+
+
+class DirectoryWatcher:
+    """
+    Entrega em lotes os arquivos novos ou alterados sob `roots`.
+
+    Um arquivo só é entregue depois de ficar `debounce` segundos sem mudar de
+    tamanho nem de mtime, o que evita ler downloads e cópias ainda em andamento.
+    Cada versão (tamanho, mtime) de um arquivo é entregue uma única vez.
+    """
+
+    def __init__(
+        self,
+        roots: Iterable[Path],
+        suffixes: Iterable[str] = (".xlsx", ".xml"),
+        debounce: float = 2.0,
+        poll_interval: float = 1.0,
+        recursive: bool = True,
+        force_polling: bool = False,
+    ) -> None:
+        self.roots = [Path(root) for root in roots]
+        self.suffixes = tuple(suffix.lower() for suffix in suffixes)
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.backend = create_backend(self.roots, recursive, force_polling)
+        self._pending: Dict[Path, Tuple[Signature, float]] = {}
+        self._delivered: Dict[Path, Signature] = {}
+        self._stop = threading.Event()
+
+    def _relevante(self, path: Path) -> bool:
+        nome = path.name.lower()
+        return (
+            nome.endswith(self.suffixes)
+            and not nome.endswith(IGNORED_SUFFIXES)
+            and not nome.startswith(IGNORED_PREFIXES)
+        )
+
+    def _marcar(self, paths: Iterable[Path], agora: float) -> None:
+        for path in paths:
+            if not self._relevante(path):
+                continue
+            signature = _signature(path)
+            if signature is None or self._delivered.get(path) == signature:
+                self._pending.pop(path, None)
+                continue
+            anterior = self._pending.get(path)
+            if anterior is None or anterior[0] != signature:
+                self._pending[path] = (signature, agora)
+
+    def _estaveis(self, agora: float) -> List[Path]:
+        prontos: List[Path] = []
+        for path, (signature, desde) in list(self._pending.items()):
+            atual = _signature(path)
+            if atual is None:
+                del self._pending[path]
+            elif atual != signature:
+                self._pending[path] = (atual, agora)
+            elif agora - desde >= self.debounce:
+                del self._pending[path]
+                self._delivered[path] = signature
+                prontos.append(path)
+        return sorted(prontos)
+
+    def start(self, incluir_existentes: bool = False) -> None:
+        existentes = self.backend.prime()
+        if incluir_existentes:
+            self._marcar(existentes, time.monotonic() - self.debounce)
+        else:
+            for path in existentes:
+                signature = _signature(path)
+                if signature is not None:
+                    self._delivered[path] = signature
+
+    def poll(self) -> List[Path]:
+        """Uma iteração: espera eventos por até `poll_interval` e devolve os arquivos prontos."""
+        timeout = self.poll_interval
+        if self._pending:
+            timeout = min(timeout, self.debounce / 2)
+        alterados = self.backend.poll(timeout)
+        agora = time.monotonic()
+        self._marcar(alterados, agora)
+        return self._estaveis(agora)
+
+    def run(
+        self, handler: Callable[[List[Path]], None], incluir_existentes: bool = False
+    ) -> None:
+        self.start(incluir_existentes)
+        try:
+            while not self._stop.is_set():
+                prontos = self.poll()
+                if prontos:
+                    handler(prontos)
+        finally:
+            self.backend.close()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+__all__ = ["DirectoryWatcher", "InotifyBackend", "PollingBackend", "create_backend"]
@@ -0,0 +1,154 @@
+"""Manutenção do resumo por empresa/competência/transmissora (RSM_TUSTAVDRESUMO)."""
+
+from __future__ import annotations
+
+import datetime as dt
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, literal, select
+from sqlalchemy.orm import Session
+
+from models.tust_models import RsmTustAvdResumo, RsmTustAvisoDebito, RsmTustAvisoDebitoItem
+
+
+def _aggregate(filters: list):
+    avd = RsmTustAvisoDebito
+    item = RsmTustAvisoDebitoItem
+    grouped = (
+        select(
+            avd.codigoempresa.label("codigoempresa"),
+            avd.datacompetencia.label("datacompetencia"),
+            item.codigoons.label("codigoons"),
+            func.count(item.id_avisodebitoitem).label("qtditens"),
+            func.coalesce(func.sum(item.valorparcela1), 0).label("valorparcela1"),
+            func.coalesce(func.sum(item.valorparcela2), 0).label("valorparcela2"),
+            func.coalesce(func.sum(item.valorparcela3), 0).label("valorparcela3"),
+            func.coalesce(func.sum(item.valortotal), 0).label("valortotal"),
+        )
+        .join(avd, avd.id_avisodebito == item.identificadoravisodebitotransmissao)
+        .where(*filters)
+        .group_by(avd.codigoempresa, avd.datacompetencia, item.codigoons)
+        .subquery()
+    )
+    # O agrupamento fica numa subconsulta porque o Oracle não aceita
+    # SEQUENCE.NEXTVAL (chave do resumo) num SELECT com GROUP BY.
+    return select(literal(dt.datetime.utcnow()).label("dataalteracao"), *grouped.c)
+
+
+_RESUMO_COLUMNS = [
+    "DATAALTERACAO",
+    "CODIGOEMPRESA",
+    "DATACOMPETENCIA",
+    "CODIGOONS",
+    "QTDITENS",
+    "VALORPARCELA1",
+    "VALORPARCELA2",
+    "VALORPARCELA3",
+    "VALORTOTAL",
+]
+
+
+def atualizar_resumo(session: Session, codigo_empresa: str, competencia: dt.datetime) -> None:
+    """
+    Recalcula o resumo de uma empresa/competência dentro da transação corrente.
+
+    Apenas a fatia afetada pela importação é regravada (um DELETE e um
+    INSERT ... SELECT agrupado), sem varrer as demais competências.
+    """
+    session.flush()
+    session.execute(
+        delete(RsmTustAvdResumo).where(
+            RsmTustAvdResumo.codigoempresa == codigo_empresa,
+            RsmTustAvdResumo.datacompetencia == competencia,
+        )
+    )
+    session.execute(
+        insert(RsmTustAvdResumo.__table__).from_select(
+            _RESUMO_COLUMNS,
+            _aggregate(
+                [
+                    RsmTustAvisoDebito.codigoempresa == codigo_empresa,
+                    RsmTustAvisoDebito.datacompetencia == competencia,
+                ]
+            ),
+        )
+    )
+
+
+def rebuild_resumo(session: Session) -> int:
+    """Reconstrói o resumo inteiro a partir dos itens; retorna a quantidade de linhas."""
+    session.execute(delete(RsmTustAvdResumo))
+    session.execute(
+        insert(RsmTustAvdResumo.__table__).from_select(_RESUMO_COLUMNS, _aggregate([]))
+    )
+    return session.query(func.count(RsmTustAvdResumo.id_avdresumo)).scalar() or 0
+
+
+def find_resumo(
+    session: Session, codigo_empresa: str, competencia: dt.datetime, codigo_ons: str
+) -> Optional[RsmTustAvdResumo]:
+    return (
+        session.query(RsmTustAvdResumo)
+        .filter(
+            RsmTustAvdResumo.codigoempresa == codigo_empresa,
+            RsmTustAvdResumo.datacompetencia == competencia,
+            RsmTustAvdResumo.codigoons == codigo_ons,
+        )
+        .one_or_none()
+    )
+
+
+def listar_resumo(
+    session: Session,
+    codigo_empresa: Optional[str] = None,
+    competencia: Optional[dt.datetime] = None,
+    codigo_ons: Optional[str] = None,
+) -> List[RsmTustAvdResumo]:
+    query = session.query(RsmTustAvdResumo)
+    if codigo_empresa:
+        query = query.filter(RsmTustAvdResumo.codigoempresa == codigo_empresa)
+    if competencia:
+        query = query.filter(RsmTustAvdResumo.datacompetencia == competencia)
+    if codigo_ons:
+        query = query.filter(RsmTustAvdResumo.codigoons == codigo_ons)
+    return query.order_by(
+        RsmTustAvdResumo.codigoempresa,
+        RsmTustAvdResumo.datacompetencia,
+        RsmTustAvdResumo.codigoons,
+    ).all()
+
+
+def parcelas_por_transmissora(
+    session: Session,
+    competencia: dt.datetime,
+    codigo_empresa: Optional[str] = None,
+    chaves: Optional[Iterable[Tuple[str, str]]] = None,
+) -> Dict[Tuple[str, str], object]:
+    """
+    Linhas com valorparcela1..3 por (empresa, transmissora) na competência.
+
+    Vêm do resumo; a transmissora que falta nele (resumo parcial ou ainda não
+    gerado) cai para a soma dos itens da AVD, uma por uma. Com `chaves`, a
+    soma dos itens só é consultada se alguma delas não estiver no resumo.
+    """
+    linhas: Dict[Tuple[str, str], object] = {
+        (linha.codigoempresa, linha.codigoons): linha
+        for linha in listar_resumo(session, codigo_empresa, competencia)
+    }
+    if chaves is not None and set(chaves) <= linhas.keys():
+        return linhas
+    filtros = [RsmTustAvisoDebito.datacompetencia == competencia]
+    if codigo_empresa:
+        filtros.append(RsmTustAvisoDebito.codigoempresa == codigo_empresa)
+    for linha in session.execute(_aggregate(filtros)):
+        linhas.setdefault((linha.codigoempresa, linha.codigoons), linha)
+    return linhas
+
+
+__all__ = [
+    "atualizar_resumo",
+    "find_resumo",
+    "listar_resumo",
+    "parcelas_por_transmissora",
+    "rebuild_resumo",
+]
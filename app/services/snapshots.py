@@ -0,0 +1,313 @@
+"""Snapshots colunares (Parquet) das AVDs e NFs, particionados por competência."""
+
+from __future__ import annotations
+
+import datetime as dt
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set
+
+import pyarrow as pa  # type: ignore
+import pyarrow.parquet as pq  # type: ignore
+from sqlalchemy import Integer, Numeric, String, func, select
+from sqlalchemy.orm import Session
+
+from models.tust_models import (
+    RsmTustAvisoDebito,
+    RsmTustAvisoDebitoItem,
+    RsmTustFatTransmissaoNf,
+)
+
+MONEY = pa.decimal128(18, 2)
+PERCENT = pa.decimal128(10, 2)
+
+# Linhas lidas do banco (e gravadas no Parquet) por lote.
+DEFAULT_BATCH_SIZE = 10_000
+
+# A competência vem sempre da AVD; as NFs são associadas à AVD pelo
+# IDENTIFICADOR (número da AVD), como na conciliação.
+TABLES: Dict[str, pa.Schema] = {
+    "avd_itens": pa.schema(
+        [
+            ("id_avisodebitoitem", pa.int64()),
+            ("id_avisodebito", pa.int64()),
+            ("numeroavd", pa.string()),
+            ("codigoempresa", pa.string()),
+            ("codigoons", pa.string()),
+            ("nometransmissora", pa.string()),
+            ("cnpjtransmissora", pa.string()),
+            ("percentual_rede_basica", PERCENT),
+            ("valor_rede_basica", MONEY),
+            ("valorparcela1", MONEY),
+            ("valorparcela2", MONEY),
+            ("valorparcela3", MONEY),
+            ("valortotal", MONEY),
+        ]
+    ),
+    "notas_fiscais": pa.schema(
+        [
+            ("id_faturatransmissaonf", pa.int64()),
+            ("id_avisodebito", pa.int64()),
+            ("numeroavd", pa.string()),
+            ("codigoempresa", pa.string()),
+            ("cnpj_emissor", pa.string()),
+            ("cnpj_destinatario", pa.string()),
+            ("numeronotafiscal", pa.string()),
+            ("numerofatura", pa.string()),
+            ("chavenfe", pa.string()),
+            ("dataemissao", pa.timestamp("us")),
+            ("datavencimento", pa.timestamp("us")),
+            ("valortotal", MONEY),
+            ("iscancelado", pa.string()),
+        ]
+    ),
+}
+
+
+def _statement(table: str, competencia: dt.datetime):
+    avd = RsmTustAvisoDebito
+    if table == "avd_itens":
+        item = RsmTustAvisoDebitoItem
+        return (
+            select(
+                item.id_avisodebitoitem,
+                avd.id_avisodebito,
+                avd.numeroavd,
+                avd.codigoempresa,
+                item.codigoons,
+                item.nometransmissora,
+                item.cnpjtransmissora,
+                item.percentual_rede_basica,
+                item.valor_rede_basica,
+                item.valorparcela1,
+                item.valorparcela2,
+                item.valorparcela3,
+                item.valortotal,
+            )
+            .join(avd, avd.id_avisodebito == item.identificadoravisodebitotransmissao)
+            .where(avd.datacompetencia == competencia)
+            .order_by(item.id_avisodebitoitem)
+        )
+    if table == "notas_fiscais":
+        nf = RsmTustFatTransmissaoNf
+        return (
+            select(
+                nf.id_faturatransmissaonf,
+                avd.id_avisodebito,
+                avd.numeroavd,
+                avd.codigoempresa,
+                nf.cnpj_emissor,
+                nf.cnpj_destinatario,
+                nf.numeronotafiscal,
+                nf.numerofatura,
+                nf.chavenfe,
+                nf.dataemissao,
+                nf.datavencimento,
+                nf.valortotal,
+                nf.iscancelado,
+            )
+            .join(avd, avd.identificador == nf.identificador)
+            .where(avd.datacompetencia == competencia)
+            .order_by(nf.id_faturatransmissaonf)
+        )
+    raise ValueError(f"Tabela de snapshot desconhecida: {table}")
+
+
+def partition_name(competencia: dt.datetime) -> str:
+    return f"competencia={competencia:%Y-%m}"
+
+
+def competencias_disponiveis(session: Session) -> List[dt.datetime]:
+    rows = session.execute(
+        select(RsmTustAvisoDebito.datacompetencia)
+        .distinct()
+        .order_by(RsmTustAvisoDebito.datacompetencia)
+    )
+    return [value for (value,) in rows if value is not None]
+
+
+def competencias_exportadas(destino: Path, table: str) -> Set[str]:
+    base = destino / table
+    if not base.is_dir():
+        return set()
+    return {
+        path.name
+        for path in base.iterdir()
+        if path.is_dir() and (path / "part-0.parquet").exists()
+    }
+
+
+def versao_particao(session: Session, table: str, competencia: dt.datetime) -> List[object]:
+    """
+    Assinatura barata do conteúdo de uma partição, calculada no banco.
+
+    Sai de um único SELECT agregado sobre as mesmas linhas e colunas exportadas:
+    contagem, maior id e soma dos ids pegam linhas novas ou removidas; para cada
+    valor, a soma e a soma ponderada pelo id pegam edições que mantêm o total
+    (valores trocados de linha, AVD reimportada com ids reaproveitados pelo
+    SQLite); textos entram pelo tamanho ponderado pelo id, mínimo e máximo e
+    datas pelo mínimo e máximo, inclusive o DATAALTERACAO das NFs, que pega
+    cancelamentos e demais alterações gravadas pela aplicação. Uma edição feita
+    fora da aplicação que preserve todas essas medidas só entra com `refresh`.
+    """
+    stmt = _statement(table, competencia).order_by(None)
+    if table == "notas_fiscais":
+        stmt = stmt.add_columns(RsmTustFatTransmissaoNf.dataalteracao)
+    chave, *colunas = stmt.subquery().c
+    agregados = [func.count(), func.max(chave), func.sum(chave)]
+    for coluna in colunas:
+        if isinstance(coluna.type, Numeric):
+            agregados += [func.sum(coluna), func.sum(coluna * chave)]
+        elif isinstance(coluna.type, Integer):
+            agregados.append(func.sum(coluna))
+        elif isinstance(coluna.type, String):
+            agregados += [func.sum(func.length(coluna) * chave), func.min(coluna), func.max(coluna)]
+        else:
+            agregados += [func.min(coluna), func.max(coluna)]
+    # Decimal e datetime viram texto para comparar com o que foi salvo em JSON.
+    return [
+        None if value is None else str(value)
+        for value in session.execute(select(*agregados)).one()
+    ]
+
+
+def _versao_path(destino: Path, table: str, competencia: dt.datetime) -> Path:
+    return destino / table / partition_name(competencia) / "_versao.json"
+
+
+def versao_exportada(destino: Path, table: str, competencia: dt.datetime) -> Optional[List[object]]:
+    path = _versao_path(destino, table, competencia)
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def _record_batches(
+    session: Session, table: str, competencia: dt.datetime, batch_size: int
+) -> Iterator[pa.RecordBatch]:
+    """As linhas da partição em lotes de `batch_size`, sem carregar a competência inteira."""
+    schema = TABLES[table]
+    result = session.execute(
+        _statement(table, competencia), execution_options={"yield_per": batch_size}
+    )
+    for rows in result.partitions():
+        # Numeric(18, 2) chega como Decimal; decimal128 preserva o ponto fixo.
+        arrays = [
+            pa.array(list(values), type=field.type) for values, field in zip(zip(*rows), schema)
+        ]
+        yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def remover_particao(destino: Path, table: str, competencia: dt.datetime) -> bool:
+    """Apaga a partição exportada da competência; retorna se ela existia."""
+    part_dir = destino / table / partition_name(competencia)
+    if not part_dir.is_dir():
+        return False
+    shutil.rmtree(part_dir)
+    return True
+
+
+def write_partition(
+    session: Session,
+    destino: Path,
+    table: str,
+    competencia: dt.datetime,
+    versao: Optional[List[object]] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> int:
+    """
+    Grava (ou substitui) a partição de uma competência; retorna a quantidade de linhas.
+
+    As linhas vêm do banco em lotes e vão para o Parquet lote a lote, num
+    temporário renomeado no fim. Competência sem linhas não tem partição: a
+    que existia é apagada, e a competência volta a ser exportada quando os
+    dados chegarem. A assinatura de `versao_particao` fica ao lado do
+    arquivo, em `_versao.json`.
+    """
+    if versao is None:
+        versao = versao_particao(session, table, competencia)
+    part_dir = destino / table / partition_name(competencia)
+    tmp = part_dir / ".part-0.parquet.tmp"
+    writer: Optional[pq.ParquetWriter] = None
+    rows = 0
+    try:
+        for batch in _record_batches(session, table, competencia, batch_size):
+            if writer is None:
+                part_dir.mkdir(parents=True, exist_ok=True)
+                writer = pq.ParquetWriter(tmp, TABLES[table], compression="zstd")
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    except BaseException:
+        if writer is not None:
+            writer.close()
+            tmp.unlink()
+        raise
+    if writer is None:
+        remover_particao(destino, table, competencia)
+        return 0
+    writer.close()
+    os.replace(tmp, part_dir / "part-0.parquet")
+    versao_tmp = part_dir / "._versao.json.tmp"
+    versao_tmp.write_text(json.dumps(versao), encoding="utf-8")
+    os.replace(versao_tmp, _versao_path(destino, table, competencia))
+    return rows
+
+
+def export_snapshots(
+    session: Session,
+    destino: Path,
+    tables: Optional[Sequence[str]] = None,
+    full: bool = False,
+    refresh: Iterable[dt.datetime] = (),
+) -> Dict[str, Dict[str, int]]:
+    """
+    Exporta as competências ausentes no destino ou alteradas desde a última
+    exportação (ou todas, com `full`).
+
+    Uma partição já exportada só é regravada se `versao_particao` mudou (notas
+    novas ou canceladas, AVD reimportada); partições sem `_versao.json`, de
+    exportações anteriores, são regravadas uma vez. `refresh` força a
+    regravação de competências específicas. Partições de competências que
+    ficaram vazias ou saíram do banco são apagadas e aparecem no resumo com 0.
+    """
+    selected = list(tables or TABLES)
+    forced = {partition_name(value) for value in refresh}
+    disponiveis = competencias_disponiveis(session)
+
+    resumo: Dict[str, Dict[str, int]] = {}
+    for table in selected:
+        existentes = set() if full else competencias_exportadas(destino, table)
+        resumo[table] = {}
+        for competencia in disponiveis:
+            name = partition_name(competencia)
+            versao = versao_particao(session, table, competencia)
+            if (
+                name in existentes
+                and name not in forced
+                and versao_exportada(destino, table, competencia) == versao
+            ):
+                continue
+            rows = write_partition(session, destino, table, competencia, versao)
+            if rows or name in existentes:
+                resumo[table][name] = rows
+        atuais = {partition_name(competencia) for competencia in disponiveis}
+        for name in sorted(competencias_exportadas(destino, table) - atuais):
+            remover_particao(destino, table, dt.datetime.strptime(name, "competencia=%Y-%m"))
+            resumo[table][name] = 0
+    return resumo
+
+
+__all__ = [
+    "DEFAULT_BATCH_SIZE",
+    "TABLES",
+    "competencias_disponiveis",
+    "competencias_exportadas",
+    "export_snapshots",
+    "partition_name",
+    "remover_particao",
+    "versao_exportada",
+    "versao_particao",
+    "write_partition",
+]
@@ -0,0 +1,201 @@
+"""Geração dos títulos de contas a pagar (RSM_TUSTFATTRANSMISSAOTITCP) das faturas conciliadas."""
+
+from __future__ import annotations
+
+import datetime as dt
+from decimal import Decimal
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import or_, update
+from sqlalchemy.orm import Session
+
+from models.tust_models import (
+    RsmTustAvisoDebito,
+    RsmTustFatTransmissaoTitCp,
+    RsmTustFaturaTransmissao,
+)
+
+from app.services.bulk import bulk_insert, bulk_update
+from app.services.faturas import SITUACAO_CONCILIADA
+from app.services.resumo import parcelas_por_transmissora
+from app.services.transmissoras import transmissora_cache
+
+PARCELAS = (1, 2, 3)
+
+
+def _faturas(
+    session: Session, competencia: dt.datetime, codigo_empresa: Optional[str]
+) -> List[Tuple[RsmTustFaturaTransmissao, Optional[RsmTustAvisoDebito]]]:
+    query = (
+        session.query(RsmTustFaturaTransmissao, RsmTustAvisoDebito)
+        .outerjoin(
+            RsmTustAvisoDebito,
+            RsmTustAvisoDebito.id_avisodebito
+            == RsmTustFaturaTransmissao.identificadoravisodebitotransmissao,
+        )
+        .filter(
+            RsmTustFaturaTransmissao.datacompetencia == competencia,
+            or_(
+                RsmTustFaturaTransmissao.excluido.is_(None),
+                RsmTustFaturaTransmissao.excluido != "S",
+            ),
+        )
+        .order_by(RsmTustFaturaTransmissao.id_faturatransmissao)
+    )
+    if codigo_empresa:
+        query = query.filter(RsmTustFaturaTransmissao.codigoempresa == codigo_empresa)
+    return query.all()
+
+
+def _travar_competencia(
+    session: Session, competencia: dt.datetime, codigo_empresa: Optional[str]
+) -> None:
+    """
+    Trava as faturas da competência até o fim da transação com um UPDATE sem efeito.
+
+    Outra geração da mesma competência (em outra thread ou processo) espera
+    aqui e só lê os títulos existentes depois do commit desta.
+    """
+    fatura = RsmTustFaturaTransmissao
+    stmt = (
+        update(fatura)
+        .where(fatura.datacompetencia == competencia)
+        .values(qtdtituloscontaspagar=fatura.qtdtituloscontaspagar)
+    )
+    if codigo_empresa:
+        stmt = stmt.where(fatura.codigoempresa == codigo_empresa)
+    session.execute(stmt)
+
+
+def _titulos_existentes(
+    session: Session, competencia: dt.datetime, codigo_empresa: Optional[str]
+) -> Set[Tuple[int, int]]:
+    """Chaves naturais (fatura, sequencial) dos títulos já gerados na competência."""
+    query = (
+        session.query(
+            RsmTustFatTransmissaoTitCp.identificadorfaturatransmissao,
+            RsmTustFatTransmissaoTitCp.sequencial,
+        )
+        .join(
+            RsmTustFaturaTransmissao,
+            RsmTustFaturaTransmissao.id_faturatransmissao
+            == RsmTustFatTransmissaoTitCp.identificadorfaturatransmissao,
+        )
+        .filter(RsmTustFaturaTransmissao.datacompetencia == competencia)
+    )
+    if codigo_empresa:
+        query = query.filter(RsmTustFaturaTransmissao.codigoempresa == codigo_empresa)
+    return {(fatura_id, sequencial) for fatura_id, sequencial in query}
+
+
+def parcelas_da_fatura(
+    fatura: RsmTustFaturaTransmissao, avd: Optional[RsmTustAvisoDebito], resumo
+) -> List[Tuple[int, Decimal, Optional[dt.datetime]]]:
+    """
+    (sequencial, valor, vencimento) de cada parcela a pagar.
+
+    Com o resumo (ou item) da AVD, cada parcela não nula vira um título com o
+    vencimento da parcela na AVD; sem ele, a fatura inteira vira um título único.
+    """
+    if resumo is None:
+        valor = fatura.valorfatura or Decimal("0")
+        return [(1, valor, fatura.datavencimento)] if valor else []
+
+    parcelas = []
+    for numero in PARCELAS:
+        valor = getattr(resumo, f"valorparcela{numero}")
+        if not valor:
+            continue
+        vencimento = getattr(avd, f"datavencimentoparcela{numero}") if avd else None
+        parcelas.append((numero, valor, vencimento or fatura.datavencimento))
+    return parcelas
+
+
+def gerar_titulos(
+    session: Session, competencia: dt.datetime, codigo_empresa: Optional[str] = None
+) -> Dict[str, int]:
+    """
+    Gera os títulos que faltam para as faturas conciliadas da competência.
+
+    Faturas divergentes ou ainda não conciliadas (TIPOSITUACAOFATURATRANSMISSAO
+    diferente de CONCILIADA) não geram títulos; são só contadas. Idempotente
+    pela chave (fatura, sequencial): títulos já existentes não são recriados, e
+    as faturas da competência ficam travadas até o commit, então duas gerações
+    simultâneas não duplicam títulos. O número de consultas não depende da
+    quantidade de faturas; o commit fica com o chamador, uma transação por
+    competência.
+    """
+    _travar_competencia(session, competencia, codigo_empresa)
+    faturas = []
+    nao_conciliadas = 0
+    for fatura, avd in _faturas(session, competencia, codigo_empresa):
+        if fatura.tiposituacaofaturatransmissao == SITUACAO_CONCILIADA:
+            faturas.append((fatura, avd))
+        else:
+            nao_conciliadas += 1
+    if not faturas:
+        return {"faturas": 0, "titulos": 0, "existentes": 0, "nao_conciliadas": nao_conciliadas}
+
+    # Resumo e, para a transmissora que falta nele, os itens da AVD.
+    resumos = parcelas_por_transmissora(
+        session,
+        competencia,
+        codigo_empresa,
+        {(fatura.codigoempresa, fatura.codigotransmissoraons) for fatura, _ in faturas},
+    )
+    existentes = _titulos_existentes(session, competencia, codigo_empresa)
+
+    agora = dt.datetime.utcnow()
+    novos: List[dict] = []
+    quantidades: Dict[int, int] = {}
+    for fatura, avd in faturas:
+        transmissora = transmissora_cache.get_por_codigo(session, fatura.codigotransmissoraons)
+        resumo = resumos.get((fatura.codigoempresa, fatura.codigotransmissoraons))
+        parcelas = parcelas_da_fatura(fatura, avd, resumo)
+        quantidades[fatura.id_faturatransmissao] = len(parcelas)
+        for sequencial, valor, vencimento in parcelas:
+            if (fatura.id_faturatransmissao, sequencial) in existentes:
+                continue
+            numero = fatura.numeronotafiscal or str(fatura.id_faturatransmissao)
+            novos.append(
+                {
+                    "datainclusao": agora,
+                    "identificador": fatura.identificador,
+                    "identificadorfaturatransmissao": fatura.id_faturatransmissao,
+                    "sequencial": sequencial,
+                    "codigofornecedor": transmissora.codigofornecedor if transmissora else None,
+                    "numerotitulo": f"{numero}-{sequencial}",
+                    "codigoempresa": fatura.codigoempresa,
+                    "codigofilial": fatura.codigofilial,
+                    "dataemissao": fatura.datafatura,
+                    "dataentrada": agora,
+                    "datavencimento": vencimento,
+                    "datacompetencia": fatura.datacompetencia,
+                    "valortitulo": valor,
+                    "codigotipocobranca": (
+                        transmissora.codigotipodobranca if transmissora else None
+                    ),
+                    "codigotipopagamento": (
+                        transmissora.codigotipopagamento if transmissora else None
+                    ),
+                }
+            )
+
+    bulk_insert(session, RsmTustFatTransmissaoTitCp, novos)
+    bulk_update(
+        session,
+        RsmTustFaturaTransmissao,
+        [
+            {"id_faturatransmissao": fatura_id, "qtdtituloscontaspagar": quantidade}
+            for fatura_id, quantidade in quantidades.items()
+        ],
+    )
+    return {
+        "faturas": len(faturas),
+        "titulos": len(novos),
+        "existentes": len(existentes),
+        "nao_conciliadas": nao_conciliadas,
+    }
+
+
+__all__ = ["gerar_titulos", "parcelas_da_fatura"]
@@ -0,0 +1,152 @@
+"""Cache em memória (por processo) do cadastro de transmissoras."""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from models.tust_models import RsmTustTransmissora
+
+
+def normalize_cnpj(cnpj: Optional[str]) -> str:
+    """Mantém apenas dígitos e letras do CNPJ, em maiúsculas (remove pontos, barra e hífen)."""
+    if not cnpj:
+        return ""
+    return "".join(ch for ch in str(cnpj).upper() if ch.isascii() and ch.isalnum())
+
+
+class TransmissoraRecord:
+    """Projeção compacta de `RsmTustTransmissora` usada pelos fluxos de conciliação."""
+
+    __slots__ = (
+        "id_transmissora",
+        "codigoons",
+        "nome",
+        "razaosocial",
+        "cnpj",
+        "formapagamento",
+        "formaencaminhamentofaturas",
+        "urlsite",
+        "codigofornecedor",
+        "codigotipodobranca",
+        "codigotipopagamento",
+        "codigofornecedorcontacorrente",
+    )
+
+    def __init__(self, **values: object) -> None:
+        for attr in self.__slots__:
+            setattr(self, attr, values.get(attr))
+
+    @classmethod
+    def from_model(cls, model: RsmTustTransmissora) -> "TransmissoraRecord":
+        return cls(**{attr: getattr(model, attr) for attr in cls.__slots__})
+
+    def __repr__(self) -> str:
+        return f"TransmissoraRecord(codigoons={self.codigoons!r}, cnpj={self.cnpj!r})"
+
+
+def current_version(session: Session) -> int:
+    """
+    Versão do cadastro de transmissoras.
+
+    O importador (`scripts/import_transmissoras_xls.py`) grava um novo
+    `RSM_TUSTPROCESSOIMPORTACAO` a cada execução e carimba as linhas com o id;
+    o maior id carimbado funciona como versão.
+    """
+    value = session.query(
+        func.max(RsmTustTransmissora.identificadorprocessoimportacao)
+    ).scalar()
+    return int(value or 0)
+
+
+class TransmissoraCache:
+    """
+    Cache read-through das transmissoras indexado por CNPJ e por código ONS.
+
+    A validade é controlada pela versão do cadastro (consultada no máximo a cada
+    `version_check_interval` segundos) com recarga forçada após `ttl` segundos.
+    """
+
+    def __init__(self, ttl: float = 3600.0, version_check_interval: float = 30.0) -> None:
+        self.ttl = ttl
+        self.version_check_interval = version_check_interval
+        self._lock = threading.Lock()
+        self._por_cnpj: Dict[str, TransmissoraRecord] = {}
+        self._por_codigo: Dict[str, TransmissoraRecord] = {}
+        self._version: Optional[int] = None
+        self._loaded_at = 0.0
+        self._checked_at = 0.0
+        self._stats = {"hits": 0, "misses": 0, "reloads": 0}
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._version = None
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats, size=len(self._por_codigo))
+
+    def _load(self, session: Session, version: int) -> None:
+        rows = session.query(RsmTustTransmissora).order_by(RsmTustTransmissora.id_transmissora)
+        por_cnpj: Dict[str, TransmissoraRecord] = {}
+        por_codigo: Dict[str, TransmissoraRecord] = {}
+        for model in rows:
+            record = TransmissoraRecord.from_model(model)
+            if record.codigoons:
+                por_codigo.setdefault(record.codigoons, record)
+            cnpj = normalize_cnpj(record.cnpj)
+            if cnpj:
+                # Há transmissoras distintas com o mesmo CNPJ; prevalece a de menor id.
+                por_cnpj.setdefault(cnpj, record)
+        self._por_cnpj = por_cnpj
+        self._por_codigo = por_codigo
+        self._version = version
+        self._loaded_at = self._checked_at = time.monotonic()
+        self._stats["reloads"] += 1
+
+    def _ensure_fresh(self, session: Session) -> None:
+        now = time.monotonic()
+        if self._version is not None:
+            if now - self._loaded_at < self.ttl and now - self._checked_at < self.version_check_interval:
+                return
+        version = current_version(session)
+        expired = now - self._loaded_at >= self.ttl
+        if self._version is None or version != self._version or expired:
+            self._load(session, version)
+        else:
+            self._checked_at = now
+
+    def _lookup(self, session: Session, index: str, key: str) -> Optional[TransmissoraRecord]:
+        with self._lock:
+            self._ensure_fresh(session)
+            record = getattr(self, index).get(key)
+            self._stats["hits" if record is not None else "misses"] += 1
+            return record
+
+    def get_por_cnpj(self, session: Session, cnpj: Optional[str]) -> Optional[TransmissoraRecord]:
+        return self._lookup(session, "_por_cnpj", normalize_cnpj(cnpj))
+
+    def get_por_codigo(self, session: Session, codigo_ons: Optional[str]) -> Optional[TransmissoraRecord]:
+        return self._lookup(session, "_por_codigo", (codigo_ons or "").strip())
+
+    def all(self, session: Session) -> Iterable[TransmissoraRecord]:
+        with self._lock:
+            self._ensure_fresh(session)
+            return list(self._por_codigo.values())
+
+
+transmissora_cache = TransmissoraCache()
+
+
+__all__ = [
+    "TransmissoraCache",
+    "TransmissoraRecord",
+    "current_version",
+    "normalize_cnpj",
+    "transmissora_cache",
+]
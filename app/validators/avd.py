@@ -2,18 +2,59 @@ from __future__ import annotations
 
 import datetime as dt
 from decimal import Decimal
-from typing import List, Optional
+from itertools import chain
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
 
+from sqlalchemy import or_
 from sqlalchemy.orm import Session
 
 from models.tust_models import (
+    RsmTustAvdResumo,
     RsmTustAvisoDebito,
     RsmTustAvisoDebitoItem,
+    RsmTustFatTransmissaoBoleto,
     RsmTustFatTransmissaoNf,
-    RsmTustTransmissora,
 )
 
-from app.parsers.nfe import NFeInvoice
+from app.parsers.boleto import BoletoInfo
+from app.parsers.nfe import (
+    DEFAULT_CHUNK_SIZE,
+    InvoiceBatch,
+    NFeCancelamento,
+    NFeInvoice,
+    chunked,
+)
+from app.services.bulk import bulk_insert, bulk_update
+from app.services.cancelamentos import aplicar_cancelamentos
+from app.services.faturas import (
+    FaturaKey,
+    GrupoFatura,
+    atualizar_agregados,
+    fatura_por_chave,
+    montar_faturas,
+)
+from app.services.resumo import find_resumo, parcelas_por_transmissora
+from app.services.transmissoras import TransmissoraRecord, transmissora_cache
+from app.validators.nfe import validar_lote
+
+# Item da AVD ou linha do resumo: ambos expõem valorparcela1..3.
+ItemParcelas = Union[RsmTustAvisoDebitoItem, RsmTustAvdResumo]
+
+# (CNPJ do beneficiário, CNPJ do pagador) de um boleto.
+CnpjsBoleto = Tuple[Optional[str], Optional[str]]
+
+_IN_CHUNK = 500
 
 
 class AVDValidationError(Exception):
@@ -31,12 +72,8 @@ def _find_avd(session: Session, codigo_empresa: str, competencia: dt.datetime) -
     )
 
 
-def _find_transmissora_por_cnpj(session: Session, cnpj: str) -> Optional[RsmTustTransmissora]:
-    return (
-        session.query(RsmTustTransmissora)
-        .filter(RsmTustTransmissora.cnpj == cnpj)
-        .one_or_none()
-    )
+def _find_transmissora_por_cnpj(session: Session, cnpj: str) -> Optional[TransmissoraRecord]:
+    return transmissora_cache.get_por_cnpj(session, cnpj)
 
 
 def _find_avd_item(session: Session, avd_id: int, codigo_transmissora: str) -> Optional[RsmTustAvisoDebitoItem]:
@@ -50,85 +87,460 @@ def _find_avd_item(session: Session, avd_id: int, codigo_transmissora: str) -> O
     )
 
 
+def _notas_existentes(
+    session: Session, chaves: List[str]
+) -> Tuple[Dict[str, List[int]], Set[str]]:
+    """
+    Ids das NFs já gravadas por CHAVENFE e as chaves já canceladas no banco
+    (ISCANCELADO = 'S'), numa consulta pelo índice, em blocos.
+    """
+    nf = RsmTustFatTransmissaoNf
+    existentes: Dict[str, List[int]] = {}
+    canceladas: Set[str] = set()
+    for start in range(0, len(chaves), _IN_CHUNK):
+        query = session.query(nf.chavenfe, nf.id_faturatransmissaonf, nf.iscancelado).filter(
+            nf.chavenfe.in_(chaves[start : start + _IN_CHUNK])
+        )
+        for chave, nf_id, iscancelado in query:
+            existentes.setdefault(chave, []).append(nf_id)
+            if iscancelado == "S":
+                canceladas.add(chave)
+    return existentes, canceladas
+
+
 def _persist_notas_fiscais(
-    session: Session, avd: RsmTustAvisoDebito, invoices: List[NFeInvoice]
-) -> List[RsmTustFatTransmissaoNf]:
-    registros: List[RsmTustFatTransmissaoNf] = []
-    for invoice in invoices:
-        nf = RsmTustFatTransmissaoNf(
-            datainclusao=dt.datetime.utcnow(),
-            identificador=avd.identificador,
-            identificadorfaturatransmissao=avd.id_avisodebito,
-            cnpj_emissor=invoice.cnpj_emitente,
-            nome_emissor=invoice.nome_emitente,
-            cnpj_destinatario=invoice.cnpj_destinatario,
-            nome_destinatario=invoice.nome_destinatario,
-            numeronotafiscal=invoice.numero_nfe,
-            numerofatura=invoice.numero_fatura,
-            dataemissao=invoice.data_emissao,
-            datavencimento=invoice.data_vencimento,
-            valortotal=invoice.valor_total,
-            chavenfe=invoice.chave_nfe,
+    session: Session,
+    avd: RsmTustAvisoDebito,
+    invoices: List[NFeInvoice],
+    faturas: Optional[Dict[str, int]] = None,
+    existentes: Optional[Dict[str, List[int]]] = None,
+) -> List[int]:
+    """
+    Grava as notas novas e atualiza as já gravadas com a mesma CHAVENFE.
+
+    `faturas` mapeia a chave da NF-e para o id da fatura de transmissão;
+    `existentes` (de `_notas_existentes`) evita consultar as chaves de novo.
+    Reprocessar o mesmo diretório não duplica notas (nem os totais das
+    faturas); o cancelamento de uma nota já gravada é preservado. Retorna os
+    ids das notas inseridas.
+    """
+    faturas = faturas or {}
+    por_chave = {invoice.chave_nfe: invoice for invoice in invoices}
+    if existentes is None:
+        existentes, _ = _notas_existentes(session, list(por_chave))
+    agora = dt.datetime.utcnow()
+
+    def valores(invoice: NFeInvoice) -> dict:
+        return {
+            "identificador": avd.identificador,
+            "identificadorfaturatransmissao": faturas.get(invoice.chave_nfe),
+            "cnpj_emissor": invoice.cnpj_emitente,
+            "nome_emissor": invoice.nome_emitente,
+            "cnpj_destinatario": invoice.cnpj_destinatario,
+            "nome_destinatario": invoice.nome_destinatario,
+            "numeronotafiscal": invoice.numero_nfe,
+            "numerofatura": invoice.numero_fatura,
+            "dataemissao": invoice.data_emissao,
+            "datavencimento": invoice.data_vencimento,
+            "valortotal": invoice.valor_total,
+            "chavenfe": invoice.chave_nfe,
+        }
+
+    bulk_update(
+        session,
+        RsmTustFatTransmissaoNf,
+        [
+            {"id_faturatransmissaonf": nf_id, "dataalteracao": agora, **valores(invoice)}
+            for chave, invoice in por_chave.items()
+            for nf_id in existentes.get(chave, ())
+        ],
+    )
+    return bulk_insert(
+        session,
+        RsmTustFatTransmissaoNf,
+        [
+            {"datainclusao": agora, **valores(invoice)}
+            for chave, invoice in por_chave.items()
+            if chave not in existentes
+        ],
+        return_ids=True,
+    )
+
+
+def _persist_boletos(
+    session: Session,
+    avd: RsmTustAvisoDebito,
+    boletos: Sequence[BoletoInfo],
+    cnpjs: Optional[Dict[str, CnpjsBoleto]] = None,
+    faturas: Optional[Dict[str, int]] = None,
+) -> List[int]:
+    """
+    Grava os boletos ainda não registrados (pela linha digitável).
+
+    `cnpjs` e `faturas` são indexados pela linha digitável: beneficiário e
+    pagador vêm da NF (ou fatura) a que o boleto foi vinculado.
+    """
+    cnpjs = cnpjs or {}
+    faturas = faturas or {}
+    linhas = [boleto.linha_digitavel for boleto in boletos]
+    existentes = set()
+    for start in range(0, len(linhas), _IN_CHUNK):
+        existentes.update(
+            linha
+            for (linha,) in session.query(RsmTustFatTransmissaoBoleto.linhadigitavel).filter(
+                RsmTustFatTransmissaoBoleto.linhadigitavel.in_(linhas[start : start + _IN_CHUNK])
+            )
         )
-        session.add(nf)
-        registros.append(nf)
-    session.flush()
-    return registros
+
+    agora = dt.datetime.utcnow()
+    return bulk_insert(
+        session,
+        RsmTustFatTransmissaoBoleto,
+        [
+            {
+                "datainclusao": agora,
+                "identificador": avd.identificador,
+                "cnpj_beneficiario": cnpjs.get(boleto.linha_digitavel, (None, None))[0],
+                "cnpj_pagador": cnpjs.get(boleto.linha_digitavel, (None, None))[1],
+                "datavencimento": boleto.data_vencimento,
+                "valortotal": boleto.valor,
+                "linhadigitavel": boleto.linha_digitavel,
+                "identificadorfaturatransmissao": faturas.get(boleto.linha_digitavel),
+            }
+            for boleto in boletos
+            if boleto.linha_digitavel not in existentes
+        ],
+        return_ids=True,
+    )
 
 
-def _avaliar_divergencia(item: Optional[RsmTustAvisoDebitoItem], invoice: NFeInvoice) -> Optional[str]:
-    if item is None:
-        return "Item da transmissora não encontrado na AVD."
+def _cnpjs_dos_grupos(
+    grupos: Dict[FaturaKey, GrupoFatura], ids: Dict[FaturaKey, int]
+) -> Tuple[Dict[str, CnpjsBoleto], Dict[int, CnpjsBoleto]]:
+    """
+    CNPJs de cada boleto agrupado (da NF com duplicata de mesmo valor) e de
+    cada fatura (da sua primeira NF), para os boletos que sobrarem.
+    """
+    por_boleto: Dict[str, CnpjsBoleto] = {}
+    por_fatura: Dict[int, CnpjsBoleto] = {}
+    for key, grupo in grupos.items():
+        primeira = grupo.notas[0]
+        por_fatura[ids[key]] = (primeira.cnpj_emitente, primeira.cnpj_destinatario)
+        por_valor: Dict[Decimal, NFeInvoice] = {}
+        for invoice in grupo.notas:
+            valor = (
+                invoice.duplicata_valor
+                if invoice.duplicata_valor is not None
+                else invoice.valor_total
+            )
+            por_valor.setdefault(valor, invoice)
+        for boleto in grupo.boletos:
+            nota = por_valor.get(boleto.valor, primeira)
+            por_boleto[boleto.linha_digitavel] = (nota.cnpj_emitente, nota.cnpj_destinatario)
+    return por_boleto, por_fatura
+
 
-    soma_parcelas = (
+def _indexar_boletos(boletos: Iterable[BoletoInfo]) -> Dict[Decimal, List[BoletoInfo]]:
+    indice: Dict[Decimal, List[BoletoInfo]] = {}
+    for boleto in boletos:
+        indice.setdefault(boleto.valor, []).append(boleto)
+    return indice
+
+
+def _conferir_boleto(
+    invoice: NFeInvoice, boletos: Dict[Decimal, List[BoletoInfo]]
+) -> tuple:
+    """
+    Casa a duplicata da NF com um boleto de mesmo valor (cada boleto é usado uma vez).
+
+    Retorna (linha digitável, divergência).
+    """
+    valor = invoice.duplicata_valor if invoice.duplicata_valor is not None else invoice.valor_total
+    candidatos = boletos.get(valor)
+    if not candidatos:
+        return None, f"Boleto de valor {valor} não encontrado para a duplicata."
+
+    for posicao, boleto in enumerate(candidatos):
+        if invoice.data_vencimento is None or boleto.data_vencimento == invoice.data_vencimento:
+            candidatos.pop(posicao)
+            return boleto.linha_digitavel, None
+
+    boleto = candidatos.pop(0)
+    return boleto.linha_digitavel, (
+        f"Vencimento do boleto ({boleto.data_vencimento}) diferente da duplicata "
+        f"({invoice.data_vencimento})."
+    )
+
+
+def _soma_parcelas(item: ItemParcelas) -> Decimal:
+    return (
         (item.valorparcela1 or Decimal("0"))
         + (item.valorparcela2 or Decimal("0"))
         + (item.valorparcela3 or Decimal("0"))
     )
-    if invoice.valor_total != soma_parcelas:
-        return f"Valor da NF ({invoice.valor_total}) diferente da soma de parcelas ({soma_parcelas})."
+
+
+def _avaliar_divergencia(item: Optional[ItemParcelas], valor_total: Decimal) -> Optional[str]:
+    if item is None:
+        return "Item da transmissora não encontrado na AVD."
+
+    soma_parcelas = _soma_parcelas(item)
+    if valor_total != soma_parcelas:
+        return f"Valor da NF ({valor_total}) diferente da soma de parcelas ({soma_parcelas})."
 
     return None
 
 
+def _validar(
+    invoices: Iterable[NFeInvoice],
+    item: Optional[ItemParcelas],
+    codigo_transmissora: str,
+    competencia: dt.date,
+    indice: Optional[Dict[Decimal, List[BoletoInfo]]],
+) -> Iterator[dict]:
+    invoices = list(invoices)
+    for invoice, divergencia_nfe in zip(invoices, validar_lote(invoices)):
+        linha, divergencia_boleto = (
+            _conferir_boleto(invoice, indice) if indice is not None else (None, None)
+        )
+        yield {
+            "numero_nfe": invoice.numero_nfe,
+            "chave_nfe": invoice.chave_nfe,
+            "valor_nf": _format_money(invoice.valor_total),
+            "codigo_transmissora": codigo_transmissora,
+            "competencia": competencia.isoformat(),
+            "divergencia": _avaliar_divergencia(item, invoice.valor_total),
+            "divergencia_nfe": divergencia_nfe,
+            "linha_digitavel": linha,
+            "divergencia_boleto": divergencia_boleto,
+        }
+
+
+def iter_validacoes(
+    invoices: Iterable[NFeInvoice],
+    item: Optional[ItemParcelas],
+    codigo_transmissora: str,
+    competencia: dt.date,
+    boletos: Optional[Sequence[BoletoInfo]] = None,
+) -> Iterator[dict]:
+    """Sem `boletos` (None) a conferência de boleto não é feita e seus campos saem nulos."""
+    indice = _indexar_boletos(boletos) if boletos is not None else None
+    return _validar(invoices, item, codigo_transmissora, competencia, indice)
+
+
+def _cancelamentos(invoices) -> Dict[str, NFeCancelamento]:
+    return invoices.cancelamentos if isinstance(invoices, InvoiceBatch) else {}
+
+
 def conciliar_notas_com_avd(
     session: Session,
     codigo_empresa: str,
     competencia: dt.date,
-    invoices: List[NFeInvoice],
+    invoices: Union[InvoiceBatch, Iterable[NFeInvoice]],
+    boletos: Optional[Sequence[BoletoInfo]] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ao_validar: Optional[Callable[[dict], None]] = None,
 ) -> dict:
+    """
+    Grava e concilia as notas bloco a bloco (`InvoiceBatch` ou blocos de `chunk_size`).
+
+    Cada bloco é agrupado em faturas, gravado e validado antes do próximo ser
+    lido; os agregados das faturas são recalculados uma vez no fim. Eventos de
+    cancelamento do `InvoiceBatch` são aplicados ao final (inclusive a notas de
+    cargas anteriores) e as notas canceladas saem das validações.
+
+    Sem `ao_validar`, as validações voltam em `validations` (um dict por nota
+    em memória). Com ele, cada validação é entregue assim que o seu bloco é
+    conciliado e não fica no resultado; como um evento de cancelamento pode
+    vir depois da nota, o resultado traz `chaves_canceladas` para o consumidor
+    descartar as já entregues.
+    """
     competencia_dt = dt.datetime.combine(competencia, dt.time())
     avd = _find_avd(session, codigo_empresa, competencia_dt)
     if not avd:
         raise AVDValidationError(f"Não existe AVD para código {codigo_empresa} e competência {competencia}.")
 
-    if not invoices:
-        return {"status": "sem_notas", "avd": avd.numeroavd}
+    chunks = invoices.chunks() if isinstance(invoices, InvoiceBatch) else chunked(invoices, chunk_size)
+    primeiro = next(chunks, None)
+    if not primeiro:
+        cancelamentos = _cancelamentos(invoices)
+        resultado = {"status": "sem_notas", "avd": avd.numeroavd}
+        if cancelamentos:
+            resultado["cancelamentos"] = aplicar_cancelamentos(session, cancelamentos.values())
+        return resultado
 
-    transmissora = _find_transmissora_por_cnpj(session, invoices[0].cnpj_emitente)
+    referencia = primeiro[0]
+    transmissora = _find_transmissora_por_cnpj(session, referencia.cnpj_emitente)
     if not transmissora:
-        raise AVDValidationError(f"Transmissora com CNPJ {invoices[0].cnpj_emitente} não cadastrada.")
+        raise AVDValidationError(f"Transmissora com CNPJ {referencia.cnpj_emitente} não cadastrada.")
 
-    item = _find_avd_item(session, avd.id_avisodebito, transmissora.codigoons)
+    # O resumo responde com uma linha por transmissora; AVDs importadas antes
+    # dele existir caem na busca pelo item.
+    item = find_resumo(
+        session, codigo_empresa, competencia_dt, transmissora.codigoons
+    ) or _find_avd_item(session, avd.id_avisodebito, transmissora.codigoons)
 
-    _persist_notas_fiscais(session, avd, invoices)
+    indice = _indexar_boletos(boletos) if boletos is not None else None
+    pendentes = list(boletos or ())
+    fatura_ids: Dict[FaturaKey, int] = {}
+    cnpjs_fatura: Dict[int, CnpjsBoleto] = {}
+    validacoes: List[dict] = []
+    invalidas: Set[str] = set()
+    ja_canceladas: Set[str] = set()
+    boletos_gravados = 0
+    for chunk in chain([primeiro], chunks):
+        grupos, ids = montar_faturas(session, avd, chunk, pendentes, sobras_no_unico=False)
+        faturas_nf, faturas_boleto = fatura_por_chave(grupos, ids)
+        cnpjs_boleto, cnpjs_chunk = _cnpjs_dos_grupos(grupos, ids)
+        for fatura_id, cnpjs in cnpjs_chunk.items():
+            cnpjs_fatura.setdefault(fatura_id, cnpjs)
+        existentes, canceladas = _notas_existentes(session, [inv.chave_nfe for inv in chunk])
+        _persist_notas_fiscais(session, avd, chunk, faturas_nf, existentes)
+        ja_canceladas.update(canceladas)
+        if faturas_boleto:
+            vinculados = [b for b in pendentes if b.linha_digitavel in faturas_boleto]
+            pendentes = [b for b in pendentes if b.linha_digitavel not in faturas_boleto]
+            boletos_gravados += len(
+                _persist_boletos(session, avd, vinculados, cnpjs_boleto, faturas_boleto)
+            )
+        fatura_ids.update(ids)
+        # Notas já canceladas no banco (evento de uma carga anterior) não são
+        # validadas nem disputam boleto, como as canceladas neste lote.
+        validaveis = [inv for inv in chunk if inv.chave_nfe not in canceladas]
+        for validacao in _validar(validaveis, item, transmissora.codigoons, competencia, indice):
+            if validacao["divergencia_nfe"]:
+                invalidas.add(validacao["chave_nfe"])
+            if ao_validar is not None:
+                ao_validar(validacao)
+            else:
+                validacoes.append(validacao)
 
-    validacoes = []
-    for invoice in invoices:
-        divergencia = _avaliar_divergencia(item, invoice)
-        validacoes.append(
-            {
-                "numero_nfe": invoice.numero_nfe,
-                "valor_nf": float(invoice.valor_total),
-                "codigo_transmissora": transmissora.codigoons,
-                "competencia": competencia.isoformat(),
-                "divergencia": divergencia,
-            }
+    if pendentes:
+        # Boletos sem duplicata de mesmo valor: havendo uma única fatura, ficam nela.
+        # Sem fatura, beneficiário e pagador ficam em aberto.
+        unica = next(iter(fatura_ids.values())) if len(fatura_ids) == 1 else None
+        boletos_gravados += len(
+            _persist_boletos(
+                session,
+                avd,
+                pendentes,
+                {b.linha_digitavel: cnpjs_fatura[unica] for b in pendentes} if unica else None,
+                {b.linha_digitavel: unica for b in pendentes} if unica else None,
+            )
         )
+    if fatura_ids:
+        atualizar_agregados(session, avd, fatura_ids)
+
+    cancelamentos = _cancelamentos(invoices)
+    if cancelamentos:
+        validacoes = [v for v in validacoes if v["chave_nfe"] not in cancelamentos]
 
-    return {
+    resultado = {
         "status": "ok",
         "avd": avd.numeroavd,
         "transmissora_codigo": transmissora.codigoons,
-        "validations": validacoes,
+        "faturas": sorted(fatura_ids.values()),
+        "boletos_gravados": boletos_gravados,
+        "notas_invalidas": len(invalidas.difference(cancelamentos)),
+        "notas_ja_canceladas": len(ja_canceladas),
+        "cancelamentos": aplicar_cancelamentos(session, cancelamentos.values()),
     }
+    if ao_validar is None:
+        resultado["validations"] = validacoes
+    else:
+        resultado["chaves_canceladas"] = sorted(cancelamentos)
+    return resultado
+
+
+CONCILIACAO_EXPORT_FIELDS = (
+    "numero_avd",
+    "competencia",
+    "codigo_empresa",
+    "codigo_transmissora",
+    "cnpj_emissor",
+    "numero_nfe",
+    "chave_nfe",
+    "valor_nf",
+    "soma_parcelas",
+    "divergencia",
+)
+
+
+def _format_money(value: Optional[Decimal]) -> Optional[str]:
+    if value is None:
+        return None
+    return format(Decimal(value).quantize(Decimal("0.01")), "f")
+
+
+def iter_conciliacao_persistida(
+    session: Session,
+    codigo_empresa: Optional[str] = None,
+    competencia_inicio: Optional[dt.date] = None,
+    competencia_fim: Optional[dt.date] = None,
+    chunk_size: int = 1000,
+) -> Iterator[Dict[str, Optional[str]]]:
+    """
+    Reconcilia as NFs já gravadas (exceto as canceladas) com as AVDs, linha a linha.
+
+    As notas são lidas em ordem de AVD com cursor (`yield_per`); apenas o resumo
+    (ou os itens) da AVD corrente fica em memória, então o consumo é constante
+    no período.
+    Valores monetários saem como string decimal exata.
+    """
+    query = (
+        session.query(RsmTustFatTransmissaoNf, RsmTustAvisoDebito)
+        .join(
+            RsmTustAvisoDebito,
+            RsmTustAvisoDebito.identificador == RsmTustFatTransmissaoNf.identificador,
+        )
+        .filter(
+            or_(
+                RsmTustFatTransmissaoNf.iscancelado.is_(None),
+                RsmTustFatTransmissaoNf.iscancelado != "S",
+            )
+        )
+        .order_by(RsmTustAvisoDebito.id_avisodebito, RsmTustFatTransmissaoNf.id_faturatransmissaonf)
+    )
+    if codigo_empresa:
+        query = query.filter(RsmTustAvisoDebito.codigoempresa == codigo_empresa)
+    if competencia_inicio:
+        query = query.filter(
+            RsmTustAvisoDebito.datacompetencia >= dt.datetime.combine(competencia_inicio, dt.time())
+        )
+    if competencia_fim:
+        query = query.filter(
+            RsmTustAvisoDebito.datacompetencia <= dt.datetime.combine(competencia_fim, dt.time())
+        )
+
+    avd_atual: Optional[int] = None
+    itens: Dict[str, ItemParcelas] = {}
+    for nf, avd in query.yield_per(chunk_size):
+        if avd.id_avisodebito != avd_atual:
+            avd_atual = avd.id_avisodebito
+            itens = {
+                codigo_ons: linha
+                for (_, codigo_ons), linha in parcelas_por_transmissora(
+                    session, avd.datacompetencia, avd.codigoempresa
+                ).items()
+            }
+
+        transmissora = _find_transmissora_por_cnpj(session, nf.cnpj_emissor)
+        item = itens.get(transmissora.codigoons) if transmissora else None
+        valor_nf = nf.valortotal if nf.valortotal is not None else Decimal("0")
+        if transmissora is None:
+            divergencia = f"Transmissora com CNPJ {nf.cnpj_emissor} não cadastrada."
+        else:
+            divergencia = _avaliar_divergencia(item, valor_nf)
+
+        yield {
+            "numero_avd": avd.numeroavd,
+            "competencia": avd.datacompetencia.date().isoformat() if avd.datacompetencia else None,
+            "codigo_empresa": avd.codigoempresa,
+            "codigo_transmissora": transmissora.codigoons if transmissora else None,
+            "cnpj_emissor": nf.cnpj_emissor,
+            "numero_nfe": nf.numeronotafiscal,
+            "chave_nfe": nf.chavenfe,
+            "valor_nf": _format_money(valor_nf),
+            "soma_parcelas": _format_money(_soma_parcelas(item)) if item else None,
+            "divergencia": divergencia,
+        }
@@ -0,0 +1,107 @@
+"""Integridade das NF-es lidas: dígito da chave de acesso, coerência da chave e CNPJs."""
+
+from __future__ import annotations
+
+import re
+from functools import lru_cache
+from operator import mul
+from typing import Iterable, List, Optional
+
+from app.parsers.nfe import NFeInvoice
+
+# Pesos do módulo 11, da direita para a esquerda (2..9 em ciclo), já na ordem
+# dos dígitos: a soma vira um `sum(map(mul, digitos, pesos))` sem aritmética de índice.
+PESOS_CHAVE = tuple((2 + i % 8) for i in range(43))[::-1]
+PESOS_CNPJ_DV1 = (5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2)
+PESOS_CNPJ_DV2 = (6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2)
+
+# Posições da chave de acesso (44 caracteres).
+_AAMM = slice(2, 6)
+_CNPJ = slice(6, 20)
+_SERIE = slice(22, 25)
+_NUMERO = slice(25, 34)
+
+# CNPJ alfanumérico (IN RFB 2.229/2024): 12 caracteres [0-9A-Z] e dois DVs
+# numéricos; o numérico tradicional é o caso particular só com dígitos. Na
+# chave de acesso o CNPJ do emitente ocupa as posições 7 a 20.
+_CNPJ_RE = re.compile(r"[0-9A-Z]{12}[0-9]{2}")
+_CHAVE_RE = re.compile(r"[0-9]{6}[0-9A-Z]{12}[0-9]{26}")
+
+
+def _digitos(texto: str) -> bytes:
+    """
+    Valor de cada caractere como bytes: código ASCII menos 48 (b'0' → 0,
+    b'A' → 17), a regra dos DVs do CNPJ alfanumérico; para somar com os pesos direto.
+    """
+    return bytes(ch - 48 for ch in texto.encode("ascii"))
+
+
+def _dv_modulo11(digitos: bytes, pesos: tuple) -> int:
+    resto = sum(map(mul, digitos, pesos)) % 11
+    return 0 if resto < 2 else 11 - resto
+
+
+def chave_sem_prefixo(chave: str) -> str:
+    return chave[3:] if chave[:3].upper() == "NFE" else chave
+
+
+def chave_valida(chave: str) -> bool:
+    """44 caracteres (CNPJ do emitente pode ser alfanumérico) com o DV (módulo 11) correto."""
+    chave = chave_sem_prefixo(chave)
+    if not _CHAVE_RE.fullmatch(chave):
+        return False
+    digitos = _digitos(chave)
+    return _dv_modulo11(digitos[:43], PESOS_CHAVE) == digitos[43]
+
+
+@lru_cache(maxsize=4096)
+def cnpj_valido(cnpj: str) -> bool:
+    """CNPJ (numérico ou alfanumérico) com os dois DVs corretos (memoizado: repetem muito)."""
+    if not _CNPJ_RE.fullmatch(cnpj) or cnpj == cnpj[0] * 14:
+        return False
+    digitos = _digitos(cnpj)
+    return (
+        _dv_modulo11(digitos[:12], PESOS_CNPJ_DV1) == digitos[12]
+        and _dv_modulo11(digitos[:13], PESOS_CNPJ_DV2) == digitos[13]
+    )
+
+
+def problemas_nfe(invoice: NFeInvoice) -> List[str]:
+    problemas: List[str] = []
+    chave = chave_sem_prefixo(invoice.chave_nfe)
+    if not chave_valida(chave):
+        problemas.append(f"Chave de acesso inválida ({invoice.chave_nfe or 'ausente'}).")
+    else:
+        if chave[_CNPJ] != invoice.cnpj_emitente:
+            problemas.append(
+                f"CNPJ da chave ({chave[_CNPJ]}) diferente do emitente ({invoice.cnpj_emitente})."
+            )
+        if invoice.serie.isdigit() and int(chave[_SERIE]) != int(invoice.serie):
+            problemas.append(
+                f"Série da chave ({int(chave[_SERIE])}) diferente da nota ({invoice.serie})."
+            )
+        if invoice.numero_nfe.isdigit() and int(chave[_NUMERO]) != int(invoice.numero_nfe):
+            problemas.append(
+                f"Número da chave ({int(chave[_NUMERO])}) diferente da nota ({invoice.numero_nfe})."
+            )
+        emissao = invoice.data_emissao
+        if emissao is not None and chave[_AAMM] != emissao.strftime("%y%m"):
+            problemas.append(
+                f"Ano/mês da chave ({chave[_AAMM]}) diferente da emissão ({emissao:%Y-%m})."
+            )
+    if invoice.data_emissao is None:
+        problemas.append("dhEmi ausente.")
+    if not cnpj_valido(invoice.cnpj_emitente):
+        problemas.append(f"CNPJ do emitente inválido ({invoice.cnpj_emitente or 'ausente'}).")
+    if len(invoice.cnpj_destinatario) == 14 and not cnpj_valido(invoice.cnpj_destinatario):
+        problemas.append(f"CNPJ do destinatário inválido ({invoice.cnpj_destinatario}).")
+    return problemas
+
+
+def validar_lote(invoices: Iterable[NFeInvoice]) -> List[Optional[str]]:
+    """
+    Confere um lote de notas numa passada; uma entrada por nota, na mesma ordem.
+
+    None quando a nota está íntegra; senão, os problemas encontrados juntos.
+    """
+    return [" ".join(problemas) or None for problemas in map(problemas_nfe, invoices)]
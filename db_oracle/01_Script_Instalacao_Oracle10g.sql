@@ -53,6 +53,11 @@
         "STATUS" VARCHAR2(30),
         "QTDERROS" NUMBER,
         "IDENTIFICADORPROCESSOIMPORTACAO" NUMBER,
+        "MENSAGEMERRO" VARCHAR2(4000),
+        "QTDARQUIVOSXML" NUMBER,
+        "QTDARQUIVOSDANFE" NUMBER,
+        "QTDARQUIVOSBOLETO" NUMBER,
+        "QTDARQUIVOSFATURA" NUMBER,
         CONSTRAINT "RSM_TUSTIMPAUTEXECUCAO_PK" PRIMARY KEY ("ID_IMPAUTEXECUCAO")
    );
 
@@ -235,6 +240,24 @@
    
    CREATE SEQUENCE "SEQ_RSM_TUSTAVISODEBITOITEM" NOCACHE NOORDER NOCYCLE;
 
+-- Armazena totais por empresa/competência/transmissora (mantido na importação das AVDs)
+  CREATE TABLE "RSM_TUSTAVDRESUMO" (
+        "ID_AVDRESUMO" NUMBER NOT NULL,
+        "DATAALTERACAO" TIMESTAMP,
+        "CODIGOEMPRESA" VARCHAR2(10),
+        "DATACOMPETENCIA" TIMESTAMP,
+        "CODIGOONS" VARCHAR2(10),
+        "QTDITENS" NUMBER,
+        "VALORPARCELA1" NUMBER(18,2),
+        "VALORPARCELA2" NUMBER(18,2),
+        "VALORPARCELA3" NUMBER(18,2),
+        "VALORTOTAL" NUMBER(18,2),
+        CONSTRAINT "RSM_TUSTAVDRESUMO_PK" PRIMARY KEY ("ID_AVDRESUMO"),
+        CONSTRAINT "RSM_TUSTAVDRESUMO_UK" UNIQUE ("CODIGOEMPRESA", "DATACOMPETENCIA", "CODIGOONS")
+);
+
+   CREATE SEQUENCE "SEQ_RSM_TUSTAVDRESUMO" NOCACHE NOORDER NOCYCLE;
+
    
 -- Armazena faturas de transmissão de energia
   CREATE TABLE "RSM_TUSTFATURATRANSMISSAO" (
@@ -296,11 +319,14 @@
         "NOMEARQUIVO" VARCHAR2(100),
         "ISCANCELADO" CHAR(1),
         "DATACANCELAMENTO" TIMESTAMP,
+        "CODIGOTRANSMISSORAONS" VARCHAR2(10),
         CONSTRAINT "RSM_TUSTFATTRANSMISSAOARQ_PK" PRIMARY KEY ("ID_FATURATRANSMISSAOARQUIVO")
 );
    
    CREATE SEQUENCE "SEQ_RSM_TUSTFATTRANSMISSAOARQ" NOCACHE NOORDER NOCYCLE;
 
+   CREATE INDEX "RSM_TUSTFATTRANSMISSAOARQ_IX1" ON "RSM_TUSTFATTRANSMISSAOARQUIVO" ("ID_ARQUIVO", "CODIGOTRANSMISSORAONS");
+
 
 -- Armazena boletos vinculados à fatura de transmissão
   CREATE TABLE "RSM_TUSTFATTRANSMISSAOBOLETO" (
@@ -355,6 +381,8 @@
    
    CREATE SEQUENCE "SEQ_RSM_TUSTFATTRANSMISSAONF" NOCACHE NOORDER NOCYCLE;
 
+   CREATE INDEX "RSM_TUSTFATTRANSMISSAONF_IX1" ON "RSM_TUSTFATTRANSMISSAONF" ("CHAVENFE");
+
 
 -- Armazena títulos de contas a pagar vinculados à fatura de transmissão
   CREATE TABLE "RSM_TUSTFATTRANSMISSAOTITCP" (
@@ -389,7 +417,8 @@
         "CODIGOPROJETO" VARCHAR2(30),
         "ISCANCELADO" CHAR(1),
         "DATACANCELAMENTO" TIMESTAMP,
-        CONSTRAINT "RSM_TUSTFATTRANSMISSAOTITCP_PK" PRIMARY KEY ("ID_FATURATRANSMISSAOTITCP")
+        CONSTRAINT "RSM_TUSTFATTRANSMISSAOTITCP_PK" PRIMARY KEY ("ID_FATURATRANSMISSAOTITCP"),
+        CONSTRAINT "RSM_TUSTFATTRANSMISSAOTITCP_UK" UNIQUE ("IDENTIFICADORFATURATRANSMISSAO", "SEQUENCIAL")
    );
    
    CREATE SEQUENCE "SEQ_RSM_TUSTFATTRANSTITCP" NOCACHE NOORDER NOCYCLE;
@@ -409,6 +438,16 @@
    
    CREATE SEQUENCE "SEQ_RSM_TUSTANEXO" NOCACHE NOORDER NOCYCLE;
 
+   CREATE INDEX "RSM_TUSTANEXO_IX1" ON "RSM_TUSTANEXO" ("IDENTIFICADORARQUIVO");
+
+
+-- Versão do schema gravada pela aplicação (models.tust_models.ensure_schema)
+  CREATE TABLE "RSM_TUSTSCHEMAVERSAO" (
+        "VERSAO" VARCHAR2(64) NOT NULL,
+        "DATAALTERACAO" TIMESTAMP,
+        CONSTRAINT "RSM_TUSTSCHEMAVERSAO_PK" PRIMARY KEY ("VERSAO")
+   );
+
 
 CREATE OR REPLACE TYPE RSM_TYPEROW IS TABLE OF VARCHAR2 (100);
 
@@ -0,0 +1,143 @@
+"""Benchmark de memória e tempo do parse de AVD: AvdItems (colunas) x lista de dicts."""
+
+from __future__ import annotations
+
+import argparse
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from decimal import Decimal
+from itertools import chain
+from pathlib import Path
+from typing import Dict, List
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+from app.parsers.avd import (  # noqa: E402
+    LayoutCache,
+    _decimal_or_none,
+    _header,
+    _iter_sheet,
+    _items,
+    _parse_shared_strings,
+    detect_layout,
+    load_avd_rows,
+    workbook_parts,
+)
+
+_ROW = re.compile(rb'<row r="(\d+)".*?</row>', re.S)
+
+
+def _ampliar(origem: Path, destino: Path, repeticoes: int) -> int:
+    """Copia a AVD repetindo `repeticoes` vezes as linhas de itens (renumeradas)."""
+    with zipfile.ZipFile(origem) as zf:
+        sheets, _ = workbook_parts(zf)
+        sheet = sheets[0][1]
+        data = zf.read(sheet)
+        rows = list(_ROW.finditer(data))
+        itens = [m for m in rows if int(m.group(1)) > 5]
+        cabecalho = data[: itens[0].start()]
+        rodape = data[itens[-1].end() :]
+        partes = [cabecalho]
+        numero = 5
+        for _ in range(repeticoes):
+            for m in itens:
+                numero += 1
+                antigo = m.group(1)
+                linha = m.group(0).replace(b'r="' + antigo + b'"', b'r="%d"' % numero, 1)
+                linha = re.sub(rb'(<c r="[A-Z]+)' + antigo + rb'"', rb"\g<1>%d" % numero + b'"', linha)
+                partes.append(linha)
+        partes.append(rodape)
+        with zipfile.ZipFile(destino, "w", zipfile.ZIP_DEFLATED) as out:
+            for info in zf.infolist():
+                conteudo = b"".join(partes) if info.filename == sheet else zf.read(info.filename)
+                out.writestr(info.filename, conteudo)
+    return numero - 5
+
+
+def parse_dicts(path: Path):
+    """Caminho anterior: planilha inteira em memória e um dict com Decimals por item."""
+    with zipfile.ZipFile(path) as zf:
+        sheets, shared_path = workbook_parts(zf)
+        shared = _parse_shared_strings(zf.read(shared_path)) if shared_path else []
+        rows = list(_iter_sheet(zf.read(sheets[0][1]), shared))
+        layout, _, _ = detect_layout(zf, sheets, shared_path, shared)
+    map_rows = {idx: data for idx, data in rows}
+    col = layout.colunas
+    items: List[Dict[str, object]] = []
+    for row_idx, data in rows:
+        if row_idx <= layout.header_row or not data.get(col["codigo_ons"]):
+            continue
+        items.append(
+            {
+                "codigo_ons": data.get(col["codigo_ons"]),
+                "nome_transmissora": data.get(col["nome_transmissora"]),
+                "cnpj": data.get(col["cnpj"]),
+                **{
+                    campo: _decimal_or_none(data.get(col.get(campo, "")))
+                    for campo in (
+                        "valor_parcela1",
+                        "valor_parcela2",
+                        "valor_parcela3",
+                        "valor_total",
+                        "valor_pis_cofins",
+                    )
+                },
+            }
+        )
+    return _header(layout, rows), items, map_rows
+
+
+def parse_colunas(path: Path):
+    layout, head, rows = load_avd_rows(path, LayoutCache())
+    return _header(layout, head), _items(layout, chain(head, rows))
+
+
+def _medir(nome: str, func, path: Path, rodadas: int):
+    tempos = []
+    for _ in range(rodadas):
+        inicio = time.perf_counter()
+        func(path)
+        tempos.append(time.perf_counter() - inicio)
+    tracemalloc.start()
+    resultado = func(path)
+    _, pico = tracemalloc.get_traced_memory()
+    atual, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    itens = len(resultado[1])
+    print(
+        f"{nome:8s} itens={itens:7d}  tempo={min(tempos):6.3f}s  "
+        f"pico={pico / 2**20:7.1f} MiB  retido={atual / 2**20:7.1f} MiB"
+    )
+    return resultado
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "excel_path", type=Path, nargs="?", default=ROOT_DIR / "AVD_3748_202510.xlsx"
+    )
+    parser.add_argument(
+        "--repeticoes", type=int, default=100, help="Cópias das linhas de itens (default: 100)."
+    )
+    parser.add_argument("--rodadas", type=int, default=3, help="Rodadas de tempo; vale a menor.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "avd_bench.xlsx"
+        linhas = _ampliar(args.excel_path, path, args.repeticoes)
+        print(f"{linhas} linhas de itens")
+        _, dicts, _ = _medir("dicts", parse_dicts, path, args.rodadas)
+        _, colunas = _medir("colunas", parse_colunas, path, args.rodadas)
+
+    soma_dicts = sum((item["valor_total"] or Decimal("0")) for item in dicts)
+    print(f"soma valor_total: dicts={soma_dicts:.2f} colunas={colunas.total('valor_total')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Benchmark de extração de pacotes ZIP: extractall x extração seletiva em paralelo."""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+from app.robots.extracao import extrair_zip  # noqa: E402
+
+SUFFIXES = (".xml", ".pdf", ".txt")
+
+
+def _gerar_pacote(path: Path, notas: int, pdfs: int, extras: int, pdf_kb: int) -> int:
+    """Pacote sintético no formato dos da VSB; devolve o total descompactado."""
+    rng = random.Random(42)
+    total = 0
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for indice in range(notas):
+            itens = "".join(
+                f"<det nItem=\"{i}\"><prod><xProd>TUST ITEM {rng.randrange(10**6)}</xProd>"
+                f"<vProd>{rng.randrange(10**7) / 100:.2f}</vProd></prod></det>"
+                for i in range(60)
+            )
+            conteudo = f"<nfeProc><NFe><infNFe Id=\"NFe{indice:044d}\">{itens}</infNFe></NFe></nfeProc>"
+            zf.writestr(f"xml/{indice:06d}.xml", conteudo)
+            total += len(conteudo)
+        for indice in range(pdfs):
+            # Metade aleatória (imagens), metade texto repetido: comprime como um PDF real.
+            metade = pdf_kb * 512
+            conteudo = os.urandom(metade) + (b"BT /F1 12 Tf (DANFE) Tj ET\n" * (metade // 27))
+            zf.writestr(f"pdf/{indice:06d}.pdf", conteudo)
+            total += len(conteudo)
+        for indice in range(extras):
+            conteudo = os.urandom(pdf_kb * 1024)
+            zf.writestr(f"extras/{indice:06d}.jpg", conteudo)
+            total += len(conteudo)
+    return total
+
+
+def _medir(nome: str, funcao, destino: Path, repeticoes: int) -> None:
+    tempos = []
+    for _ in range(repeticoes):
+        shutil.rmtree(destino, ignore_errors=True)
+        destino.mkdir(parents=True)
+        inicio = time.perf_counter()
+        arquivos = funcao(destino)
+        tempos.append(time.perf_counter() - inicio)
+    gravados = sum(path.stat().st_size for path in arquivos)
+    melhor = min(tempos)
+    print(
+        f"{nome:<28} {len(arquivos):6d} arquivos {gravados / 2**20:8.1f} MiB "
+        f"{melhor:7.3f}s {gravados / 2**20 / melhor:8.1f} MiB/s"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--notas", type=int, default=2000)
+    parser.add_argument("--pdfs", type=int, default=400)
+    parser.add_argument("--extras", type=int, default=100, help="Membros que não são usados.")
+    parser.add_argument("--pdf-kb", type=int, default=256)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base = Path(tmp)
+        pacote = base / "pacote.zip"
+        total = _gerar_pacote(pacote, args.notas, args.pdfs, args.extras, args.pdf_kb)
+        print(
+            f"Pacote: {pacote.stat().st_size / 2**20:.1f} MiB compactado, "
+            f"{total / 2**20:.1f} MiB descompactado (CPUs: {os.cpu_count()})"
+        )
+        destino = base / "destino"
+
+        def extractall(dest: Path):
+            with zipfile.ZipFile(pacote) as zf:
+                zf.extractall(dest)
+                return [dest / nome for nome in zf.namelist()]
+
+        _medir("extractall (todos)", extractall, destino, args.repeticoes)
+        for workers in (1, 2, 4, 8):
+            _medir(
+                f"extrair_zip seletivo x{workers}",
+                lambda dest, w=workers: extrair_zip(pacote, dest, SUFFIXES, max_workers=w),
+                destino,
+                args.repeticoes,
+            )
+
+
+if __name__ == "__main__":
+    main()
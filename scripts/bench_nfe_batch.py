@@ -0,0 +1,140 @@
+"""Benchmark de memória das NF-es: lista de dataclasses comuns x registros com slots x InvoiceBatch."""
+
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass, fields
+from decimal import Decimal
+from pathlib import Path
+from typing import Optional
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+from app.parsers.nfe import InvoiceBatch, parse_nfe_file  # noqa: E402
+from app.validators.nfe import PESOS_CHAVE, _digitos, _dv_modulo11, validar_lote  # noqa: E402
+
+COMPETENCIA = dt.date(2025, 10, 1)
+TEMPLATE = (
+    '<nfeProc xmlns="http://www.portalfiscal.inf.br/nfe"><NFe><infNFe Id="NFe{chave}">'
+    "<ide><nNF>{numero}</nNF><serie>1</serie><dhEmi>2025-10-05T10:00:00-03:00</dhEmi></ide>"
+    "<emit><CNPJ>92715812000131</CNPJ><xNome>TRANSMISSORA BENCH S.A.</xNome></emit>"
+    "<dest><CNPJ>11222333000181</CNPJ><xNome>CONSUMIDORA BENCH LTDA</xNome></dest>"
+    "<total><ICMSTot><vNF>{valor}</vNF></ICMSTot></total>"
+    "<cobr><fat><nFat>{numero}</nFat></fat><dup><nDup>001</nDup><dVenc>2025-11-15</dVenc>"
+    "<vDup>{valor}</vDup></dup></cobr></infNFe></NFe></nfeProc>"
+)
+
+
+@dataclass
+class NFeInvoiceLegado:
+    """Forma anterior do registro: dataclass com __dict__ e um Path por nota."""
+
+    codigo_ons: str
+    competencia: dt.date
+    cnpj_emitente: str
+    nome_emitente: str
+    cnpj_destinatario: str
+    nome_destinatario: str
+    numero_nfe: str
+    serie: str
+    chave_nfe: str
+    numero_fatura: Optional[str]
+    valor_total: Decimal
+    data_emissao: dt.datetime
+    data_vencimento: Optional[dt.date]
+    duplicata_numero: Optional[str]
+    duplicata_valor: Optional[Decimal]
+    arquivo: Path
+
+
+def _chave(numero: int) -> str:
+    base = f"4325109271581200013155001{numero:09d}1{numero:08d}"
+    return base + str(_dv_modulo11(_digitos(base), PESOS_CHAVE))
+
+
+def _gerar(destino: Path, quantidade: int) -> None:
+    for numero in range(1, quantidade + 1):
+        (destino / f"nfe_{numero:06d}.xml").write_text(
+            TEMPLATE.format(
+                chave=_chave(numero), numero=numero, valor=f"{numero % 9973}.{numero % 100:02d}"
+            ),
+            encoding="utf-8",
+        )
+
+
+def _lista_legado(batch: InvoiceBatch):
+    campos = [campo.name for campo in fields(NFeInvoiceLegado)]
+    notas = []
+    for path in batch.paths:
+        nota = parse_nfe_file(path, batch.codigo_ons, batch.competencia)
+        valores = {campo: getattr(nota, campo) for campo in campos}
+        valores["arquivo"] = Path(valores["arquivo"])
+        notas.append(NFeInvoiceLegado(**valores))
+    return notas
+
+
+def _lista_slots(batch: InvoiceBatch):
+    return list(batch)
+
+
+def _blocos(batch: InvoiceBatch):
+    total = Decimal("0")
+    quantidade = 0
+    for chunk in batch.chunks():
+        total += sum(nota.valor_total for nota in chunk)
+        quantidade += len(chunk)
+    return quantidade
+
+
+def _medir(nome: str, func, batch: InvoiceBatch) -> None:
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    resultado = func(batch)
+    tempo = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    quantidade = resultado if isinstance(resultado, int) else len(resultado)
+    del resultado
+    print(
+        f"{nome:8s} notas={quantidade:6d}  tempo={tempo:6.2f}s  "
+        f"pico={pico / 2**20:7.1f} MiB  ({pico / quantidade:6.0f} B/nota)"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--notas", type=int, default=50000, help="Notas geradas (default: 50000).")
+    parser.add_argument(
+        "--chunk-size", type=int, default=500, help="Tamanho do bloco do InvoiceBatch."
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        destino = Path(tmp)
+        _gerar(destino, args.notas)
+        batch = InvoiceBatch.from_directory(
+            destino, "BENCH", COMPETENCIA, chunk_size=args.chunk_size
+        )
+        _medir("legado", _lista_legado, batch)
+        _medir("slots", _lista_slots, batch)
+        _medir("blocos", _blocos, batch)
+
+        notas = list(batch)
+        inicio = time.perf_counter()
+        invalidas = sum(1 for problema in validar_lote(notas) if problema)
+        tempo = time.perf_counter() - inicio
+        print(
+            f"validação notas={len(notas):6d}  tempo={tempo:6.2f}s  "
+            f"({tempo / len(notas) * 1e6:.1f} µs/nota, {invalidas} inválidas)"
+        )
+
+
+if __name__ == "__main__":
+    main()
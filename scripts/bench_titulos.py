@@ -0,0 +1,117 @@
+"""Benchmark da geração de títulos de contas a pagar num banco SQLite temporário."""
+
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import sys
+import tempfile
+import time
+from decimal import Decimal
+from pathlib import Path
+
+from sqlalchemy import event, insert
+from sqlalchemy.orm import sessionmaker
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+from models.tust_models import (  # noqa: E402
+    Base,
+    RsmTustAvdResumo,
+    RsmTustAvisoDebito,
+    RsmTustFaturaTransmissao,
+    create_db_engine,
+)
+from app.services.faturas import SITUACAO_CONCILIADA  # noqa: E402
+from app.services.titulos import gerar_titulos  # noqa: E402
+
+COMPETENCIA = dt.datetime(2025, 1, 1)
+
+
+def _popular(session, faturas: int) -> None:
+    session.execute(
+        insert(RsmTustAvisoDebito),
+        [
+            {
+                "id_avisodebito": 1,
+                "identificador": 1,
+                "codigoempresa": "BENCH",
+                "datacompetencia": COMPETENCIA,
+                "datavencimentoparcela1": dt.datetime(2025, 2, 15),
+                "datavencimentoparcela2": dt.datetime(2025, 2, 25),
+                "datavencimentoparcela3": dt.datetime(2025, 3, 5),
+            }
+        ],
+    )
+    codigos = [f"B{numero:05d}" for numero in range(faturas)]
+    session.execute(
+        insert(RsmTustAvdResumo),
+        [
+            {
+                "codigoempresa": "BENCH",
+                "datacompetencia": COMPETENCIA,
+                "codigoons": codigo,
+                "valorparcela1": Decimal("100.10"),
+                "valorparcela2": Decimal("200.20"),
+                "valorparcela3": Decimal("300.30"),
+            }
+            for codigo in codigos
+        ],
+    )
+    session.execute(
+        insert(RsmTustFaturaTransmissao),
+        [
+            {
+                "identificador": 1,
+                "identificadoravisodebitotransmissao": 1,
+                "codigotransmissoraons": codigo,
+                "codigoempresa": "BENCH",
+                "datacompetencia": COMPETENCIA,
+                "numeronotafiscal": str(numero),
+                "valorfatura": Decimal("600.60"),
+                "tiposituacaofaturatransmissao": SITUACAO_CONCILIADA,
+            }
+            for numero, codigo in enumerate(codigos, start=1)
+        ],
+    )
+    session.commit()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--faturas", type=int, default=4000, help="Faturas sintéticas (3 títulos cada)."
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_db_engine(f"sqlite:///{Path(tmp) / 'bench.db'}")
+        Base.metadata.create_all(engine)
+        SessionFactory = sessionmaker(bind=engine)
+        consultas = [0]
+        event.listen(
+            engine,
+            "before_cursor_execute",
+            lambda *_: consultas.__setitem__(0, consultas[0] + 1),
+        )
+
+        with SessionFactory() as session:
+            _popular(session, args.faturas)
+
+        for rodada in ("inicial", "repetida"):
+            consultas[0] = 0
+            inicio = time.perf_counter()
+            with SessionFactory() as session:
+                resumo = gerar_titulos(session, COMPETENCIA)
+                session.commit()
+            duracao = time.perf_counter() - inicio
+            print(
+                f"{rodada}: {resumo['titulos']} títulos novos, {resumo['existentes']} existentes, "
+                f"{consultas[0]} comandos SQL, {duracao:.2f}s"
+            )
+
+
+if __name__ == "__main__":
+    main()
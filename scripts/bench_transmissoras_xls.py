@@ -0,0 +1,78 @@
+"""Benchmark da leitura do cadastro de transmissoras (.xls): leitura completa x mmap + on_demand."""
+
+from __future__ import annotations
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+DEFAULT_XLS = ROOT_DIR / "ac42067b-aa8a-475b-a259-2cc9d8d4afe7.xls"
+
+
+def _medir(path: Path, on_demand: bool, repeticoes: int) -> dict:
+    """Roda num processo próprio: o pico de RSS (ru_maxrss) é do processo inteiro."""
+    from scripts.import_transmissoras_xls import load_sheet
+
+    base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        book, sheet = load_sheet(path, on_demand=on_demand)
+        linhas = sum(1 for row in range(1, sheet.nrows) if sheet.cell_value(row, 0))
+        tempos.append(time.perf_counter() - inicio)
+        del book, sheet
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss vem em KiB no Linux (em bytes no macOS).
+    fator = 1 if sys.platform == "darwin" else 1024
+    return {
+        "linhas": linhas,
+        "melhor_s": min(tempos),
+        "pico_rss_mib": pico * fator / 2**20,
+        "acrescimo_rss_mib": (pico - base) * fator / 2**20,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("xls_path", nargs="?", default=DEFAULT_XLS, type=Path)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--modo", choices=("completo", "on_demand"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.modo:
+        print(json.dumps(_medir(args.xls_path, args.modo == "on_demand", args.repeticoes)))
+        return
+
+    print(f"{args.xls_path.name}: {args.xls_path.stat().st_size / 2**20:.2f} MiB")
+    for modo in ("completo", "on_demand"):
+        saida = subprocess.run(
+            [
+                sys.executable,
+                __file__,
+                str(args.xls_path),
+                "--modo",
+                modo,
+                "--repeticoes",
+                str(args.repeticoes),
+            ],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        r = json.loads(saida.strip().splitlines()[-1])
+        print(
+            f"{modo:<10} {r['linhas']:5d} linhas  {r['melhor_s'] * 1000:7.1f} ms  "
+            f"pico RSS {r['pico_rss_mib']:6.1f} MiB (+{r['acrescimo_rss_mib']:.1f} MiB na leitura)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Verifica o custo de importação de app.main com `python -X importtime`.
+
+Falha (exit 1) se algum módulo pesado que deveria ser importado só sob demanda
+aparecer no import ou se o tempo acumulado passar do orçamento.
+"""
+
+from __future__ import annotations
+
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+
+# Carregados só quando uma rota precisa deles (ver comentário em app/main.py).
+LAZY_MODULES = (
+    "requests",
+    "sqlalchemy",
+    "models.tust_models",
+    "app.parsers.nfe",
+    "app.validators.avd",
+    "app.robots.vsb",
+)
+
+
+def medir(module: str) -> Dict[str, int]:
+    """Tempo acumulado (µs) de cada módulo importado por `import <module>`."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    tempos: Dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        tempos[name] = int(cumulative)
+    return tempos
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="app.main", help="Módulo a medir.")
+    parser.add_argument(
+        "--max-ms",
+        type=float,
+        default=800.0,
+        help="Orçamento do import (melhor de --runs execuções, em ms).",
+    )
+    parser.add_argument("--runs", type=int, default=3, help="Execuções; vale a mais rápida.")
+    args = parser.parse_args()
+
+    melhores = [medir(args.module) for _ in range(args.runs)]
+    tempos = min(melhores, key=lambda t: t.get(args.module, 0))
+    total_ms = tempos.get(args.module, 0) / 1000
+
+    erros = [f"{name} importado no boot" for name in LAZY_MODULES if name in tempos]
+    if total_ms > args.max_ms:
+        erros.append(
+            f"import de {args.module} levou {total_ms:.0f} ms (máximo {args.max_ms:.0f} ms)"
+        )
+
+    maiores = sorted(
+        ((t, n) for n, t in tempos.items() if "." not in n or n.startswith("app.")),
+        reverse=True,
+    )[:10]
+    print(f"{args.module}: {total_ms:.0f} ms")
+    for tempo, name in maiores:
+        print(f"  {tempo / 1000:8.1f} ms  {name}")
+
+    if erros:
+        for erro in erros:
+            print(f"ERRO: {erro}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
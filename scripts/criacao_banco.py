@@ -1,4 +1,4 @@
-from models.tust_models import Base, create_sqlite_engine
+from models.tust_models import DEFAULT_DB_URL, Base, create_db_engine
 
-engine = create_sqlite_engine("sqlite:///tust.db", echo=True)
+engine = create_db_engine(DEFAULT_DB_URL, echo=True)
 Base.metadata.create_all(engine)
\ No newline at end of file
@@ -0,0 +1,73 @@
+"""Exporta a conciliação NF x AVD em NDJSON ou CSV, linha a linha."""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import io
+import sys
+from pathlib import Path
+
+from sqlalchemy.orm import sessionmaker
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+from models.tust_models import DEFAULT_DB_URL, create_db_engine, ensure_schema  # noqa: E402
+from app.services.consultas import parse_competencia  # noqa: E402
+from app.services.exportacao import FORMATOS, iter_export  # noqa: E402
+from app.validators.avd import (  # noqa: E402
+    CONCILIACAO_EXPORT_FIELDS,
+    iter_conciliacao_persistida,
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Exporta a conciliação das NFs gravadas com as AVDs."
+    )
+    parser.add_argument(
+        "--db-url",
+        default=DEFAULT_DB_URL,
+        help="URL do banco compatível com SQLAlchemy (padrão: TUST_DB_URL ou sqlite:///tust.db).",
+    )
+    parser.add_argument("--codigo-empresa", help="Filtra pelo código da empresa.")
+    parser.add_argument("--de", help="Competência inicial (YYYY.MM).")
+    parser.add_argument("--ate", help="Competência final (YYYY.MM).")
+    parser.add_argument("--formato", choices=sorted(FORMATOS), default="ndjson")
+    parser.add_argument(
+        "--output",
+        type=Path,
+        help="Arquivo de saída (padrão: stdout). Extensão .gz grava comprimido.",
+    )
+    args = parser.parse_args()
+
+    engine = create_db_engine(args.db_url)
+    ensure_schema(engine)
+    SessionFactory = sessionmaker(bind=engine)
+
+    if args.output is None:
+        out = sys.stdout
+    elif args.output.suffix == ".gz":
+        out = io.TextIOWrapper(gzip.open(args.output, "wb"), encoding="utf-8", newline="")
+    else:
+        out = args.output.open("w", encoding="utf-8", newline="")
+
+    try:
+        with SessionFactory() as session:
+            rows = iter_conciliacao_persistida(
+                session,
+                codigo_empresa=args.codigo_empresa,
+                competencia_inicio=parse_competencia(args.de).date() if args.de else None,
+                competencia_fim=parse_competencia(args.ate).date() if args.ate else None,
+            )
+            for chunk in iter_export(rows, args.formato, CONCILIACAO_EXPORT_FIELDS):
+                out.write(chunk)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
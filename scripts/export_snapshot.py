@@ -0,0 +1,74 @@
+"""Gera snapshots Parquet particionados por competência para análises."""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+from sqlalchemy.orm import sessionmaker
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+from models.tust_models import DEFAULT_DB_URL, create_db_engine, ensure_schema  # noqa: E402
+from app.services.consultas import parse_competencia  # noqa: E402
+from app.services.snapshots import TABLES, export_snapshots  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Exporta AVDs e NFs para Parquet, uma partição por competência."
+    )
+    parser.add_argument("destino", type=Path, help="Diretório raiz dos snapshots.")
+    parser.add_argument(
+        "--db-url",
+        default=DEFAULT_DB_URL,
+        help="URL do banco compatível com SQLAlchemy (padrão: TUST_DB_URL ou sqlite:///tust.db).",
+    )
+    parser.add_argument(
+        "--table",
+        action="append",
+        choices=sorted(TABLES),
+        help="Tabela a exportar (pode repetir; padrão: todas).",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Regrava todas as competências em vez de só as novas ou alteradas.",
+    )
+    parser.add_argument(
+        "--refresh",
+        action="append",
+        default=[],
+        metavar="YYYY.MM",
+        help="Regrava a competência informada mesmo se já exportada.",
+    )
+    args = parser.parse_args()
+
+    engine = create_db_engine(args.db_url)
+    ensure_schema(engine)
+    SessionFactory = sessionmaker(bind=engine)
+
+    with SessionFactory() as session:
+        resumo = export_snapshots(
+            session,
+            args.destino,
+            tables=args.table,
+            full=args.full,
+            refresh=[parse_competencia(value) for value in args.refresh],
+        )
+
+    for table, partitions in resumo.items():
+        if not partitions:
+            print(f"{table}: nenhuma competência nova ou alterada.")
+        for name, rows in partitions.items():
+            if rows:
+                print(f"{table}/{name}: {rows} linhas.")
+            else:
+                print(f"{table}/{name}: sem linhas, partição removida.")
+
+
+if __name__ == "__main__":
+    main()
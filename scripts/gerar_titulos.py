@@ -0,0 +1,48 @@
+"""Gera os títulos de contas a pagar das faturas de transmissão de uma competência."""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+from sqlalchemy.orm import sessionmaker
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+from models.tust_models import DEFAULT_DB_URL, create_db_engine, ensure_schema  # noqa: E402
+from app.services.consultas import parse_competencia  # noqa: E402
+from app.services.titulos import gerar_titulos  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Cria em lote os títulos (um por parcela) que ainda faltam na competência."
+    )
+    parser.add_argument("competencia", help="Competência no formato YYYY.MM.")
+    parser.add_argument("--codigo-empresa", help="Restringe a uma empresa.")
+    parser.add_argument(
+        "--db-url",
+        default=DEFAULT_DB_URL,
+        help="URL do banco compatível com SQLAlchemy (padrão: TUST_DB_URL ou sqlite:///tust.db).",
+    )
+    args = parser.parse_args()
+
+    engine = create_db_engine(args.db_url)
+    ensure_schema(engine)
+    SessionFactory = sessionmaker(bind=engine)
+
+    with SessionFactory() as session:
+        resumo = gerar_titulos(session, parse_competencia(args.competencia), args.codigo_empresa)
+        session.commit()
+        print(
+            f"{resumo['titulos']} títulos gerados para {resumo['faturas']} faturas "
+            f"({resumo['existentes']} já existiam; {resumo['nao_conciliadas']} faturas "
+            "divergentes ou não conciliadas ignoradas)."
+        )
+
+
+if __name__ == "__main__":
+    main()
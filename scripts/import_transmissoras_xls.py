@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import argparse
+import mmap
 import unicodedata
 from datetime import datetime
 from decimal import Decimal
@@ -17,10 +18,14 @@ if str(ROOT_DIR) not in sys.path:
     sys.path.append(str(ROOT_DIR))
 
 from models.tust_models import (  # noqa: E402
-    Base,
+    DEFAULT_DB_URL,
+    RsmTustProcessoImportacao,
     RsmTustTransmissora,
-    create_sqlite_engine,
+    create_db_engine,
+    ensure_schema,
 )
+from app.services.bulk import bulk_insert, bulk_update  # noqa: E402
+from app.services.transmissoras import transmissora_cache  # noqa: E402
 
 HEADER_MAP = {
     "codigo": "codigo_ons",
@@ -82,9 +87,30 @@ def normalize_header(text: str) -> str:
     return cleaned.replace(" ", "_")
 
 
-def load_sheet(path: Path) -> Tuple[xlrd.book.Book, xlrd.sheet.Sheet]:
-    workbook = xlrd.open_workbook(path, encoding_override="utf-8")
-    sheet = workbook.sheet_by_index(0)
+def load_sheet(path: Path, on_demand: bool = True) -> Tuple[xlrd.book.Book, xlrd.sheet.Sheet]:
+    """
+    Lê só a primeira planilha do cadastro.
+
+    O arquivo é mapeado em memória e entregue ao xlrd como `file_contents` (o
+    stream Workbook é lido do mapa, sem cópia) e, com `on_demand`, as demais
+    planilhas não são carregadas; ao fim os buffers do livro são liberados e só
+    a planilha lida continua em memória. `on_demand=False` mantém a leitura
+    completa anterior.
+    """
+    if not on_demand:
+        workbook = xlrd.open_workbook(path, encoding_override="utf-8")
+        return workbook, workbook.sheet_by_index(0)
+
+    with path.open("rb") as handle:
+        buffer = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        workbook = xlrd.open_workbook(
+            file_contents=buffer, encoding_override="utf-8", on_demand=True
+        )
+        sheet = workbook.sheet_by_index(0)
+        workbook.release_resources()
+    finally:
+        buffer.close()
     return workbook, sheet
 
 
@@ -176,7 +202,17 @@ def import_transmissoras(session: Session, path: Path) -> int:
     if "codigo_ons" not in headers:
         raise ValueError("Cabeçalho 'CÓDIGO' não encontrado no arquivo XLS.")
 
-    inserted = 0
+    # Cada execução gera um processo de importação; o id carimbado nas linhas
+    # é a versão usada para invalidar o cache de transmissoras.
+    processo = RsmTustProcessoImportacao(datainclusao=datetime.utcnow())
+    session.add(processo)
+    session.flush()
+
+    existentes = dict(
+        session.query(RsmTustTransmissora.codigoons, RsmTustTransmissora.id_transmissora)
+    )
+    novos: Dict[str, Dict[str, object]] = {}
+    atualizados: Dict[str, Dict[str, object]] = {}
     for row_idx in range(1, sheet.nrows):
         codigo_ons = str_or_none(
             get_cell_value(book, sheet, row_idx, headers["codigo_ons"])
@@ -186,6 +222,7 @@ def import_transmissoras(session: Session, path: Path) -> int:
 
         data = {
             "codigoons": codigo_ons,
+            "identificadorprocessoimportacao": processo.id_processoimportacao,
             "nome": str_or_none(
                 get_cell_value(book, sheet, row_idx, headers.get("sigla_agente", -1))
             ),
@@ -278,20 +315,18 @@ def import_transmissoras(session: Session, path: Path) -> int:
             ),
         }
 
-        existing = (
-            session.query(RsmTustTransmissora)
-            .filter_by(codigoons=data["codigoons"])
-            .one_or_none()
-        )
-        if existing:
-            for attr, value in data.items():
-                setattr(existing, attr, value)
+        # Linhas repetidas do mesmo código: prevalece a última, como no upsert por linha.
+        if codigo_ons in existentes:
+            data["id_transmissora"] = existentes[codigo_ons]
+            atualizados[codigo_ons] = data
         else:
-            session.add(RsmTustTransmissora(**data))  # type: ignore[arg-type]
-            inserted += 1
+            novos[codigo_ons] = data
 
+    bulk_update(session, RsmTustTransmissora, list(atualizados.values()))
+    bulk_insert(session, RsmTustTransmissora, list(novos.values()))
     session.commit()
-    return inserted
+    transmissora_cache.invalidate()
+    return len(novos)
 
 
 def main() -> None:
@@ -301,14 +336,14 @@ def main() -> None:
     parser.add_argument("xls_path", type=Path, help="Caminho do arquivo .xls de transmissoras.")
     parser.add_argument(
         "--db-url",
-        default="sqlite:///tust.db",
-        help="URL do banco suportada pelo SQLAlchemy (padrão: sqlite:///tust.db).",
+        default=DEFAULT_DB_URL,
+        help="URL do banco suportada pelo SQLAlchemy (padrão: TUST_DB_URL ou sqlite:///tust.db).",
     )
     parser.add_argument("--echo", action="store_true", help="Ativa echo SQL.")
     args = parser.parse_args()
 
-    engine = create_sqlite_engine(args.db_url, echo=args.echo)
-    Base.metadata.create_all(engine)
+    engine = create_db_engine(args.db_url, echo=args.echo)
+    ensure_schema(engine)
     SessionFactory = sessionmaker(bind=engine)
 
     with SessionFactory() as session:
@@ -0,0 +1,116 @@
+"""Teste de carga do POST /robots/vsb: latência e recusas (429/503) sob sobrecarga.
+
+Por padrão sobe o app no próprio processo com o robô simulado (sem acessar o
+portal nem o banco); com --url dispara contra um servidor já em execução.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+
+def _cliente_local(download_ms: int):
+    import app.robots.vsb as vsb
+    from fastapi.testclient import TestClient
+
+    def robo_simulado(codigo_ons, competencia=None, download_dir=None):
+        time.sleep(download_ms / 1000)
+        return {
+            "codigo_ons": codigo_ons,
+            "competencia": competencia or "2025.10",
+            "arquivos": [],
+            "destino": f"/tmp/{codigo_ons}",
+        }
+
+    vsb.run_vsb_robot = robo_simulado
+    from app.main import app
+
+    return TestClient(app)
+
+
+def _cliente_remoto(url: str):
+    import requests
+
+    class Cliente:
+        def __init__(self) -> None:
+            self.session = requests.Session()
+
+        def post(self, path: str, json=None):
+            return self.session.post(url.rstrip("/") + path, json=json, timeout=300)
+
+        def get(self, path: str):
+            return self.session.get(url.rstrip("/") + path, timeout=30)
+
+    return Cliente()
+
+
+def _percentil(valores: List[float], p: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="Servidor em execução (p.ex. http://localhost:8000).")
+    parser.add_argument("--requisicoes", type=int, default=200)
+    parser.add_argument("--concorrencia", type=int, default=50)
+    parser.add_argument(
+        "--download-ms", type=int, default=200, help="Duração do robô simulado (modo local)."
+    )
+    parser.add_argument("--competencia", default="2025.10")
+    args = parser.parse_args()
+
+    cliente = _cliente_remoto(args.url) if args.url else _cliente_local(args.download_ms)
+
+    def disparar(indice: int) -> Tuple[int, float, str]:
+        # Códigos distintos: cada pedido é uma execução própria (sem coalescência).
+        corpo = {"codigo_ons": f"LOAD{indice:05d}", "competencia": args.competencia}
+        inicio = time.perf_counter()
+        resposta = cliente.post("/robots/vsb", json=corpo)
+        return resposta.status_code, time.perf_counter() - inicio, resposta.headers.get(
+            "Retry-After", ""
+        )
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concorrencia) as pool:
+        resultados = list(pool.map(disparar, range(args.requisicoes)))
+    total = time.perf_counter() - inicio
+
+    por_status: Dict[int, List[float]] = {}
+    retry_after: Dict[int, List[str]] = {}
+    for status, latencia, retry in resultados:
+        por_status.setdefault(status, []).append(latencia)
+        if retry:
+            retry_after.setdefault(status, []).append(retry)
+
+    print(
+        f"{args.requisicoes} requisições, concorrência {args.concorrencia}, "
+        f"{total:.2f}s ({args.requisicoes / total:.1f} req/s)"
+    )
+    for status, latencias in sorted(por_status.items()):
+        print(
+            f"  {status}: {len(latencias):5d}  p50={_percentil(latencias, 50) * 1000:7.1f} ms  "
+            f"p95={_percentil(latencias, 95) * 1000:7.1f} ms  "
+            f"max={max(latencias) * 1000:7.1f} ms  "
+            f"média={statistics.mean(latencias) * 1000:7.1f} ms"
+        )
+        if status in retry_after:
+            print(f"        Retry-After: {sorted(set(retry_after[status]), key=int)}")
+    print(json.dumps(cliente.get("/metrics/admissao").json(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
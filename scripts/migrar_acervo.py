@@ -0,0 +1,110 @@
+"""Migra a árvore data/vsb/<competencia>/<codigo_ons>/ para o acervo compactado por competência."""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+from sqlalchemy.orm import sessionmaker
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+from models.tust_models import DEFAULT_DB_URL, create_db_engine, ensure_schema  # noqa: E402
+from app.services.acervo import ACERVO_DIR, Acervo, mover_para_acervo  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "raiz",
+        nargs="?",
+        default=Path("data") / "vsb",
+        type=Path,
+        help="Diretório com as competências baixadas (padrão: data/vsb).",
+    )
+    parser.add_argument(
+        "--acervo-dir",
+        default=ACERVO_DIR,
+        type=Path,
+        help="Destino dos pacotes (padrão: ACERVO_DIR ou data/acervo).",
+    )
+    parser.add_argument(
+        "--competencia", action="append", help="Migra só estas competências (ex.: 2025.10)."
+    )
+    parser.add_argument(
+        "--remover",
+        action="store_true",
+        help=(
+            "Apaga cada arquivo depois de relido do pacote e conferido pelo hash; os anexos "
+            "do banco com o mesmo hash passam a apontar para o acervo."
+        ),
+    )
+    parser.add_argument(
+        "--db-url",
+        default=DEFAULT_DB_URL,
+        help="URL do banco compatível com SQLAlchemy (padrão: TUST_DB_URL ou sqlite:///tust.db).",
+    )
+    args = parser.parse_args()
+
+    session_factory = None
+    if args.remover:
+        engine = create_db_engine(args.db_url)
+        ensure_schema(engine)
+        session_factory = sessionmaker(bind=engine)
+
+    acervo = Acervo(args.acervo_dir)
+    inicio = time.perf_counter()
+    totais = {
+        "arquivos": 0,
+        "objetos_novos": 0,
+        "bytes": 0,
+        "removidos": 0,
+        "anexos_apontados": 0,
+        "mantidos": 0,
+    }
+    # Diretórios ocultos (p.ex. o .http_cache do robô) não são competências.
+    competencias = sorted(
+        path for path in args.raiz.iterdir() if path.is_dir() and not path.name.startswith(".")
+    )
+    for competencia_dir in competencias:
+        competencia = competencia_dir.name
+        if args.competencia and competencia not in args.competencia:
+            continue
+        for codigo_dir in sorted(path for path in competencia_dir.iterdir() if path.is_dir()):
+            resumo = mover_para_acervo(
+                acervo,
+                competencia,
+                codigo_dir.name,
+                codigo_dir,
+                remover=args.remover,
+                session_factory=session_factory,
+            )
+            for chave in totais:
+                totais[chave] += resumo[chave]
+            print(
+                f"{competencia}/{codigo_dir.name}: {resumo['arquivos']} arquivos, "
+                f"{resumo['objetos_novos']} novos no pacote, {resumo['removidos']} removidos, "
+                f"{resumo['anexos_apontados']} anexos apontados ao acervo"
+            )
+        if args.remover and not any(competencia_dir.iterdir()):
+            competencia_dir.rmdir()
+        pacote = acervo.pacote(competencia)
+        if pacote.pack_path.exists():
+            print(
+                f"{competencia}: {len(pacote.objetos)} objetos, "
+                f"{pacote.pack_path.stat().st_size / 2**20:.1f} MiB no pacote"
+            )
+    acervo.close()
+    print(
+        f"Total: {totais['arquivos']} arquivos ({totais['bytes'] / 2**20:.1f} MiB), "
+        f"{totais['objetos_novos']} objetos novos, {totais['removidos']} removidos, "
+        f"{totais['mantidos']} mantidos no disco em {time.perf_counter() - inicio:.1f}s."
+    )
+
+
+if __name__ == "__main__":
+    main()
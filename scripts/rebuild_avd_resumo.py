@@ -0,0 +1,42 @@
+"""Reconstrói RSM_TUSTAVDRESUMO a partir dos itens de AVD já importados."""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+from sqlalchemy.orm import sessionmaker
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+from models.tust_models import DEFAULT_DB_URL, create_db_engine, ensure_schema  # noqa: E402
+from app.services.resumo import rebuild_resumo  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Recalcula do zero o resumo por empresa/competência/transmissora."
+    )
+    parser.add_argument(
+        "--db-url",
+        default=DEFAULT_DB_URL,
+        help="URL do banco compatível com SQLAlchemy (padrão: TUST_DB_URL ou sqlite:///tust.db).",
+    )
+    parser.add_argument("--echo", action="store_true", help="Ativa echo SQL.")
+    args = parser.parse_args()
+
+    engine = create_db_engine(args.db_url, echo=args.echo)
+    ensure_schema(engine)
+    SessionFactory = sessionmaker(bind=engine)
+
+    with SessionFactory() as session:
+        total = rebuild_resumo(session)
+        session.commit()
+        print(f"RSM_TUSTAVDRESUMO reconstruído com {total} linhas.")
+
+
+if __name__ == "__main__":
+    main()
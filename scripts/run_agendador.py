@@ -0,0 +1,65 @@
+"""Processo agendador das importações automáticas (RSM_TUSTIMPAUTOMATICA)."""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+from sqlalchemy.orm import sessionmaker
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+from models.tust_models import DEFAULT_DB_URL, create_db_engine, ensure_schema  # noqa: E402
+from app.services.agendamento import Agendador  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Executa robôs e importações nos horários de RSM_TUSTIMPAUTOMATICA."
+    )
+    parser.add_argument(
+        "--db-url",
+        default=DEFAULT_DB_URL,
+        help="URL do banco compatível com SQLAlchemy (padrão: TUST_DB_URL ou sqlite:///tust.db).",
+    )
+    parser.add_argument("--workers", type=int, default=2, help="Execuções simultâneas.")
+    parser.add_argument(
+        "--codigo-empresa", help="Código da empresa (AVD) usado na conciliação das NF-es."
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=60.0,
+        help="Intervalo em segundos entre verificações de horários vencidos.",
+    )
+    parser.add_argument(
+        "--once",
+        action="store_true",
+        help="Executa apenas os horários vencidos agora (inclui atrasados) e encerra.",
+    )
+    args = parser.parse_args()
+
+    engine = create_db_engine(args.db_url)
+    ensure_schema(engine)
+    agendador = Agendador(
+        sessionmaker(bind=engine), max_workers=args.workers, codigo_empresa=args.codigo_empresa
+    )
+
+    if args.once:
+        agendador.recuperar_travadas()
+        submetidas = agendador.tick()
+        agendador.shutdown(wait=True)
+        print(f"{len(submetidas)} configuração(ões) executada(s).")
+        return
+
+    try:
+        agendador.run_forever(poll_interval=args.poll_interval)
+    except KeyboardInterrupt:
+        agendador.shutdown(wait=True)
+
+
+if __name__ == "__main__":
+    main()
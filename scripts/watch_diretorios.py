@@ -0,0 +1,103 @@
+"""Monitora diretórios e importa AVDs (.xlsx) e NF-es (.xml) assim que chegam."""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+from sqlalchemy.orm import sessionmaker
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+from models.tust_models import DEFAULT_DB_URL, create_db_engine, ensure_schema  # noqa: E402
+from app.services.consultas import parse_competencia  # noqa: E402
+from app.services.ingestao import Ingestor  # noqa: E402
+from app.services.monitoramento import DirectoryWatcher  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Importa continuamente as planilhas AVD e NF-es salvas nos diretórios."
+    )
+    parser.add_argument("diretorios", type=Path, nargs="+", help="Diretórios a monitorar.")
+    parser.add_argument(
+        "--db-url",
+        default=DEFAULT_DB_URL,
+        help="URL do banco compatível com SQLAlchemy (padrão: TUST_DB_URL ou sqlite:///tust.db).",
+    )
+    parser.add_argument("--workers", type=int, default=4, help="Arquivos lidos em paralelo.")
+    parser.add_argument(
+        "--debounce",
+        type=float,
+        default=2.0,
+        help="Segundos sem alteração para considerar um arquivo completo.",
+    )
+    parser.add_argument(
+        "--poll-interval", type=float, default=1.0, help="Intervalo máximo entre verificações."
+    )
+    parser.add_argument(
+        "--polling",
+        action="store_true",
+        help="Força a varredura periódica (p.ex. em compartilhamentos de rede sem inotify).",
+    )
+    parser.add_argument(
+        "--existentes",
+        action="store_true",
+        help="Importa também os arquivos que já estavam nos diretórios ao iniciar.",
+    )
+    parser.add_argument(
+        "--codigo-empresa", help="Código da empresa (AVD) usado na conciliação das NF-es."
+    )
+    parser.add_argument(
+        "--competencia",
+        help="Competência YYYY.MM das NF-es (padrão: diretório YYYY.MM do caminho).",
+    )
+    parser.add_argument(
+        "--overwrite",
+        action="store_true",
+        help="Sobrescreve AVDs já existentes (apaga e reimporta).",
+    )
+    args = parser.parse_args()
+
+    for diretorio in args.diretorios:
+        if not diretorio.is_dir():
+            parser.error(f"{diretorio} não é um diretório.")
+
+    engine = create_db_engine(args.db_url)
+    ensure_schema(engine)
+    ingestor = Ingestor(
+        sessionmaker(bind=engine),
+        max_workers=args.workers,
+        codigo_empresa=args.codigo_empresa,
+        competencia=parse_competencia(args.competencia).date() if args.competencia else None,
+        overwrite=args.overwrite,
+    )
+    watcher = DirectoryWatcher(
+        args.diretorios,
+        debounce=args.debounce,
+        poll_interval=args.poll_interval,
+        force_polling=args.polling,
+    )
+
+    def processar(paths) -> None:
+        for resultado in ingestor(paths):
+            print(
+                f"{Path(resultado['arquivo']).name}: {resultado['status']} "
+                f"({resultado['tipo']}, {resultado['detalhe']})",
+                flush=True,
+            )
+
+    print(f"Monitorando {len(args.diretorios)} diretório(s) via {watcher.backend.name}.")
+    try:
+        watcher.run(processar, incluir_existentes=args.existentes)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        ingestor.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Acervo: gravação concorrente entre instâncias e remoção com anexos no banco."""
+
+from __future__ import annotations
+
+import datetime as dt
+import threading
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from models.tust_models import RsmTustAnexo, create_db_engine, ensure_schema
+from app.services.acervo import Acervo, PacoteCompetencia, mover_para_acervo
+from app.services.documentos import registrar_documentos
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'acervo.db'}")
+    ensure_schema(engine)
+    return sessionmaker(bind=engine)
+
+
+def test_instancias_concorrentes_nao_perdem_objetos(tmp_path):
+    # Duas instâncias do mesmo pacote fazem o papel de dois processos.
+    pacotes = [PacoteCompetencia(tmp_path, "2024.01") for _ in range(2)]
+
+    def guardar(indice: int) -> None:
+        for numero in range(20):
+            conteudo = f"{indice}-{numero}".encode()
+            pacotes[indice].guardar(f"T{indice}", [(f"{numero}.xml", conteudo)])
+
+    threads = [threading.Thread(target=guardar, args=(indice,)) for indice in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    relido = PacoteCompetencia(tmp_path, "2024.01")
+    assert len(relido.objetos) == 40
+    assert {codigo: len(nomes) for codigo, nomes in relido.entradas.items()} == {
+        "T0": 20,
+        "T1": 20,
+    }
+    assert relido.ler_entrada("T1/7.xml") == b"1-7"
+    # O leitor antigo enxerga o que a outra instância gravou depois.
+    assert pacotes[0].ler(relido.entradas["T1"]["7.xml"]) == b"1-7"
+
+
+def test_remover_aponta_os_anexos_para_o_acervo(tmp_path, session_factory):
+    diretorio = tmp_path / "vsb" / "2024.01" / "T01"
+    diretorio.mkdir(parents=True)
+    (diretorio / "nf.xml").write_bytes(b"<nf/>")
+    longo = diretorio / ("b" * 195 + ".pdf")
+    longo.write_bytes(b"%PDF")
+    with session_factory() as session:
+        registrar_documentos(
+            session, sorted(diretorio.iterdir()), "T01", dt.date(2024, 1, 1), cache=None
+        )
+        session.commit()
+    acervo = Acervo(tmp_path / "acervo")
+
+    resumo = mover_para_acervo(
+        acervo, "2024.01", "T01", diretorio, remover=True, session_factory=session_factory
+    )
+
+    assert (resumo["removidos"], resumo["mantidos"], resumo["anexos_apontados"]) == (1, 1, 1)
+    assert not (diretorio / "nf.xml").exists()
+    # A referência ao nome longo não cabe em FILENAME: o arquivo fica no disco.
+    assert longo.exists()
+    with session_factory() as session:
+        nomes = sorted(nome for (nome,) in session.query(RsmTustAnexo.filename))
+    assert nomes[0] == "acervo:2024.01/T01/nf.xml"
+    assert acervo.ler_referencia(nomes[0]) == b"<nf/>"
+
+
+def test_remover_exige_o_banco(tmp_path):
+    diretorio = tmp_path / "T01"
+    diretorio.mkdir()
+    (diretorio / "nf.xml").write_bytes(b"<nf/>")
+
+    with pytest.raises(ValueError):
+        mover_para_acervo(Acervo(tmp_path / "acervo"), "2024.01", "T01", diretorio, remover=True)
+    assert (diretorio / "nf.xml").exists()
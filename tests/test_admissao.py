@@ -0,0 +1,57 @@
+"""`Limiter`: recusa com a fila cheia, espera sem limite e verificação antecipada."""
+
+from __future__ import annotations
+
+import threading
+
+import pytest
+
+from app.services.admissao import Limiter, Saturado
+
+
+def _ocupar(limite: Limiter) -> threading.Event:
+    """Ocupa a única vaga numa thread até o evento devolvido ser sinalizado."""
+    ocupado, liberar = threading.Event(), threading.Event()
+
+    def segurar():
+        with limite.slot():
+            ocupado.set()
+            liberar.wait()
+
+    threading.Thread(target=segurar, daemon=True).start()
+    ocupado.wait()
+    return liberar
+
+
+def test_fila_cheia_recusa_mas_esperar_aguarda():
+    limite = Limiter("escrita", limite=1, fila=0, espera_max=0.01)
+    liberar = _ocupar(limite)
+
+    with pytest.raises(Saturado) as erro:
+        limite.verificar()
+    assert erro.value.status_code == 429
+    with pytest.raises(Saturado):
+        with limite.slot():
+            pass
+
+    admitido = threading.Event()
+
+    def esperar():
+        with limite.slot(esperar=True):
+            admitido.set()
+
+    espera = threading.Thread(target=esperar)
+    espera.start()
+    assert not admitido.wait(0.05)
+    liberar.set()
+    espera.join(timeout=5)
+    assert admitido.is_set()
+    assert (limite.recusados, limite.expirados) == (2, 0)
+
+
+def test_verificar_nao_reserva_vaga():
+    limite = Limiter("escrita", limite=1, fila=0)
+    limite.verificar()
+    with limite.slot():
+        assert limite.ativos == 1
+    assert limite.stats()["admitidos"] == 1
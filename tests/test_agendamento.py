@@ -0,0 +1,223 @@
+"""`Agendador`: horários, reivindicação, erros do job e liberação, num SQLite temporário."""
+
+from __future__ import annotations
+
+import datetime as dt
+import threading
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from models.tust_models import (
+    RsmTustImpAutExecucao,
+    RsmTustImpAutomatica,
+    create_db_engine,
+    ensure_schema,
+)
+from app.services import agendamento
+from app.services.agendamento import (
+    STATUS_ERRO,
+    STATUS_EXECUTANDO,
+    STATUS_OCIOSO,
+    STATUS_SUCESSO,
+    Agendador,
+    executar_importacao,
+    slots_pendentes,
+)
+
+
+@pytest.fixture
+def fabrica(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'agenda.db'}")
+    ensure_schema(engine)
+    return sessionmaker(bind=engine)
+
+
+def _config(fabrica, **valores) -> int:
+    valores.setdefault("horaexecucao", dt.datetime(2024, 1, 5, 3, 0))
+    valores.setdefault("status", STATUS_OCIOSO)
+    with fabrica() as session:
+        config = RsmTustImpAutomatica(**valores)
+        session.add(config)
+        session.commit()
+        return config.id_impautomatica
+
+
+def test_job_padrao_usa_o_banco_do_agendador(fabrica):
+    agendador = Agendador(fabrica)
+    assert agendador.job.func is executar_importacao
+    assert agendador.job.keywords == {"session_factory": fabrica, "codigo_empresa": None}
+    agendador.shutdown()
+
+
+def test_erro_do_job_fica_na_execucao(fabrica):
+    config_id = _config(fabrica)
+
+    def job(competencia, execucao_id):
+        raise ValueError(f"portal recusou {competencia}")
+
+    agendador = Agendador(fabrica, job=job)
+    assert agendador.tick(dt.datetime(2024, 2, 10)) == [config_id]
+    agendador.shutdown()
+
+    with fabrica() as session:
+        execucao = session.query(RsmTustImpAutExecucao).one()
+        assert execucao.status == STATUS_ERRO
+        assert execucao.qtderros == 1
+        assert execucao.mensagemerro == "ValueError: portal recusou 2024.01"
+        config = session.get(RsmTustImpAutomatica, config_id)
+        assert (config.status, config.statusimportacao) == (STATUS_OCIOSO, STATUS_ERRO)
+
+
+def test_configuracao_liberada_quando_a_execucao_falha(fabrica):
+    config_id = _config(fabrica)
+    chamadas = []
+
+    def fabrica_instavel():
+        chamadas.append(1)
+        if len(chamadas) == 1:
+            raise RuntimeError("banco indisponível")
+        return fabrica()
+
+    agendador = Agendador(fabrica_instavel, job=lambda competencia, execucao_id: 0)
+    assert agendador._executar(config_id, ["2024.01"]) == 1
+    agendador.shutdown()
+
+    with fabrica() as session:
+        config = session.get(RsmTustImpAutomatica, config_id)
+        assert (config.status, config.statusimportacao) == (STATUS_OCIOSO, STATUS_ERRO)
+
+
+def test_slots_pendentes_recupera_meses_perdidos():
+    config = RsmTustImpAutomatica(
+        horaexecucao=dt.datetime(2024, 1, 31, 3, 0),
+        dataultimaexecucao=dt.datetime(2023, 12, 31, 3, 0),
+    )
+    agora = dt.datetime(2024, 4, 30, 12, 0)
+
+    # O dia 31 fica limitado ao fim de cada mês.
+    assert slots_pendentes(config, agora) == [
+        dt.datetime(2024, 1, 31, 3, 0),
+        dt.datetime(2024, 2, 29, 3, 0),
+        dt.datetime(2024, 3, 31, 3, 0),
+        dt.datetime(2024, 4, 30, 3, 0),
+    ]
+    assert slots_pendentes(config, agora, max_catchup=2) == [
+        dt.datetime(2024, 3, 31, 3, 0),
+        dt.datetime(2024, 4, 30, 3, 0),
+    ]
+    # Sem execução anterior, só o mês corrente.
+    config.dataultimaexecucao = None
+    assert slots_pendentes(config, agora) == [dt.datetime(2024, 4, 30, 3, 0)]
+    assert slots_pendentes(config, dt.datetime(2024, 5, 31, 2, 59)) == []
+
+
+def test_atrasados_numa_unica_execucao(fabrica):
+    config_id = _config(fabrica, dataultimaexecucao=dt.datetime(2024, 1, 5, 3, 0))
+    competencias = []
+
+    def job(competencia, execucao_id):
+        competencias.append(competencia)
+        return 0
+
+    agendador = Agendador(fabrica, job=job)
+    agora = dt.datetime(2024, 4, 10, 8, 0)
+    assert agendador.tick(agora) == [config_id]
+    agendador.shutdown()
+
+    assert competencias == ["2024.01", "2024.02", "2024.03"]
+    with fabrica() as session:
+        assert session.query(RsmTustImpAutExecucao).count() == 3
+        config = session.get(RsmTustImpAutomatica, config_id)
+        assert config.dataultimaexecucao == agora
+        assert (config.status, config.statusimportacao) == (STATUS_OCIOSO, STATUS_SUCESSO)
+
+    # Nada mais vencido até o horário de maio.
+    outro = Agendador(fabrica, job=job)
+    assert outro.tick(dt.datetime(2024, 5, 5, 2, 59)) == []
+    outro.shutdown()
+
+
+def test_horario_local_e_nao_utc(fabrica, monkeypatch):
+    config_id = _config(fabrica, horaexecucao=dt.datetime(2024, 1, 10, 3, 0))
+    agendador = Agendador(fabrica, job=lambda competencia, execucao_id: 0)
+
+    # 02:00 em Brasília já são 05:00 UTC, mas o horário cadastrado é local.
+    monkeypatch.setattr(agendamento, "agora_local", lambda: dt.datetime(2024, 2, 10, 2, 0))
+    assert agendador.tick() == []
+    monkeypatch.setattr(agendamento, "agora_local", lambda: dt.datetime(2024, 2, 10, 3, 0))
+    assert agendador.tick() == [config_id]
+    agendador.shutdown()
+
+
+def test_reivindicacao_impede_execucao_sobreposta(fabrica):
+    config_id = _config(fabrica)
+    liberar = threading.Event()
+
+    def job(competencia, execucao_id):
+        liberar.wait(5)
+        return 0
+
+    primeiro = Agendador(fabrica, job=job)
+    segundo = Agendador(fabrica, job=job)
+    agora = dt.datetime(2024, 2, 10)
+    try:
+        assert primeiro.tick(agora) == [config_id]
+        # Outro processo (ou o mesmo, de novo) não reivindica a configuração em execução.
+        assert segundo.tick(agora) == []
+        assert primeiro.tick(agora) == []
+        with fabrica() as session:
+            assert not segundo._reivindicar(session, config_id, agora)
+    finally:
+        liberar.set()
+        primeiro.shutdown()
+        segundo.shutdown()
+
+    with fabrica() as session:
+        assert session.query(RsmTustImpAutExecucao).count() == 1
+        assert session.get(RsmTustImpAutomatica, config_id).status == STATUS_OCIOSO
+
+
+def test_execucao_longa_com_batimento_nao_e_recuperada(fabrica):
+    inicio = dt.datetime(2024, 2, 10, 3, 0)
+    config_id = _config(fabrica, status=STATUS_EXECUTANDO, dataultimaexecucao=inicio)
+    agendador = Agendador(fabrica, stale_after=dt.timedelta(minutes=10))
+    agendador._running[config_id] = None
+
+    # Três horas depois, com batimento recente: continua em execução.
+    agora = inicio + dt.timedelta(hours=3)
+    assert agendador._bater(agora - dt.timedelta(minutes=1)) == 1
+    assert agendador.recuperar_travadas(agora) == 0
+
+    # Sem batimento além de `stale_after` (processo caiu): liberada.
+    assert agendador.recuperar_travadas(agora + dt.timedelta(minutes=10)) == 1
+    agendador.shutdown()
+    with fabrica() as session:
+        config = session.get(RsmTustImpAutomatica, config_id)
+        assert (config.status, config.statusimportacao) == (STATUS_OCIOSO, STATUS_ERRO)
+
+
+def test_job_padrao_importa_os_arquivos_baixados(fabrica, monkeypatch, tmp_path):
+    from app.robots.scheduler import RobotScheduler
+    from app.services import documentos
+    from app.services.ingestao import Ingestor
+
+    nota = tmp_path / "2024.01" / "T001" / "nota.xml"
+    resultados = [
+        {"codigo_ons": "T001", "status": "ok", "arquivos": [str(nota)]},
+        {"codigo_ons": "T002", "status": "erro", "erro": "portal fora do ar"},
+    ]
+    monkeypatch.setattr(RobotScheduler, "run", lambda self, transmissoras, comp: resultados)
+    monkeypatch.setattr(documentos, "registrar_resultados", lambda *args: None)
+    chamadas = []
+
+    def ingerir(self, paths):
+        chamadas.append((self.codigo_empresa, self.competencia, paths))
+        return [{"arquivo": str(nota), "tipo": "nfe", "status": "erro", "detalhe": "AVD?"}]
+
+    monkeypatch.setattr(Ingestor, "__call__", ingerir)
+
+    erros = executar_importacao("2024.01", None, session_factory=fabrica, codigo_empresa="E1")
+
+    assert chamadas == [("E1", dt.date(2024, 1, 1), [nota])]
+    assert erros == 2
@@ -0,0 +1,203 @@
+"""Leitura da AVD: detecção do layout pelo conteúdo contra o leitor de células fixas."""
+
+from __future__ import annotations
+
+import zipfile
+from decimal import ROUND_HALF_UP, Decimal
+from itertools import chain
+from pathlib import Path
+from xml.etree import ElementTree as ET
+
+import pytest
+
+from app.parsers import avd
+from app.parsers.avd import (
+    _NULO,
+    CENTAVO,
+    AvdItems,
+    LayoutCache,
+    _excel_serial_to_datetime,
+    _header,
+    _items,
+    _parse_due,
+    _parse_period,
+    _parse_shared_strings,
+    load_avd_rows,
+)
+
+AMOSTRA = Path(__file__).resolve().parents[1] / "AVD_3748_202510.xlsx"
+XL_NS = {"main": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+
+pytestmark = pytest.mark.skipif(not AMOSTRA.exists(), reason="planilha de exemplo ausente")
+
+
+def _decimal(value):
+    return None if value in (None, "") else Decimal(value)
+
+
+def _celulas_fixas(path: Path):
+    """O leitor anterior: sheet1.xml com cabeçalho e colunas em células fixas."""
+    with zipfile.ZipFile(path) as zf:
+        shared = _parse_shared_strings(zf.read("xl/sharedStrings.xml"))
+        root = ET.fromstring(zf.read("xl/worksheets/sheet1.xml"))
+    linhas = {}
+    for row in root.iterfind(".//main:sheetData/main:row", XL_NS):
+        valores = {}
+        for cell in row.iterfind("main:c", XL_NS):
+            v = cell.find("main:v", XL_NS)
+            if v is None:
+                continue
+            col = "".join(filter(str.isalpha, cell.attrib["r"]))
+            valores[col] = shared[int(v.text)] if cell.attrib.get("t") == "s" else v.text
+        if valores:
+            linhas[int(row.attrib["r"])] = valores
+
+    header = {
+        "numero_avd": linhas[1]["D"],
+        "encargo_mensal": _decimal(linhas[1].get("G")),
+        "codigo_empresa": linhas[2]["A"],
+        "nome_empresa": linhas[2]["B"],
+        "periodo_apuracao": _parse_period(linhas[2]["D"]),
+        "pv_spb": _decimal(linhas[2].get("G")),
+        "data_disponibilizacao": _excel_serial_to_datetime(linhas[3]["D"]),
+        "total_sem_pis_cofins": _decimal(linhas[3].get("G")),
+        "vencimento_parcela1": _parse_due(linhas[5]["D"]),
+        "vencimento_parcela2": _parse_due(linhas[5]["E"]),
+        "vencimento_parcela3": _parse_due(linhas[5]["F"]),
+    }
+    items = [
+        {
+            "codigo_ons": dados["A"],
+            "nome_transmissora": dados.get("B"),
+            "cnpj": dados.get("C"),
+            "valor_parcela1": _decimal(dados.get("D")),
+            "valor_parcela2": _decimal(dados.get("E")),
+            "valor_parcela3": _decimal(dados.get("F")),
+            "valor_total": _decimal(dados.get("H")),
+            "valor_pis_cofins": _decimal(dados.get("G")),
+        }
+        for idx, dados in sorted(linhas.items())
+        if idx > 5 and dados.get("A")
+    ]
+    return header, items
+
+
+def _em_centavos(item: dict) -> dict:
+    return {
+        campo: (
+            valor.quantize(CENTAVO, rounding=ROUND_HALF_UP) if isinstance(valor, Decimal) else valor
+        )
+        for campo, valor in item.items()
+    }
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return LayoutCache(tmp_path / "layouts.json")
+
+
+def _parse(path: Path, cache: LayoutCache):
+    """`parse_avd` com um cache de layouts próprio do teste."""
+    layout, head, rows = load_avd_rows(path, cache)
+    return _header(layout, head), _items(layout, chain(head, rows))
+
+
+def test_deteccao_igual_as_celulas_fixas(cache):
+    esperado_header, esperado_items = _celulas_fixas(AMOSTRA)
+
+    header, items = _parse(AMOSTRA, cache)
+
+    assert header == esperado_header
+    assert len(items) == len(esperado_items) > 0
+    assert items.to_dicts() == [_em_centavos(item) for item in esperado_items]
+
+
+def test_layout_em_cache_da_o_mesmo_resultado(cache):
+    primeiro = _parse(AMOSTRA, cache)
+    assert (cache.hits, cache.misses) == (0, 1)
+    assert cache.path.exists()
+
+    # Cache relido do disco, como num novo processo.
+    novo = LayoutCache(cache.path)
+    segundo = _parse(AMOSTRA, novo)
+
+    assert (novo.hits, novo.misses) == (1, 0)
+    assert segundo[0] == primeiro[0]
+    assert segundo[1].to_dicts() == primeiro[1].to_dicts()
+
+
+def test_cache_de_layouts_na_raiz_do_projeto():
+    raiz = Path(__file__).resolve().parents[1]
+    assert avd.ROOT_DIR == raiz
+    assert avd.AVD_LAYOUT_CACHE.is_absolute()
+
+
+def _itens() -> AvdItems:
+    items = AvdItems()
+    items.append("T001", "Transmissora A", "00000000000191", ["1.005", "2.004", "", "3.01", None])
+    items.append("T002", None, None, ["-0.005", "0", "10", "10", "0.5"])
+    return items
+
+
+def test_itens_em_centavos_arredondados_meio_para_cima():
+    items = _itens()
+
+    assert items.centavos("valor_parcela1").typecode == "q"
+    assert list(items.centavos("valor_parcela1")) == [101, -1]
+    assert list(items.centavos("valor_parcela2")) == [200, 0]
+    assert list(items.centavos("valor_parcela3")) == [_NULO, 1000]
+    assert list(items.centavos("valor_pis_cofins")) == [_NULO, 50]
+    assert items.total("valor_parcela1") == Decimal("1.00")
+    # Células vazias ficam fora da soma.
+    assert items.total("valor_parcela3") == Decimal("10.00")
+    assert items.total("valor_pis_cofins") == Decimal("0.50")
+
+
+def test_acesso_por_linha_como_dict():
+    items = _itens()
+
+    assert len(items) == 2
+    primeiro = items[0]
+    assert primeiro["codigo_ons"] == "T001"
+    assert primeiro["valor_parcela1"] == Decimal("1.01")
+    assert primeiro["valor_parcela3"] is None
+    assert primeiro.get("valor_pis_cofins") is None
+    assert primeiro.get("inexistente", "x") == "x"
+    with pytest.raises(KeyError):
+        primeiro["inexistente"]
+
+    assert items[-1]["codigo_ons"] == "T002"
+    assert items[-2]["codigo_ons"] == "T001"
+    for index in (2, -3):
+        with pytest.raises(IndexError):
+            items[index]
+    assert [item["codigo_ons"] for item in items] == ["T001", "T002"]
+    assert items.to_dicts()[1] == {
+        "codigo_ons": "T002",
+        "nome_transmissora": None,
+        "cnpj": None,
+        "valor_parcela1": Decimal("-0.01"),
+        "valor_parcela2": Decimal("0.00"),
+        "valor_parcela3": Decimal("10.00"),
+        "valor_total": Decimal("10.00"),
+        "valor_pis_cofins": Decimal("0.50"),
+    }
+
+
+def test_insert_rows_com_zero_no_lugar_de_vazio():
+    linhas = list(_itens().insert_rows(42))
+
+    assert [linha["identificador"] for linha in linhas] == [1, 2]
+    assert {linha["identificadoravisodebitotransmissao"] for linha in linhas} == {42}
+    assert linhas[0] == {
+        "identificador": 1,
+        "identificadoravisodebitotransmissao": 42,
+        "codigoons": "T001",
+        "nometransmissora": "Transmissora A",
+        "cnpjtransmissora": "00000000000191",
+        "valorparcela1": Decimal("1.01"),
+        "valorparcela2": Decimal("2.00"),
+        "valorparcela3": Decimal("0.00"),
+        "valortotal": Decimal("3.01"),
+    }
+    assert linhas[1]["valorparcela1"] == Decimal("-0.01")
@@ -0,0 +1,75 @@
+"""Linha digitável: dígitos verificadores (módulos 10 e 11) e fator de vencimento."""
+
+from __future__ import annotations
+
+import datetime as dt
+from decimal import Decimal
+
+import pytest
+
+from app.parsers.boleto import (
+    BoletoError,
+    _dv_modulo10,
+    _dv_modulo11,
+    data_por_fator,
+    decode_linha_digitavel,
+)
+
+
+def _linha(banco: str, fator: int, centavos: int, campo_livre: str) -> str:
+    """Monta a linha digitável a partir dos dados do código de barras."""
+    sem_dv = f"{banco}9{fator:04d}{centavos:010d}{campo_livre}"
+    barras = sem_dv[:4] + str(_dv_modulo11(sem_dv)) + sem_dv[4:]
+    campos = [barras[0:4] + barras[19:24], barras[24:34], barras[34:44]]
+    return "".join(campo + str(_dv_modulo10(campo)) for campo in campos) + barras[4] + barras[5:19]
+
+
+def test_modulo10():
+    # Pesos 2,1,2,... da direita; produtos de dois dígitos somam os algarismos.
+    assert _dv_modulo10("001900000") == 9
+    assert _dv_modulo10("5") == 9
+    assert _dv_modulo10("0") == 0
+
+
+def test_modulo11():
+    # Pesos 2 a 9 da direita, recomeçando em 2.
+    assert _dv_modulo11("111111111") == 9
+    assert _dv_modulo11("1") == 9
+    # Restos 0, 10 e 11 viram 1.
+    assert _dv_modulo11("0") == 1
+    assert _dv_modulo11("6") == 1
+
+
+def test_decodifica_linha_valida():
+    linha = _linha("001", 1000, 123456, "0" * 19 + "123456")
+    formatada = f"{linha[:5]}.{linha[5:10]} {linha[10:15]}.{linha[15:21]} {linha[21:]}"
+
+    boleto = decode_linha_digitavel(formatada, dt.date(2025, 3, 1))
+
+    assert boleto.linha_digitavel == linha
+    assert boleto.banco == "001"
+    assert boleto.valor == Decimal("1234.56")
+    assert boleto.data_vencimento == dt.date(2025, 2, 22)
+    assert len(boleto.codigo_barras) == 44
+
+
+@pytest.mark.parametrize(
+    "posicao, mensagem",
+    [(9, "campo 1"), (20, "campo 2"), (31, "campo 3"), (32, "geral"), (40, "geral")],
+)
+def test_digito_alterado_e_recusado(posicao, mensagem):
+    linha = _linha("341", 9999, 5000, "1234567890" * 2 + "12345")
+    alterada = linha[:posicao] + str((int(linha[posicao]) + 1) % 10) + linha[posicao + 1 :]
+
+    with pytest.raises(BoletoError, match=mensagem):
+        decode_linha_digitavel(alterada)
+
+
+def test_fator_de_vencimento_recomeca_em_2025():
+    assert data_por_fator(0) is None
+    assert data_por_fator(1000, dt.date(2000, 7, 1)) == dt.date(2000, 7, 3)
+    assert data_por_fator(9999, dt.date(2025, 2, 1)) == dt.date(2025, 2, 21)
+    # A partir de 22/02/2025 o fator 1000 volta a valer.
+    assert data_por_fator(1000, dt.date(2025, 2, 22)) == dt.date(2025, 2, 22)
+    assert data_por_fator(1001, dt.date(2025, 3, 1)) == dt.date(2025, 2, 23)
+    assert data_por_fator(1500, dt.date(2026, 7, 1)) == dt.date(2026, 7, 7)
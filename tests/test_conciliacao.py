@@ -0,0 +1,328 @@
+"""Conciliação das NF-es e boletos com a AVD num SQLite temporário."""
+
+from __future__ import annotations
+
+import dataclasses
+import datetime as dt
+import threading
+from concurrent.futures import Future
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from models.tust_models import (
+    RsmTustAvdResumo,
+    RsmTustAvisoDebito,
+    RsmTustAvisoDebitoItem,
+    RsmTustFatTransmissaoBoleto,
+    RsmTustFatTransmissaoNf,
+    RsmTustFatTransmissaoTitCp,
+    RsmTustFaturaTransmissao,
+    RsmTustTransmissora,
+    create_db_engine,
+    ensure_schema,
+)
+from app.parsers.boleto import BoletoInfo
+from app.parsers.nfe import NFeCancelamento, NFeInvoice
+from app.services.cancelamentos import aplicar_cancelamentos
+from app.services.faturas import SITUACAO_CONCILIADA, SITUACAO_DIVERGENTE
+from app.services.ingestao import Ingestor
+from app.services.titulos import gerar_titulos
+from app.services.transmissoras import transmissora_cache
+from app.validators import avd as avd_validator
+from app.validators.avd import conciliar_notas_com_avd
+
+CNPJ_TRANSMISSORA = "11111111000111"
+COMPETENCIA = dt.date(2024, 1, 1)
+
+
+@pytest.fixture
+def session(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'conciliacao.db'}")
+    ensure_schema(engine)
+    transmissora_cache.invalidate()
+    with sessionmaker(bind=engine)() as sessao:
+        sessao.add(
+            RsmTustTransmissora(
+                codigoons="T001", cnpj=CNPJ_TRANSMISSORA, identificadorprocessoimportacao=1
+            )
+        )
+        avd = RsmTustAvisoDebito(
+            identificador=10,
+            codigoempresa="E1",
+            numeroavd="AVD-1",
+            datacompetencia=dt.datetime(2024, 1, 1),
+        )
+        sessao.add(avd)
+        sessao.flush()
+        sessao.add(
+            RsmTustAvisoDebitoItem(
+                identificadoravisodebitotransmissao=avd.id_avisodebito,
+                codigoons="T001",
+                valorparcela1=Decimal("300.00"),
+            )
+        )
+        sessao.commit()
+        yield sessao
+    transmissora_cache.invalidate()
+
+
+def nota(numero: int, valor: str, destinatario: str = "22222222000122") -> NFeInvoice:
+    return NFeInvoice(
+        codigo_ons="T001",
+        competencia=COMPETENCIA,
+        cnpj_emitente=CNPJ_TRANSMISSORA,
+        nome_emitente="Transmissora",
+        cnpj_destinatario=destinatario,
+        nome_destinatario="Empresa",
+        numero_nfe=str(numero),
+        serie="1",
+        chave_nfe=f"{numero:044d}",
+        numero_fatura=None,
+        valor_total=Decimal(valor),
+        data_emissao=dt.datetime(2024, 1, 10),
+        data_vencimento=dt.date(2024, 1, 20),
+        duplicata_numero="001",
+        duplicata_valor=Decimal(valor),
+        arquivo=f"{numero}.xml",
+    )
+
+
+def boleto(linha: str, valor: str) -> BoletoInfo:
+    return BoletoInfo(linha, linha, "001", Decimal(valor), dt.date(2024, 1, 20))
+
+
+def test_boleto_herda_os_cnpjs_da_nota_vinculada(session, monkeypatch):
+    monkeypatch.setattr(avd_validator, "_IN_CHUNK", 1)
+    notas = [nota(1, "100.00", "22222222000122"), nota(2, "200.00", "33333333000133")]
+    boletos = [boleto("L200", "200.00"), boleto("L100", "100.00")]
+
+    resultado = conciliar_notas_com_avd(session, "E1", COMPETENCIA, notas, boletos)
+    repetido = conciliar_notas_com_avd(session, "E1", COMPETENCIA, notas, boletos)
+
+    assert (resultado["boletos_gravados"], repetido["boletos_gravados"]) == (2, 0)
+    pagadores = dict(
+        session.query(
+            RsmTustFatTransmissaoBoleto.linhadigitavel, RsmTustFatTransmissaoBoleto.cnpj_pagador
+        )
+    )
+    assert pagadores == {"L100": "22222222000122", "L200": "33333333000133"}
+
+
+def test_reprocessar_nao_duplica_notas_nem_totais(session):
+    notas = [nota(1, "100.00"), nota(2, "200.00")]
+
+    conciliar_notas_com_avd(session, "E1", COMPETENCIA, notas)
+    conciliar_notas_com_avd(session, "E1", COMPETENCIA, notas)
+
+    assert session.query(RsmTustFatTransmissaoNf).count() == 2
+    fatura = session.query(RsmTustFaturaTransmissao).one()
+    assert fatura.qtdnotasfiscais == 2
+    assert fatura.valortotalnotasfiscais == Decimal("300.00")
+    assert fatura.tiposituacaofaturatransmissao == SITUACAO_CONCILIADA
+
+
+def test_fatura_divergente_da_avd(session):
+    conciliar_notas_com_avd(session, "E1", COMPETENCIA, [nota(1, "100.00")])
+
+    fatura = session.query(RsmTustFaturaTransmissao).one()
+    assert fatura.valorons == Decimal("300.00")
+    assert fatura.tiposituacaofaturatransmissao == SITUACAO_DIVERGENTE
+
+
+def test_titulos_so_para_faturas_conciliadas(session):
+    competencia = dt.datetime(2024, 1, 1)
+    conciliar_notas_com_avd(session, "E1", COMPETENCIA, [nota(1, "100.00")])
+
+    divergente = gerar_titulos(session, competencia)
+    assert (divergente["titulos"], divergente["nao_conciliadas"]) == (0, 1)
+
+    conciliar_notas_com_avd(session, "E1", COMPETENCIA, [nota(2, "200.00")])
+    conciliada = gerar_titulos(session, competencia)
+    assert (conciliada["titulos"], conciliada["nao_conciliadas"]) == (1, 0)
+    titulo = session.query(RsmTustFatTransmissaoTitCp).one()
+    assert titulo.valortitulo == Decimal("300.00")
+
+
+def _futuro(valor) -> Future:
+    futuro: Future = Future()
+    futuro.set_result(valor)
+    return futuro
+
+
+def test_ingestor_reporta_erro_inesperado_por_arquivo(session, monkeypatch):
+    def falhar(sessao, *args, **kwargs):
+        sessao.add(RsmTustTransmissora(codigoons="T999"))
+        sessao.flush()
+        raise RuntimeError("conexão perdida")
+
+    monkeypatch.setattr(avd_validator, "conciliar_notas_com_avd", falhar)
+    ingestor = Ingestor(sessionmaker(bind=session.get_bind()), codigo_empresa="E1")
+    notas = [nota(1, "100.00"), nota(2, "200.00")]
+    resultados = ingestor._ingerir_notas([(Path(n.arquivo), _futuro(n)) for n in notas])
+    ingestor.close()
+
+    assert [(r["arquivo"], r["status"], r["detalhe"]) for r in resultados] == [
+        ("1.xml", "erro", "conexão perdida"),
+        ("2.xml", "erro", "conexão perdida"),
+    ]
+    assert session.query(RsmTustTransmissora).filter_by(codigoons="T999").count() == 0
+
+
+def test_nota_antes_da_avd_e_conciliada_quando_ela_chega(session):
+    fevereiro = dt.date(2024, 2, 1)
+    ingestor = Ingestor(sessionmaker(bind=session.get_bind()), codigo_empresa="E1")
+    notas = [
+        dataclasses.replace(nota(1, "300.00"), competencia=fevereiro),
+        dataclasses.replace(nota(2, "100.00"), competencia=fevereiro),
+    ]
+
+    esperando = ingestor._ingerir_notas([(Path(n.arquivo), _futuro(n)) for n in notas])
+    assert {r["status"] for r in esperando} == {"aguardando_avd"}
+    assert ingestor.aguardando_avd == 2
+    # Outro lote sem a AVD: as notas continuam na fila sem serem reportadas de novo.
+    assert ingestor([]) == []
+
+    avd = RsmTustAvisoDebito(
+        identificador=11,
+        codigoempresa="E1",
+        numeroavd="AVD-2",
+        datacompetencia=dt.datetime(2024, 2, 1),
+    )
+    session.add(avd)
+    session.flush()
+    session.add(
+        RsmTustAvisoDebitoItem(
+            identificadoravisodebitotransmissao=avd.id_avisodebito,
+            codigoons="T001",
+            valorparcela1=Decimal("300.00"),
+        )
+    )
+    session.commit()
+    resultados = ingestor([])
+    ingestor.close()
+
+    assert [(r["arquivo"], r["status"]) for r in resultados] == [
+        ("1.xml", "importado"),
+        ("2.xml", "importado"),
+    ]
+    # A validação é por nota: a de 100,00 não bate com as parcelas da transmissora.
+    assert resultados[0]["detalhe"] == "AVD AVD-2, 1 divergente(s) da AVD"
+    assert ingestor.aguardando_avd == 0
+    assert session.query(RsmTustFatTransmissaoNf).count() == 2
+
+
+def test_validacoes_entregues_por_callback(session):
+    entregues = []
+    notas = [nota(1, "100.00"), nota(2, "200.00")]
+
+    resultado = conciliar_notas_com_avd(
+        session, "E1", COMPETENCIA, notas, chunk_size=1, ao_validar=entregues.append
+    )
+
+    assert [v["chave_nfe"] for v in entregues] == [n.chave_nfe for n in notas]
+    assert "validations" not in resultado
+    assert resultado["chaves_canceladas"] == []
+
+
+def test_nota_ja_cancelada_no_banco_fica_fora(session):
+    notas = [nota(1, "100.00"), nota(2, "200.00")]
+    conciliar_notas_com_avd(session, "E1", COMPETENCIA, notas)
+    aplicar_cancelamentos(
+        session, [NFeCancelamento(notas[0].chave_nfe, dt.datetime(2024, 1, 15), None, "ev.xml")]
+    )
+
+    resultado = conciliar_notas_com_avd(session, "E1", COMPETENCIA, notas)
+
+    assert [v["chave_nfe"] for v in resultado["validations"]] == [notas[1].chave_nfe]
+    assert resultado["notas_ja_canceladas"] == 1
+    cancelada = session.query(RsmTustFatTransmissaoNf).filter_by(chavenfe=notas[0].chave_nfe).one()
+    assert cancelada.iscancelado == "S"
+    fatura = session.query(RsmTustFaturaTransmissao).one()
+    assert (fatura.qtdnotasfiscais, fatura.valortotalnotasfiscais) == (1, Decimal("200.00"))
+
+
+def _parcelar(session, *valores: str) -> None:
+    """Reparte o item da AVD em parcelas (vencimentos em 20/01, 20/02 e 20/03)."""
+    avd = session.query(RsmTustAvisoDebito).one()
+    item = session.query(RsmTustAvisoDebitoItem).one()
+    for numero, valor in enumerate(valores, start=1):
+        setattr(item, f"valorparcela{numero}", Decimal(valor))
+        setattr(avd, f"datavencimentoparcela{numero}", dt.datetime(2024, numero, 20))
+    session.flush()
+
+
+def _titulos(session):
+    return [
+        (t.sequencial, t.valortitulo, t.datavencimento)
+        for t in session.query(RsmTustFatTransmissaoTitCp).order_by(
+            RsmTustFatTransmissaoTitCp.sequencial
+        )
+    ]
+
+
+def test_um_titulo_por_parcela_e_reexecucao_sem_novos(session):
+    _parcelar(session, "100.00", "200.00")
+    conciliar_notas_com_avd(session, "E1", COMPETENCIA, [nota(1, "300.00")])
+    competencia = dt.datetime(2024, 1, 1)
+
+    primeira = gerar_titulos(session, competencia)
+    session.commit()
+    segunda = gerar_titulos(session, competencia)
+
+    assert (primeira["titulos"], segunda["titulos"], segunda["existentes"]) == (2, 0, 2)
+    assert _titulos(session) == [
+        (1, Decimal("100.00"), dt.datetime(2024, 1, 20)),
+        (2, Decimal("200.00"), dt.datetime(2024, 2, 20)),
+    ]
+    assert session.query(RsmTustFaturaTransmissao).one().qtdtituloscontaspagar == 2
+
+
+def test_transmissora_fora_do_resumo_usa_os_itens(session):
+    _parcelar(session, "100.00", "200.00")
+    # Resumo só de outra transmissora: T001 não pode virar um título do valor cheio.
+    session.add(
+        RsmTustAvdResumo(
+            codigoempresa="E1",
+            datacompetencia=dt.datetime(2024, 1, 1),
+            codigoons="T002",
+            valorparcela1=Decimal("50.00"),
+        )
+    )
+    conciliar_notas_com_avd(session, "E1", COMPETENCIA, [nota(1, "300.00")])
+
+    gerar_titulos(session, dt.datetime(2024, 1, 1))
+
+    assert [(seq, valor) for seq, valor, _ in _titulos(session)] == [
+        (1, Decimal("100.00")),
+        (2, Decimal("200.00")),
+    ]
+
+
+def test_geracoes_simultaneas_nao_duplicam(session):
+    conciliar_notas_com_avd(session, "E1", COMPETENCIA, [nota(1, "300.00")])
+    session.commit()
+    competencia = dt.datetime(2024, 1, 1)
+    factory = sessionmaker(bind=session.get_bind())
+    resultado = {}
+
+    with factory() as primeira:
+        gerar_titulos(primeira, competencia)
+
+        def concorrente():
+            with factory() as segunda:
+                resultado.update(gerar_titulos(segunda, competencia))
+                segunda.commit()
+
+        thread = threading.Thread(target=concorrente)
+        thread.start()
+        # A segunda geração espera a trava da competência até este commit.
+        thread.join(0.3)
+        assert thread.is_alive()
+        primeira.commit()
+    thread.join(5)
+
+    assert (resultado["titulos"], resultado["existentes"]) == (0, 1)
+    assert session.query(RsmTustFatTransmissaoTitCp).count() == 1
@@ -0,0 +1,97 @@
+"""API de leitura das AVDs num SQLite temporário: paginação, projeção e ETag."""
+
+from __future__ import annotations
+
+import datetime as dt
+from decimal import Decimal
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+
+from models.tust_models import (
+    RsmTustAvisoDebito,
+    RsmTustAvisoDebitoItem,
+    create_db_engine,
+    ensure_schema,
+)
+from app.main import app
+from app.services import database
+
+
+@pytest.fixture
+def factory(tmp_path, monkeypatch):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'consultas.db'}")
+    ensure_schema(engine)
+    factory = sessionmaker(bind=engine)
+    monkeypatch.setattr(database, "get_session_factory", lambda *args, **kwargs: factory)
+    with factory() as sessao:
+        avd = RsmTustAvisoDebito(
+            identificador=10,
+            codigoempresa="E1",
+            numeroavd="AVD-1",
+            datacompetencia=dt.datetime(2024, 1, 1),
+        )
+        sessao.add(avd)
+        sessao.flush()
+        for numero in range(1, 6):
+            sessao.add(
+                RsmTustAvisoDebitoItem(
+                    identificadoravisodebitotransmissao=avd.id_avisodebito,
+                    codigoons=f"T00{numero}",
+                    valorparcela1=Decimal(f"{numero}00.10"),
+                )
+            )
+        sessao.commit()
+    return factory
+
+
+@pytest.fixture
+def client(factory):
+    with TestClient(app) as client:
+        yield client
+
+
+def test_itens_paginados_por_chave_com_projecao(client):
+    primeira = client.get("/avds/1/itens", params={"limit": 2, "fields": "codigoons"}).json()
+    assert primeira == {
+        "items": [
+            {"id_avisodebitoitem": 1, "codigoons": "T001"},
+            {"id_avisodebitoitem": 2, "codigoons": "T002"},
+        ],
+        "next_after": 2,
+    }
+    ultima = client.get(
+        "/avds/1/itens", params={"after": 4, "limit": 2, "fields": "valorparcela1"}
+    ).json()
+    assert ultima == {
+        "items": [{"id_avisodebitoitem": 5, "valorparcela1": "500.10"}],
+        "next_after": None,
+    }
+    assert client.get("/avds/1/itens", params={"fields": "inexistente"}).status_code == 400
+    assert client.get("/avds/99/itens").status_code == 404
+
+
+def test_etag_da_pagina(client, factory):
+    resposta = client.get("/avds/1/itens", params={"limit": 2})
+    etag = resposta.headers["ETag"]
+
+    repetida = client.get("/avds/1/itens", params={"limit": 2}, headers={"If-None-Match": etag})
+    assert (repetida.status_code, repetida.headers["ETag"]) == (304, etag)
+    outra_pagina = client.get(
+        "/avds/1/itens", params={"after": 2, "limit": 2}, headers={"If-None-Match": etag}
+    )
+    assert outra_pagina.status_code == 200
+
+    # Mudança fora da página não invalida o ETag; dentro dela, sim.
+    with factory() as sessao:
+        sessao.get(RsmTustAvisoDebitoItem, 5).valorparcela1 = Decimal("1.00")
+        sessao.commit()
+    fora = client.get("/avds/1/itens", params={"limit": 2}, headers={"If-None-Match": etag})
+    assert fora.status_code == 304
+    with factory() as sessao:
+        sessao.get(RsmTustAvisoDebitoItem, 1).valorparcela1 = Decimal("1.00")
+        sessao.commit()
+    dentro = client.get("/avds/1/itens", params={"limit": 2}, headers={"If-None-Match": etag})
+    assert dentro.status_code == 200
+    assert dentro.headers["ETag"] != etag
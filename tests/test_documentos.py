@@ -0,0 +1,181 @@
+"""Registro dos documentos baixados: deduplicação por hash e cache da inspeção."""
+
+from __future__ import annotations
+
+import os
+import zipfile
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from models.tust_models import (
+    RsmTustAnexo,
+    RsmTustFatTransmissaoArquivo,
+    RsmTustImpAutExecucao,
+    create_db_engine,
+    ensure_schema,
+)
+from app.robots.extracao import assinaturas_zip, extrair_zip
+from app.services import documentos
+from app.services.documentos import (
+    TIPO_BOLETO,
+    TIPO_DANFE,
+    TIPO_EVENTO_XML,
+    TIPO_FATURA,
+    TIPO_NFE_XML,
+    TIPO_OUTRO,
+    CacheInspecao,
+    classificar,
+    inspecionar,
+    registrar_documentos,
+)
+
+
+@pytest.fixture
+def session(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'docs.db'}")
+    ensure_schema(engine)
+    with sessionmaker(bind=engine)() as sessao:
+        yield sessao
+
+
+@pytest.fixture
+def hashes(monkeypatch):
+    lidos = []
+    original = documentos.file_digest
+
+    def contar(path, *args, **kwargs):
+        lidos.append(path.name)
+        return original(path, *args, **kwargs)
+
+    monkeypatch.setattr(documentos, "file_digest", contar)
+    return lidos
+
+
+def test_arquivo_inalterado_nao_e_relido(tmp_path, hashes):
+    origem = tmp_path / "pacote"
+    origem.mkdir()
+    (origem / "boleto.txt").write_text("linha 1")
+    (origem / "fatura.pdf").write_bytes(b"%PDF")
+    cache = CacheInspecao(tmp_path / "cache")
+
+    primeira = inspecionar(sorted(origem.iterdir()), cache)
+    segunda = inspecionar(sorted(origem.iterdir()), cache)
+
+    assert hashes == ["boleto.txt", "fatura.pdf"]
+    assert [(d.tipo, d.digest) for d in segunda] == [(d.tipo, d.digest) for d in primeira]
+
+    # Mudou o conteúdo (e o mtime): volta a ser lido.
+    (origem / "boleto.txt").write_text("linha 2")
+    os.utime(origem / "boleto.txt", ns=(1, 1))
+    terceira = inspecionar(sorted(origem.iterdir()), cache)
+    assert hashes[-1] == "boleto.txt"
+    assert terceira[0].digest != primeira[0].digest
+
+
+def test_registro_repetido_ignora_os_conhecidos(tmp_path, session, hashes):
+    origem = tmp_path / "pacote"
+    origem.mkdir()
+    (origem / "boleto.txt").write_text("linha 1")
+    arquivos = [origem / "boleto.txt"]
+    cache = CacheInspecao(tmp_path / "cache")
+
+    primeiro = registrar_documentos(session, arquivos, "T01", cache=cache)
+    segundo = registrar_documentos(session, arquivos, "T01", cache=cache)
+
+    assert (primeiro["novos"], segundo["novos"], segundo["ignorados"]) == (1, 0, 1)
+    assert hashes == ["boleto.txt"]
+    assert session.query(RsmTustAnexo).count() == 1
+
+
+def test_anexo_indexado_pelo_hash():
+    indices = {
+        index.name: [column.name for column in index.columns]
+        for index in RsmTustAnexo.__table__.indexes
+    }
+    assert indices == {"RSM_TUSTANEXO_IX1": ["IDENTIFICADORARQUIVO"]}
+
+
+def test_classificacao(tmp_path):
+    arquivos = {
+        "nota.xml": b'<?xml version="1.0"?><nfeProc xmlns="http://www.portalfiscal.inf.br/nfe">',
+        "cancelamento.xml": b"<procEventoNFe versao='1.00'>",
+        "outro.xml": b"<relatorio/>",
+        "danfe.pdf": b"%PDF",
+        "boleto_001.pdf": b"%PDF",
+        "linhas.txt": b"0019...",
+        "fatura_janeiro.pdf": b"%PDF",
+        "leiame.doc": b"doc",
+    }
+    for nome, conteudo in arquivos.items():
+        (tmp_path / nome).write_bytes(conteudo)
+
+    assert {nome: classificar(tmp_path / nome) for nome in arquivos} == {
+        "nota.xml": TIPO_NFE_XML,
+        "cancelamento.xml": TIPO_EVENTO_XML,
+        "outro.xml": TIPO_OUTRO,
+        "danfe.pdf": TIPO_DANFE,
+        "boleto_001.pdf": TIPO_BOLETO,
+        "linhas.txt": TIPO_BOLETO,
+        "fatura_janeiro.pdf": TIPO_FATURA,
+        "leiame.doc": TIPO_OUTRO,
+    }
+
+
+def test_mesmo_arquivo_em_duas_transmissoras(tmp_path, session):
+    for codigo in ("T01", "T02"):
+        (tmp_path / codigo).mkdir()
+        (tmp_path / codigo / "boleto.txt").write_text("mesma linha")
+
+    primeira = registrar_documentos(session, [tmp_path / "T01" / "boleto.txt"], "T01", cache=None)
+    segunda = registrar_documentos(session, [tmp_path / "T02" / "boleto.txt"], "T02", cache=None)
+
+    assert (primeira["novos"], segunda["novos"]) == (1, 1)
+    # O conteúdo fica uma vez; o vínculo, um por transmissora.
+    assert session.query(RsmTustAnexo).count() == 1
+    vinculos = session.query(RsmTustFatTransmissaoArquivo.codigotransmissoraons).all()
+    assert sorted(codigo for (codigo,) in vinculos) == ["T01", "T02"]
+
+
+def test_reextracao_do_mesmo_pacote_usa_o_cache(tmp_path, hashes):
+    pacote = tmp_path / "pacote.zip"
+    with zipfile.ZipFile(pacote, "w") as zf:
+        zf.writestr("nota.xml", "<nfeProc/>")
+        zf.writestr("danfe.pdf", b"%PDF")
+    destino = tmp_path / "extraido"
+    cache = CacheInspecao(tmp_path / "cache")
+
+    for mtime_ns in (1, 2):
+        assinaturas = assinaturas_zip(pacote, destino)
+        arquivos = extrair_zip(pacote, destino, max_workers=1)
+        # Cada extração dá um mtime novo aos arquivos.
+        for path in arquivos:
+            os.utime(path, ns=(mtime_ns, mtime_ns))
+        inspecionar(arquivos, cache, assinaturas)
+
+    assert sorted(hashes) == ["danfe.pdf", "nota.xml"]
+
+
+def test_contagens_somadas_na_execucao(tmp_path, session):
+    execucao = RsmTustImpAutExecucao(status="EXECUTANDO")
+    session.add(execucao)
+    session.flush()
+    arquivos = [tmp_path / nome for nome in ("nota.xml", "danfe.pdf", "boleto.txt")]
+    for path in arquivos:
+        path.write_bytes(b"<nfeProc>" if path.suffix == ".xml" else path.name.encode())
+
+    registrar_documentos(
+        session,
+        arquivos,
+        "T01",
+        execucao_id=execucao.id_impautexecucao,
+        cache=None,
+    )
+    session.refresh(execucao)
+
+    assert (
+        execucao.qtdarquivosxml,
+        execucao.qtdarquivosdanfe,
+        execucao.qtdarquivosboleto,
+        execucao.qtdarquivosfatura,
+    ) == (1, 1, 1, 0)
@@ -0,0 +1,124 @@
+"""Exportação da conciliação persistida em NDJSON e CSV (decimais exatos e filtros)."""
+
+from __future__ import annotations
+
+import datetime as dt
+import json
+from decimal import Decimal
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+
+from models.tust_models import (
+    RsmTustAvisoDebito,
+    RsmTustAvisoDebitoItem,
+    RsmTustTransmissora,
+    create_db_engine,
+    ensure_schema,
+)
+from app.main import app
+from app.parsers.nfe import NFeInvoice
+from app.services import database
+from app.services.transmissoras import transmissora_cache
+from app.validators.avd import CONCILIACAO_EXPORT_FIELDS, conciliar_notas_com_avd
+
+CNPJ_TRANSMISSORA = "11111111000111"
+
+
+def nota(numero: int, valor: str, competencia: dt.date) -> NFeInvoice:
+    return NFeInvoice(
+        codigo_ons="T001",
+        competencia=competencia,
+        cnpj_emitente=CNPJ_TRANSMISSORA,
+        nome_emitente="Transmissora",
+        cnpj_destinatario="22222222000122",
+        nome_destinatario="Empresa",
+        numero_nfe=str(numero),
+        serie="1",
+        chave_nfe=f"{numero:044d}",
+        numero_fatura=None,
+        valor_total=Decimal(valor),
+        data_emissao=dt.datetime(2024, 1, 10),
+        data_vencimento=None,
+        duplicata_numero=None,
+        duplicata_valor=None,
+        arquivo=f"{numero}.xml",
+    )
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'export.db'}")
+    ensure_schema(engine)
+    factory = sessionmaker(bind=engine)
+    monkeypatch.setattr(database, "get_session_factory", lambda *args, **kwargs: factory)
+    transmissora_cache.invalidate()
+    with factory() as sessao:
+        sessao.add(
+            RsmTustTransmissora(
+                codigoons="T001", cnpj=CNPJ_TRANSMISSORA, identificadorprocessoimportacao=1
+            )
+        )
+        for identificador, mes, parcela in ((10, 1, "300.10"), (11, 2, "50.00")):
+            avd = RsmTustAvisoDebito(
+                identificador=identificador,
+                codigoempresa="E1",
+                numeroavd=f"AVD-{mes}",
+                datacompetencia=dt.datetime(2024, mes, 1),
+            )
+            sessao.add(avd)
+            sessao.flush()
+            sessao.add(
+                RsmTustAvisoDebitoItem(
+                    identificadoravisodebitotransmissao=avd.id_avisodebito,
+                    codigoons="T001",
+                    valorparcela1=Decimal(parcela),
+                )
+            )
+        sessao.flush()
+        janeiro = conciliar_notas_com_avd(
+            sessao, "E1", dt.date(2024, 1, 1), [nota(1, "300.10", dt.date(2024, 1, 1))]
+        )
+        conciliar_notas_com_avd(
+            sessao, "E1", dt.date(2024, 2, 1), [nota(2, "49.99", dt.date(2024, 2, 1))]
+        )
+        sessao.commit()
+    # A resposta do /robots/vsb usa as mesmas validações: valor em string decimal.
+    assert janeiro["validations"][0]["valor_nf"] == "300.10"
+    with TestClient(app) as client:
+        yield client
+    transmissora_cache.invalidate()
+
+
+def test_ndjson_com_decimais_exatos(client):
+    resposta = client.get("/conciliacao/export")
+
+    assert resposta.headers["content-type"].startswith("application/x-ndjson")
+    linhas = [json.loads(linha) for linha in resposta.text.splitlines()]
+    assert [(row["numero_avd"], row["valor_nf"], row["soma_parcelas"]) for row in linhas] == [
+        ("AVD-1", "300.10", "300.10"),
+        ("AVD-2", "49.99", "50.00"),
+    ]
+    assert linhas[0]["divergencia"] is None
+    assert linhas[1]["divergencia"].startswith("Valor da NF (49.99)")
+
+
+def test_csv_com_cabecalho_e_filtro_de_competencia(client):
+    resposta = client.get(
+        "/conciliacao/export", params={"formato": "csv", "de": "2024.02", "ate": "2024.02"}
+    )
+
+    assert resposta.headers["content-disposition"] == 'attachment; filename="conciliacao.csv"'
+    cabecalho, *linhas = resposta.text.splitlines()
+    assert cabecalho.split(";") == list(CONCILIACAO_EXPORT_FIELDS)
+    assert len(linhas) == 1
+    assert linhas[0].split(";")[:2] == ["AVD-2", "2024-02-01"]
+    assert "49.99;50.00" in linhas[0]
+
+    so_janeiro = client.get("/conciliacao/export", params={"ate": "2024.01"})
+    assert [json.loads(row)["numero_avd"] for row in so_janeiro.text.splitlines()] == ["AVD-1"]
+
+
+def test_competencia_invalida(client):
+    assert client.get("/conciliacao/export", params={"de": "2024.13"}).status_code == 422
@@ -0,0 +1,45 @@
+"""`extrair_zip`: membros acima do limite avisados no log e membros corrompidos recusados."""
+
+from __future__ import annotations
+
+import logging
+import zipfile
+
+import pytest
+
+from app.robots.extracao import ExtracaoError, extrair_zip
+
+
+def _pacote(path, membros):
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for nome, conteudo in membros.items():
+            zf.writestr(nome, conteudo)
+    return path
+
+
+def test_membro_grande_ignorado_com_aviso(tmp_path, caplog):
+    pacote = _pacote(tmp_path / "p.zip", {"nf.xml": b"<nf/>", "grande.pdf": b"x" * 2048})
+
+    with caplog.at_level(logging.WARNING, logger="app.robots.extracao"):
+        arquivos = extrair_zip(pacote, tmp_path / "out", max_member_bytes=1024)
+
+    assert [path.name for path in arquivos] == ["nf.xml"]
+    assert "grande.pdf" in caplog.text
+
+
+@pytest.mark.parametrize("corromper", ["deflate", "crc"])
+def test_membro_corrompido_vira_extracao_error(tmp_path, corromper):
+    pacote = _pacote(tmp_path / "p.zip", {"nf.xml": b"<nf>" + b"a" * 4096 + b"</nf>"})
+    with zipfile.ZipFile(pacote) as zf:
+        info = zf.getinfo("nf.xml")
+    dados = bytearray(pacote.read_bytes())
+    inicio = info.header_offset + 30 + len(info.filename) + len(info.extra)
+    if corromper == "deflate":
+        dados[inicio : inicio + 8] = b"\xff" * 8
+    else:
+        dados[inicio + 14 : inicio + 18] = bytes(4)
+    pacote.write_bytes(bytes(dados))
+
+    with pytest.raises(ExtracaoError, match="nf.xml"):
+        extrair_zip(pacote, tmp_path / "out")
+    assert not list((tmp_path / "out").iterdir())
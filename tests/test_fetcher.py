@@ -0,0 +1,265 @@
+"""
+`Fetcher` contra um servidor HTTP local: retentativas, espera entre elas,
+esgotamento do orçamento, revalidação com 304, reuso das conexões por host,
+limite do cache e reaproveitamento da extração do robô VSB.
+"""
+
+from __future__ import annotations
+
+import io
+import json
+import os
+import threading
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+import pytest
+from requests.structures import CaseInsensitiveDict
+
+from app.robots import http, vsb
+from app.robots.http import FetchError, FetchResult, Fetcher, HttpCache, RetryBudget
+
+
+class ServidorFalso(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), _Handler)
+        # caminho -> lista de respostas (status, cabeçalhos); a última se repete.
+        self.roteiro: Dict[str, List[tuple]] = {}
+        # caminho -> corpo das respostas 200 (padrão: "<caminho> <status>").
+        self.corpos: Dict[str, bytes] = {}
+        self.pedidos: List[tuple] = []
+        self.conexoes = set()
+        self._lock = threading.Lock()
+
+    def proxima(self, caminho: str) -> tuple:
+        with self._lock:
+            respostas = self.roteiro.get(caminho, [(404, {})])
+            return respostas.pop(0) if len(respostas) > 1 else respostas[0]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        servidor = self.server
+        servidor.pedidos.append((self.path, dict(self.headers)))
+        servidor.conexoes.add(self.client_address)
+        status, cabecalhos = servidor.proxima(self.path)
+        etag = cabecalhos.get("ETag")
+        if etag and self.headers.get("If-None-Match") == etag:
+            status = 304
+        if status == 304:
+            corpo = b""
+        else:
+            corpo = servidor.corpos.get(self.path, f"{self.path} {status}".encode())
+        self.send_response(status)
+        for nome, valor in cabecalhos.items():
+            self.send_header(nome, valor)
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def servidor():
+    srv = ServidorFalso()
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+@pytest.fixture
+def esperas(monkeypatch) -> List[float]:
+    registro: List[float] = []
+    monkeypatch.setattr(http.time, "sleep", registro.append)
+    return registro
+
+
+def url(srv: ServidorFalso, caminho: str) -> str:
+    return f"http://127.0.0.1:{srv.server_address[1]}{caminho}"
+
+
+def test_retenta_ate_sucesso_com_backoff_limitado(servidor, esperas):
+    servidor.roteiro["/x"] = [(503, {}), (502, {}), (200, {})]
+    fetcher = Fetcher(max_attempts=4, base_delay=0.5, max_delay=0.75)
+
+    result = fetcher.get(url(servidor, "/x"))
+
+    assert result.status_code == 200
+    assert result.content == b"/x 200"
+    assert len(servidor.pedidos) == 3
+    assert len(esperas) == 2
+    assert all(0 <= espera <= 0.75 for espera in esperas)
+    fetcher.close()
+
+
+def test_retry_after_define_a_espera(servidor, esperas):
+    servidor.roteiro["/x"] = [(429, {"Retry-After": "3"}), (200, {})]
+    fetcher = Fetcher(max_delay=8.0)
+
+    assert fetcher.get(url(servidor, "/x")).status_code == 200
+    assert esperas == [3.0]
+    fetcher.close()
+
+
+def test_desiste_apos_max_attempts(servidor, esperas):
+    servidor.roteiro["/x"] = [(503, {})]
+    fetcher = Fetcher(max_attempts=3)
+
+    with pytest.raises(FetchError) as exc:
+        fetcher.get(url(servidor, "/x"))
+
+    assert exc.value.status_code == 503
+    assert len(servidor.pedidos) == 3
+    assert len(esperas) == 2
+    fetcher.close()
+
+
+def test_orcamento_esgotado_interrompe_retentativas(servidor, esperas):
+    servidor.roteiro["/x"] = [(503, {})]
+    fetcher = Fetcher(max_attempts=10, budget=RetryBudget(ratio=0.0, min_tokens=2))
+
+    with pytest.raises(FetchError):
+        fetcher.get(url(servidor, "/x"))
+    assert len(servidor.pedidos) == 3
+
+    # Sem fichas, a próxima falha não é retentada.
+    with pytest.raises(FetchError):
+        fetcher.get(url(servidor, "/x"))
+    assert len(servidor.pedidos) == 4
+    assert len(esperas) == 2
+    fetcher.close()
+
+
+def test_erro_de_conexao_e_retentado(esperas):
+    srv = ServidorFalso()
+    destino = url(srv, "/x")
+    srv.server_close()
+    fetcher = Fetcher(max_attempts=2)
+
+    with pytest.raises(FetchError) as exc:
+        fetcher.get(destino, timeout=2)
+
+    assert exc.value.status_code is None
+    assert len(esperas) == 1
+    fetcher.close()
+
+
+def test_revalidacao_304_usa_o_cache(servidor, esperas, tmp_path):
+    servidor.roteiro["/x"] = [(200, {"ETag": '"v1"', "Content-Type": "text/plain"})]
+    fetcher = Fetcher(cache=HttpCache(tmp_path))
+
+    primeiro = fetcher.get(url(servidor, "/x"), use_cache=True)
+    segundo = fetcher.get(url(servidor, "/x"), use_cache=True)
+
+    assert primeiro.from_cache is False
+    assert segundo.from_cache is True
+    assert segundo.content == primeiro.content == b"/x 200"
+    assert servidor.pedidos[1][1].get("If-None-Match") == '"v1"'
+    fetcher.close()
+
+
+def test_reaproveita_a_conexao_do_host(servidor, esperas):
+    servidor.roteiro["/x"] = [(503, {}), (200, {})]
+    servidor.roteiro["/y"] = [(200, {})]
+    fetcher = Fetcher()
+
+    fetcher.get(url(servidor, "/x"))
+    fetcher.get(url(servidor, "/y"))
+    fetcher.get(url(servidor, "/y"))
+
+    assert len(servidor.pedidos) == 4
+    assert len(servidor.conexoes) == 1
+    fetcher.close()
+
+
+def _resposta(corpo: bytes, etag: str) -> FetchResult:
+    return FetchResult(200, CaseInsensitiveDict({"ETag": etag}), corpo)
+
+
+def test_cache_remove_os_menos_usados_acima_do_limite(tmp_path):
+    cache = HttpCache(tmp_path, max_bytes=25)
+    for numero, nome in enumerate("abc"):
+        cache.store(f"http://h/{nome}", _resposta(nome.encode() * 10, '"v"'))
+        corpo = cache.corpo(f"http://h/{nome}")
+        os.utime(corpo, (numero, numero))
+    # "a" (30 bytes no total com "b" e "c") já saiu ao gravar "c".
+    assert cache.corpo("http://h/a") is None
+    assert cache.load("http://h/b") is not None  # "b" passa a ser o mais recente
+
+    cache.store("http://h/d", _resposta(b"d" * 10, '"v"'))
+
+    assert cache.corpo("http://h/c") is None
+    assert cache.corpo("http://h/b") is not None
+    assert cache.corpo("http://h/d") is not None
+    assert cache.validators("http://h/c") == {}
+
+
+def test_resposta_sem_validadores_descarta_a_versao_em_cache(tmp_path):
+    cache = HttpCache(tmp_path)
+    cache.store("http://h/a", _resposta(b"v1", '"v1"'))
+
+    cache.store("http://h/a", FetchResult(200, CaseInsensitiveDict(), b"v2"))
+
+    assert cache.corpo("http://h/a") is None
+
+
+@pytest.fixture
+def portal_vsb(servidor, tmp_path, monkeypatch):
+    pacote = io.BytesIO()
+    with zipfile.ZipFile(pacote, "w") as zf:
+        zf.writestr("nfe/nota.xml", "<nfeProc/>")
+        zf.writestr("boleto.txt", "linha")
+        zf.writestr("leiame.doc", "ignorado")
+    servidor.roteiro["/getFiles.php?codigo=T1&data=2024.01"] = [(200, {})]
+    servidor.corpos["/getFiles.php?codigo=T1&data=2024.01"] = json.dumps(
+        {"zipUrl": "/pacote.zip"}
+    ).encode()
+    servidor.roteiro["/pacote.zip"] = [(200, {"ETag": '"p1"', "Content-Type": "application/zip"})]
+    servidor.corpos["/pacote.zip"] = pacote.getvalue()
+
+    fetcher = Fetcher(cache=HttpCache(tmp_path / "cache"))
+    monkeypatch.setattr(vsb, "fetcher", fetcher)
+    monkeypatch.setattr(vsb, "VSB_BASE_URL", url(servidor, ""))
+    extracoes = []
+    extrair = vsb.extrair_zip
+
+    def contar(*args, **kwargs):
+        extracoes.append(args[0])
+        return extrair(*args, **kwargs)
+
+    monkeypatch.setattr(vsb, "extrair_zip", contar)
+    yield extracoes
+    fetcher.close()
+
+
+def test_vsb_reaproveita_a_extracao_no_304(portal_vsb, servidor, tmp_path):
+    destino = tmp_path / "2024.01" / "T1"
+
+    primeiro = vsb.vsb_robot._run("T1", "2024.01", destino)
+    segundo = vsb.vsb_robot._run("T1", "2024.01", destino)
+
+    assert servidor.pedidos[-1][1].get("If-None-Match") == '"p1"'
+    assert len(portal_vsb) == 1
+    assert sorted(primeiro["arquivos"]) == sorted(segundo["arquivos"])
+    assert {path.name for path in segundo["arquivos"]} == {"nota.xml", "boleto.txt"}
+    assert segundo["assinaturas"] == primeiro["assinaturas"]
+    assert len(segundo["assinaturas"]) == 2
+    # O pacote não é copiado para o destino: a extração lê o corpo em cache.
+    assert not list(destino.glob("*.zip"))
+
+    # Arquivo extraído apagado: o 304 não basta, o pacote em cache é extraído de novo.
+    (destino / "boleto.txt").unlink()
+    terceiro = vsb.vsb_robot._run("T1", "2024.01", destino)
+
+    assert len(portal_vsb) == 2
+    assert (destino / "boleto.txt").exists()
+    assert sorted(terceiro["arquivos"]) == sorted(primeiro["arquivos"])
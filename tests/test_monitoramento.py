@@ -0,0 +1,112 @@
+"""Monitoramento de diretórios: debounce, varredura periódica e transbordo do inotify."""
+
+from __future__ import annotations
+
+import os
+import sys
+import types
+
+import pytest
+
+from app.services import monitoramento
+from app.services.monitoramento import (
+    DirectoryWatcher,
+    InotifyBackend,
+    PollingBackend,
+    create_backend,
+)
+
+
+class Relogio:
+    """Substitui o módulo `time` do monitoramento: sleep só avança o relógio."""
+
+    def __init__(self) -> None:
+        self.agora = 1000.0
+
+    def monotonic(self) -> float:
+        return self.agora
+
+    def sleep(self, segundos: float) -> None:
+        self.agora += segundos
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    relogio = Relogio()
+    monkeypatch.setattr(monitoramento, "time", relogio)
+    return relogio
+
+
+def _escrever(path, conteudo: bytes, mtime_ns: int) -> None:
+    path.write_bytes(conteudo)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_arquivo_so_sai_depois_de_estavel(tmp_path, relogio):
+    watcher = DirectoryWatcher([tmp_path], debounce=2.0, poll_interval=1.0, force_polling=True)
+    watcher.start()
+    avd = tmp_path / "AVD.xlsx"
+
+    _escrever(avd, b"parte", 1)
+    assert watcher.poll() == []
+    # Ainda sendo gravado: o tamanho muda e a espera recomeça.
+    _escrever(avd, b"parte e resto", 2)
+    assert watcher.poll() == []
+    assert watcher.poll() == []
+    assert relogio.agora == 1003.0
+    assert watcher.poll() == [avd]
+    # A mesma versão não é entregue de novo.
+    assert watcher.poll() == []
+    assert watcher.poll() == []
+
+
+def test_ignora_temporarios_e_existentes(tmp_path, relogio):
+    (tmp_path / "antiga.xml").write_bytes(b"<nfe/>")
+    watcher = DirectoryWatcher([tmp_path], debounce=0.5, force_polling=True)
+    watcher.start()
+    (tmp_path / "~$AVD.xlsx").write_bytes(b"lock")
+    (tmp_path / "nota.xml.crdownload").write_bytes(b"<nf")
+    (tmp_path / "nova.xml").write_bytes(b"<nfe/>")
+
+    entregues = [path for _ in range(4) for path in watcher.poll()]
+
+    assert entregues == [tmp_path / "nova.xml"]
+
+
+def test_sem_inotify_usa_varredura(tmp_path, monkeypatch):
+    assert isinstance(create_backend([tmp_path], force_polling=True), PollingBackend)
+
+    def sem_inotify(*args, **kwargs):
+        raise OSError("inotify disponível apenas no Linux.")
+
+    monkeypatch.setattr(monitoramento, "InotifyBackend", sem_inotify)
+    assert isinstance(create_backend([tmp_path]), PollingBackend)
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify só no Linux")
+def test_transbordo_do_inotify_varre_os_diretorios(tmp_path, monkeypatch):
+    backend = InotifyBackend([tmp_path])
+    try:
+        backend.prime()
+        (tmp_path / "sub").mkdir()
+        perdida = tmp_path / "sub" / "nota.xml"
+        perdida.write_bytes(b"<nfe/>")
+        # Só o evento de transbordo chega (wd -1): os eventos dos arquivos se perderam.
+        leituras = [InotifyBackend._EVENT.pack(-1, InotifyBackend.IN_Q_OVERFLOW, 0, 0)]
+
+        def ler(fd, tamanho):
+            if not leituras:
+                raise BlockingIOError
+            return leituras.pop()
+
+        falso_os = types.SimpleNamespace(
+            read=ler, fsencode=os.fsencode, fsdecode=os.fsdecode, close=os.close
+        )
+        monkeypatch.setattr(monitoramento, "os", falso_os)
+        monkeypatch.setattr(monitoramento.select, "select", lambda r, w, x, t: (r, [], []))
+
+        assert backend.poll(0) == {perdida}
+        assert tmp_path / "sub" in backend._dirs.values()
+    finally:
+        monkeypatch.undo()
+        backend.close()
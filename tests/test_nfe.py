@@ -0,0 +1,115 @@
+"""NF-es e eventos de cancelamento: leitura em blocos e só o registrado pela SEFAZ vale."""
+
+from __future__ import annotations
+
+import datetime as dt
+import inspect
+import logging
+from decimal import Decimal
+from pathlib import Path
+
+from app.parsers.nfe import InvoiceBatch, NFeCancelamento, parse_nfe_directory, parse_nfe_xml
+
+CHAVE = "43240111222333000181550010000001231000001230"
+
+INF_EVENTO = f"""
+<infEvento Id="ID110111{CHAVE}01">
+  <tpEvento>110111</tpEvento>
+  <chNFe>{CHAVE}</chNFe>
+  <dhEvento>2024-01-15T10:00:00-03:00</dhEvento>
+  <detEvento><descEvento>Cancelamento</descEvento><nProt>143240000000001</nProt></detEvento>
+</infEvento>"""
+
+
+def _evento(cstat: str = "135", tp_evento: str = "110111") -> bytes:
+    inf = INF_EVENTO.replace("<tpEvento>110111", f"<tpEvento>{tp_evento}")
+    return f"""<procEventoNFe xmlns="http://www.portalfiscal.inf.br/nfe">
+  <evento>{inf}</evento>
+  <retEvento><infEvento>
+    <cStat>{cstat}</cStat>
+    <chNFe>{CHAVE}</chNFe>
+    <dhRegEvento>2024-01-15T10:00:05-03:00</dhRegEvento>
+    <nProt>143240000000999</nProt>
+  </infEvento></retEvento>
+</procEventoNFe>""".encode()
+
+
+def _parse(conteudo: bytes):
+    return parse_nfe_xml(Path("evento.xml"), "T001", dt.date(2024, 1, 1), conteudo)
+
+
+def test_cancelamento_registrado():
+    for cstat in ("135", "155"):
+        cancelamento = _parse(_evento(cstat))
+        assert isinstance(cancelamento, NFeCancelamento)
+        assert cancelamento.chave_nfe == f"NFe{CHAVE}"
+        assert cancelamento.protocolo == "143240000000999"
+        assert cancelamento.data_cancelamento == dt.datetime.fromisoformat(
+            "2024-01-15T10:00:05-03:00"
+        )
+
+
+def test_cancelamento_sem_registro_e_ignorado(caplog):
+    pedido = f'<evento xmlns="http://www.portalfiscal.inf.br/nfe">{INF_EVENTO}</evento>'.encode()
+    with caplog.at_level(logging.WARNING, logger="app.parsers.nfe"):
+        assert _parse(pedido) is None
+        assert _parse(_evento("136")) is None
+        assert _parse(_evento("573")) is None
+    assert len(caplog.records) == 3
+
+
+def test_outros_eventos_dao_none(caplog):
+    with caplog.at_level(logging.WARNING, logger="app.parsers.nfe"):
+        assert _parse(_evento(tp_evento="110110")) is None
+    assert not caplog.records
+
+
+def _nota(numero: int) -> bytes:
+    return f"""<nfeProc xmlns="http://www.portalfiscal.inf.br/nfe"><NFe>
+  <infNFe Id="NFe{numero:044d}">
+    <ide><nNF>{numero}</nNF><serie>1</serie><dhEmi>2024-01-10T08:00:00-03:00</dhEmi></ide>
+    <emit><CNPJ>11222333000181</CNPJ><xNome>Transmissora</xNome></emit>
+    <dest><CNPJ>44555666000181</CNPJ><xNome>Distribuidora</xNome></dest>
+    <total><ICMSTot><vNF>{numero}.50</vNF></ICMSTot></total>
+  </infNFe>
+</NFe></nfeProc>""".encode()
+
+
+def _diretorio(tmp_path: Path) -> Path:
+    for numero in range(1, 6):
+        (tmp_path / f"nota{numero}.xml").write_bytes(_nota(numero))
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "evento.xml").write_bytes(_evento())
+    return tmp_path
+
+
+def test_diretorio_lido_em_blocos(tmp_path):
+    blocos = parse_nfe_directory(_diretorio(tmp_path), "T001", dt.date(2024, 1, 1), chunk_size=2)
+
+    assert inspect.isgenerator(blocos)
+    tamanhos = []
+    for bloco in blocos:
+        tamanhos.append(len(bloco))
+    # O evento ocupa uma vaga do último bloco e não entra nas notas.
+    assert tamanhos == [2, 2, 1]
+
+
+def test_pool_de_processos_le_o_mesmo_que_o_sequencial(tmp_path):
+    paths = sorted(_diretorio(tmp_path).rglob("*.xml"))
+    conteudos = {path: path.read_bytes() for path in paths}
+
+    sequencial = InvoiceBatch(paths, "T001", dt.date(2024, 1, 1), chunk_size=4)
+    # O leitor (aqui um lambda, que não seria serializado) roda no processo pai.
+    paralelo = InvoiceBatch(
+        paths,
+        "T001",
+        dt.date(2024, 1, 1),
+        chunk_size=4,
+        max_workers=2,
+        leitor=lambda path: conteudos[path],
+    )
+
+    notas = list(sequencial)
+    assert list(paralelo) == notas
+    assert [nota.valor_total for nota in notas] == [Decimal(f"{n}.50") for n in range(1, 6)]
+    assert paralelo.cancelamentos.keys() == sequencial.cancelamentos.keys() == {f"NFe{CHAVE}"}
@@ -0,0 +1,201 @@
+"""
+Compatibilidade com o Oracle sem servidor: os comandos são compilados com
+`oracle.dialect()` e a camada de escrita em lote roda contra uma sessão falsa
+que se apresenta como Oracle e registra o que seria enviado ao banco.
+"""
+
+from __future__ import annotations
+
+import re
+from decimal import Decimal
+from pathlib import Path
+from typing import Dict, List
+
+import pytest
+from sqlalchemy import Sequence, insert
+from sqlalchemy.dialects import oracle
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from models.tust_models import (
+    Base,
+    RsmTustAvdResumo,
+    RsmTustAvisoDebitoItem,
+    RsmTustFatTransmissaoNf,
+    RsmTustSchemaVersao,
+    RsmTustTransmissora,
+)
+from app.services import bulk
+from app.services.resumo import _RESUMO_COLUMNS, _aggregate
+
+ORACLE = oracle.dialect()
+DDL_PATH = Path(__file__).resolve().parents[1] / "db_oracle" / "01_Script_Instalacao_Oracle10g.sql"
+
+
+def compilar(stmt) -> str:
+    return str(stmt.compile(dialect=ORACLE))
+
+
+class _Bind:
+    dialect = ORACLE
+
+
+class SessaoOracleFalsa:
+    """Sessão mínima para `bulk`: dialeto Oracle, sequences simuladas e registro das chamadas."""
+
+    def __init__(self, proximo_id: int = 1) -> None:
+        self.proximo_id = proximo_id
+        self.execucoes: List[tuple] = []
+        self.flushes = 0
+
+    def get_bind(self):
+        return _Bind()
+
+    def flush(self) -> None:
+        self.flushes += 1
+
+    def execute(self, stmt, params=None):
+        sql = compilar(stmt)
+        self.execucoes.append((sql, params))
+        match = re.fullmatch(r"SELECT (\w+)\.NEXTVAL FROM DUAL CONNECT BY LEVEL <= :n", sql)
+        if match:
+            inicio = self.proximo_id
+            self.proximo_id += params["n"]
+            return [(value,) for value in range(inicio, self.proximo_id)]
+        return None
+
+    def comandos(self, prefixo: str) -> List[tuple]:
+        return [(sql, params) for sql, params in self.execucoes if sql.startswith(prefixo)]
+
+
+def _itens(quantidade: int) -> List[Dict[str, object]]:
+    return [
+        {
+            "identificadoravisodebitotransmissao": 7,
+            "codigoons": f"{n:04d}",
+            "valortotal": Decimal("10.00"),
+        }
+        for n in range(quantidade)
+    ]
+
+
+def test_next_ids_busca_a_sequence_numa_unica_consulta():
+    sessao = SessaoOracleFalsa(proximo_id=100)
+
+    ids = bulk.next_ids(sessao, RsmTustAvisoDebitoItem, 3)
+
+    assert ids == [100, 101, 102]
+    assert sessao.execucoes == [
+        (
+            "SELECT SEQ_RSM_TUSTAVISODEBITOITEM.NEXTVAL FROM DUAL CONNECT BY LEVEL <= :n",
+            {"n": 3},
+        )
+    ]
+
+
+def test_next_ids_sem_quantidade_nao_consulta():
+    sessao = SessaoOracleFalsa()
+    assert bulk.next_ids(sessao, RsmTustAvisoDebitoItem, 0) == []
+    assert sessao.execucoes == []
+
+
+def test_next_ids_exige_sequence_na_chave():
+    with pytest.raises(ValueError):
+        bulk.next_ids(SessaoOracleFalsa(), RsmTustSchemaVersao, 1)
+
+
+def test_bulk_insert_prealoca_ids_por_lote_e_usa_array_dml():
+    sessao = SessaoOracleFalsa(proximo_id=1)
+
+    ids = bulk.bulk_insert(sessao, RsmTustAvisoDebitoItem, _itens(2500), batch_size=1000)
+
+    assert ids == list(range(1, 2501))
+    sequences = sessao.comandos("SELECT SEQ_RSM_TUSTAVISODEBITOITEM.NEXTVAL")
+    assert [params["n"] for _, params in sequences] == [1000, 1000, 500]
+
+    inserts = sessao.comandos("INSERT INTO")
+    # Um executemany por lote, com a chave já preenchida e sem RETURNING.
+    assert [len(params) for _, params in inserts] == [1000, 1000, 500]
+    for sql, params in inserts:
+        assert sql.startswith('INSERT INTO "RSM_TUSTAVISODEBITOITEM" ("ID_AVISODEBITOITEM",')
+        assert "RETURNING" not in sql
+        assert "NEXTVAL" not in sql
+        assert all(isinstance(row["id_avisodebitoitem"], int) for row in params)
+
+
+def test_bulk_insert_aceita_gerador_e_preserva_ids_informados():
+    sessao = SessaoOracleFalsa(proximo_id=50)
+    linhas = _itens(3)
+    linhas[1]["id_avisodebitoitem"] = 9
+
+    ids = bulk.bulk_insert(sessao, RsmTustAvisoDebitoItem, (linha for linha in linhas))
+
+    assert ids == [50, 9, 51]
+    ((_, params),) = sessao.comandos("SELECT SEQ_RSM_TUSTAVISODEBITOITEM.NEXTVAL")
+    assert params == {"n": 2}
+
+
+def test_bulk_update_por_chave_em_lotes():
+    sessao = SessaoOracleFalsa()
+    linhas = [{"id_transmissora": n, "nome": f"T{n}"} for n in range(1, 6)]
+
+    assert bulk.bulk_update(sessao, RsmTustTransmissora, linhas, batch_size=2) == 5
+
+    # UPDATE do ORM com lista de dicts: o SET/WHERE por chave é montado na execução.
+    updates = sessao.comandos('UPDATE "RSM_TUSTTRANSMISSORA"')
+    assert [len(params) for _, params in updates] == [2, 2, 1]
+    assert all("id_transmissora" in row for _, params in updates for row in params)
+
+
+def test_insert_com_chave_explicita_compila_sem_nextval():
+    sql = compilar(insert(RsmTustFatTransmissaoNf).values(id_faturatransmissaonf=1, chavenfe="x"))
+    assert "NEXTVAL" not in sql
+
+
+def test_insert_sem_chave_usa_a_sequence_da_coluna():
+    sql = compilar(insert(RsmTustFatTransmissaoNf).values(chavenfe="x"))
+    assert '"SEQ_RSM_TUSTFATTRANSMISSAONF".nextval' in sql
+
+
+def test_resumo_agrupa_numa_subconsulta_sem_nextval_junto_do_group_by():
+    filtros = [RsmTustAvdResumo.codigoempresa == "3748"]
+    sql = compilar(
+        insert(RsmTustAvdResumo.__table__).from_select(_RESUMO_COLUMNS, _aggregate(filtros))
+    )
+
+    externo, _, subconsulta = sql.partition("FROM (SELECT")
+    assert '"SEQ_RSM_TUSTAVDRESUMO".nextval' in externo
+    assert "GROUP BY" not in externo
+    assert "GROUP BY" in subconsulta
+    assert "nextval" not in subconsulta.lower()
+
+
+@pytest.mark.parametrize("table", Base.metadata.sorted_tables, ids=lambda t: t.name)
+def test_ddl_compila_para_oracle(table):
+    assert compilar(CreateTable(table)).startswith(f'\nCREATE TABLE "{table.name}"')
+    for index in table.indexes:
+        assert "CREATE INDEX" in compilar(CreateIndex(index))
+
+
+def test_sequences_e_indices_dos_modelos_existem_no_script_oracle():
+    ddl = DDL_PATH.read_text(encoding="latin-1")
+    sequences = {
+        column.default.name
+        for table in Base.metadata.tables.values()
+        for column in table.columns
+        if isinstance(column.default, Sequence)
+    }
+    indices = {index.name for table in Base.metadata.tables.values() for index in table.indexes}
+
+    assert sequences
+    faltando = sorted(name for name in sequences | indices if f'"{name}"' not in ddl)
+    assert faltando == []
+
+
+def test_create_db_engine_oracle():
+    pytest.importorskip("oracledb")
+    from models.tust_models import create_db_engine
+
+    engine = create_db_engine("oracle+oracledb://u:p@localhost:1521/?service_name=TUST")
+    assert engine.dialect.name == "oracle"
+    assert engine.pool._pre_ping
+
@@ -0,0 +1,128 @@
+"""RSM_TUSTAVDRESUMO: recálculo por empresa/competência e consulta pela API."""
+
+from __future__ import annotations
+
+import datetime as dt
+from decimal import Decimal
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+
+from models.tust_models import (
+    RsmTustAvdResumo,
+    RsmTustAvisoDebito,
+    RsmTustAvisoDebitoItem,
+    create_db_engine,
+    ensure_schema,
+)
+from app.main import app
+from app.services import database
+from app.services.resumo import atualizar_resumo, listar_resumo, rebuild_resumo
+
+JANEIRO = dt.datetime(2024, 1, 1)
+FEVEREIRO = dt.datetime(2024, 2, 1)
+
+
+def _avd(sessao, empresa: str, competencia: dt.datetime, itens) -> RsmTustAvisoDebito:
+    avd = RsmTustAvisoDebito(codigoempresa=empresa, datacompetencia=competencia)
+    sessao.add(avd)
+    sessao.flush()
+    for codigo_ons, parcela1, parcela2 in itens:
+        sessao.add(
+            RsmTustAvisoDebitoItem(
+                identificadoravisodebitotransmissao=avd.id_avisodebito,
+                codigoons=codigo_ons,
+                valorparcela1=Decimal(parcela1),
+                valorparcela2=Decimal(parcela2),
+                valortotal=Decimal(parcela1) + Decimal(parcela2),
+            )
+        )
+    return avd
+
+
+@pytest.fixture
+def factory(tmp_path, monkeypatch):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'resumo.db'}")
+    ensure_schema(engine)
+    factory = sessionmaker(bind=engine)
+    monkeypatch.setattr(database, "get_session_factory", lambda *args, **kwargs: factory)
+    with factory() as sessao:
+        _avd(
+            sessao,
+            "E1",
+            JANEIRO,
+            [("T001", "10.00", "5.00"), ("T001", "1.10", "0"), ("T002", "7", "0")],
+        )
+        _avd(sessao, "E1", FEVEREIRO, [("T001", "3.00", "0")])
+        _avd(sessao, "E2", JANEIRO, [("T001", "2.00", "0")])
+        rebuild_resumo(sessao)
+        sessao.commit()
+    return factory
+
+
+def _linhas(sessao, **filtros):
+    return [
+        (r.codigoempresa, r.datacompetencia.month, r.codigoons, r.qtditens, r.valorparcela1)
+        for r in listar_resumo(sessao, **filtros)
+    ]
+
+
+def test_rebuild_agrupa_e_listar_filtra(factory):
+    with factory() as sessao:
+        assert _linhas(sessao) == [
+            ("E1", 1, "T001", 2, Decimal("11.10")),
+            ("E1", 1, "T002", 1, Decimal("7.00")),
+            ("E1", 2, "T001", 1, Decimal("3.00")),
+            ("E2", 1, "T001", 1, Decimal("2.00")),
+        ]
+        assert _linhas(sessao, codigo_empresa="E1", competencia=JANEIRO, codigo_ons="T002") == [
+            ("E1", 1, "T002", 1, Decimal("7.00"))
+        ]
+
+
+def test_atualizar_regrava_so_a_fatia(factory):
+    with factory() as sessao:
+        outras = {
+            (r.codigoempresa, r.datacompetencia): r.id_avdresumo
+            for r in sessao.query(RsmTustAvdResumo)
+            if (r.codigoempresa, r.datacompetencia) != ("E1", JANEIRO)
+        }
+        # Reimportação de E1/jan: T002 sai e o valor de T001 muda.
+        sessao.query(RsmTustAvisoDebitoItem).filter_by(codigoons="T002").delete()
+        item = sessao.query(RsmTustAvisoDebitoItem).filter_by(valorparcela1=Decimal("1.10")).one()
+        item.valorparcela1 = Decimal("2.10")
+        atualizar_resumo(sessao, "E1", JANEIRO)
+        sessao.commit()
+
+        assert _linhas(sessao, codigo_empresa="E1", competencia=JANEIRO) == [
+            ("E1", 1, "T001", 2, Decimal("12.10"))
+        ]
+        depois = {
+            (r.codigoempresa, r.datacompetencia): r.id_avdresumo
+            for r in sessao.query(RsmTustAvdResumo)
+            if (r.codigoempresa, r.datacompetencia) != ("E1", JANEIRO)
+        }
+        assert depois == outras
+
+
+def test_api_resumo(factory):
+    with TestClient(app) as client:
+        resposta = client.get(
+            "/avds/resumo", params={"codigo_empresa": "E1", "competencia": "2024.02"}
+        )
+        invalida = client.get("/avds/resumo", params={"competencia": "2024.13"})
+
+    assert resposta.json() == [
+        {
+            "codigo_empresa": "E1",
+            "competencia": "2024-02-01",
+            "codigo_ons": "T001",
+            "qtd_itens": 1,
+            "valor_parcela1": "3.00",
+            "valor_parcela2": "0.00",
+            "valor_parcela3": "0.00",
+            "valor_total": "3.00",
+        }
+    ]
+    assert invalida.status_code == 422
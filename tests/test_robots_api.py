@@ -0,0 +1,118 @@
+"""/robots/vsb: coalescência pela execução resolvida e replay por Idempotency-Key."""
+
+from __future__ import annotations
+
+import threading
+import time
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import _vsb_respostas, app
+from app.robots.base import default_competencia
+from app.robots.scheduler import RobotScheduler
+from app.robots.vsb import vsb_robot
+from app.services.transmissoras import TransmissoraRecord
+
+
+@pytest.fixture
+def robo(monkeypatch):
+    """Substitui a execução do robô VSB por uma que espera `liberar` e conta as chamadas."""
+    estado = {"chamadas": 0, "iniciado": threading.Event(), "liberar": threading.Event()}
+
+    def executar(codigo_ons: str, competencia: str, destino: Path):
+        estado["chamadas"] += 1
+        estado["iniciado"].set()
+        estado["liberar"].wait(5)
+        return {
+            "codigo_ons": codigo_ons,
+            "competencia": competencia,
+            "destino": destino,
+            "arquivos": [destino / "nf.xml"],
+            "metadata": {},
+        }
+
+    monkeypatch.setattr(vsb_robot, "_run", executar)
+    _vsb_respostas._entries.clear()
+    yield estado
+    _vsb_respostas._entries.clear()
+
+
+def _em_paralelo(primeiro, segundo, estado) -> list:
+    """Roda `primeiro` até o robô começar, então `segundo`, e libera o robô."""
+    resultados: list = [None, None]
+
+    def rodar(indice, fn):
+        resultados[indice] = fn()
+
+    threads = [threading.Thread(target=rodar, args=(0, primeiro))]
+    threads[0].start()
+    assert estado["iniciado"].wait(5)
+    threads.append(threading.Thread(target=rodar, args=(1, segundo)))
+    threads[1].start()
+    time.sleep(0.3)
+    estado["liberar"].set()
+    for thread in threads:
+        thread.join(5)
+    return resultados
+
+
+def test_mesma_execucao_resolvida_e_compartilhada(tmp_path, robo):
+    base = {"codigo_ons": "T001", "download_dir": str(tmp_path)}
+
+    def post(corpo):
+        with TestClient(app) as client:
+            return client.post("/robots/vsb", json=corpo)
+
+    # Difere em db_url e na competência explícita x padrão: mesmo destino, uma execução.
+    primeira, segunda = _em_paralelo(
+        lambda: post(base),
+        lambda: post({**base, "competencia": default_competencia(), "db_url": "sqlite://"}),
+        robo,
+    )
+
+    assert robo["chamadas"] == 1
+    assert primeira.status_code == segunda.status_code == 200
+    assert segunda.headers.get("X-Coalesced") == "true"
+    assert primeira.json()["destino"] == segunda.json()["destino"]
+
+
+def test_agendador_e_api_compartilham_a_execucao(tmp_path, robo):
+    transmissora = TransmissoraRecord(codigoons="T001", urlsite="https://www.vsbtrans.com.br/")
+
+    def api():
+        with TestClient(app) as client:
+            return client.post(
+                "/robots/vsb", json={"codigo_ons": "T001", "download_dir": str(tmp_path)}
+            )
+
+    lote, resposta = _em_paralelo(
+        lambda: RobotScheduler(download_dir=tmp_path).run([transmissora]),
+        api,
+        robo,
+    )
+
+    assert robo["chamadas"] == 1
+    assert lote[0]["status"] == "ok"
+    assert resposta.headers.get("X-Coalesced") == "true"
+
+
+def test_idempotency_key_repete_a_resposta(tmp_path, robo):
+    robo["liberar"].set()
+    corpo = {"codigo_ons": "T001", "download_dir": str(tmp_path)}
+    with TestClient(app) as client:
+        primeira = client.post("/robots/vsb", json=corpo, headers={"Idempotency-Key": "k1"})
+        repetida = client.post(
+            "/robots/vsb",
+            json={**corpo, "competencia": default_competencia()},
+            headers={"Idempotency-Key": "k1"},
+        )
+        conflito = client.post(
+            "/robots/vsb", json={**corpo, "codigo_ons": "T002"}, headers={"Idempotency-Key": "k1"}
+        )
+
+    assert robo["chamadas"] == 1
+    assert repetida.headers.get("Idempotent-Replayed") == "true"
+    assert repetida.json() == primeira.json()
+    assert conflito.status_code == 422
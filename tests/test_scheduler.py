@@ -0,0 +1,82 @@
+"""`RobotScheduler` e a interface `Robot` com um robô falso registrado num host próprio."""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Dict, List
+
+import pytest
+
+from app.robots.base import Robot, RobotError
+from app.robots.registry import register_robot
+from app.robots.scheduler import RobotScheduler
+from app.services.admissao import Limiter
+from app.services.transmissoras import TransmissoraRecord
+
+
+class RoboFalso(Robot):
+    name = "falso"
+    hosts = ("portal-falso.test",)
+
+    def fetch_metadata(self, codigo_ons: str, competencia: str) -> Dict[str, object]:
+        if codigo_ons == "R":
+            raise RobotError("portal fora do ar")
+        if codigo_ons == "X":
+            raise OSError("disco cheio")
+        return {}
+
+    def download(
+        self, codigo_ons: str, competencia: str, metadata: Dict[str, object], destino: Path
+    ) -> Path:
+        return destino / "pacote.zip"
+
+    def extract(self, archive: Path, destino: Path) -> List[Path]:
+        return [destino / "nf.xml"]
+
+
+def test_robot_exige_as_tres_etapas():
+    class Incompleto(Robot):
+        def fetch_metadata(self, codigo_ons, competencia):
+            return {}
+
+    with pytest.raises(TypeError):
+        Incompleto()
+
+
+def test_falha_inesperada_vira_erro_da_transmissora(tmp_path, caplog):
+    register_robot(RoboFalso())
+    transmissoras = [
+        TransmissoraRecord(codigoons=codigo, urlsite="https://portal-falso.test/")
+        for codigo in ("OK", "R", "X")
+    ]
+
+    resultados = RobotScheduler(download_dir=tmp_path).run(transmissoras, "2024.01")
+
+    por_codigo = {resultado["codigo_ons"]: resultado for resultado in resultados}
+    assert por_codigo["OK"]["status"] == "ok"
+    assert por_codigo["R"] == {
+        "codigo_ons": "R",
+        "portal": "falso",
+        "status": "erro",
+        "erro": "portal fora do ar",
+    }
+    assert por_codigo["X"]["status"] == "erro"
+    assert por_codigo["X"]["erro"] == "disco cheio"
+    assert "Falha inesperada no robô falso para X" in caplog.text
+
+
+def test_downloads_passam_pelo_limite(tmp_path):
+    register_robot(RoboFalso())
+    limite = Limiter("download", limite=1, fila=0)
+    transmissoras = [
+        TransmissoraRecord(codigoons=codigo, urlsite="https://portal-falso.test/")
+        for codigo in ("A", "B", "C")
+    ]
+
+    resultados = RobotScheduler(download_dir=tmp_path, downloads=limite).run(
+        transmissoras, "2024.01"
+    )
+
+    # Fila zero não recusa o lote: ele espera a vaga.
+    assert [resultado["status"] for resultado in resultados] == ["ok", "ok", "ok"]
+    assert (limite.admitidos, limite.recusados) == (3, 0)
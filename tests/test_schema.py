@@ -0,0 +1,82 @@
+"""`ensure_schema` num banco já existente: colunas, índices e UNIQUEs novos e a versão gravada."""
+
+from __future__ import annotations
+
+import pytest
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import IntegrityError
+
+from models import tust_models
+from models.tust_models import Base, create_db_engine, ensure_schema
+
+TITCP = "RSM_TUSTFATTRANSMISSAOTITCP"
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    monkeypatch.setattr(tust_models, "_schemas_ok", set())
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'antigo.db'}")
+    # Banco de antes do UNIQUE dos títulos: tabela só com algumas colunas.
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                f'CREATE TABLE "{TITCP}" ("ID_FATURATRANSMISSAOTITCP" INTEGER PRIMARY KEY, '
+                '"IDENTIFICADORFATURATRANSMISSAO" INTEGER, "SEQUENCIAL" INTEGER)'
+            )
+        )
+    return engine
+
+
+def _inserir_titulo(engine, fatura: int, sequencial: int) -> None:
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                f'INSERT INTO "{TITCP}" ("IDENTIFICADORFATURATRANSMISSAO", "SEQUENCIAL") '
+                "VALUES (:fatura, :sequencial)"
+            ),
+            {"fatura": fatura, "sequencial": sequencial},
+        )
+
+
+def test_tabela_existente_ganha_colunas_e_unique(engine):
+    assert ensure_schema(engine) is True
+
+    colunas = {coluna["name"] for coluna in inspect(engine).get_columns(TITCP)}
+    assert {"VALORTITULO", "DATAVENCIMENTO"} <= colunas
+    indices = {indice["name"]: indice["unique"] for indice in inspect(engine).get_indexes(TITCP)}
+    assert indices["RSM_TUSTFATTRANSMISSAOTITCP_UK"]
+    _inserir_titulo(engine, 1, 1)
+    with pytest.raises(IntegrityError):
+        _inserir_titulo(engine, 1, 1)
+
+
+def test_banco_em_dia_nao_roda_create_all(engine, monkeypatch):
+    ensure_schema(engine)
+    monkeypatch.setattr(tust_models, "_schemas_ok", set())
+
+    def falhar(*args, **kwargs):
+        raise AssertionError("create_all com o schema em dia")
+
+    monkeypatch.setattr(Base.metadata, "create_all", falhar)
+    assert ensure_schema(engine) is False
+
+
+def test_duplicados_adiam_o_unique_e_a_versao(engine, monkeypatch):
+    _inserir_titulo(engine, 1, 1)
+    _inserir_titulo(engine, 1, 1)
+
+    ensure_schema(engine)
+
+    assert "RSM_TUSTFATTRANSMISSAOTITCP_UK" not in {
+        indice["name"] for indice in inspect(engine).get_indexes(TITCP)
+    }
+    with engine.connect() as conn:
+        assert conn.execute(text('SELECT COUNT(*) FROM "RSM_TUSTSCHEMAVERSAO"')).scalar() == 0
+
+    # Limpos os duplicados, a próxima verificação cria o UNIQUE e grava a versão.
+    with engine.begin() as conn:
+        conn.execute(text(f'DELETE FROM "{TITCP}" WHERE "ID_FATURATRANSMISSAOTITCP" = 2'))
+    monkeypatch.setattr(tust_models, "_schemas_ok", set())
+    assert ensure_schema(engine) is True
+    with engine.connect() as conn:
+        assert conn.execute(text('SELECT COUNT(*) FROM "RSM_TUSTSCHEMAVERSAO"')).scalar() == 1
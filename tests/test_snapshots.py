@@ -0,0 +1,126 @@
+"""Snapshots Parquet por competência: exportação em lotes e regravação incremental."""
+
+from __future__ import annotations
+
+import datetime as dt
+from decimal import Decimal
+
+import pyarrow.parquet as pq
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from models.tust_models import (
+    RsmTustAvisoDebito,
+    RsmTustAvisoDebitoItem,
+    RsmTustFatTransmissaoNf,
+    create_db_engine,
+    ensure_schema,
+)
+from app.services.snapshots import export_snapshots, write_partition
+
+JANEIRO = dt.datetime(2024, 1, 1)
+FEVEREIRO = dt.datetime(2024, 2, 1)
+
+
+@pytest.fixture
+def session(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'snapshots.db'}")
+    ensure_schema(engine)
+    with sessionmaker(bind=engine)() as sessao:
+        for numero, competencia in ((1, JANEIRO), (2, FEVEREIRO)):
+            avd = RsmTustAvisoDebito(
+                identificador=numero,
+                codigoempresa="E1",
+                numeroavd=f"AVD-{numero}",
+                datacompetencia=competencia,
+            )
+            sessao.add(avd)
+            sessao.flush()
+            sessao.add_all(
+                RsmTustAvisoDebitoItem(
+                    identificadoravisodebitotransmissao=avd.id_avisodebito,
+                    codigoons=f"T00{indice}",
+                    valorparcela1=Decimal(valor),
+                    valortotal=Decimal(valor),
+                )
+                for indice, valor in enumerate(("100.10", "200.20", "300.30"), start=1)
+            )
+        sessao.add(
+            RsmTustFatTransmissaoNf(
+                identificador=1, chavenfe="NFe1", valortotal=Decimal("100.10"), iscancelado="N"
+            )
+        )
+        sessao.commit()
+        yield sessao
+
+
+def _ler(destino, table, competencia="2024-01"):
+    return pq.read_table(destino / table / f"competencia={competencia}" / "part-0.parquet")
+
+
+def test_exporta_em_lotes_com_decimais(tmp_path, session):
+    destino = tmp_path / "snap"
+
+    linhas = write_partition(session, destino, "avd_itens", JANEIRO, batch_size=2)
+
+    tabela = _ler(destino, "avd_itens")
+    assert linhas == tabela.num_rows == 3
+    assert str(tabela.schema.field("valortotal").type) == "decimal128(18, 2)"
+    assert tabela.column("valortotal").to_pylist() == [
+        Decimal("100.10"),
+        Decimal("200.20"),
+        Decimal("300.30"),
+    ]
+
+
+def test_reexportacao_so_regrava_o_que_mudou(tmp_path, session):
+    destino = tmp_path / "snap"
+    primeira = export_snapshots(session, destino)
+    assert primeira == {
+        "avd_itens": {"competencia=2024-01": 3, "competencia=2024-02": 3},
+        "notas_fiscais": {"competencia=2024-01": 1},
+    }
+    assert export_snapshots(session, destino) == {"avd_itens": {}, "notas_fiscais": {}}
+
+    # Valores trocados de linha: a soma da competência não muda.
+    itens = (
+        session.query(RsmTustAvisoDebitoItem)
+        .filter(RsmTustAvisoDebitoItem.identificadoravisodebitotransmissao == 1)
+        .order_by(RsmTustAvisoDebitoItem.id_avisodebitoitem)
+        .all()
+    )
+    itens[0].valortotal, itens[2].valortotal = itens[2].valortotal, itens[0].valortotal
+    # Cancelamento sem DATAALTERACAO (p.ex. feito direto no banco).
+    session.query(RsmTustFatTransmissaoNf).update({"iscancelado": "S"})
+    session.commit()
+
+    segunda = export_snapshots(session, destino)
+    assert segunda == {
+        "avd_itens": {"competencia=2024-01": 3},
+        "notas_fiscais": {"competencia=2024-01": 1},
+    }
+    assert _ler(destino, "avd_itens").column("valortotal").to_pylist()[0] == Decimal("300.30")
+    assert _ler(destino, "notas_fiscais").column("iscancelado").to_pylist() == ["S"]
+
+
+def test_competencia_esvaziada_perde_a_particao(tmp_path, session):
+    destino = tmp_path / "snap"
+    export_snapshots(session, destino)
+
+    session.query(RsmTustAvisoDebitoItem).filter(
+        RsmTustAvisoDebitoItem.identificadoravisodebitotransmissao == 2
+    ).delete()
+    session.commit()
+    assert export_snapshots(session, destino)["avd_itens"] == {"competencia=2024-02": 0}
+    assert not (destino / "avd_itens" / "competencia=2024-02").exists()
+
+    # A AVD inteira saiu do banco: a partição de janeiro das NFs também sai.
+    session.query(RsmTustAvisoDebitoItem).delete()
+    session.query(RsmTustAvisoDebito).filter_by(identificador=1).delete()
+    session.commit()
+    resumo = export_snapshots(session, destino)
+    assert resumo == {
+        "avd_itens": {"competencia=2024-01": 0},
+        "notas_fiscais": {"competencia=2024-01": 0},
+    }
+    assert not (destino / "notas_fiscais" / "competencia=2024-01").exists()
@@ -0,0 +1,108 @@
+"""Cache do cadastro de transmissoras: acertos, validade e versão do cadastro."""
+
+from __future__ import annotations
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from models.tust_models import RsmTustTransmissora, create_db_engine, ensure_schema
+from app.services import transmissoras
+from app.services.transmissoras import TransmissoraCache
+
+
+class Relogio:
+    def __init__(self) -> None:
+        self.agora = 1000.0
+
+    def monotonic(self) -> float:
+        return self.agora
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    relogio = Relogio()
+    monkeypatch.setattr(transmissoras, "time", relogio)
+    return relogio
+
+
+@pytest.fixture
+def session(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'transmissoras.db'}")
+    ensure_schema(engine)
+    with sessionmaker(bind=engine)() as sessao:
+        sessao.add_all(
+            [
+                RsmTustTransmissora(
+                    codigoons="T001", cnpj="11.111.111/0001-11", identificadorprocessoimportacao=1
+                ),
+                RsmTustTransmissora(
+                    codigoons="T002", cnpj="22222222000122", identificadorprocessoimportacao=1
+                ),
+            ]
+        )
+        sessao.commit()
+        yield sessao
+
+
+def _importar(session, codigo: str, cnpj: str, processo: int) -> None:
+    session.add(
+        RsmTustTransmissora(codigoons=codigo, cnpj=cnpj, identificadorprocessoimportacao=processo)
+    )
+    session.commit()
+
+
+def test_acertos_e_faltas(session, relogio):
+    cache = TransmissoraCache()
+
+    assert cache.get_por_cnpj(session, "11111111000111").codigoons == "T001"
+    assert cache.get_por_codigo(session, " T002 ").cnpj == "22222222000122"
+    assert cache.get_por_cnpj(session, "99999999000199") is None
+    assert cache.get_por_codigo(session, None) is None
+
+    assert cache.stats == {"hits": 2, "misses": 2, "reloads": 1, "size": 2}
+
+
+def test_versao_nova_recarrega_depois_do_intervalo(session, relogio):
+    cache = TransmissoraCache(ttl=3600, version_check_interval=30)
+    assert cache.get_por_codigo(session, "T003") is None
+
+    _importar(session, "T003", "33333333000133", processo=2)
+    # Dentro do intervalo a versão nem é consultada.
+    relogio.agora += 29
+    assert cache.get_por_codigo(session, "T003") is None
+    relogio.agora += 1
+    assert cache.get_por_codigo(session, "T003").cnpj == "33333333000133"
+    assert cache.stats["reloads"] == 2
+
+
+def test_mesma_versao_so_recarrega_no_fim_do_ttl(session, relogio):
+    cache = TransmissoraCache(ttl=120, version_check_interval=30)
+    cache.get_por_codigo(session, "T001")
+
+    # Linha gravada sem novo processo de importação: a versão não muda.
+    _importar(session, "T004", "44444444000144", processo=1)
+    relogio.agora += 60
+    assert cache.get_por_codigo(session, "T004") is None
+    assert cache.stats["reloads"] == 1
+    relogio.agora += 60
+    assert cache.get_por_codigo(session, "T004") is not None
+    assert cache.stats["reloads"] == 2
+
+
+def test_invalidate_forca_recarga(session, relogio):
+    cache = TransmissoraCache()
+    cache.get_por_codigo(session, "T001")
+    _importar(session, "T005", "55555555000155", processo=1)
+
+    cache.invalidate()
+
+    assert cache.get_por_codigo(session, "T005") is not None
+
+
+def test_cnpj_repetido_fica_com_o_menor_id(session, relogio):
+    _importar(session, "T009", "11111111000111", processo=2)
+    cache = TransmissoraCache()
+
+    assert cache.get_por_cnpj(session, "11.111.111/0001-11").codigoons == "T001"
+    assert cache.get_por_codigo(session, "T009").cnpj == "11111111000111"
+    assert {record.codigoons for record in cache.all(session)} == {"T001", "T002", "T009"}
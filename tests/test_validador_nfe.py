@@ -0,0 +1,69 @@
+"""Integridade das NF-es: CNPJ alfanumérico, chave de acesso e emissão ausente."""
+
+from __future__ import annotations
+
+import dataclasses
+import datetime as dt
+from decimal import Decimal
+
+from app.parsers.nfe import NFeInvoice
+from app.services.transmissoras import normalize_cnpj
+from app.validators.nfe import (
+    PESOS_CHAVE,
+    _digitos,
+    _dv_modulo11,
+    chave_valida,
+    cnpj_valido,
+    problemas_nfe,
+)
+
+# Exemplo da Receita Federal para o CNPJ alfanumérico: 12.ABC.345/01DE-35.
+CNPJ_ALFANUMERICO = "12ABC34501DE35"
+CNPJ_NUMERICO = "11222333000181"
+
+
+def chave(cnpj: str, numero: int = 123, serie: int = 1, aamm: str = "2401") -> str:
+    base = f"43{aamm}{cnpj}55{serie:03d}{numero:09d}1{numero:08d}"
+    return base + str(_dv_modulo11(_digitos(base), PESOS_CHAVE))
+
+
+def nota(cnpj: str, **campos) -> NFeInvoice:
+    invoice = NFeInvoice(
+        codigo_ons="T001",
+        competencia=dt.date(2024, 1, 1),
+        cnpj_emitente=cnpj,
+        nome_emitente="Transmissora",
+        cnpj_destinatario=CNPJ_NUMERICO,
+        nome_destinatario="Empresa",
+        numero_nfe="123",
+        serie="1",
+        chave_nfe=chave(cnpj),
+        numero_fatura=None,
+        valor_total=Decimal("100.00"),
+        data_emissao=dt.datetime(2024, 1, 10),
+        data_vencimento=None,
+        duplicata_numero=None,
+        duplicata_valor=None,
+        arquivo="nfe.xml",
+    )
+    return dataclasses.replace(invoice, **campos)
+
+
+def test_cnpj_alfanumerico():
+    assert cnpj_valido(CNPJ_ALFANUMERICO)
+    assert cnpj_valido(CNPJ_NUMERICO)
+    assert not cnpj_valido("12ABC34501DE36")
+    assert not cnpj_valido("12abc34501de35")
+    assert not cnpj_valido("12ABC34501DEA5")
+    assert normalize_cnpj("12.abc.345/01de-35") == CNPJ_ALFANUMERICO
+
+
+def test_chave_com_cnpj_alfanumerico():
+    valida = chave(CNPJ_ALFANUMERICO)
+    assert chave_valida(valida)
+    assert not chave_valida(valida[:-1] + str((int(valida[-1]) + 1) % 10))
+    assert problemas_nfe(nota(CNPJ_ALFANUMERICO)) == []
+
+
+def test_emissao_ausente():
+    assert problemas_nfe(nota(CNPJ_NUMERICO, data_emissao=None)) == ["dhEmi ausente."]